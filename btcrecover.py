@@ -50,7 +50,9 @@ __version__          =  "0.14.0"
 __ordering_version__ = b"0.6.4"  # must be updated whenever password ordering changes
 
 import sys, argparse, itertools, string, re, multiprocessing, signal, os, cPickle, gc, \
-       time, hashlib, collections, base64, struct, atexit, zlib, math, json, numbers
+       time, hashlib, collections, base64, struct, atexit, zlib, math, json, numbers, mmap, Queue, array, \
+       bisect, heapq, tempfile, shutil, random, socket, select, threading, multiprocessing.pool, binascii, \
+       functools, platform, hmac
 
 # The progressbar module is recommended but optional; it is typically
 # distributed with btcrecover (it is loaded later on demand)
@@ -70,7 +72,7 @@ import sys, argparse, itertools, string, re, multiprocessing, signal, os, cPickl
 # warning: these can't be the key for a wildcard set: digits 'i' 'b' '[' ',' ';' '-' '<' '>'
 def init_wildcards():
     global wildcard_sets, wildcard_keys, wildcard_nocase_sets, wildcard_re, \
-           custom_wildcard_cache, backreference_maps, backreference_maps_sha1
+           custom_wildcard_cache, compiled_wildcard_cache, backreference_maps, backreference_maps_sha1
     # N.B. that tstr() will not convert string.*case to Unicode correctly if the locale has
     # been set to one with a single-byte code page e.g. ISO-8859-1 (Latin1) or Windows-1252
     wildcard_sets = {
@@ -108,6 +110,7 @@ def init_wildcards():
     #
     wildcard_re = None
     custom_wildcard_cache   = dict()
+    compiled_wildcard_cache = dict()
     backreference_maps      = dict()
     backreference_maps_sha1 = None
 
@@ -278,6 +281,44 @@ def prompt_unicode_password(prompt, error_msg):
     return password
 
 
+# A base class for wallets which, in addition to return_verified_password_or_false(), can verify a
+# "packed" batch of passwords: a single bytestring with every password already converted into the
+# encoding the wallet requires, along with an array of the offsets at which each one ends. Worker
+# processes which are sent packed batches (see SharedPasswordSlots) needn't decode them only to
+# re-encode each password. Derived classes set encode_password, and implement
+# _return_verified_index_or_none() which is given a list of already-encoded bytestrings.
+class PackedPasswordsWallet(object):
+
+    # A function which converts a password into the encoding the wallet requires,
+    # or None if the passwords are already in that encoding (and need no conversion)
+    encode_password = None
+
+    # Returns a tuple: if a password is correct return it, else return False for item 0;
+    # return a count of passwords checked for item 1
+    def return_verified_password_or_false(self, passwords):
+        encode_password = self.encode_password
+        index, count = self._return_verified_index_or_none(
+            map(encode_password, passwords) if encode_password else passwords)
+        return (False if index is None else passwords[index]), count
+
+    # Returns a tuple: if a password is correct return its index, else return None for item 0;
+    # return a count of passwords checked for item 1
+    def return_verified_packed_index_or_none(self, data, ends):
+        return self._return_verified_index_or_none(
+            [data[start:end] for start, end in itertools.izip(itertools.chain((0,), ends), ends)])
+
+# Packs a list of passwords for a wallet's return_verified_packed_index_or_none(), converting each
+# with encode_password (unless it's None); returns a tuple: a bytestring and an array of end offsets
+def pack_passwords(passwords, encode_password):
+    if encode_password:
+        passwords = map(encode_password, passwords)
+    ends, end = array.array(b"I"), 0
+    for password in passwords:
+        end += len(password)
+        ends.append(end)
+    return b"".join(passwords), ends
+
+
 ############### Armory ###############
 
 # Try to add the Armory libraries to the path for various platforms
@@ -636,15 +677,16 @@ class WalletArmory(object):
 ############### Bitcoin Core ###############
 
 @register_wallet_class
-class WalletBitcoinCore(object):
+class WalletBitcoinCore(PackedPasswordsWallet):
 
     class __metaclass__(type):
         @property
         def data_extract_id(cls): return b"bc"
 
-    @staticmethod
-    def passwords_per_seconds(seconds):
-        return max(int(round(10 * seconds)), 1)
+    def passwords_per_seconds(self, seconds):
+        # Each password requires iter_count SHA-512 hashes
+        hashes_per_second = calibrated_rate(b"sha512_chain", b"hashlib", sha512_chain_benchmark)
+        return max(int(round(hashes_per_second / self._iter_count * seconds)), 1)
 
     @staticmethod
     def is_wallet_file(wallet_file):
@@ -654,6 +696,8 @@ class WalletBitcoinCore(object):
     def __init__(self, loading = False):
         assert loading, 'use load_from_* to create a ' + self.__class__.__name__
         load_aes256_library()
+        # measured once here (and not by each worker process) since it takes a moment
+        self._sha512_lanes_min = load_sha512_chains_library()
 
     def __setstate__(self, state):
         # (re-)load the required libraries after being unpickled
@@ -697,20 +741,31 @@ class WalletBitcoinCore(object):
         self._part_encrypted_master_key, self._salt, self._iter_count = struct.unpack(b"< 32s 8s I", mkey_data)
         return self
 
+    # Passwords are verified as UTF-8 bytestrings (in the ASCII-only version they already are)
+    if tstr == unicode:
+        encode_password = staticmethod(lambda p: p.encode("utf_8", "ignore"))
+
     # Defer to either the cpu or OpenCL implementation
-    def return_verified_password_or_false(self, passwords):
-        return self._return_verified_password_or_false_opencl(passwords) if hasattr(self, "_cl_devices") \
-          else self._return_verified_password_or_false_cpu(passwords)
+    def _return_verified_index_or_none(self, passwords):
+        return self._return_verified_index_or_none_opencl(passwords) if hasattr(self, "_cl_devices") \
+          else self._return_verified_index_or_none_cpu(passwords)
 
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
-    def _return_verified_password_or_false_cpu(self, passwords):
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
+    def _return_verified_index_or_none_cpu(self, passwords):
         # Copy a global into local for a small speed boost
         l_sha512 = hashlib.sha512
 
-        # Convert Unicode strings (lazily) to UTF-8 bytestrings
-        if tstr == unicode:
-            passwords = itertools.imap(lambda p: p.encode("utf_8", "ignore"), passwords)
+        # With enough passwords, it can be faster to compute all of their hash chains at once
+        if self._sha512_lanes_min and len(passwords) >= self._sha512_lanes_min:
+            derived_keys = sha512_chains_lanes([password + self._salt for password in passwords], self._iter_count)
+            part_master_keys = aes256_cbc_decrypt_keys([derived_key[:32] for derived_key in derived_keys],
+                self._part_encrypted_master_key[:16], self._part_encrypted_master_key[16:])
+            for count, part_master_key in enumerate(part_master_keys, 1):
+                # If the last block (bytes 16-31) of part_encrypted_master_key is all padding, we've found it
+                if part_master_key == b"\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10":
+                    return count-1, count
+            return None, count
 
         for count, password in enumerate(passwords, 1):
             derived_key = password + self._salt
@@ -720,9 +775,9 @@ class WalletBitcoinCore(object):
             #
             # If the last block (bytes 16-31) of part_encrypted_master_key is all padding, we've found it
             if part_master_key == b"\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10":
-                return password if tstr == str else password.decode("utf_8", "replace"), count
+                return count-1, count
 
-        return False, count
+        return None, count
 
     # Load and initialize the OpenCL kernel for Bitcoin Core, given:
     #   devices - a list of one or more of the devices returned by get_opencl_devices()
@@ -731,7 +786,7 @@ class WalletBitcoinCore(object):
     #   int_rate  - number of times to interrupt calculations to prevent hanging
     #               the GPU driver per call to return_verified_password_or_false()
     def init_opencl_kernel(self, devices, global_ws, local_ws, int_rate):
-        # Need to save these for return_verified_password_or_false_opencl()
+        # Need to save these for _return_verified_index_or_none_opencl()
         assert devices, "WalletBitcoinCore.init_opencl_kernel: at least one device is selected"
         assert len(devices) == len(global_ws) == len(local_ws), "WalletBitcoinCore.init_opencl_kernel: one global_ws and one local_ws specified for each device"
         self._cl_devices   = devices
@@ -774,12 +829,8 @@ class WalletBitcoinCore(object):
         if self._iter_count_chunksize % int_rate != 0:  # if not evenly divisible,
             self._iter_count_chunksize += 1             # then round up
 
-    def _return_verified_password_or_false_opencl(self, passwords):
-        assert len(passwords) <= sum(self._cl_global_ws), "WalletBitcoinCore.return_verified_password_or_false_opencl: at most --global-ws passwords"
-
-        # Convert Unicode strings to UTF-8 bytestrings
-        if tstr == unicode:
-            passwords = map(lambda p: p.encode("utf_8", "ignore"), passwords)
+    def _return_verified_index_or_none_opencl(self, passwords):
+        assert len(passwords) <= sum(self._cl_global_ws), "WalletBitcoinCore.return_verified_index_or_none_opencl: at most --global-ws passwords"
 
         # The first iter_count iteration is done by the CPU
         hashes = numpy.empty([sum(self._cl_global_ws), 64], numpy.uint8)
@@ -832,13 +883,13 @@ class WalletBitcoinCore(object):
         pyopencl.wait_for_events(done)
 
         # Using the computed hashes, try to decrypt the master key (in CPU)
-        for i, password in enumerate(passwords):
-            derived_key = hashes[i].tostring()
-            part_master_key = aes256_cbc_decrypt(derived_key[:32], self._part_encrypted_master_key[:16], self._part_encrypted_master_key[16:])
+        part_master_keys = aes256_cbc_decrypt_keys([hashes[i, :32].tostring() for i in xrange(len(passwords))],
+            self._part_encrypted_master_key[:16], self._part_encrypted_master_key[16:])
+        for i, part_master_key in enumerate(part_master_keys):
             # If the last block (bytes 16-31) of part_encrypted_master_key is all padding, we've found it
             if part_master_key == b"\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10":
-                return password if tstr == str else password.decode("utf_8", "replace"), i + 1
-        return False, i + 1
+                return i, i + 1
+        return None, i + 1
 
 
 @register_wallet_class
@@ -918,7 +969,7 @@ class WalletPywallet(WalletBitcoinCore):
 # - KnC for Android key backup files (same as the above)
 
 @register_wallet_class
-class WalletMultiBit(object):
+class WalletMultiBit(PackedPasswordsWallet):
 
     class __metaclass__(type):
         @property
@@ -935,7 +986,8 @@ class WalletMultiBit(object):
     def __init__(self, loading = False):
         assert loading, 'use load_from_* to create a ' + self.__class__.__name__
         aes_library_name = load_aes256_library().__name__
-        self._passwords_per_second = 100000 if aes_library_name == b"Crypto" else 5000
+        # Each password takes about as long as two AES decryptions (one for its key derivation and overhead)
+        self._passwords_per_second = calibrated_rate(b"aes256_cbc", aes_library_name, aes256_cbc_benchmark) / 2
 
     def __setstate__(self, state):
         # (re-)load the required libraries after being unpickled
@@ -970,28 +1022,30 @@ class WalletMultiBit(object):
         self._salt            = privkey_data[:8]
         return self
 
+    # Passwords are verified as UTF-16 bytestrings, truncating each code unit to 8 bits
+    # (in the ASCII-only version they already are)
+    if tstr == unicode:
+        encode_password = staticmethod(lambda p: p.encode("utf_16_le", "ignore")[::2])
+
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
     assert b"1" < b"9" < b"A" < b"Z" < b"a" < b"z"  # the b58 check below assumes ASCII ordering in the interest of speed
-    def return_verified_password_or_false(self, orig_passwords):
+    def _return_verified_index_or_none(self, passwords):
         # Copy a few globals into local for a small speed boost
         l_md5                 = hashlib.md5
-        l_aes256_cbc_decrypt  = aes256_cbc_decrypt
         encrypted_block       = self._encrypted_block
         salt                  = self._salt
 
-        # Convert Unicode strings (lazily) to UTF-16 bytestrings, truncating each code unit to 8 bits
-        if tstr == unicode:
-            passwords = itertools.imap(lambda p: p.encode("utf_16_le", "ignore")[::2], orig_passwords)
-        else:
-            passwords = orig_passwords
-
-        for count, password in enumerate(passwords, 1):
+        # Derive all the keys and ivs first so the block can be decrypted with all of them at once
+        keys, ivs = [], []
+        for password in passwords:
             salted = password + salt
             key1   = l_md5(salted).digest()
             key2   = l_md5(key1 + salted).digest()
-            iv     = l_md5(key2 + salted).digest()
-            b58_privkey = l_aes256_cbc_decrypt(key1 + key2, iv, encrypted_block)
+            keys.append(key1 + key2)
+            ivs .append(l_md5(key2 + salted).digest())
+
+        for count, b58_privkey in enumerate(aes256_cbc_decrypt_keys(keys, ivs, encrypted_block), 1):
 
             # (all this may be fragile, e.g. what if comments or whitespace precede what's expected in future versions?)
             if b58_privkey[0] in b"LK5Q\x0a#":
@@ -1002,14 +1056,14 @@ class WalletMultiBit(object):
                         # If it's outside of the base58 set [1-9A-HJ-NP-Za-km-z]
                         if c > b"z" or c < b"1" or b"9" < c < b"A" or b"Z" < c < b"a" or c in b"IOl": break  # not base58
                     else:  # if the loop above doesn't break, it's base58
-                        return orig_passwords[count-1], count
+                        return count-1, count
                 # Does it look like a bitcoinj protobuf (newest Bitcoin for Android backup) or a KnC for Android key backup?
                 # (there's a 1 in 2 trillion chance this hits but the password is wrong)
                 elif b58_privkey[2:6] == b"org." and b58_privkey[0] == b"\x0a" and ord(b58_privkey[1]) < 128 or \
                      b58_privkey == b"# KEEP YOUR PRIV":
-                    return orig_passwords[count-1], count
+                    return count-1, count
 
-        return False, count
+        return None, count
 
 
 ############### bitcoinj ###############
@@ -1019,7 +1073,7 @@ class WalletMultiBit(object):
 EncryptionParams = collections.namedtuple("EncryptionParams", "salt n r p")
 
 @register_wallet_class
-class WalletBitcoinj(object):
+class WalletBitcoinj(PackedPasswordsWallet):
 
     class __metaclass__(type):
         @property
@@ -1047,20 +1101,15 @@ class WalletBitcoinj(object):
 
     def __init__(self, loading = False):
         assert loading, 'use load_from_* to create a ' + self.__class__.__name__
-        global pylibscrypt
-        import pylibscrypt
-        # This is the base estimate for the scrypt N,r,p defaults of 16384,8,1
-        if not pylibscrypt._done:
-            print(prog+": warning: can't find an scrypt library, performance will be severely degraded", file=sys.stderr)
-            self._passwords_per_second = 0.03
-        else:
-            self._passwords_per_second = 14
+        scrypt_library_name = load_scrypt_library().__name__
+        # This is the base estimate for the scrypt N,r,p defaults of 16384,8,1 (it's measured with
+        # an N of 1024 to save time, and the time taken is proportional to N)
+        self._passwords_per_second = calibrated_rate(b"scrypt_1024_8_1", scrypt_library_name, scrypt_benchmark) / 16
         load_aes256_library()
 
     def __setstate__(self, state):
         # (re-)load the required libraries after being unpickled
-        global pylibscrypt
-        import pylibscrypt
+        load_scrypt_library()
         load_aes256_library()
         self.__dict__ = state
 
@@ -1106,11 +1155,14 @@ class WalletBitcoinj(object):
         self._encryption_parameters = EncryptionParams._make(struct.unpack(b"< 8s I H H", privkey_data[32:]))
         return self
 
+    # Passwords are verified as UTF-16BE bytestrings
+    encode_password = staticmethod(lambda p: p.encode("utf_16_be", "ignore"))
+
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
-    def return_verified_password_or_false(self, passwords):
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
+    def _return_verified_index_or_none(self, passwords):
         # Copy a few globals into local for a small speed boost
-        l_scrypt              = pylibscrypt.scrypt
+        l_scrypt              = scrypt
         l_aes256_cbc_decrypt  = aes256_cbc_decrypt
         part_encrypted_key    = self._part_encrypted_key
         scrypt_salt           = self._encryption_parameters.salt
@@ -1118,19 +1170,15 @@ class WalletBitcoinj(object):
         scrypt_r              = self._encryption_parameters.r
         scrypt_p              = self._encryption_parameters.p
 
-        # Convert strings (lazily) to UTF-16BE bytestrings
-        passwords = itertools.imap(lambda p: p.encode("utf_16_be", "ignore"), passwords)
-
         for count, password in enumerate(passwords, 1):
             derived_key = l_scrypt(password, scrypt_salt, scrypt_n, scrypt_r, scrypt_p, 32)
             part_key    = l_aes256_cbc_decrypt(derived_key, part_encrypted_key[:16], part_encrypted_key[16:])
             #
             # If the last block (bytes 16-31) of part_encrypted_key is all padding, we've found it
             if part_key == b"\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10":
-                password = password.decode("utf_16_be", "replace")
-                return password.encode("ascii", "replace") if tstr == str else password, count
+                return count-1, count
 
-        return False, count
+        return None, count
 
 
 ############### MultiBit HD ###############
@@ -1178,16 +1226,13 @@ class WalletMultiBitHD(WalletBitcoinj):
         return self
 
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
-    def return_verified_password_or_false(self, passwords):
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
+    def _return_verified_index_or_none(self, passwords):
         # Copy a few globals into local for a small speed boost
-        l_scrypt             = pylibscrypt.scrypt
+        l_scrypt             = scrypt
         l_aes256_cbc_decrypt = aes256_cbc_decrypt
         encrypted_block      = self._encrypted_block
 
-        # Convert strings (lazily) to UTF-16BE bytestrings
-        passwords = itertools.imap(lambda p: p.encode("utf_16_be", "ignore"), passwords)
-
         for count, password in enumerate(passwords, 1):
             derived_key = l_scrypt(password, b'\x35\x51\x03\x80\x75\xa3\xb0\xc5', olen=32)  # w/a hardcoded salt
             block       = l_aes256_cbc_decrypt(
@@ -1198,10 +1243,9 @@ class WalletMultiBitHD(WalletBitcoinj):
             # Does it look like a bitcoinj protobuf file?
             # (there's a 1 in 2 trillion chance this hits but the password is wrong)
             if block[2:6] == b"org." and block[0] == b"\x0a" and ord(block[1]) < 128:
-                password = password.decode("utf_16_be", "replace")
-                return password.encode("ascii", "replace") if tstr == str else password, count
+                return count-1, count
 
-        return False, count
+        return None, count
 
 
 ############### Android Spending PIN ###############
@@ -1260,7 +1304,7 @@ class WalletAndroidSpendingPIN(WalletBitcoinj):
 ############### mSIGNA ###############
 
 @register_wallet_class
-class WalletMsigna(object):
+class WalletMsigna(PackedPasswordsWallet):
 
     class __metaclass__(type):
         @property
@@ -1275,7 +1319,8 @@ class WalletMsigna(object):
     def __init__(self, loading = False):
         assert loading, 'use load_from_* to create a ' + self.__class__.__name__
         aes_library_name = load_aes256_library().__name__
-        self._passwords_per_second = 50000 if aes_library_name == b"Crypto" else 5000
+        # Each password takes about as long as four AES decryptions (most for its double SHA-512 and overhead)
+        self._passwords_per_second = calibrated_rate(b"aes256_cbc", aes_library_name, aes256_cbc_benchmark) / 4
 
     def __setstate__(self, state):
         # (re-)load the required libraries after being unpickled
@@ -1336,20 +1381,21 @@ class WalletMsigna(object):
         self._salt                   = privkey_data[32:]
         return self
 
+    # Passwords are verified as UTF-8 bytestrings (in the ASCII-only version they already are)
+    if tstr == unicode:
+        encode_password = staticmethod(lambda p: p.encode("utf_8", "ignore"))
+
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
-    def return_verified_password_or_false(self, passwords):
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
+    def _return_verified_index_or_none(self, passwords):
         # Copy some vars into local for a small speed boost
         l_sha1                 = hashlib.sha1
         l_sha256               = hashlib.sha256
         part_encrypted_privkey = self._part_encrypted_privkey
         salt                   = self._salt
 
-        # Convert Unicode strings (lazily) to UTF-8 bytestrings
-        if tstr == unicode:
-            passwords = itertools.imap(lambda p: p.encode("utf_8", "ignore"), passwords)
-
-        for count, password in enumerate(passwords, 1):
+        keys = []
+        for password in passwords:
             password_hashed = l_sha256(l_sha256(password).digest()).digest()  # mSIGNA does this first
             #
             # mSIGNA's remaining KDF is OpenSSL's EVP_BytesToKey using SHA1 and an iteration count of
@@ -1361,20 +1407,21 @@ class WalletMsigna(object):
             derived_part2 = derived_part1 + password_hashed + salt
             for i in xrange(5):
                 derived_part2 = l_sha1(derived_part2).digest()
-            #
-            part_privkey = aes256_cbc_decrypt(derived_part1 + derived_part2[:12], part_encrypted_privkey[:16], part_encrypted_privkey[16:])
-            #
+            keys.append(derived_part1 + derived_part2[:12])
+
+        part_privkeys = aes256_cbc_decrypt_keys(keys, part_encrypted_privkey[:16], part_encrypted_privkey[16:])
+        for count, part_privkey in enumerate(part_privkeys, 1):
             # If the last block (bytes 16-31) of part_encrypted_privkey is all padding, we've found it
             if part_privkey == b"\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10\x10":
-                return password if tstr == str else password.decode("utf_8", "replace"), count
+                return count-1, count
 
-        return False, count
+        return None, count
 
 
 ############### Electrum ###############
 
 @register_wallet_class
-class WalletElectrum1(object):
+class WalletElectrum1(PackedPasswordsWallet):
 
     class __metaclass__(type):
         @property
@@ -1389,7 +1436,8 @@ class WalletElectrum1(object):
     def __init__(self, loading = False):
         assert loading, 'use load_from_* to create a ' + self.__class__.__name__
         aes_library_name = load_aes256_library().__name__
-        self._passwords_per_second = 100000 if aes_library_name == b"Crypto" else 5000
+        # Each password takes about as long as two AES decryptions (one for its key derivation and overhead)
+        self._passwords_per_second = calibrated_rate(b"aes256_cbc", aes_library_name, aes256_cbc_benchmark) / 2
 
     def __setstate__(self, state):
         # (re-)load the required libraries after being unpickled
@@ -1432,30 +1480,28 @@ class WalletElectrum1(object):
         self._part_encrypted_seed = seed_data[16:]  # the first 16-byte encrypted block of the seed
         return self
 
+    # Passwords are verified as UTF-8 bytestrings (in the ASCII-only version they already are)
+    if tstr == unicode:
+        encode_password = staticmethod(lambda p: p.encode("utf_8", "ignore"))
+
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
     assert b"0" < b"9" < b"a" < b"f"  # the hex check below assumes ASCII ordering in the interest of speed
-    def return_verified_password_or_false(self, passwords):
+    def _return_verified_index_or_none(self, passwords):
         # Copy some vars into local for a small speed boost
         l_sha256             = hashlib.sha256
-        l_aes256_cbc_decrypt = aes256_cbc_decrypt
         part_encrypted_seed  = self._part_encrypted_seed
         iv                   = self._iv
 
-        # Convert Unicode strings (lazily) to UTF-8 bytestrings
-        if tstr == unicode:
-            passwords = itertools.imap(lambda p: p.encode("utf_8", "ignore"), passwords)
-
-        for count, password in enumerate(passwords, 1):
-            key  = l_sha256( l_sha256( password ).digest() ).digest()
-            seed = l_aes256_cbc_decrypt(key, iv, part_encrypted_seed)
+        keys = [l_sha256( l_sha256( password ).digest() ).digest() for password in passwords]
+        for count, seed in enumerate(aes256_cbc_decrypt_keys(keys, iv, part_encrypted_seed), 1):
             # If the first 16 bytes of the encrypted seed is all lower-case hex, we've found it
             for c in seed:
                 if c > b"f" or c < b"0" or b"9" < c < b"a": break  # not hex
             else:  # if the loop above doesn't break, it's all hex
-                return password if tstr == str else password.decode("utf_8", "replace"), count
+                return count-1, count
 
-        return False, count
+        return None, count
 
 @register_wallet_class
 class WalletElectrum2(WalletElectrum1):
@@ -1491,37 +1537,31 @@ class WalletElectrum2(WalletElectrum1):
         return self                                   # (the member variable name comes from the base class)
 
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
     assert b"1" < b"9" < b"A" < b"Z" < b"a" < b"z"  # the b58 check below assumes ASCII ordering in the interest of speed
-    def return_verified_password_or_false(self, passwords):
+    def _return_verified_index_or_none(self, passwords):
         # Copy some vars into local for a small speed boost
         l_sha256             = hashlib.sha256
-        l_aes256_cbc_decrypt = aes256_cbc_decrypt
         part_encrypted_xprv  = self._part_encrypted_seed
         iv                   = self._iv
 
-        # Convert Unicode strings (lazily) to UTF-8 bytestrings
-        if tstr == unicode:
-            passwords = itertools.imap(lambda p: p.encode("utf_8", "ignore"), passwords)
-
-        for count, password in enumerate(passwords, 1):
-            key  = l_sha256( l_sha256( password ).digest() ).digest()
-            xprv = l_aes256_cbc_decrypt(key, iv, part_encrypted_xprv)
+        keys = [l_sha256( l_sha256( password ).digest() ).digest() for password in passwords]
+        for count, xprv in enumerate(aes256_cbc_decrypt_keys(keys, iv, part_encrypted_xprv), 1):
 
             if xprv.startswith(b"xprv"):  # BIP32 extended private key version bytes
                 for c in xprv[4:]:
                     # If it's outside of the base58 set [1-9A-HJ-NP-Za-km-z]
                     if c > b"z" or c < b"1" or b"9" < c < b"A" or b"Z" < c < b"a" or c in b"IOl": break  # not base58
                 else:  # if the loop above doesn't break, it's base58
-                    return password if tstr == str else password.decode("utf_8", "replace"), count
+                    return count-1, count
 
-        return False, count
+        return None, count
 
 
 ############### Blockchain ###############
 
 @register_wallet_class
-class WalletBlockchain(object):
+class WalletBlockchain(PackedPasswordsWallet):
 
     class __metaclass__(type):
         @property
@@ -1535,12 +1575,12 @@ class WalletBlockchain(object):
         pbkdf2_library_name = load_pbkdf2_library().__name__
         aes_library_name    = load_aes256_library().__name__
         self._iter_count           = iter_count
-        self._passwords_per_second = 400000 if pbkdf2_library_name == "hashlib" else 100000
         if iter_count == 0:  # if it's a v0 wallet
             iter_count = 10
-        self._passwords_per_second /= iter_count
-        if aes_library_name != b"Crypto" and self._passwords_per_second > 2000:
-            self._passwords_per_second = 2000
+        # Each password requires iter_count PBKDF2 iterations plus (about) two AES decryptions
+        self._passwords_per_second = 1.0 / (
+            iter_count / calibrated_rate(b"pbkdf2_hmac_sha1", pbkdf2_library_name, pbkdf2_hmac_sha1_benchmark) +
+            2.0        / calibrated_rate(b"aes256_cbc",       aes_library_name,    aes256_cbc_benchmark))
 
     def __setstate__(self, state):
         # (re-)load the required libraries after being unpickled
@@ -1613,9 +1653,13 @@ class WalletBlockchain(object):
         self._salt_and_iv     = salt_and_iv
         return self
 
+    # Passwords are verified as UTF-8 bytestrings (in the ASCII-only version they already are)
+    if tstr == unicode:
+        encode_password = staticmethod(lambda p: p.encode("utf_8", "ignore"))
+
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
-    def return_verified_password_or_false(self, passwords):
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
+    def _return_verified_index_or_none(self, passwords):
         # Copy a few globals into local for a small speed boost
         l_pbkdf2_hmac        = pbkdf2_hmac
         l_aes256_cbc_decrypt = aes256_cbc_decrypt
@@ -1624,32 +1668,34 @@ class WalletBlockchain(object):
         salt_and_iv          = self._salt_and_iv
         iter_count           = self._iter_count
 
-        # Convert Unicode strings (lazily) to UTF-8 bytestrings
-        if tstr == unicode:
-            passwords = map(lambda p: p.encode("utf_8", "ignore"), passwords)
-
         v0 = not iter_count     # version 0.0 wallets don't specify an iter_count
-        if v0: iter_count = 10  # the default iter_count for version 0.0 wallets
-        for count, password in enumerate(passwords, 1):
-            key = l_pbkdf2_hmac(b"sha1", password, salt_and_iv, iter_count, 32)          # iter_count iterations
-            unencrypted_block = l_aes256_cbc_decrypt(key, salt_and_iv, encrypted_block)  # CBC mode
+        if v0:
+            # The default iter_count for version 0.0 wallets is 10, but older schemes used only 1 iteration;
+            # both keys are calculated at once (although the older schemes are only tried further below)
+            keys, old_keys = [], []
+            for password in passwords:
+                old_key, key = pbkdf2_hmac_checkpoints(b"sha1", password, salt_and_iv, (1, 10), 32)
+                keys    .append(key)
+                old_keys.append(old_key)
+        else:
+            keys = [l_pbkdf2_hmac(b"sha1", password, salt_and_iv, iter_count, 32) for password in passwords]  # iter_count iterations
+        for count, unencrypted_block in enumerate(aes256_cbc_decrypt_keys(keys, salt_and_iv, encrypted_block), 1):  # CBC mode
             # A bit fragile because it assumes the guid is in the first encrypted block,
             # although this has always been the case as of 6/2014 (since 12/2011)
             if unencrypted_block[0] == b"{" and b'"guid"' in unencrypted_block:
-                return password if tstr == str else password.decode("utf_8", "replace"), count
+                return count-1, count
 
         if v0:
             # Try the older encryption schemes possibly used in v0.0 wallets
-            for count, password in enumerate(passwords, 1):
-                key = l_pbkdf2_hmac(b"sha1", password, salt_and_iv, 1, 32)                   # only 1 iteration
+            for count, key in enumerate(old_keys, 1):  # only 1 iteration
                 unencrypted_block = l_aes256_cbc_decrypt(key, salt_and_iv, encrypted_block)  # CBC mode
                 if unencrypted_block[0] == b"{" and b'"guid"' in unencrypted_block:
-                    return password if tstr == str else password.decode("utf_8", "replace"), count
+                    return count-1, count
                 unencrypted_block = l_aes256_ofb_decrypt(key, salt_and_iv, encrypted_block)  # OFB mode
                 if unencrypted_block[0] == b"{" and b'"guid"' in unencrypted_block:
-                    return password if tstr == str else password.decode("utf_8", "replace"), count
+                    return count-1, count
 
-        return False, count
+        return None, count
 
 @register_wallet_class
 class WalletBlockchainSecondpass(WalletBlockchain):
@@ -1752,18 +1798,14 @@ class WalletBlockchainSecondpass(WalletBlockchain):
         return self
 
     # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
-    def return_verified_password_or_false(self, passwords):
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
+    def _return_verified_index_or_none(self, passwords):
         # Copy vars into locals for a small speed boost
         l_sha256 = hashlib.sha256
         password_hash = self._password_hash
         salt          = self._salt
         iter_count    = self._iter_count
 
-        # Convert Unicode strings (lazily) to UTF-8 bytestrings
-        if tstr == unicode:
-            passwords = itertools.imap(lambda p: p.encode("utf_8", "ignore"), passwords)
-
         # Newer wallets specify an iter_count and use something similar to PBKDF1 with SHA-256
         if iter_count:
             for count, password in enumerate(passwords, 1):
@@ -1771,7 +1813,7 @@ class WalletBlockchainSecondpass(WalletBlockchain):
                 for i in xrange(iter_count):
                     running_hash = l_sha256(running_hash).digest()
                 if running_hash == password_hash:
-                    return password if tstr == str else password.decode("utf_8", "replace"), count
+                    return count-1, count
 
         # Older wallets used one of three password hashing schemes
         else:
@@ -1779,17 +1821,17 @@ class WalletBlockchainSecondpass(WalletBlockchain):
                 running_hash = l_sha256(salt + password).digest()
                 # Just a single SHA-256 hash
                 if running_hash == password_hash:
-                    return password if tstr == str else password.decode("utf_8", "replace"), count
+                    return count-1, count
                 # Exactly 10 hashes (the first of which was done above)
                 for i in xrange(9):
                     running_hash = l_sha256(running_hash).digest()
                 if running_hash == password_hash:
-                    return password if tstr == str else password.decode("utf_8", "replace"), count
+                    return count-1, count
                 # A single unsalted hash
                 if l_sha256(password).digest() == password_hash:
-                    return password if tstr == str else password.decode("utf_8", "replace"), count
+                    return count-1, count
 
-        return False, count
+        return None, count
 
 
 ############### Bither ###############
@@ -1875,7 +1917,7 @@ class WalletBither(WalletBitcoinj):  # not really a bitcoinj wallet, but does sh
 ############### BIP-39 ###############
 
 # @register_wallet_class - not a "registed" wallet since there are no wallet files nor extracts
-class WalletBIP39(object):
+class WalletBIP39(PackedPasswordsWallet):
 
     def __init__(self, mpk = None, address = None, address_limit = None, mnemonic = None, lang = None, path = None, is_performance = False):
         global normalize, hmac
@@ -1900,6 +1942,14 @@ class WalletBIP39(object):
         self.sr_wallet._checksum_ratio = 1
 
         self._mnemonic = b" ".join(sr.mnemonic_ids_guess)
+        # The mnemonic is the (fixed) PBKDF2 password, and only the salt (derived from the passphrase) changes
+        self._pbkdf2_salts = pbkdf2_hmac_fixed_key(b"sha512", self._mnemonic)
+
+    def __getstate__(self):
+        # The PBKDF2 function can't be pickled, but it's recreated by __setstate__()
+        state = self.__dict__.copy()
+        del state[b"_pbkdf2_salts"]
+        return state
 
     def __setstate__(self, state):
         # (re-)load the required libraries after being unpickled
@@ -1908,46 +1958,150 @@ class WalletBIP39(object):
         import hmac
         load_pbkdf2_library()
         self.__dict__ = state
+        self._pbkdf2_salts = pbkdf2_hmac_fixed_key(b"sha512", self._mnemonic)
 
     def passwords_per_seconds(self, seconds):
         return self.sr_wallet.passwords_per_seconds(seconds)
 
-    # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
-    # is correct return it, else return False for item 0; return a count of passwords checked for item 1
-    def return_verified_password_or_false(self, passwords):
-        # Convert Unicode strings (lazily) to normalized UTF-8 bytestrings
-        if tstr == unicode:
-            passwords = itertools.imap(lambda p: normalize("NFKD", p).encode("utf_8", "ignore"), passwords)
+    # Passwords are verified as normalized UTF-8 bytestrings (in the ASCII-only version they already are)
+    if tstr == unicode:
+        encode_password = staticmethod(lambda p: normalize("NFKD", p).encode("utf_8", "ignore"))
 
-        for count, password in enumerate(passwords, 1):
-            seed_bytes = pbkdf2_hmac(b"sha512", self._mnemonic, b"mnemonic" + password, 2048)
+    # This is the time-consuming function executed by worker thread(s). It returns a tuple: if a password
+    # is correct return its index, else return None for item 0; return a count of passwords checked for item 1
+    def _return_verified_index_or_none(self, passwords):
+        seeds = self._pbkdf2_salts([b"mnemonic" + password for password in passwords], 2048, 64)
+        for count, seed_bytes in enumerate(seeds, 1):
             seed_bytes = hmac.new(b"Bitcoin seed", seed_bytes, hashlib.sha512).digest()
             if self.sr_wallet._verify_seed(seed_bytes):
-                return password if tstr == str else password.decode("utf_8", "replace"), count
-
-        return False, count
+                return count-1, count
+
+        return None, count
+
+
+# Loads the system's OpenSSL libcrypto (1.0.0+) via ctypes and returns it, or returns None if it can't be
+# found. It's an alternative to PyCrypto, hashlib.pbkdf2_hmac and pylibscrypt for the library loaders below
+# (which use whichever is fastest); its scrypt (EVP_PBE_scrypt) also requires OpenSSL 1.1.0+.
+libcrypto = None
+libcrypto_searched = False
+def load_libcrypto():
+    global libcrypto, libcrypto_searched
+    if libcrypto_searched: return libcrypto
+    libcrypto_searched = True
+    import ctypes, ctypes.util
+    c_void_p, c_int, c_char_p, c_size_t, c_uint64 = \
+        ctypes.c_void_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, ctypes.c_uint64
+    for name in (b"crypto", b"libcrypto", b"libeay32"):
+        path = ctypes.util.find_library(name)
+        if not path: continue
+        if path == b"/usr/lib/libcrypto.dylib": continue  # (macOS 10.15+ aborts if this one is loaded)
+        try:
+            lib = ctypes.CDLL(path)
+            for func_name in (b"EVP_CIPHER_CTX_new", b"EVP_aes_256_cbc", b"EVP_aes_256_ofb", b"EVP_get_digestbyname"):
+                getattr(lib, func_name).restype = c_void_p
+            lib.EVP_CIPHER_CTX_free.argtypes        = c_void_p,
+            lib.EVP_CIPHER_CTX_set_padding.argtypes = c_void_p, c_int
+            lib.EVP_DecryptInit_ex.argtypes         = c_void_p, c_void_p, c_void_p, c_char_p, c_char_p
+            lib.EVP_DecryptUpdate.argtypes          = c_void_p, c_char_p, ctypes.POINTER(c_int), c_char_p, c_int
+            lib.EVP_get_digestbyname.argtypes       = c_char_p,
+            lib.PKCS5_PBKDF2_HMAC.argtypes          = c_char_p, c_int, c_char_p, c_int, c_int, c_void_p, c_int, c_char_p
+        except (OSError, AttributeError):
+            continue
+        try:
+            lib.EVP_PBE_scrypt.argtypes = c_char_p, c_size_t, c_char_p, c_size_t, \
+                                          c_uint64, c_uint64, c_uint64, c_uint64, c_char_p, c_size_t
+        except AttributeError:
+            pass  # (only OpenSSL 1.1.0+ has scrypt)
+        # Before OpenSSL 1.1.0, EVP_get_digestbyname() can't find any digests until they've been added
+        if hasattr(lib, b"OpenSSL_add_all_digests"):
+            lib.OpenSSL_add_all_digests()
+        lib.__name__ = b"libcrypto"  # just so it can be checked like the modules returned by the loaders below
+        libcrypto = lib
+        break
+    return libcrypto
 
 
 # Creates two decryption functions (in global namespace), aes256_cbc_decrypt() and aes256_ofb_decrypt(),
-# using either PyCrypto if it's available or a pure python library. The created functions each take
+# using PyCrypto, libcrypto (see above), or a pure python library. The created functions each take
 # three bytestring arguments: key, iv, ciphertext. ciphertext must be a multiple of 16 bytes, and any
 # padding present is not stripped.
+#
+# Also creates aes256_cbc_decrypt_keys() which takes a list of keys, an iv (or a list of ivs, one per key),
+# and a ciphertext which must be a single 16-byte block, and returns the list of plaintexts (one per key).
+# With aespython, it uses NumPy (if available) to decrypt with all the keys at once.
+#
+# Unless a backend is specified, PyCrypto is preferred if it's available, then libcrypto, unless a later one
+# measures faster on this host (see fastest_backend() below).
 missing_pycrypto_warned = False
-def load_aes256_library(force_purepython = False):
-    global aes256_cbc_decrypt, aes256_ofb_decrypt, missing_pycrypto_warned
-    if not force_purepython:
+def load_aes256_library(force_purepython = False, backend = None):
+    global aes256_cbc_decrypt, aes256_ofb_decrypt, aes256_cbc_decrypt_keys, missing_pycrypto_warned
+    if force_purepython:
+        backend = b"aespython"
+    elif not backend:
+        backends = []
         try:
             import Crypto.Cipher.AES
-            new_aes = Crypto.Cipher.AES.new
-            aes256_cbc_decrypt = lambda key, iv, ciphertext: \
-                new_aes(key, Crypto.Cipher.AES.MODE_CBC, iv).decrypt(ciphertext)
-            aes256_ofb_decrypt = lambda key, iv, ciphertext: \
-                new_aes(key, Crypto.Cipher.AES.MODE_OFB, iv).decrypt(ciphertext)
-            return Crypto  # just so the caller can check which version was loaded
+            backends.append(b"Crypto")
         except ImportError:
-            if not missing_pycrypto_warned:
-                print(prog+": warning: can't find PyCrypto, using aespython instead", file=sys.stderr)
-                missing_pycrypto_warned = True
+            pass
+        if load_libcrypto():
+            backends.append(b"libcrypto")
+        backends.append(b"aespython")
+        backend = fastest_backend(b"aes256_cbc", aes256_cbc_benchmark,
+            *[(name, functools.partial(load_aes256_library, backend=name)) for name in backends])
+        if b"Crypto" not in backends and backend == b"aespython" and not missing_pycrypto_warned:
+            print(prog+": warning: can't find PyCrypto, using aespython instead", file=sys.stderr)
+            missing_pycrypto_warned = True
+
+    if backend == b"Crypto":
+        import Crypto.Cipher.AES
+        new_aes = Crypto.Cipher.AES.new
+        aes256_cbc_decrypt = lambda key, iv, ciphertext: \
+            new_aes(key, Crypto.Cipher.AES.MODE_CBC, iv).decrypt(ciphertext)
+        aes256_ofb_decrypt = lambda key, iv, ciphertext: \
+            new_aes(key, Crypto.Cipher.AES.MODE_OFB, iv).decrypt(ciphertext)
+        def aes256_cbc_decrypt_keys(keys, iv, ciphertext, MODE_CBC = Crypto.Cipher.AES.MODE_CBC):
+            if isinstance(iv, list):
+                return [new_aes(key, MODE_CBC, key_iv).decrypt(ciphertext) for key, key_iv in itertools.izip(keys, iv)]
+            return [new_aes(key, MODE_CBC, iv).decrypt(ciphertext) for key in keys]
+        return Crypto  # just so the caller can check which version was loaded
+
+    if backend == b"libcrypto":
+        import ctypes
+        l_libcrypto   = load_libcrypto()
+        c_int, byref  = ctypes.c_int, ctypes.byref
+        create_buffer = ctypes.create_string_buffer
+        def aes256_decrypt_factory(evp_cipher):
+            def aes256_decrypt(key, iv, ciphertext):
+                ctx = l_libcrypto.EVP_CIPHER_CTX_new()
+                try:
+                    l_libcrypto.EVP_DecryptInit_ex(ctx, evp_cipher, None, key, iv)
+                    l_libcrypto.EVP_CIPHER_CTX_set_padding(ctx, 0)
+                    plaintext, plaintext_len = create_buffer(len(ciphertext)), c_int()
+                    l_libcrypto.EVP_DecryptUpdate(ctx, plaintext, byref(plaintext_len), ciphertext, len(ciphertext))
+                    return plaintext.raw[:plaintext_len.value]
+                finally:
+                    l_libcrypto.EVP_CIPHER_CTX_free(ctx)
+            return aes256_decrypt
+        aes256_cbc_decrypt = aes256_decrypt_factory(l_libcrypto.EVP_aes_256_cbc())
+        aes256_ofb_decrypt = aes256_decrypt_factory(l_libcrypto.EVP_aes_256_ofb())
+        # One cipher context is reused for all the keys (only the key and iv are reset for each)
+        def aes256_cbc_decrypt_keys(keys, iv, ciphertext, evp_cipher = l_libcrypto.EVP_aes_256_cbc()):
+            ctx = l_libcrypto.EVP_CIPHER_CTX_new()
+            try:
+                l_libcrypto.EVP_DecryptInit_ex(ctx, evp_cipher, None, None, None)
+                l_libcrypto.EVP_CIPHER_CTX_set_padding(ctx, 0)
+                decrypt_init, decrypt_update = l_libcrypto.EVP_DecryptInit_ex, l_libcrypto.EVP_DecryptUpdate
+                plaintext, plaintext_len_ref = create_buffer(16), byref(c_int())
+                plaintexts = []
+                for key, key_iv in itertools.izip(keys, iv if isinstance(iv, list) else itertools.repeat(iv)):
+                    decrypt_init(ctx, None, None, key, key_iv)
+                    decrypt_update(ctx, plaintext, plaintext_len_ref, ciphertext, 16)
+                    plaintexts.append(plaintext.raw)
+                return plaintexts
+            finally:
+                l_libcrypto.EVP_CIPHER_CTX_free(ctx)
+        return l_libcrypto  # just so the caller can check which version was loaded
 
     # This version is attributed to GitHub user serprex; please see the aespython
     # README.txt for more information. It measures over 30x faster than the more
@@ -1970,29 +2124,509 @@ def load_aes256_library(force_purepython = False):
         return aes256_decrypt
     aes256_cbc_decrypt = aes256_decrypt_factory(aespython.cbc_mode.CBCMode)
     aes256_ofb_decrypt = aes256_decrypt_factory(aespython.ofb_mode.OFBMode)
+    try:
+        import numpy
+        numpy_min_keys = AES_KEYS_NUMPY_MIN
+    except ImportError:
+        numpy_min_keys = None
+    def aes256_cbc_decrypt_keys(keys, iv, ciphertext):
+        if numpy_min_keys and len(keys) >= numpy_min_keys:
+            return aes256_cbc_decrypt_keys_numpy(keys, iv, ciphertext)
+        if isinstance(iv, list):
+            return [aes256_cbc_decrypt(key, key_iv, ciphertext) for key, key_iv in itertools.izip(keys, iv)]
+        return [aes256_cbc_decrypt(key, iv, ciphertext) for key in keys]
     return aespython  # just so the caller can check which version was loaded
 
 
+# Decrypts a single 16-byte AES-256 CBC block with each of a list of keys at once, using NumPy arrays with
+# one row per byte of a key or of the AES state, and one column per key. The key schedules are expanded
+# and the rounds are computed a byte at a time using table lookups, all the keys in lockstep. Because
+# NumPy's per-call overhead is high, this is only faster than aespython for at least AES_KEYS_NUMPY_MIN
+# keys (with 1000 keys, it measures about 20x faster, although it's still 2x slower than PyCrypto).
+AES_KEYS_NUMPY_MIN = 10
+aes_numpy_tables   = None
+def aes256_cbc_decrypt_keys_numpy(keys, iv, ciphertext):
+    global aes_numpy_tables
+    import numpy, aespython.aes_tables
+    if not aes_numpy_tables:
+        aes_numpy_tables = (numpy.array(aespython.aes_tables.sbox,   numpy.uint8),
+                            numpy.array(aespython.aes_tables.i_sbox, numpy.uint8)) + \
+                      tuple(numpy.array(gal,                         numpy.uint8) for gal in aespython.aes_tables.galI)
+    sbox, i_sbox, gal14, gal11, gal13, gal9 = aes_numpy_tables
+    rcon = aespython.aes_tables.rcon
+    assert len(ciphertext) == 16, "aes256_cbc_decrypt_keys_numpy: ciphertext is a single block"
+    keys_count = len(keys)
+
+    # Expand the key schedules, one 4-byte word at a time (for all the keys)
+    words     = numpy.empty((60, 4, keys_count), numpy.uint8)
+    words[:8] = numpy.frombuffer(b"".join(keys), numpy.uint8).reshape(keys_count, 8, 4).transpose(1, 2, 0)
+    for i in xrange(8, 60):
+        temp = words[i-1]
+        if i % 8 == 0:
+            temp     = sbox[temp[[1, 2, 3, 0]]]  # RotWord, then SubWord
+            temp[0] ^= rcon[i // 8]
+        elif i % 8 == 4:
+            temp     = sbox[temp]                # SubWord
+        numpy.bitwise_xor(words[i-8], temp, words[i])
+    round_keys = words.reshape(15, 16, keys_count)
+
+    # The state's bytes are in column order (as are the round keys')
+    inv_shift_rows = [4 * ((i // 4 - i % 4) % 4) + i % 4 for i in xrange(16)]
+    state = numpy.frombuffer(ciphertext, numpy.uint8)[:, None] ^ round_keys[14]
+    for r in xrange(13, 0, -1):
+        state  = i_sbox[state[inv_shift_rows]]  # InvShiftRows, then InvSubBytes
+        state ^= round_keys[r]
+        columns = state.reshape(4, 4, keys_count)
+        mixed   = gal14[columns]                  # InvMixColumns
+        mixed  ^= numpy.roll(gal11[columns], -1, 1)
+        mixed  ^= numpy.roll(gal13[columns], -2, 1)
+        mixed  ^= numpy.roll(gal9 [columns], -3, 1)
+        state   = mixed.reshape(16, keys_count)
+    state  = i_sbox[state[inv_shift_rows]]
+    state ^= round_keys[0]
+    if isinstance(iv, list):  # CBC mode
+        state ^= numpy.frombuffer(b"".join(iv), numpy.uint8).reshape(keys_count, 16).T
+    else:
+        state ^= numpy.frombuffer(iv, numpy.uint8)[:, None]
+
+    plaintexts = state.T.tostring()
+    return [plaintexts[i : i+16] for i in xrange(0, len(plaintexts), 16)]
+
+
 # Creates a key derivation function (in global namespace) named pbkdf2_hmac() using either the
-# hashlib.pbkdf2_hmac from Python 2.7.8+ if it's available, or a pure python library (passlib).
-# The created function takes a hash name, two bytestring arguments and two integer arguments:
-# hash_name (e.g. b"sha1"), password, salt, iter_count, key_len (the length of the returned key)
+# hashlib.pbkdf2_hmac from Python 2.7.8+, libcrypto (see load_libcrypto() above), or a pure python
+# implementation below. The created function takes a hash name, two bytestring arguments and two
+# integer arguments: hash_name (e.g. b"sha1"), password, salt, iter_count, key_len (the length of
+# the returned key)
+#
+# Also creates pbkdf2_hmac_checkpoints() which takes the same arguments except that instead of an
+# iter_count, it takes a list of them in ascending order, and returns the list of keys (one per count)
+#
+# Also creates pbkdf2_hmac_fixed_key() which takes a hash_name and a password, and returns a function
+# which takes a list of salts, an iter_count and a key_len, and returns the list of keys (one per salt)
+#
+# Unless a backend is specified, hashlib is preferred if it's available, then libcrypto, unless a later
+# one measures faster on this host (see fastest_backend() below).
 missing_pbkdf2_warned = False
-def load_pbkdf2_library(force_purepython = False):
-    global pbkdf2_hmac, missing_pbkdf2_warned
-    if not force_purepython:
+def load_pbkdf2_library(force_purepython = False, backend = None):
+    global pbkdf2_hmac, pbkdf2_hmac_checkpoints, pbkdf2_hmac_fixed_key, missing_pbkdf2_warned
+    if force_purepython:
+        backend = b"pbkdf2_hmac_purepython"
+    elif not backend:
+        backends = []
+        if hasattr(hashlib, b"pbkdf2_hmac"):
+            backends.append(b"hashlib")
+        if load_libcrypto():
+            backends.append(b"libcrypto")
+        backends.append(b"pbkdf2_hmac_purepython")
+        backend = fastest_backend(b"pbkdf2_hmac_sha1", pbkdf2_hmac_sha1_benchmark,
+            *[(name, functools.partial(load_pbkdf2_library, backend=name)) for name in backends])
+        if b"hashlib" not in backends and backend == b"pbkdf2_hmac_purepython" and not missing_pbkdf2_warned:
+            print(prog+": warning: hashlib.pbkdf2_hmac requires Python 2.7.8+, using pure python instead", file=sys.stderr)
+            missing_pbkdf2_warned = True
+
+    if backend == b"hashlib":
+        pbkdf2_hmac = hashlib.pbkdf2_hmac
+        library     = hashlib
+    elif backend == b"libcrypto":
+        import ctypes
+        l_libcrypto   = load_libcrypto()
+        create_buffer = ctypes.create_string_buffer
+        def pbkdf2_hmac(hash_name, password, salt, iter_count, key_len = None):
+            evp_md = l_libcrypto.EVP_get_digestbyname(hash_name)
+            if not evp_md:
+                raise ValueError("unsupported hash type " + hash_name)
+            if key_len is None:
+                key_len = hashlib.new(hash_name).digest_size
+            key = create_buffer(key_len)
+            if not l_libcrypto.PKCS5_PBKDF2_HMAC(password, len(password), salt, len(salt), iter_count, evp_md, key_len, key):
+                raise ValueError("libcrypto's PKCS5_PBKDF2_HMAC failed")
+            return key.raw
+        library = l_libcrypto
+    else:
+        pbkdf2_hmac = pbkdf2_hmac_purepython
+        pbkdf2_hmac_checkpoints = pbkdf2_hmac_checkpoints_purepython
+        pbkdf2_hmac_fixed_key   = pbkdf2_hmac_fixed_key_purepython
+        return pbkdf2_hmac_purepython  # just so the caller can check which version was loaded
+
+    # Unless it's implemented in Python (w/o OpenSSL), it's faster to restart the calculation for
+    # each iteration count (or to rekey the HMAC for each salt) in C than it is to avoid it in Python
+    if pbkdf2_hmac.__module__ == b"hashlib":
+        pbkdf2_hmac_checkpoints = pbkdf2_hmac_checkpoints_purepython
+        pbkdf2_hmac_fixed_key   = pbkdf2_hmac_fixed_key_purepython
+    else:
+        pbkdf2_hmac_checkpoints = lambda hash_name, password, salt, iter_counts, key_len: \
+            [pbkdf2_hmac(hash_name, password, salt, iter_count, key_len) for iter_count in iter_counts]
+        pbkdf2_hmac_fixed_key   = lambda hash_name, password: lambda salts, iter_count, key_len: \
+            [pbkdf2_hmac(hash_name, password, salt, iter_count, key_len) for salt in salts]
+    return library  # just so the caller can check which version was loaded
+
+
+# Creates a key derivation function (in global namespace) named scrypt() using either pylibscrypt (which
+# itself uses a binary scrypt library if it can find one, else pure python) or libcrypto (OpenSSL 1.1.0+).
+# The created function takes the same arguments as pylibscrypt.scrypt(): password, salt, N, r, p, olen.
+#
+# Unless a backend is specified, a binary pylibscrypt is preferred, then libcrypto, then a pure python
+# pylibscrypt (which is only measured if it's the only one available, since it's so slow).
+missing_scrypt_warned = False
+def load_scrypt_library(backend = None):
+    global scrypt, missing_scrypt_warned
+    if not backend:
+        backends = []
         try:
-            pbkdf2_hmac = hashlib.pbkdf2_hmac
-            return hashlib  # just so the caller can check which version was loaded
-        except AttributeError:
-            if not missing_pbkdf2_warned:
-                print(prog+": warning: hashlib.pbkdf2_hmac requires Python 2.7.8+, using passlib instead", file=sys.stderr)
-                missing_pbkdf2_warned = True
+            import pylibscrypt
+            if pylibscrypt._done:
+                backends.append(pylibscrypt.scrypt.__module__)
+        except ImportError:
+            pylibscrypt = None
+        if load_libcrypto() and hasattr(libcrypto, b"EVP_PBE_scrypt"):
+            backends.append(b"libcrypto")
+        if not backends:
+            if not pylibscrypt:
+                raise ImportError("can't find pylibscrypt or libcrypto (OpenSSL 1.1.0+) for scrypt")
+            if not missing_scrypt_warned:
+                print(prog+": warning: can't find an scrypt library, performance will be severely degraded", file=sys.stderr)
+                missing_scrypt_warned = True
+            backends.append(pylibscrypt.scrypt.__module__)
+        backend = fastest_backend(b"scrypt_1024_8_1", scrypt_benchmark,
+            *[(name, functools.partial(load_scrypt_library, name)) for name in backends])
+
+    if backend == b"libcrypto":
+        import ctypes
+        l_libcrypto   = load_libcrypto()
+        create_buffer = ctypes.create_string_buffer
+        def scrypt(password, salt, N = 2**14, r = 8, p = 1, olen = 64):
+            key = create_buffer(olen)
+            # (the memory limit is exactly what's required, see OpenSSL's EVP_PBE_scrypt() for details)
+            if not l_libcrypto.EVP_PBE_scrypt(password, len(password), salt, len(salt), N, r, p,
+                                              128 * r * (N + p + 2), key, olen):
+                raise ValueError("libcrypto's EVP_PBE_scrypt failed (are N, r, and p valid?)")
+            return key.raw
+        return l_libcrypto  # just so the caller can check which version was loaded
+
+    import pylibscrypt
+    scrypt = pylibscrypt.scrypt
+    return sys.modules[scrypt.__module__]  # just so the caller can check which version was loaded
+
+
+# Returns the inner and outer hash objects of an HMAC keyed with password (and not yet updated with a
+# message), to be copied for each message as in hmac_states_digest() below
+hmac_trans_5c = b"".join(chr(x ^ 0x5C) for x in xrange(256))
+hmac_trans_36 = b"".join(chr(x ^ 0x36) for x in xrange(256))
+def hmac_key_states(hash_name, password):
+    hash_new   = getattr(hashlib, hash_name)
+    block_size = hash_new().block_size
+    if len(password) > block_size:
+        password = hash_new(password).digest()
+    password   = password.ljust(block_size, b"\0")
+    return hash_new(password.translate(hmac_trans_36)), hash_new(password.translate(hmac_trans_5c))
+#
+def hmac_states_digest(inner_start, outer_start, message):
+    inner = inner_start.copy()
+    outer = outer_start.copy()
+    inner.update(message)
+    outer.update(inner.digest())
+    return outer.digest()
+
+
+# Calculates PBKDF2 keys at several iteration counts (see pbkdf2_hmac_checkpoints() above) with a single
+# chain of HMAC iterations: the key for an iteration count is the running XOR of each block's HMAC chain
+# so far, so the keys for the smaller iteration counts are saved along the way to the largest one
+def pbkdf2_hmac_checkpoints_purepython(hash_name, password, salt, iter_counts, key_len):
+    inner_start, outer_start = hmac_key_states(hash_name, password)
+    digest_size = inner_start.digest_size
+    hmac = functools.partial(hmac_states_digest, inner_start, outer_start)
+
+    l_hexlify   = binascii.hexlify
+    keys_blocks = [[] for iter_count in iter_counts]  # one list of blocks per iteration count
+    for block_num in xrange(1, (key_len - 1) // digest_size + 2):
+        u = hmac(salt + struct.pack(b">I", block_num))
+        t = int(l_hexlify(u), 16)
+        done = 1
+        for key_blocks, iter_count in zip(keys_blocks, iter_counts):
+            for i in xrange(iter_count - done):
+                u  = hmac(u)
+                t ^= int(l_hexlify(u), 16)
+            done = max(iter_count, done)
+            key_blocks.append(binascii.unhexlify(b"%0*x" % (2 * digest_size, t)))
+    return [b"".join(key_blocks)[:key_len] for key_blocks in keys_blocks]
+
+
+# Returns a function which calculates PBKDF2 keys for a list of salts using the same password (see
+# pbkdf2_hmac_fixed_key() above). The password's HMAC states are only calculated once, and the
+# loop over the salts and iterations avoids the overhead of a function call per HMAC.
+def pbkdf2_hmac_fixed_key_purepython(hash_name, password):
+    inner_start, outer_start = hmac_key_states(hash_name, password)
+    digest_size = inner_start.digest_size
+    inner_copy  = inner_start.copy
+    outer_copy  = outer_start.copy
+    l_hexlify   = binascii.hexlify
+    hex_len     = 2 * digest_size
     #
-    import passlib.utils.pbkdf2
-    passlib_pbkdf2 = passlib.utils.pbkdf2.pbkdf2
-    pbkdf2_hmac = lambda hash_name, *args: passlib_pbkdf2(*args, prf= b"hmac-" + hash_name)
-    return passlib  # just so the caller can check which version was loaded
+    def pbkdf2_hmac_salts(salts, iter_count, key_len = None):
+        if key_len is None:
+            key_len = digest_size
+        keys = []
+        for salt in salts:
+            key_blocks = []
+            for block_num in xrange(1, (key_len - 1) // digest_size + 2):
+                inner = inner_copy()
+                outer = outer_copy()
+                inner.update(salt + struct.pack(b">I", block_num))
+                outer.update(inner.digest())
+                u = outer.digest()
+                t = int(l_hexlify(u), 16)
+                for i in xrange(iter_count - 1):
+                    inner = inner_copy()
+                    outer = outer_copy()
+                    inner.update(u)
+                    outer.update(inner.digest())
+                    u  = outer.digest()
+                    t ^= int(l_hexlify(u), 16)
+                key_blocks.append(binascii.unhexlify(b"%0*x" % (hex_len, t)))
+            keys.append(b"".join(key_blocks)[:key_len])
+        return keys
+    return pbkdf2_hmac_salts
+
+
+# A pure python replacement for hashlib.pbkdf2_hmac (which requires Python 2.7.8+)
+def pbkdf2_hmac_purepython(hash_name, password, salt, iter_count, key_len = None):
+    return pbkdf2_hmac_fixed_key_purepython(hash_name, password)((salt,), iter_count, key_len)[0]
+
+
+# Returns the result of hashing data with SHA-512 iter_count times, each time hashing the previous digest
+def sha512_chain(data, iter_count):
+    l_sha512 = hashlib.sha512
+    for i in xrange(iter_count):
+        data = l_sha512(data).digest()
+    return data
+
+SHA512_K = (
+    0x428a2f98d728ae22, 0x7137449123ef65cd, 0xb5c0fbcfec4d3b2f, 0xe9b5dba58189dbbc, 0x3956c25bf348b538,
+    0x59f111f1b605d019, 0x923f82a4af194f9b, 0xab1c5ed5da6d8118, 0xd807aa98a3030242, 0x12835b0145706fbe,
+    0x243185be4ee4b28c, 0x550c7dc3d5ffb4e2, 0x72be5d74f27b896f, 0x80deb1fe3b1696b1, 0x9bdc06a725c71235,
+    0xc19bf174cf692694, 0xe49b69c19ef14ad2, 0xefbe4786384f25e3, 0x0fc19dc68b8cd5b5, 0x240ca1cc77ac9c65,
+    0x2de92c6f592b0275, 0x4a7484aa6ea6e483, 0x5cb0a9dcbd41fbd4, 0x76f988da831153b5, 0x983e5152ee66dfab,
+    0xa831c66d2db43210, 0xb00327c898fb213f, 0xbf597fc7beef0ee4, 0xc6e00bf33da88fc2, 0xd5a79147930aa725,
+    0x06ca6351e003826f, 0x142929670a0e6e70, 0x27b70a8546d22ffc, 0x2e1b21385c26c926, 0x4d2c6dfc5ac42aed,
+    0x53380d139d95b3df, 0x650a73548baf63de, 0x766a0abb3c77b2a8, 0x81c2c92e47edaee6, 0x92722c851482353b,
+    0xa2bfe8a14cf10364, 0xa81a664bbc423001, 0xc24b8b70d0f89791, 0xc76c51a30654be30, 0xd192e819d6ef5218,
+    0xd69906245565a910, 0xf40e35855771202a, 0x106aa07032bbd1b8, 0x19a4c116b8d2d0c8, 0x1e376c085141ab53,
+    0x2748774cdf8eeb99, 0x34b0bcb5e19b48a8, 0x391c0cb3c5c95a63, 0x4ed8aa4ae3418acb, 0x5b9cca4f7763e373,
+    0x682e6ff3d6b2b8a3, 0x748f82ee5defb2fc, 0x78a5636f43172f60, 0x84c87814a1f0ab72, 0x8cc702081a6439ec,
+    0x90befffa23631e28, 0xa4506cebde82bde9, 0xbef9a3f7b2c67915, 0xc67178f2e372532b, 0xca273eceea26619c,
+    0xd186b8c721c0c207, 0xeada7dd6cde0eb1e, 0xf57d4f7fee6ed178, 0x06f067aa72176fba, 0x0a637dc5a2c898a6,
+    0x113f9804bef90dae, 0x1b710b35131c471b, 0x28db77f523047d84, 0x32caab7b40c72493, 0x3c9ebe0a15c9bebc,
+    0x431d67c49c100d4c, 0x4cc5d4becb3e42b6, 0x597f299cfc657e2a, 0x5fcb6fab3ad6faec, 0x6c44198c4a475817)
+SHA512_H0 = (
+    0x6a09e667f3bcc908, 0xbb67ae8584caa73b, 0x3c6ef372fe94f82b, 0xa54ff53a5f1d36f1,
+    0x510e527fade682d1, 0x9b05688c2b3e6c1f, 0x1f83d9abfb41bd6b, 0x5be0cd19137e2179)
+
+# Does the same as sha512_chain() for each of a list of bytestrings, but (after the first iteration) advances
+# all of the chains in lockstep using NumPy uint64 arrays with one element per chain, much like the OpenCL
+# kernel in sha512-bc-kernel.cl does with one work item per chain. Because every digest after the first is
+# 64 bytes long, each iteration hashes exactly one 128-byte block whose second half is constant padding.
+def sha512_chains_lanes(datas, iter_count):
+    import numpy
+    if iter_count < 1: return list(datas)
+    u64   = numpy.uint64
+    shift = [u64(n) for n in xrange(65)]
+    K     = [u64(k) for k in SHA512_K]
+    H0    = [u64(h) for h in SHA512_H0]
+
+    # The message schedule W has one row per word and one column per chain; its
+    # rows 8-15 hold the padding for a 64-byte message, and never change
+    digests = b"".join(hashlib.sha512(data).digest() for data in datas)
+    lanes   = len(digests) // 64
+    W       = numpy.empty((80, lanes), u64)
+    W[:8]   = numpy.frombuffer(digests, b">u8").reshape(lanes, 8).T
+    W[8]    = u64(0x8000000000000000)
+    W[9:15] = 0
+    W[15]   = u64(512)  # the message length in bits
+    t1, t2, t3, t4 = (numpy.empty(lanes, u64) for i in xrange(4))
+    state   = [numpy.empty(lanes, u64) for i in xrange(8)]
+
+    # Rotates x right by n bits into out (clobbering tmp)
+    def rotr(x, n, out, tmp):
+        numpy.right_shift(x, shift[n], out)
+        numpy.left_shift (x, shift[64-n], tmp)
+        numpy.bitwise_or(out, tmp, out)
+
+    for i in xrange(iter_count - 1):
+        for t in xrange(16, 80):
+            w15 = W[t-15]
+            w2  = W[t-2]
+            rotr(w15,  1, t1, t3); rotr(w15,  8, t2, t3); t1 ^= t2; numpy.right_shift(w15, shift[7], t2); t1 ^= t2
+            rotr(w2,  19, t2, t3); rotr(w2,  61, t4, t3); t2 ^= t4; numpy.right_shift(w2,  shift[6], t4); t2 ^= t4
+            numpy.add(t1, t2, W[t]); W[t] += W[t-7]; W[t] += W[t-16]
+
+        for s, h in zip(state, H0):
+            s.fill(h)
+        a, b, c, d, e, f, g, h = state
+        for t in xrange(80):
+            rotr(e, 14, t1, t3); rotr(e, 18, t2, t3); t1 ^= t2; rotr(e, 41, t2, t3); t1 ^= t2  # Sigma1(e)
+            numpy.bitwise_xor(f, g, t2); t2 &= e; t2 ^= g                                      # Ch(e, f, g)
+            t1 += t2; t1 += h; t1 += K[t]; t1 += W[t]                                          # T1
+            rotr(a, 28, t2, t3); rotr(a, 34, t4, t3); t2 ^= t4; rotr(a, 39, t4, t3); t2 ^= t4  # Sigma0(a)
+            numpy.bitwise_or(a, b, t3); t3 &= c; numpy.bitwise_and(a, b, t4); t3 |= t4         # Maj(a, b, c)
+            t2 += t3                                                                           # T2
+            d += t1          # d becomes the new e
+            numpy.add(t1, t2, h)  # and h (no longer needed) becomes the new a
+            a, b, c, d, e, f, g, h = h, a, b, c, d, e, f, g
+
+        for j, (s, h) in enumerate(zip((a, b, c, d, e, f, g, h), H0)):
+            numpy.add(s, h, W[j])
+
+    digests = W[:8].T.astype(b">u8").tostring()
+    return [digests[i : i+64] for i in xrange(0, len(digests), 64)]
+
+
+# Measures whether sha512_chains_lanes() is any faster than calling sha512_chain() once per bytestring, and
+# returns the fewest number of chains for which it is (which depends on NumPy's per-call overhead and on
+# how fast hashlib's SHA-512 is), or None if NumPy isn't available or if it's never faster. The rates are
+# calibrated (see calibrated_rate() below), so they're only measured once per host.
+def load_sha512_chains_library():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    hashlib_rate = calibrated_rate(b"sha512_chain", b"hashlib", sha512_chain_benchmark)
+    for lanes in (256, 1024, 4096):
+        # (each of the count iterations hashes once in every lane)
+        lanes_rate = lanes * calibrated_rate(b"sha512_chain_lanes_%d" % lanes, b"numpy",
+                                             lambda count: sha512_chains_lanes((b"",) * lanes, count))
+        if lanes_rate > hashlib_rate:
+            return lanes
+    return None
+
+
+# The calibration benchmarks for the library loaders above; each performs count operations using
+# whichever backend is currently loaded
+def sha512_chain_benchmark(count):
+    sha512_chain(b"", count)                            # count is the number of hashes
+#
+def aes256_cbc_benchmark(count):
+    aes256_cbc_decrypt_keys([b"\0" * 32] * count, b"\0" * 16, b"\0" * 16)  # count is the number of keys
+#
+def pbkdf2_hmac_sha1_benchmark(count):
+    pbkdf2_hmac(b"sha1", b"password", b"salt", count)    # count is the number of iterations
+#
+def pbkdf2_hmac_sha512_benchmark(count):
+    pbkdf2_hmac(b"sha512", b"password", b"salt", count)  # (as used by BIP39)
+#
+def scrypt_benchmark(count):
+    for i in xrange(count):
+        scrypt(b"password", b"salt", 1024, 8, 1, 32)
+
+
+# Returns the name of the fastest of several backends (implementations) of a crypto primitive. Each of the
+# candidates is a (backend name, loader function) tuple in order of preference, and each loader is called
+# before benchmark() measures its backend with calibrated_rate() (see below). Because measurements are a bit
+# noisy, a later candidate is only chosen if it's at least CALIBRATION_MARGIN times faster. A candidate whose
+# loader or benchmark raises an exception is skipped (with a warning, once per process).
+CALIBRATION_MARGIN = 1.25
+failed_backends    = set()
+def fastest_backend(primitive, benchmark, *candidates):
+    best_backend = best_rate = error = None
+    for backend, loader in candidates:
+        key = primitive + b"/" + backend
+        if key in failed_backends:
+            continue
+        try:
+            rate = calibrated_rate(primitive, backend, benchmark, loader)
+        except Exception as e:
+            print(prog+": warning: not using", backend, "for", primitive+":", e, file=sys.stderr)
+            failed_backends.add(key)
+            error = e
+            continue
+        if best_backend is None or rate > best_rate * CALIBRATION_MARGIN:
+            best_backend, best_rate = backend, rate
+    if best_backend is None and error:
+        raise error
+    return best_backend
+
+
+# Returns the speed (in operations per second) of a backend of a crypto primitive. The first time, setup()
+# (if any) is called, and then benchmark(count), which must perform count operations, is timed with a
+# doubling count until it takes at least CALIBRATION_SECONDS, and then the fastest of CALIBRATION_REPEATS
+# timings with that count is used. Rates are kept for the rest of the process, and they're also saved in
+# calibration_filename (unless it's None) keyed by host, interpreter, and library versions so that later runs
+# can skip the measurements (just delete the file to remeasure everything).
+CALIBRATION_SECONDS  = 0.05
+CALIBRATION_REPEATS  = 3
+calibration_filename = os.path.join(os.path.expanduser("~"), ".btcrecover-calibration.json")
+calibration_rates    = None
+def calibrated_rate(primitive, backend, benchmark, setup = None):
+    global calibration_rates
+    if calibration_rates is None:
+        calibration_rates = load_calibration_rates()
+    key = primitive + b"/" + backend
+    rate = calibration_rates.get(key)
+    if not rate:
+        if setup:
+            setup()
+        count = 1
+        while True:
+            start = time.time()
+            benchmark(count)
+            elapsed = time.time() - start
+            if elapsed >= CALIBRATION_SECONDS: break
+            count *= 2
+        for i in xrange(CALIBRATION_REPEATS - 1):
+            start = time.time()
+            benchmark(count)
+            elapsed = min(elapsed, time.time() - start)
+        rate = calibration_rates[key] = count / elapsed
+        save_calibration_rates()
+    return rate
+
+# Identifies the host, interpreter, and versions of btcrecover and the optional crypto libraries that the
+# calibration rates were measured with, so that they're remeasured after any of these are installed or upgraded
+calibration_id = None
+def calibration_host_id():
+    global calibration_id
+    if calibration_id is None:
+        versions = [b"btcrecover-" + __version__]
+        for module_name in (b"numpy", b"Crypto", b"pylibscrypt"):
+            try:
+                versions.append(module_name + b"-" + str(getattr(__import__(module_name), b"__version__", b"")))
+            except ImportError:
+                pass
+        l_libcrypto = load_libcrypto()
+        if l_libcrypto:
+            version_num = getattr(l_libcrypto, b"OpenSSL_version_num", None) or getattr(l_libcrypto, b"SSLeay", None)
+            versions.append(b"libcrypto-%x" % version_num() if version_num else b"libcrypto")
+        calibration_id = b" ".join([platform.node(), platform.machine(), sys.executable,
+                                    sys.version.replace("\n", " ")] + versions)
+    return calibration_id
+
+def load_calibration_rates():
+    if calibration_filename:
+        try:
+            with open(calibration_filename) as calibration_file:
+                rates = json.load(calibration_file).get(calibration_host_id())
+            if isinstance(rates, dict):
+                return rates
+        except (IOError, ValueError, AttributeError):
+            pass
+    return {}
+
+def save_calibration_rates():
+    if not calibration_filename:
+        return
+    try:
+        with open(calibration_filename) as calibration_file:
+            all_rates = json.load(calibration_file)
+        if not isinstance(all_rates, dict):
+            all_rates = {}
+    except (IOError, ValueError):
+        all_rates = {}
+    all_rates[calibration_host_id()] = calibration_rates
+    try:
+        with open(calibration_filename, "w") as calibration_file:
+            json.dump(all_rates, calibration_file, indent=1, sort_keys=True)
+    except (IOError, OSError):
+        pass  # the calibration file is only an optimization, so failing to write it isn't fatal
 
 
 ################################### Argument Parsing ###################################
@@ -2358,10 +2992,20 @@ parser_common.add_argument("--regex-never", metavar="STRING", help="never try pa
 parser_common.add_argument("--delimiter",   metavar="STRING", help="the delimiter between tokens in the tokenlist or columns in the typos-map (default: whitespace)")
 parser_common.add_argument("--skip",        type=int, default=0,    metavar="COUNT", help="skip this many initial passwords for continuing an interrupted search")
 parser_common.add_argument("--threads",     type=int, default=cpus, metavar="COUNT", help="number of worker threads (default: number of CPUs, %(default)s)")
+parser_common.add_argument("--backend",     choices=("processes", "threads", "auto"), default="processes", help="verify passwords in worker processes, in worker threads which share one wallet (faster only if its key derivation function releases Python's GIL), or in whichever of these a quick benchmark finds faster (default: %(default)s)")
 parser_common.add_argument("--worker",      metavar="ID#/TOTAL#",   help="divide the workload between TOTAL# servers, where each has a different ID# between 1 and TOTAL#")
+parser_common.add_argument("--worker-bases", action="store_true", help="with --worker, divide up the base passwords (e.g. token combinations) instead of the passwords, so that each worker only generates its own share")
+parser_common.add_argument("--coordinator", metavar="ADDRESS",      help="instead of searching, hand out parts of the search on demand to --coordinated-by workers which connect to ADDRESS ([HOST]:PORT or a Unix socket path; HOST defaults to 127.0.0.1, use 0.0.0.0:PORT to accept workers on other machines)")
+parser_common.add_argument("--coordinated-by", metavar="ADDRESS",   help="search the parts handed out by the --coordinator at ADDRESS (HOST:PORT or a Unix socket path) using the same options (implies --no-dupchecks)")
+parser_common.add_argument("--coordinator-secret", metavar="SECRET",help="a secret shared by the --coordinator and its workers which they must know to connect (required with HOST:PORT; may instead be set in the BTCR_COORDINATOR_SECRET environment variable); the connections are not encrypted, so use an SSH tunnel or VPN on untrusted networks")
+parser_common.add_argument("--shard-generation", action="store_true", help="each worker thread generates its own share of the passwords instead of the main thread generating them all (implies --no-dupchecks)")
 parser_common.add_argument("--max-eta",     type=int, default=168,  metavar="HOURS", help="max estimated runtime before refusing to even start (default: %(default)s hours, i.e. 1 week)")
+parser_common.add_argument("--eta-sample",  type=int, nargs="?", const=1000, metavar="COUNT", help="instead of counting all the passwords before starting, estimate the count (for the ETA and --max-eta) from a random sample of COUNT base passwords (default: %(const)s); as with --no-eta, duplicates are then tracked while searching (so no --autosave duplicate cache is saved), and it can't be used with --compact-dupchecks")
 parser_common.add_argument("--no-eta",      action="store_true",    help="disable calculating the estimated time to completion")
+parser_common.add_argument("--background-count", action="store_true", help="start searching right away while counting the passwords (for the ETA and --max-eta) in the background; as with --no-eta, duplicates are then tracked while searching (so no --autosave duplicate cache is saved), and it can't be used with --compact-dupchecks")
 parser_common.add_argument("--no-dupchecks", "-d", action="count", default=0, help="disable duplicate guess checking to save memory; specify up to four times for additional effect")
+parser_common.add_argument("--compact-dupchecks", type=int, nargs="?", const=64, metavar="BITS", help="check for duplicate guesses using BITS-bit hashes (default: %(const)s) to use much less memory; with --no-eta, a guess whose hash collides with another's is (very rarely) skipped")
+parser_common.add_argument("--max-memory",  type=int, metavar="MB", help="limit the memory used by each duplicate guess checker to about MB megabytes by moving older guesses to temporary files")
 parser_common.add_argument("--no-progress", action="store_true",   default=not sys.stdout.isatty(), help="disable the progress bar")
 parser_common.add_argument("--android-pin", action="store_true", help="search for the spending pin instead of the backup password in a Bitcoin Wallet for Android/BlackBerry")
 parser_common.add_argument("--blockchain-secondpass", action="store_true", help="search for the second password instead of the main password in a Blockchain wallet")
@@ -2370,6 +3014,8 @@ parser_common.add_argument("--data-extract",action="store_true", help="prompt fo
 parser_common.add_argument("--mkey",        action="store_true", help=argparse.SUPPRESS)  # deprecated, use --data-extract instead
 parser_common.add_argument("--privkey",     action="store_true", help=argparse.SUPPRESS)  # deprecated, use --data-extract instead
 parser_common.add_argument("--exclude-passwordlist", metavar="FILE", nargs="?", const="-", help="never try passwords read (exactly one per line) from this file or from stdin")
+parser_common.add_argument("--exclude-index", metavar="FILE", help="never try passwords found in this index file (see --build-exclude-index)")
+parser_common.add_argument("--build-exclude-index", metavar="FILE", help="read the --exclude-passwordlist file, save it as an index FILE for use with --exclude-index, and then exit")
 parser_common.add_argument("--listpass",    action="store_true", help="just list all password combinations to test and exit")
 parser_common.add_argument("--performance", action="store_true", help="run a continuous performance test (Ctrl-C to exit)")
 parser_common.add_argument("--pause",       action="store_true", help="pause before exiting")
@@ -2493,6 +3139,24 @@ def parse_arguments(effective_argv, wallet = None, base_iterator = None,
             print("#"+tstr(i), dev.name.strip())
         sys.exit(0)
 
+    if args.build_exclude_index:
+        if not args.exclude_passwordlist:
+            error_exit("--build-exclude-index requires --exclude-passwordlist")
+        exclude_file = open_or_use(args.exclude_passwordlist, "r", kwds.get("exclude_passwordlist"), permit_stdin=True)
+        index_file   = open_or_use(args.build_exclude_index, "wb", new_or_empty=True)
+        if not index_file:
+            error_exit("--build-exclude-index file '"+tstr(args.build_exclude_index)+"' already exists, won't overwrite")
+        try:
+            passwords_count = build_exclude_index(exclude_file, index_file)
+        except MemoryError:
+            error_exit("not enough memory to build the --exclude-index file")
+        finally:
+            index_file.close()
+            if exclude_file != sys.stdin:
+                exclude_file.close()
+        print("Saved {:,} passwords to the exclude index file '{}'".format(passwords_count, args.build_exclude_index))
+        sys.exit(0)
+
     # If we're not --restoring nor using a passwordlist, try to open the tokenlist_file now
     # (if we are restoring, we don't know what to open until after the restore data is loaded)
     TOKENS_AUTO_FILENAME = "btcrecover-tokens-auto.txt"
@@ -2781,6 +3445,21 @@ def parse_arguments(effective_argv, wallet = None, base_iterator = None,
         print(prog+": warning: --threads must be >= 1, assuming 1", file=sys.stderr)
         args.threads = 1
 
+    if args.compact_dupchecks is not None:
+        max_fingerprint_bits = CompactDuplicateChecker.max_fingerprint_bits()
+        if not 32 <= args.compact_dupchecks <= max_fingerprint_bits:
+            error_exit("--compact-dupchecks BITS must be between 32 and", max_fingerprint_bits)
+        if args.no_dupchecks >= 2:
+            print(prog+": warning: --compact-dupchecks is ignored with two or more --no-dupchecks", file=sys.stderr)
+
+    if args.max_memory is not None:
+        if args.max_memory < 1:
+            error_exit("--max-memory must be >= 1")
+        if args.compact_dupchecks is not None:
+            print(prog+": warning: --max-memory is ignored with --compact-dupchecks", file=sys.stderr)
+        elif args.no_dupchecks >= 2:
+            print(prog+": warning: --max-memory is ignored with two or more --no-dupchecks", file=sys.stderr)
+
     if args.worker:  # worker servers
         global worker_id, workers_total
         match = re.match(r"(\d+)/(\d+)$", args.worker)
@@ -2795,6 +3474,8 @@ def parse_arguments(effective_argv, wallet = None, base_iterator = None,
         if worker_id > workers_total:
             error_exit("in --worker ID#/TOTAL#, ID# must be <= TOTAL#")
         worker_id -= 1  # now it's in the range [0, workers_total)
+    elif args.worker_bases:
+        error_exit("--worker-bases requires --worker")
 
     global have_progress, progressbar
     if args.no_progress:
@@ -3081,6 +3762,75 @@ def parse_arguments(effective_argv, wallet = None, base_iterator = None,
             has_any_wildcards = True  # If not all cached, need to assume there are wildcards
 
 
+    if args.backend != "processes":
+        if args.shard_generation:
+            error_exit("--backend", args.backend, "can't be used with --shard-generation")
+        if args.enable_gpu:
+            error_exit("--backend", args.backend, "can't be used with --enable-gpu")
+
+    # Each worker process generates its own passwords with --shard-generation, so they can neither
+    # coordinate their progress for autosaves nor detect duplicates which are in other shards
+    if args.shard_generation:
+        if sys.platform == "win32":
+            error_exit("--shard-generation is not supported on Windows")
+        if args.autosave:
+            error_exit("--shard-generation can't be used with --autosave or --restore")
+        if args.skip:
+            error_exit("--shard-generation can't be used with --skip")
+        if args.worker:
+            error_exit("--shard-generation can't be used with --worker")
+        if args.enable_gpu:
+            error_exit("--shard-generation can't be used with --enable-gpu")
+        if passwordlist_file == sys.stdin and not passwordlist_allcached:
+            error_exit("--shard-generation requires that a --passwordlist from stdin is small enough to be read into memory")
+        if not args.no_dupchecks:
+            print(prog+": warning: --no-dupchecks has been enabled because duplicates can't be detected across shards", file=sys.stderr)
+            args.no_dupchecks = 1
+
+    # With --coordinator and --coordinated-by, the search is divided up into ranges of base passwords, so
+    # duplicates in different ranges can't be detected, and the coordinator keeps track of the progress
+    if args.coordinator or args.coordinated_by:
+        option = "--coordinator" if args.coordinator else "--coordinated-by"
+        if args.coordinator and args.coordinated_by:
+            error_exit("--coordinator can't be used with --coordinated-by")
+        try:
+            family = coordinator_socket_address(args.coordinator or args.coordinated_by, passive=bool(args.coordinator))[0]
+        except (socket.error, ValueError) as e:
+            error_exit("invalid", option, "address:", e)
+        if not args.coordinator_secret:
+            args.coordinator_secret = os.environ.get(b"BTCR_COORDINATOR_SECRET")
+        if not args.coordinator_secret and family != getattr(socket, "AF_UNIX", None):
+            error_exit(option, "requires a --coordinator-secret (or BTCR_COORDINATOR_SECRET) when used with HOST:PORT")
+        if args.worker:
+            error_exit(option, "can't be used with --worker")
+        if args.shard_generation:
+            error_exit(option, "can't be used with --shard-generation")
+        if args.listpass or args.performance:
+            error_exit(option, "can't be used with --listpass or --performance")
+        if args.coordinator:
+            if args.skip and not restored:
+                error_exit("--coordinator can't be used with --skip")
+        else:
+            if args.autosave:
+                error_exit("--coordinated-by can't be used with --autosave or --restore (the --coordinator autosaves)")
+            if args.skip:
+                error_exit("--coordinated-by can't be used with --skip")
+            if passwordlist_file == sys.stdin and not passwordlist_allcached:
+                error_exit("--coordinated-by requires that a --passwordlist from stdin is small enough to be read into memory")
+            if base_iterator and not callable(base_iterator) and iter(base_iterator) is base_iterator:
+                error_exit("--coordinated-by requires base passwords which can be iterated more than once")
+            if not args.no_dupchecks:
+                print(prog+": warning: --no-dupchecks has been enabled because duplicates can't be detected across ranges", file=sys.stderr)
+                args.no_dupchecks = 1
+            args.no_eta = True  # the passwords aren't counted by the workers
+
+    if args.background_count and sys.platform == "win32":
+        error_exit("--background-count is not supported on Windows")
+
+    if args.eta_sample is not None and args.eta_sample < 2:
+        error_exit("--eta-sample COUNT must be >= 2")
+
+
     # Some final sanity checking, now that args.no_eta's value is known
     if args.no_eta:  # always true for --listpass and --performance
         if not args.no_dupchecks:
@@ -3088,8 +3838,21 @@ def parse_arguments(effective_argv, wallet = None, base_iterator = None,
                 print(prog+": warning: --performance without --no-dupchecks will eventually cause an out-of-memory error", file=sys.stderr)
             elif not args.listpass:
                 print(prog+": warning: --no-eta without --no-dupchecks can cause out-of-memory failures while searching", file=sys.stderr)
+        if args.background_count:
+            print(prog+": warning: --background-count is ignored with --no-eta", file=sys.stderr)
+        if args.eta_sample is not None:
+            print(prog+": warning: --eta-sample is ignored with --no-eta", file=sys.stderr)
         if args.max_eta != parser.get_default("max_eta"):
             print(prog+": warning: --max-eta is ignored with --no-eta, --listpass, or --performance", file=sys.stderr)
+    #
+    # With --background-count or --eta-sample, the search (instead of the count) is the duplicate checkers'
+    # first run, so as with --no-eta they can run out of memory, and a --compact-dupchecks collision would be skipped
+    elif (args.background_count or args.eta_sample is not None) and args.no_dupchecks < 2:
+        option = "--background-count" if args.background_count else "--eta-sample"
+        if args.compact_dupchecks is not None:
+            error_exit("--compact-dupchecks can't be used with", option, "(unless --no-eta is also used)")
+        if not args.no_dupchecks:
+            print(prog+": warning:", option, "without --no-dupchecks can cause out-of-memory failures while searching", file=sys.stderr)
 
 
     # If we're using a tokenlist file, call parse_tokenlist() to parse it.
@@ -3099,6 +3862,10 @@ def parse_arguments(effective_argv, wallet = None, base_iterator = None,
         parse_tokenlist(tokenlist_file, tokenlist_first_line_num)
         base_password_generator = tokenlist_base_password_generator
 
+    # With --worker-bases, each worker only produces its own share of the base passwords
+    if args.worker_bases and not args.performance:
+        base_password_generator = worker_base_passwords(base_password_generator)
+
 
     # Open a new autosave file (if --restore was specified, the restore file
     # is still open and has already been assigned to autosave_file instead)
@@ -3110,6 +3877,11 @@ def parse_arguments(effective_argv, wallet = None, base_iterator = None,
         autosave_nextslot = 0
         print("Using autosave file '"+args.autosave+"'")
 
+    # The duplicate cache file (if any) is saved beside the autosave file (see save_dups_cache())
+    global dups_cache_filename
+    dups_cache_filename = autosave_file.name + DUPS_CACHE_SUFFIX \
+        if savestate and isinstance(getattr(autosave_file, "name", None), basestring) else None
+
 
     # Process any --exclude-passwordlist file: create the password_dups object earlier than normal and
     # instruct it to always consider passwords found in this file as duplicates (so they'll be skipped).
@@ -3122,7 +3894,7 @@ def parse_arguments(effective_argv, wallet = None, base_iterator = None,
             error_exit("can't use stdin for both --passwordlist and --exclude-passwordlist")
         #
         global password_dups
-        password_dups = DuplicateChecker()
+        password_dups = new_duplicate_checker()
         sha1          = hashlib.sha1() if savestate else None
         try:
             for excluded_pw in exclude_file:
@@ -3154,6 +3926,24 @@ def parse_arguments(effective_argv, wallet = None, base_iterator = None,
         if args.no_dupchecks:
             password_dups.disable_duplicate_tracking()
 
+    # Open any --exclude-index file (unlike --exclude-passwordlist, this takes no time)
+    global exclude_index
+    if args.exclude_index:
+        if not os.path.isfile(args.exclude_index):
+            error_exit("--exclude-index file '"+tstr(args.exclude_index)+"' does not exist")
+        try:
+            exclude_index = ExcludeIndex(open(args.exclude_index, "rb"))
+        except ValueError as e:
+            error_exit("--exclude-index file '"+tstr(args.exclude_index)+"':", e)
+        if savestate:
+            if restored:
+                if exclude_index.digest != savestate.get(b"exclude_index_hash"):
+                    error_exit("can't restore previous session: the exclude-index file has changed")
+            else:
+                savestate[b"exclude_index_hash"] = exclude_index.digest
+    else:
+        exclude_index = None
+
 
     # If something has been redirected to stdin and we've been reading from it, close
     # stdin now so we don't keep the redirected files alive while running, but only
@@ -3493,9 +4283,9 @@ class DuplicateChecker(object):
 
         # The duplicates cache is built during the first run
         if self._run_number == 0:
-            if x in self._duplicates:  # If it's the third+ time we've seen it (or 2nd+ & excluded):
+            if x in self._duplicates:  # If it's the third+ time we've seen it, or it's excluded:
                 return True
-            if x in self._seen_once:   # If it's the second time we've seen it, or it's excluded:
+            if x in self._seen_once:   # If it's the second time we've seen it:
                 self._duplicates[x] = self._seen_once.pop(x)  # move it to list of known duplicates
                 return True
             # Otherwise it's the first time we've seen it
@@ -3513,9 +4303,14 @@ class DuplicateChecker(object):
                 return True
         return False                                  # Else it isn't a recorded duplicate
 
-    # Adds x to the already-seen dict such that is_duplicate(x) will always return True
+    # Adds x to the known-duplicates dict such that is_duplicate(x) will always return True
+    # (in every run, even if it's never seen in the first run)
     def exclude(self, x):
-        self._seen_once[x] = self.EXCLUDE
+        self._duplicates[x] = self.EXCLUDE
+
+    # Returns True if x has been excluded (without changing any state)
+    def is_excluded(self, x):
+        return self._duplicates.get(x) == self.EXCLUDE
 
     # Future duplicates will be ignored (and will not consume additional memory), however
     # is_duplicate() will still return True for duplicates and exclusions seen/added so far
@@ -3528,6 +4323,433 @@ class DuplicateChecker(object):
             del self._seen_once  # No longer need this for second+ runs
         self._run_number += 1
 
+    # Returns everything needed by the second+ runs as a tuple: (list_of_duplicates, list_of_excluded)
+    def saved_duplicates(self):
+        assert self._run_number > 0, "saved_duplicates: the first run has finished"
+        duplicates, excluded = [], []
+        for x, seen in self._duplicates.iteritems():
+            (excluded if seen == self.EXCLUDE else duplicates).append(x)
+        return duplicates, excluded
+
+    # Finishes the first run without having seen its items, instead using the duplicates found by other
+    # DuplicateCheckers which together saw all of them (see count_passwords_in_parallel()), keeping any
+    # exclusions (items which only occurred once may also be included, they're just a waste of memory)
+    def finish_first_run(self, duplicates):
+        assert self._run_number == 0, "finish_first_run: the first run hasn't finished"
+        self.run_finished()
+        for x in duplicates:
+            self._duplicates.setdefault(x, 1)
+
+    # Skips the first run, instead using the results of an earlier call to saved_duplicates()
+    def load_duplicates(self, (duplicates, excluded)):
+        if self._run_number == 0:
+            self.run_finished()
+        self._duplicates = dict.fromkeys(duplicates, 1)
+        self._duplicates.update(dict.fromkeys(excluded, self.EXCLUDE))
+
+
+# A DuplicateChecker which uses much less memory during the first run: instead of storing every item seen
+# once in a dict, it stores only a fixed-width fingerprint (the item's hash) of each in an open-addressing
+# hash table (with linear probing) backed by an array. Items seen more than once are still stored in the
+# _duplicates dict, as are excluded items, and so the second+ runs are exact.
+#
+# Collision policy: during the first run, if an item's fingerprint matches that of a different item seen
+# earlier, it is (incorrectly) considered a duplicate, and it's added to the _duplicates dict as though it
+# were one. Because the second+ runs check the _duplicates dict, which holds exact items, the item will be
+# produced in those runs. With N items, the chance of any collision is about N**2 / 2**(fingerprint_bits+1).
+# Normally the first run only counts passwords, so a collision just makes that count a little low.
+class CompactDuplicateChecker(DuplicateChecker):
+
+    INITIAL_SLOTS = 1 << 16  # must be a power of 2
+    MAX_LOAD      = 0.75     # the table doubles in size when it's more than this full
+
+    # The fingerprints are stored as unsigned longs (either 32 or 64 bits), so this is the max width
+    @staticmethod
+    def max_fingerprint_bits():
+        return min(array.array(b"L").itemsize * 8, 64)
+
+    def __init__(self, fingerprint_bits = 64):
+        super(CompactDuplicateChecker, self).__init__()
+        assert 0 < fingerprint_bits <= self.max_fingerprint_bits(), "CompactDuplicateChecker: valid fingerprint_bits"
+        del self._seen_once
+        self._fingerprint_mask = (1 << fingerprint_bits) - 1
+        self._typecode         = b"I" if fingerprint_bits <= array.array(b"I").itemsize * 8 else b"L"
+        self._fingerprints     = array.array(self._typecode, [0]) * self.INITIAL_SLOTS  # 0 marks an empty slot
+        self._fingerprints_len = 0
+
+    def is_duplicate(self, x):
+        if self._run_number != 0:
+            return super(CompactDuplicateChecker, self).is_duplicate(x)
+
+        if x in self._duplicates:  # If it's been seen twice before or it's excluded
+            return True
+
+        fingerprint = hash(x) & self._fingerprint_mask or 1
+        fingerprints = self._fingerprints
+        slot_mask    = len(fingerprints) - 1
+        slot         = fingerprint & slot_mask
+        while True:
+            slot_fingerprint = fingerprints[slot]
+            if slot_fingerprint == fingerprint:  # If it's (probably) the second time we've seen it
+                self._duplicates[x] = 1
+                return True
+            if slot_fingerprint == 0:
+                break
+            slot = (slot + 1) & slot_mask
+
+        # Otherwise it's the first time we've seen it
+        if self._tracking:
+            fingerprints[slot] = fingerprint
+            self._fingerprints_len += 1
+            if self._fingerprints_len > len(fingerprints) * self.MAX_LOAD:
+                self._grow()
+        return False
+
+    # Doubles the size of the fingerprint table
+    def _grow(self):
+        old_fingerprints = self._fingerprints
+        fingerprints = array.array(self._typecode, [0]) * (2 * len(old_fingerprints))
+        slot_mask    = len(fingerprints) - 1
+        for fingerprint in old_fingerprints:
+            if fingerprint:
+                slot = fingerprint & slot_mask
+                while fingerprints[slot]:
+                    slot = (slot + 1) & slot_mask
+                fingerprints[slot] = fingerprint
+        self._fingerprints = fingerprints
+
+    def run_finished(self):
+        if self._run_number == 0:
+            del self._fingerprints  # No longer need this for second+ runs
+        self._run_number += 1
+
+
+# A DuplicateChecker which limits the memory used during the first run to about max_memory bytes. Once
+# the items seen once (so far) exceed this estimated size, they are "spilled": sorted and written to a
+# temporary file as a SpilledItems run. Lookups check the items in memory first, and then each run.
+# When there are more than MAX_RUNS runs, they're merged into one. Items seen more than once and
+# excluded items are kept in memory (in the _duplicates dict), and so the second+ runs are unchanged.
+class SpillingDuplicateChecker(DuplicateChecker):
+
+    BYTES_PER_ITEM = 100  # the estimated memory used by each item in _seen_once (not counting its length)
+    MAX_RUNS       = 8
+
+    def __init__(self, max_memory):
+        super(SpillingDuplicateChecker, self).__init__()
+        self._max_memory  = max_memory
+        self._memory_used = 0   # the estimated memory used by _seen_once
+        self._runs        = []  # a list of SpilledItems
+
+    def is_duplicate(self, x):
+        if self._run_number != 0 or not self._runs and not self._tracking:
+            return super(SpillingDuplicateChecker, self).is_duplicate(x)
+
+        if x in self._duplicates:  # If it's been seen twice before or it's excluded
+            return True
+        if x in self._seen_once:   # If it's the second time we've seen it (and it hasn't been spilled)
+            self._duplicates[x] = self._seen_once.pop(x)
+            return True
+        if self._runs:
+            key    = spilled_item_key(x)
+            hashes = SpilledItems.key_hashes(key)  # calculated just once for all the runs
+            for run in self._runs:
+                if run.contains(key, hashes):  # If it's the second time we've seen it (and it has been spilled)
+                    self._duplicates[x] = 1
+                    return True
+
+        # Otherwise it's the first time we've seen it
+        if self._tracking:
+            self._seen_once[x] = 1
+            self._memory_used += self.BYTES_PER_ITEM + len(x)
+            if self._memory_used > self._max_memory:
+                self._spill()
+        return False
+
+    # Moves all the items in _seen_once to a new run, merging the smaller runs if there are too many
+    def _spill(self):
+        keys = map(spilled_item_key, self._seen_once)
+        self._seen_once   = dict()
+        self._memory_used = 0
+        keys.sort()
+        self._runs.append(SpilledItems(keys, len(keys)))
+        del keys
+        # Merging just the smaller runs keeps the number of times each item is rewritten low
+        if len(self._runs) > self.MAX_RUNS:
+            self._runs.sort(key=len, reverse=True)
+            merging = self._runs[self.MAX_RUNS // 2:]
+            del self._runs[self.MAX_RUNS // 2:]
+            self._runs.append(SpilledItems(heapq.merge(*merging), sum(len(run) for run in merging)))
+            for run in merging:
+                run.close()
+
+    def run_finished(self):
+        if self._run_number == 0:
+            for run in self._runs:
+                run.close()
+            del self._runs
+        super(SpillingDuplicateChecker, self).run_finished()
+
+# Returns a byte string which uniquely represents an item checked by a SpillingDuplicateChecker: either a
+# password or (from tokenlist_base_password_generator()) a tuple of tokens, some of which are AnchoredTokens
+def spilled_item_key(x):
+    if isinstance(x, str):
+        return x
+    if isinstance(x, unicode):
+        return x.encode("utf_8")
+    return cPickle.dumps(tuple(t if isinstance(t, basestring) else (tstr(t),) for t in x), cPickle.HIGHEST_PROTOCOL)
+
+# An immutable set of byte strings, stored sorted in a memory-mapped temporary file. The file consists of the
+# byte strings one after another, followed by an array of their offsets (plus the offset of the end). Only a
+# sparse index of every INDEX_INTERVAL'th string and a Bloom filter are kept in memory, which use about
+# (BLOOM_BITS_PER_KEY / 8 + average_key_size / INDEX_INTERVAL) bytes per string.
+class SpilledItems(object):
+
+    INDEX_INTERVAL     = 64
+    BLOOM_BITS_PER_KEY = 10
+    BLOOM_HASHES       = 5
+
+    # sorted_keys is an iterable producing keys_count unique sorted byte strings
+    def __init__(self, sorted_keys, keys_count):
+        self._len       = keys_count
+        self._file      = tempfile.TemporaryFile(prefix="btcr-dups-")
+        self._index     = []
+        self._bloom_len = max(keys_count * self.BLOOM_BITS_PER_KEY, 8)
+        self._bloom     = bytearray((self._bloom_len + 7) // 8)
+        offsets = array.array(b"L")
+        offset  = 0
+        # Local variables are faster in the loop below
+        l_bloom, l_bloom_len, l_hash_nums = self._bloom, self._bloom_len, range(self.BLOOM_HASHES)
+        l_offsets_append, l_write, l_index_append = offsets.append, self._file.write, self._index.append
+        l_crc32, l_index_interval = zlib.crc32, self.INDEX_INTERVAL
+        for i, key in enumerate(sorted_keys):
+            if i % l_index_interval == 0:
+                l_index_append(key)
+            hash1, hash2 = hash(key), l_crc32(key) | 1
+            for j in l_hash_nums:
+                bit = (hash1 + j * hash2) % l_bloom_len
+                l_bloom[bit >> 3] |= 1 << (bit & 7)
+            l_offsets_append(offset)
+            l_write(key)
+            offset += len(key)
+        assert len(offsets) == keys_count, "SpilledItems: len(sorted_keys) == keys_count"
+        offsets.append(offset)
+        self._offsets_start = offset
+        offsets.tofile(self._file)
+        self._offset_size = offsets.itemsize
+        del offsets
+        self._file.flush()
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # Returns the two hashes used to calculate the Bloom filter bits (via double hashing) for a key
+    # (__init__ calculates these itself for speed)
+    @staticmethod
+    def key_hashes(key):
+        return hash(key), zlib.crc32(key) | 1
+
+    def __len__(self):
+        return self._len
+
+    # Returns the offsets of the keys [start, end) plus the offset after them
+    def _offsets(self, start, end):
+        offsets_pos = self._offsets_start + start * self._offset_size
+        offsets = array.array(b"L")
+        offsets.fromstring(self._mmap[offsets_pos : offsets_pos + (end - start + 1) * self._offset_size])
+        return offsets
+
+    def __contains__(self, key):
+        return self.contains(key, self.key_hashes(key))
+
+    # Same as __contains__, but with the key_hashes(key) already calculated
+    def contains(self, key, (hash1, hash2)):
+        bloom, bloom_len = self._bloom, self._bloom_len
+        for i in xrange(self.BLOOM_HASHES):
+            bit = (hash1 + i * hash2) % bloom_len
+            if not bloom[bit >> 3] & 1 << (bit & 7):
+                return False
+        # Find the block of keys which might contain key, and then binary search it
+        block_num = bisect.bisect_right(self._index, key) - 1
+        if block_num < 0:
+            return False
+        start   = block_num * self.INDEX_INTERVAL
+        offsets = self._offsets(start, min(start + self.INDEX_INTERVAL, self._len))
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            middle_key = self._mmap[offsets[middle] : offsets[middle + 1]]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return True
+        return False
+
+    # Produces all the keys in sorted order
+    def __iter__(self):
+        for start in xrange(0, self._len, self.INDEX_INTERVAL):
+            offsets = self._offsets(start, min(start + self.INDEX_INTERVAL, self._len))
+            for i in xrange(len(offsets) - 1):
+                yield self._mmap[offsets[i] : offsets[i + 1]]
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+# A DuplicateChecker (used by estimate_count_and_check_eta()) which also considers the
+# items excluded by another DuplicateChecker, without changing it, to be duplicates
+class ExcludingDuplicateChecker(DuplicateChecker):
+
+    def __init__(self, excluding):
+        super(ExcludingDuplicateChecker, self).__init__()
+        self._excluding = excluding
+
+    def is_duplicate(self, x):
+        return self._excluding.is_excluded(x) or super(ExcludingDuplicateChecker, self).is_duplicate(x)
+
+
+exclude_index = None  # initialized in parse_arguments()
+
+# A prebuilt set of passwords to exclude, read from an index file created by build_exclude_index() (via
+# --build-exclude-index) from an --exclude-passwordlist file. The file contains a Bloom filter followed by the
+# sorted (unique) keys of the passwords, where a key is the first 8 bytes of the sha1 of the UTF-8 password.
+# The file is memory-mapped, so opening it is fast regardless of its size. Checking a password which isn't
+# excluded usually only reads the Bloom filter; otherwise the key is binary searched to confirm it. The
+# chance of a (wrongly) excluded password is about passwords_count / 2**64.
+class ExcludeIndex(object):
+
+    MAGIC        = b"btcrecover exclude index"
+    HEADER       = struct.Struct(b"< 24s I Q Q I 20s")  # magic, version, keys_count, bloom_bits, bloom_hashes, digest
+    VERSION      = 1
+    KEY_SIZE     = 8   # keys are big-endian so that comparing them as byte strings is equivalent
+    BITS_PER_KEY = 10  # with 7 hashes, the Bloom filter's false-positive rate is about 0.8%
+    BLOOM_HASHES = 7
+
+    def __init__(self, index_file):
+        self._mmap = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        index_file.close()  # (the mmap remains valid)
+        if len(self._mmap) < self.HEADER.size:
+            raise ValueError("the file is too short")
+        magic, version, self._keys_count, self._bloom_bits, self._bloom_hashes, self.digest = \
+            self.HEADER.unpack_from(self._mmap)
+        if magic != self.MAGIC:
+            raise ValueError("not an exclude index file")
+        if version != self.VERSION:
+            raise ValueError("unsupported exclude index file version " + tstr(version))
+        self._keys_start = self.HEADER.size + (self._bloom_bits + 7) // 8
+        if len(self._mmap) != self._keys_start + self._keys_count * self.KEY_SIZE:
+            raise ValueError("the file is truncated")
+
+    def __len__(self):
+        return self._keys_count
+
+    @staticmethod
+    def password_key(password):
+        return hashlib.sha1(password.encode("utf_8") if isinstance(password, unicode) else password).digest()[:8]
+
+    # Returns the bit numbers in the Bloom filter of a key (via double hashing, using each half of the key)
+    @classmethod
+    def bloom_bits(cls, key, bloom_bits):
+        key_int = struct.unpack(b">Q", key)[0]
+        hash1, hash2 = key_int >> 32, key_int & 0xFFFFFFFF | 1
+        return [(hash1 + i * hash2) % bloom_bits for i in xrange(cls.BLOOM_HASHES)]
+
+    def __contains__(self, password):
+        key         = self.password_key(password)
+        l_mmap      = self._mmap
+        header_size = self.HEADER.size
+        for bit in self.bloom_bits(key, self._bloom_bits):
+            if not ord(l_mmap[header_size + (bit >> 3)]) & 1 << (bit & 7):
+                return False
+        # Binary search the sorted keys to confirm it
+        low, high = 0, self._keys_count
+        keys_start, key_size = self._keys_start, self.KEY_SIZE
+        while low < high:
+            middle = (low + high) // 2
+            middle_start = keys_start + middle * key_size
+            middle_key = l_mmap[middle_start : middle_start + key_size]
+            if middle_key < key:
+                low = middle + 1
+            elif middle_key > key:
+                high = middle
+            else:
+                return True
+        return False
+
+    def close(self):
+        self._mmap.close()
+
+# Reads passwords (one per line) from passwordlist_file, and writes an ExcludeIndex to index_file. So that only a
+# limited number of keys are in memory at once, they're first sorted in runs which are saved to temporary files,
+# and then merged into index_file. Returns the number of unique passwords saved.
+EXCLUDE_INDEX_KEYS_PER_RUN = 2**21
+def build_exclude_index(passwordlist_file, index_file):
+    key_size = ExcludeIndex.KEY_SIZE
+
+    # Produces the keys in a run file (which were saved sorted)
+    def run_keys(run_file):
+        run_file.seek(0)
+        while True:
+            keys = run_file.read(key_size * 4096)
+            if not keys: break
+            for start in xrange(0, len(keys), key_size):
+                yield keys[start : start + key_size]
+        run_file.close()
+
+    run_files = []
+    l_password_key = ExcludeIndex.password_key
+    keys = []
+    for password in itertools.chain(passwordlist_file, (None,)):
+        if password is not None:
+            password = password.rstrip("\r\n")
+            check_chars_range(password, "--exclude-passwordlist file")
+            keys.append(l_password_key(password))
+        if len(keys) >= EXCLUDE_INDEX_KEYS_PER_RUN or password is None and keys:
+            keys.sort()
+            run_file = tempfile.TemporaryFile(prefix="btcr-exclude-")
+            run_file.write(b"".join(keys))
+            run_files.append(run_file)
+            del keys[:]
+    del keys
+    keys_count = sum(run_file.tell() // key_size for run_file in run_files)  # (an upper bound, with duplicates)
+
+    bloom_bits   = max(keys_count * ExcludeIndex.BITS_PER_KEY, 8)
+    bloom        = bytearray((bloom_bits + 7) // 8)
+    l_bloom_bits = ExcludeIndex.bloom_bits
+    digest       = hashlib.sha1()
+    index_file.seek(ExcludeIndex.HEADER.size + len(bloom))  # the header and Bloom filter are written last
+    keys_count   = 0
+    prev_key     = None
+    keys         = []
+    for key in heapq.merge(*map(run_keys, run_files)):
+        if key == prev_key: continue
+        prev_key = key
+        for bit in l_bloom_bits(key, bloom_bits):
+            bloom[bit >> 3] |= 1 << (bit & 7)
+        keys.append(key)
+        if len(keys) >= 4096:
+            keys = b"".join(keys)
+            index_file.write(keys)
+            digest.update(keys)
+            keys = []
+        keys_count += 1
+    keys = b"".join(keys)
+    index_file.write(keys)
+    digest.update(keys)
+    index_file.seek(0)
+    index_file.write(ExcludeIndex.HEADER.pack(ExcludeIndex.MAGIC, ExcludeIndex.VERSION,
+                                              keys_count, bloom_bits, ExcludeIndex.BLOOM_HASHES, digest.digest()))
+    index_file.write(bloom)
+    return keys_count
+
+# Creates either a DuplicateChecker or (if requested) a CompactDuplicateChecker or SpillingDuplicateChecker;
+# if processes_sharing is given, that many processes' checkers share the --max-memory limit
+def new_duplicate_checker(processes_sharing = 1):
+    if args.compact_dupchecks:
+        return CompactDuplicateChecker(args.compact_dupchecks)
+    if args.max_memory:
+        return SpillingDuplicateChecker(args.max_memory * 2**20 // processes_sharing)
+    return DuplicateChecker()
+
 
 # The main generator function produces all possible requested password permutations with no
 # duplicates from the token_lists global as constructed above plus wildcard expansion or from
@@ -3536,12 +4758,34 @@ class DuplicateChecker(object):
 # only_yield_count)) (which does not itself return any passwords). If only_yield_count, then
 # instead of producing lists, for each iteration single integers <= chunksize are produced
 # (only the last integer might be < than chunksize), useful for counting or skipping passwords.
+#
+# Passwords can be skipped quickly by passing seek, which can be either a "password position"
+# (see below) or an integer count of passwords to skip; this requires only_yield_count. The
+# base passwords before the seek point are generated but not modified (so none of their wildcard
+# expansions or typos are generated), and then passwords are counted as usual until chunksize
+# is reached. An integer seek count is found by counting the modifications of each base password
+# analytically, so it's only permitted when there are no filters (see password_seek_target()).
+#
+# A password position is a tuple: (base_password_num, passwords_count, worker_count), where
+# passwords_count is the number of passwords produced before this base password, and worker_count
+# is the value of the --worker counter at the same point. If password_positions is a deque, the
+# password position of the current base password is appended to it (along with the total number
+# of passwords produced so far) each time passwords are produced; see do_autosave() for its use.
+#
+# If chunksize_controller is set (see ChunksizeController), its next_chunksize() is called to
+# choose the size of each chunk after the first (unless only_yield_count).
+#
+# If generator_shard is a tuple, (shard_id, shards_total), only one shard of the passwords is
+# produced (see generate_and_verify_shard()): if there are at least two modification generators,
+# the values produced by the first are divided up between the shards, otherwise the base passwords
+# are; in either case, shard_id gets those whose index modulo shards_total is equal to shard_id.
 def init_password_generator():
-    global password_dups, token_combination_dups
-    password_dups = token_combination_dups = None
+    global password_dups, token_combination_dups, password_positions, generator_shard, chunksize_controller
+    password_dups = token_combination_dups = password_positions = generator_shard = chunksize_controller = None
 #
-def password_generator(chunksize = 1, only_yield_count = False):
+def password_generator(chunksize = 1, only_yield_count = False, seek = None):
     assert chunksize > 0, "password_generator: chunksize > 0"
+    assert seek is None or only_yield_count, "password_generator: only_yield_count if seek"
     # Used to communicate between typo generators the number of typos that have been
     # created so far during each password generated so that later generators know how
     # many additional typos, at most, they are permitted to add
@@ -3550,6 +4794,7 @@ def password_generator(chunksize = 1, only_yield_count = False):
 
     passwords_gathered = []
     passwords_count    = 0  # == len(passwords_gathered)
+    passwords_produced = 0  # the sum of the lengths/counts of all the chunks produced so far
     worker_count = 0  # Only used if --worker is specified
     new_args = None
 
@@ -3557,7 +4802,7 @@ def password_generator(chunksize = 1, only_yield_count = False):
     # if they should be used; see its usage below for more details
     global password_dups
     if password_dups is None and args.no_dupchecks < 1:
-        password_dups = DuplicateChecker()
+        password_dups = new_duplicate_checker()
 
     # Copy a few globals into local for a small speed boost
     l_generator_product = generator_product
@@ -3565,10 +4810,30 @@ def password_generator(chunksize = 1, only_yield_count = False):
     l_regex_only        = regex_only
     l_regex_never       = regex_never
     l_password_dups     = password_dups
-    l_args_worker       = args.worker
+    l_exclude_index     = exclude_index
+    l_args_worker       = args.worker and not args.worker_bases  # (see worker_base_passwords())
+    l_password_positions = password_positions
     if l_args_worker:
         l_workers_total = workers_total
         l_worker_id     = worker_id
+    else:
+        l_workers_total = 1
+        l_worker_id     = 0
+
+    # When seeking to a password position, base passwords are skipped until seek_base_num is
+    # reached; when seeking analytically, they're skipped as long as all of their passwords come
+    # before seek_total_count, the total (across all workers) through this worker's seek'th password
+    seeking = seek is not None
+    if seeking:
+        if isinstance(seek, tuple):
+            seek_base_num, seek_passwords_count, seek_worker_count = seek
+        else:
+            assert seek > 0, "password_generator: seek > 0"
+            seek_base_num    = None
+            seek_total_count = (seek - 1) * l_workers_total + l_worker_id + 1
+            seek_total_sofar = 0
+            init_password_counting()
+    password_position = None
 
     # Build up the modification_generators list; see the inner loop below for more details
     modification_generators = []
@@ -3579,10 +4844,41 @@ def password_generator(chunksize = 1, only_yield_count = False):
     if args.typos_insert:    modification_generators.append( insert_typos_generator     )
     modification_generators_len = len(modification_generators)
 
+    # If only producing one shard of the passwords, divide up either the first modification
+    # generator's values (if there are others after it) or the base passwords between shards
+    l_shard_base_passwords = False
+    if generator_shard:
+        l_shard_id, l_shards_total = generator_shard
+        if modification_generators_len > 1:
+            modification_generators[0] = sharded_generator(modification_generators[0], l_shard_id, l_shards_total)
+        else:
+            l_shard_base_passwords = True
+
     # The base password generator is set in parse_arguments(); it's either an iterable
     # or a generator function (which returns an iterator) that produces base passwords
     # usually based on either a tokenlist file (as parsed above) or a passwordlist file.
-    for password_base in base_password_generator() if callable(base_password_generator) else base_password_generator:
+    for base_password_num, password_base in enumerate(
+            base_password_generator() if callable(base_password_generator) else base_password_generator):
+
+        if l_shard_base_passwords and base_password_num % l_shards_total != l_shard_id: continue
+
+        # Skip base passwords (without generating their modifications) until the seek point is reached
+        if seeking:
+            if seek_base_num is None:
+                modifications_count = count_password_modifications(password_base)
+                if seek_total_sofar + modifications_count < seek_total_count:
+                    seek_total_sofar += modifications_count
+                    continue
+                worker_count    = seek_total_sofar
+                passwords_count = max(seek_total_sofar - l_worker_id + l_workers_total - 1, 0) // l_workers_total
+            else:
+                if base_password_num < seek_base_num: continue
+                passwords_count = seek_passwords_count
+                worker_count    = seek_worker_count
+            seeking = False
+
+        if l_password_positions is not None:
+            password_position = (base_password_num, passwords_produced + passwords_count, worker_count)
 
         # The for loop below takes the password_base and applies zero or more modifications
         # to it to produce a number of different possible variations of password_base (e.g.
@@ -3617,6 +4913,9 @@ def password_generator(chunksize = 1, only_yield_count = False):
             # by external libraries to parse_arguments()
             if custom_final_checker and not custom_final_checker(password): continue
 
+            # Check the password against the --exclude-index file
+            if l_exclude_index and password in l_exclude_index: continue
+
             # This duplicate check can be disabled via --no-dupchecks
             # because it can take up a lot of memory, sometimes needlessly
             if l_password_dups and l_password_dups.is_duplicate(password):  continue
@@ -3632,14 +4931,22 @@ def password_generator(chunksize = 1, only_yield_count = False):
             passwords_count += 1
             if only_yield_count:
                 if passwords_count >= chunksize:
+                    passwords_produced += passwords_count
+                    if l_password_positions is not None:
+                        l_password_positions.append((passwords_produced, password_position))
                     new_args = yield passwords_count
                     passwords_count = 0
             else:
                 passwords_gathered.append(password)
                 if passwords_count >= chunksize:
+                    passwords_produced += passwords_count
+                    if l_password_positions is not None:
+                        l_password_positions.append((passwords_produced, password_position))
                     new_args = yield passwords_gathered
                     passwords_gathered = []
                     passwords_count    = 0
+                    if chunksize_controller:
+                        chunksize = chunksize_controller.next_chunksize(passwords_produced)
 
             # Process new arguments received from .send(), yielding nothing back to send()
             if new_args:
@@ -3652,11 +4959,44 @@ def password_generator(chunksize = 1, only_yield_count = False):
 
     if l_password_dups: l_password_dups.run_finished()
 
+    # If the seek point is past the end, all the passwords (of this worker) have been skipped
+    if seeking and seek_base_num is None:
+        passwords_count = max(seek_total_sofar - l_worker_id + l_workers_total - 1, 0) // l_workers_total
+
     # Produce the remaining passwords that have been accumulated
     if passwords_count > 0:
+        if l_password_positions is not None and password_position:
+            l_password_positions.append((passwords_produced + passwords_count, password_position))
         yield passwords_count if only_yield_count else passwords_gathered
 
 
+# Wraps a modification generator function (see password_generator()) so that it only produces
+# the values assigned to a single shard: the values, counted across all calls to the returned
+# generator function, whose index modulo shards_total is equal to shard_id
+def sharded_generator(generator, shard_id, shards_total):
+    values_counter = itertools.count()
+    def shard_of_generator(password):
+        for value in generator(password):
+            if next(values_counter) % shards_total == shard_id:
+                yield value
+    return shard_of_generator
+
+
+# With --worker-bases, returns a replacement for the base_password_generator global which only
+# produces this worker's share of the base passwords: worker ID# (of --worker ID#/TOTAL#) gets base
+# passwords number ID#, ID#+TOTAL#, ID#+2*TOTAL#, etc. Every worker produces the same base passwords
+# in the same order, so the assignment depends only on the options; --skip and autosaves count just
+# the worker's own passwords (as they do without --worker-bases). Duplicates are only detected among
+# a worker's own passwords, so a duplicate derived from the base passwords of two workers is tried twice.
+def worker_base_passwords(base_generator):
+    if not callable(base_generator) and iter(base_generator) is base_generator:
+        return itertools.islice(base_generator, worker_id, None, workers_total)  # (can only be iterated once)
+    def worker_base_password_generator():
+        return itertools.islice(base_generator() if callable(base_generator) else base_generator,
+                                worker_id, None, workers_total)
+    return worker_base_password_generator
+
+
 # This generator utility is a bit like itertools.product. It takes a list of iterators
 # and invokes them in (the equivalent of) a nested for loop, except instead of a list
 # of simple iterators it takes a list of generators each of which expects to be called
@@ -3689,7 +5029,7 @@ def tokenlist_base_password_generator():
     # if they should be used; see its usage below for more details
     global token_combination_dups
     if token_combination_dups is None and args.no_dupchecks < 2 and has_any_duplicate_tokens:
-        token_combination_dups = DuplicateChecker()
+        token_combination_dups = new_duplicate_checker()
 
     # Copy a few globals into local for a small speed boost
     l_len                    = len
@@ -4014,27 +5354,20 @@ def default_performance_base_password_generator():
         yield "Measure Performance " + tstr(i)
 
 
-# This generator function expands (or contracts) all wildcards in the string passed
-# to it, or if there are no wildcards it simply produces the string unchanged. The
-# prior_prefix argument is only used internally while recursing, and is needed to
-# support backreference wildcards. The returned value is:
-#   prior_prefix + password_with_all_wildcards_expanded
-# TODO: implement without recursion?
-def expand_wildcards_generator(password_with_wildcards, prior_prefix = ""):
-
-    # Quick check to see if any wildcards are present
-    if password_with_wildcards.find("%") == -1:
-        # If none, just produce the string and end
-        yield prior_prefix + password_with_wildcards
-        return
+# The types of compiled wildcards produced by compile_wildcard() (see below)
+WILDCARD_EXPANDING, WILDCARD_CONTRACTING, WILDCARD_BACKREFERENCE = range(3)
+#
+# Expanding wildcards with at most this many expansions (e.g. %2,3d has 1,100) have
+# all of their expansions built once and cached; larger ones are built on demand
+MAX_CACHED_WILDCARD_EXPANSIONS = 10000
 
-    # Copy a few globals into local for a small speed boost
-    l_xrange = xrange
-    l_len    = len
-    l_min    = min
-    l_max    = max
+# Splits a string containing wildcards into its literal parts (which contain no wildcards)
+# and its compiled wildcards. There's always exactly one more literal part than there are
+# wildcards (some of the literal parts may be empty strings), and they alternate, e.g.:
+#   "ab%dc%2,3a" -> ["ab", "c", ""], [ <compiled %d>, <compiled %2,3a> ]
+def compile_wildcards(password_with_wildcards):
 
-    # Find the first wildcard parameter in the format %[[min,]max][caseflag]type where
+    # Find each wildcard parameter in the format %[[min,]max][caseflag]type where
     # caseflag == "i" if present and type is one of: wildcard_keys, "<", ">", or "-"
     # (e.g. "%d", "%-", "%2n", "%1,3ia", etc.), or type is of the form "[custom-wildcard-set]", or
     # for backreferences type is of the form: [ ";file;" ["#"] | ";#" ] "b"  <--brackets denote options
@@ -4043,23 +5376,44 @@ def expand_wildcards_generator(password_with_wildcards, prior_prefix = ""):
         wildcard_re = re.compile(
             r"%(?:(?:(?P<min>\d+),)?(?P<max>\d+))?(?P<nocase>i)?(?:(?P<type>[{}<>-])|\[(?P<custom>.+?)\]|(?:;(?:(?P<bfile>.+?);)?(?P<bpos>\d+)?)?(?P<bref>b))" \
             .format(wildcard_keys))
-    match = wildcard_re.search(password_with_wildcards)
-    assert match, "expand_wildcards_generator: parsed valid wildcard spec"
 
-    password_prefix      = password_with_wildcards[0:match.start()]          # no wildcards present here,
-    full_password_prefix = prior_prefix + password_prefix                    # nor here;
-    password_postfix_with_wildcards = password_with_wildcards[match.end():]  # might be other wildcards in here
+    literals      = []
+    wildcards     = []
+    literal_start = 0
+    for match in wildcard_re.finditer(password_with_wildcards):
+        literals .append(password_with_wildcards[literal_start:match.start()])
+        wildcards.append(compile_wildcard(match))
+        literal_start = match.end()
+    literals.append(password_with_wildcards[literal_start:])
+    assert wildcards, "compile_wildcards: parsed valid wildcard spec"
+
+    return literals, wildcards
+
+# Compiles a single wildcard (a wildcard_re match object) into one of these tuples:
+#   (WILDCARD_EXPANDING,     minlen, maxlen, wildcard_set, all_expansions or None if not cached)
+#   (WILDCARD_CONTRACTING,   minlen, maxlen, contracting_type: one of "<", ">", or "-")
+#   (WILDCARD_BACKREFERENCE, minlen, maxlen, bpos, bmap or None if there's no map file)
+# Compiled wildcards are cached by their spec (e.g. "%1,3ia") in compiled_wildcard_cache.
+def compile_wildcard(match):
+    wildcard_spec = match.group(0)
+    compiled      = compiled_wildcard_cache.get(wildcard_spec)
+    if compiled: return compiled
 
-    m_bref = match.group("bref")
-    if m_bref:  # a backreference wildcard, e.g. "%b" or "%;2b" or "%;map.txt;2b"
+    # Extract or default the wildcard min and max length
+    wildcard_maxlen = match.group("max")
+    wildcard_maxlen = int(wildcard_maxlen) if wildcard_maxlen else 1
+    wildcard_minlen = match.group("min")
+    wildcard_minlen = int(wildcard_minlen) if wildcard_minlen else wildcard_maxlen
+
+    if match.group("bref"):  # a backreference wildcard, e.g. "%b" or "%;2b" or "%;map.txt;2b"
         m_bfile, m_bpos = match.group("bfile", "bpos")
-        m_bpos = int(m_bpos) if m_bpos else 1
-        bmap = backreference_maps[m_bfile] if m_bfile else None
+        compiled = (WILDCARD_BACKREFERENCE, wildcard_minlen, wildcard_maxlen,
+                    int(m_bpos) if m_bpos else 1, backreference_maps[m_bfile] if m_bfile else None)
+
     else:
         # For positive (expanding) wildcards, build the set of possible characters based on the wildcard type and caseflag
         m_custom, m_nocase = match.group("custom", "nocase")
         if m_custom:  # a custom set wildcard, e.g. %[abcdef0-9]
-            is_expanding = True
             wildcard_set = custom_wildcard_cache.get((m_custom, m_nocase))
             if wildcard_set is None:
                 wildcard_set = build_wildcard_set(m_custom)
@@ -4071,135 +5425,169 @@ def expand_wildcards_generator(password_with_wildcards, prior_prefix = ""):
                 custom_wildcard_cache[(m_custom, m_nocase)] = wildcard_set
         else:  # either a "normal" or a contracting wildcard
             m_type = match.group("type")
-            is_expanding = m_type not in "<>-"
-            if is_expanding:
-                if m_nocase and m_type in wildcard_nocase_sets:
-                    wildcard_set = wildcard_nocase_sets[m_type]
-                else:
-                    wildcard_set = wildcard_sets[m_type]
-        assert not is_expanding or wildcard_set, "expand_wildcards_generator: found expanding wildcard set"
-
-    # Extract or default the wildcard min and max length
-    wildcard_maxlen = match.group("max")
-    wildcard_maxlen = int(wildcard_maxlen) if wildcard_maxlen else 1
-    wildcard_minlen = match.group("min")
-    wildcard_minlen = int(wildcard_minlen) if wildcard_minlen else wildcard_maxlen
-
-    # If it's a backreference wildcard
-    if m_bref:
-        first_pos = len(full_password_prefix) - m_bpos
-        if first_pos < 0:  # if the prefix is shorter than the requested bpos
-            wildcard_minlen = l_max(wildcard_minlen + first_pos, 0)
-            wildcard_maxlen = l_max(wildcard_maxlen + first_pos, 0)
-            m_bpos += first_pos  # will always be >= 1
-        m_bpos *= -1             # is now <= -1
-
-        if bmap:  # if it's a backreference wildcard with a map file
-            # Special case for when the first password has no wildcard characters appended
-            if wildcard_minlen == 0:
-                # If the wildcard was at the end of the string, we're done
-                if password_postfix_with_wildcards == "":
-                    yield full_password_prefix
-                # Recurse to expand any additional wildcards possibly in password_postfix_with_wildcards
-                else:
-                    for password_expanded in expand_wildcards_generator(password_postfix_with_wildcards, full_password_prefix):
-                        yield password_expanded
-
-            # Expand the mapping backreference wildcard using the helper function (defined below)
-            # (this helper function can't handle the special case above)
-            for password_prefix_expanded in expand_mapping_backreference_wildcard(full_password_prefix, wildcard_minlen, wildcard_maxlen, m_bpos, bmap):
-
-                # If the wildcard was at the end of the string, we're done
-                if password_postfix_with_wildcards == "":
-                    yield password_prefix_expanded
-                # Recurse to expand any additional wildcards possibly in password_postfix_with_wildcards
-                else:
-                    for password_expanded in expand_wildcards_generator(password_postfix_with_wildcards, password_prefix_expanded):
-                        yield password_expanded
-
-        else:  # else it's a "normal" backreference wildcard (without a map file)
-            # Construct the first password to be produced
-            for i in xrange(0, wildcard_minlen):
-                full_password_prefix += full_password_prefix[m_bpos]
-
-            # Iterate over the [wildcard_minlen, wildcard_maxlen) range
-            i = wildcard_minlen
-            while True:
-
-                # If the wildcard was at the end of the string, we're done
-                if password_postfix_with_wildcards == "":
-                    yield full_password_prefix
-                # Recurse to expand any additional wildcards possibly in password_postfix_with_wildcards
-                else:
-                    for password_expanded in expand_wildcards_generator(password_postfix_with_wildcards, full_password_prefix):
-                        yield password_expanded
-
-                i += 1
-                if i > wildcard_maxlen: break
-
-                # Construct the next password
-                full_password_prefix += full_password_prefix[m_bpos]
+            if m_type in "<>-":
+                wildcard_set = None
+                compiled = (WILDCARD_CONTRACTING, wildcard_minlen, wildcard_maxlen, m_type)
+            elif m_nocase and m_type in wildcard_nocase_sets:
+                wildcard_set = wildcard_nocase_sets[m_type]
+            else:
+                wildcard_set = wildcard_sets[m_type]
+
+        if not compiled:
+            assert wildcard_set, "compile_wildcard: found expanding wildcard set"
+            # Small wildcards are expanded just this once, larger ones each time they're used
+            expansions_count = sum(len(wildcard_set) ** l for l in xrange(wildcard_minlen, wildcard_maxlen+1))
+            all_expansions   = tuple(wildcard_set_expanded(wildcard_set, wildcard_minlen, wildcard_maxlen)) \
+                               if expansions_count <= MAX_CACHED_WILDCARD_EXPANSIONS else None
+            compiled = (WILDCARD_EXPANDING, wildcard_minlen, wildcard_maxlen, wildcard_set, all_expansions)
+
+    compiled_wildcard_cache[wildcard_spec] = compiled
+    return compiled
+
+# Produces every string made from the characters in wildcard_set whose length is in the
+# range [minlen, maxlen], in the order produced by an expanding wildcard
+def wildcard_set_expanded(wildcard_set, minlen, maxlen):
+    return itertools.chain.from_iterable(
+        itertools.imap("".join, itertools.product(wildcard_set, repeat=wildcard_len))
+        for wildcard_len in xrange(minlen, maxlen+1))
+
+# Returns an iterable of every (password_prefix, skip) choice that a compiled wildcard can make:
+#   prior_prefix   -- the fully expanded password before the literal_before part
+#   literal_before -- the literal (wildcard-free) part of the password just before the wildcard
+#   literal_after  -- the literal part of the password just after the wildcard
+# In the tuples produced, password_prefix is prior_prefix + literal_before with the wildcard
+# expanded (or contracted) onto its end, and skip is the number of characters which should
+# be removed from the beginning of literal_after (which is only nonzero for contracting wildcards).
+def wildcard_choices(wildcard, prior_prefix, literal_before, literal_after):
+    full_password_prefix = prior_prefix + literal_before
+    wildcard_type, wildcard_minlen, wildcard_maxlen = wildcard[:3]
 
     # If it's an expanding wildcard
-    elif is_expanding:
-        # Iterate through specified wildcard lengths
-        for wildcard_len in l_xrange(wildcard_minlen, wildcard_maxlen+1):
-
-            # Expand the wildcard into a length of characters according to the wildcard type/caseflag
-            for wildcard_expanded_list in itertools.product(wildcard_set, repeat=wildcard_len):
+    if wildcard_type == WILDCARD_EXPANDING:
+        all_expansions = wildcard[4]
+        if all_expansions is None:
+            all_expansions = wildcard_set_expanded(wildcard[3], wildcard_minlen, wildcard_maxlen)
+        return itertools.izip(itertools.imap(full_password_prefix.__add__, all_expansions), itertools.repeat(0))
 
-                # If the wildcard was at the end of the string, we're done
-                if password_postfix_with_wildcards == "":
-                    yield full_password_prefix + "".join(wildcard_expanded_list)
-                    continue
-                # Recurse to expand any additional wildcards possibly in password_postfix_with_wildcards
-                for password_expanded in expand_wildcards_generator(password_postfix_with_wildcards, full_password_prefix + "".join(wildcard_expanded_list)):
-                    yield password_expanded
+    # If it's a contracting wildcard
+    if wildcard_type == WILDCARD_CONTRACTING:
+        m_type = wildcard[3]
 
-    # Otherwise it's a contracting wildcard
-    else:
         # Determine the max # of characters that can be removed from either the left
         # or the right of the wildcard, not yet taking wildcard_maxlen into account
-        max_from_left  = l_len(password_prefix) if m_type in "<-" else 0
-        if m_type in ">-":
-            max_from_right = password_postfix_with_wildcards.find("%")
-            if max_from_right == -1: max_from_right = l_len(password_postfix_with_wildcards)
-        else:
-            max_from_right = 0
+        max_from_left  = len(literal_before) if m_type in "<-" else 0
+        max_from_right = len(literal_after)  if m_type in ">-" else 0
 
+        choices = []
         # Iterate over the total number of characters to remove
-        for remove_total in l_xrange(wildcard_minlen, l_min(wildcard_maxlen, max_from_left+max_from_right) + 1):
+        for remove_total in xrange(wildcard_minlen, min(wildcard_maxlen, max_from_left+max_from_right) + 1):
 
             # Iterate over the number of characters to remove from the right of the wildcard
             # (this loop runs just once for %#,#< or %#,#> ; or for %#,#- at the beginning or end)
-            for remove_right in l_xrange(l_max(0, remove_total-max_from_left), l_min(remove_total, max_from_right) + 1):
+            for remove_right in xrange(max(0, remove_total-max_from_left), min(remove_total, max_from_right) + 1):
                 remove_left = remove_total-remove_right
+                choices.append((full_password_prefix[:-remove_left] if remove_left else full_password_prefix, remove_right))
+        return choices
+
+    # Otherwise it's a backreference wildcard
+    m_bpos, bmap = wildcard[3:]
+    first_pos = len(full_password_prefix) - m_bpos
+    if first_pos < 0:  # if the prefix is shorter than the requested bpos
+        wildcard_minlen = max(wildcard_minlen + first_pos, 0)
+        wildcard_maxlen = max(wildcard_maxlen + first_pos, 0)
+        m_bpos += first_pos  # will always be >= 1
+    m_bpos *= -1             # is now <= -1
+
+    if bmap:  # if it's a backreference wildcard with a map file
+        # Expand the mapping backreference wildcard using the helper function (defined below)
+        choices = expand_mapping_backreference_wildcard(full_password_prefix, wildcard_minlen, wildcard_maxlen, m_bpos, bmap)
+        # Special case for when the first password has no wildcard characters appended
+        # (the helper function can't handle this special case)
+        if wildcard_minlen == 0:
+            choices = itertools.chain((full_password_prefix,), choices)
+        return itertools.izip(choices, itertools.repeat(0))
+
+    # Else it's a "normal" backreference wildcard (without a map file);
+    # construct the first password to be produced
+    for i in xrange(wildcard_minlen):
+        full_password_prefix += full_password_prefix[m_bpos]
+    choices = [(full_password_prefix, 0)]
+    # and then the rest of them in the (wildcard_minlen, wildcard_maxlen] range
+    for i in xrange(wildcard_minlen, wildcard_maxlen):
+        full_password_prefix += full_password_prefix[m_bpos]
+        choices.append((full_password_prefix, 0))
+    return choices
 
-                password_prefix_contracted = full_password_prefix[:-remove_left] if remove_left else full_password_prefix
 
-                # If the wildcard was at the end or if there's nothing remaining on the right, we're done
-                if l_len(password_postfix_with_wildcards) - remove_right == 0:
-                    yield password_prefix_contracted
-                    continue
-                # Recurse to expand any additional wildcards possibly in password_postfix_with_wildcards
-                for password_expanded in expand_wildcards_generator(password_postfix_with_wildcards[remove_right:], password_prefix_contracted):
-                    yield password_expanded
+# This generator function expands (or contracts) all wildcards in the string passed
+# to it, or if there are no wildcards it simply produces the string unchanged. The
+# string is compiled just once into its literal parts and its wildcards, and then the
+# wildcards' choices are iterated over like an odometer (the last wildcard spins the
+# fastest) instead of by recursing once per wildcard. The returned value is:
+#   prior_prefix + password_with_all_wildcards_expanded
+def expand_wildcards_generator(password_with_wildcards, prior_prefix = ""):
 
+    # Quick check to see if any wildcards are present
+    if password_with_wildcards.find("%") == -1:
+        # If none, just produce the string and end
+        yield prior_prefix + password_with_wildcards
+        return
+
+    literals, wildcards = compile_wildcards(password_with_wildcards)
 
-# Recursive helper generator function for expand_wildcards_generator():
+    # Copy a few globals into local for a small speed boost
+    l_iter             = iter
+    l_wildcard_choices = wildcard_choices
+
+    last_level   = len(wildcards) - 1
+    last_literal = literals[-1]
+
+    # choices_stack[level] is an iterator over the choices of wildcards[level] given the
+    # choices currently made by every wildcard to its left (at levels < level)
+    choices_stack    = [None] * len(wildcards)
+    choices_stack[0] = l_iter(l_wildcard_choices(wildcards[0], prior_prefix, literals[0], literals[1]))
+    level = 0
+    while level >= 0:
+
+        # The last wildcard produces the finished passwords
+        if level == last_level:
+            for password_prefix, skip in choices_stack[level]:
+                yield password_prefix + last_literal[skip:]
+            level -= 1
+
+        # The others each make a single choice before moving to the wildcard on their right,
+        # or if they've run out of choices, move back to the wildcard on their left
+        else:
+            for password_prefix, skip in choices_stack[level]:
+                level += 1
+                choices_stack[level] = l_iter(l_wildcard_choices(wildcards[level], password_prefix, literals[level][skip:], literals[level+1]))
+                break
+            else:
+                level -= 1
+
+
+# Helper generator function for wildcard_choices():
 #   password_prefix -- the fully expanded password before a %b wildcard
 #   minlen, maxlen  -- the min and max from a %#,#b wildcard
 #   bpos            -- from a %;#b wildcard, this is -#
 #   bmap            -- the dict associated with the file in a %;file;b wildcard
 # This function assumes all range checking has already been performed.
 def expand_mapping_backreference_wildcard(password_prefix, minlen, maxlen, bpos, bmap):
-    for wildcard_expanded in bmap.get(password_prefix[bpos], (password_prefix[bpos],)):
-        password_prefix_expanded = password_prefix + wildcard_expanded
-        if minlen <= 1:
-            yield password_prefix_expanded
-        if maxlen > 1:
-            for password_expanded in expand_mapping_backreference_wildcard(password_prefix_expanded, minlen-1, maxlen-1, bpos, bmap):
-                yield password_expanded
+    # Each stack entry is a partially expanded password prefix along with the min and max
+    # count of characters left to append, and an iterator over its next possible characters
+    stack = [(password_prefix, minlen, maxlen, iter(bmap.get(password_prefix[bpos], (password_prefix[bpos],))))]
+    while stack:
+        password_prefix, minlen, maxlen, wildcard_expansions = stack[-1]
+        for wildcard_expanded in wildcard_expansions:
+            password_prefix_expanded = password_prefix + wildcard_expanded
+            if minlen <= 1:
+                yield password_prefix_expanded
+            if maxlen > 1:
+                stack.append((password_prefix_expanded, minlen-1, maxlen-1,
+                    iter(bmap.get(password_prefix_expanded[bpos], (password_prefix_expanded[bpos],)))))
+            break
+        else:
+            stack.pop()
 
 
 # capslock_typos_generator() is a generator function which tries swapping the case of
@@ -4461,6 +5849,317 @@ def insert_typos_generator(password_base):
         typos_sofar -= inserts_count
 
 
+################################### Password Counting ###################################
+
+
+# Simple typo generators whose replacements depend only on the single character being
+# replaced (and not on its position or its neighbors); see count_typos() for more details
+CHARACTER_ONLY_SIMPLE_TYPOS = frozenset((typo_repeat, typo_delete, typo_case, typo_replace_wildcard, typo_map))
+
+# Must be called before calling any of the count_* functions below
+def init_password_counting():
+    global insert_typos_counts_cache
+    insert_typos_counts_cache = dict()
+
+# Analytically calculates the *total* number of passwords that password_generator() will produce
+# (including those skipped by args.skip) without generating every one of them. Token combinations
+# and permutations, wildcard expansions, and typos are counted using closed-form calculations where
+# possible; when this isn't possible, only the base passwords (or their wildcard expansions) are
+# generated, and the number of typos each one produces is calculated. Returns a two-element tuple:
+#   the first element is the count, and
+#   the second is True if the count is exact, or False if it's an upper bound (if duplicate
+#   checking or --exclude-passwordlist might remove some of the counted passwords); or
+# returns None if the passwords can't be counted this way (e.g. if --regex-only was specified).
+def count_passwords_analytically():
+    # These filters can only be applied by examining each password
+    if regex_only or regex_never or custom_final_checker:
+        return None
+
+    # An iterator (as opposed to a generator function or a re-iterable sequence) can't be
+    # examined without consuming it, and the performance generator is infinite
+    if callable(base_password_generator):
+        if base_password_generator == performance_base_password_generator:
+            return None
+    elif iter(base_password_generator) is base_password_generator:
+        return None
+
+    init_password_counting()
+
+    any_typos = args.typos_capslock or args.typos_swap or enabled_simple_typos or args.typos_insert
+    if base_password_generator == tokenlist_base_password_generator and not any_typos and not has_any_anchors \
+            and (args.no_dupchecks >= 3 or not has_any_duplicate_tokens):
+        passwords_count = count_tokenlist_passwords()
+    else:
+        passwords_count = None
+    #
+    # If the closed-form tokenlist calculation isn't possible, generate the base passwords
+    if passwords_count is None:
+        passwords_count = sum(itertools.imap(count_password_modifications,
+            base_password_generator() if callable(base_password_generator) else base_password_generator))
+
+    # Workers in a server pool only get every workers_total'th password
+    # (unless --worker-bases, in which case only their own base passwords were counted above)
+    if args.worker and not args.worker_bases:
+        passwords_count = max(passwords_count - worker_id + workers_total - 1, 0) // workers_total
+
+    # Duplicates (and excluded passwords) are only removed as the passwords are generated
+    is_exact = args.no_dupchecks >= 1 and not (args.exclude_passwordlist or args.exclude_index)
+    return passwords_count, is_exact
+
+# Calculates the number of passwords produced by tokenlist_base_password_generator() (and their
+# wildcard expansions, if any) with a single closed-form calculation. The caller must ensure
+# there are no anchors, no typos, and no duplicate tokens (unless their checks are disabled).
+# Returns None if any token has a contracting or backreference wildcard.
+def count_tokenlist_passwords():
+    # combinations_counts[i] is the # of ways to choose one token from each of exactly i lines,
+    # multiplied by each chosen token's count of wildcard expansions (these are independent of
+    # the tokens around them because only expanding wildcards are permitted)
+    combinations_counts = [1]
+    for token_list in token_lists:
+        expansions_count = 0
+        for token in token_list:
+            if token is None: continue
+            if has_any_wildcards and "%" in token:
+                if any(wildcard[0] != WILDCARD_EXPANDING for wildcard in compile_wildcards(token)[1]):
+                    return None
+                expansions_count += count_wildcard_expansions(token)
+            else:
+                expansions_count += 1
+        #
+        is_required = None not in token_list
+        new_combinations_counts = [0] * (len(combinations_counts) + 1)
+        for tokens_len, combinations_count in enumerate(combinations_counts):
+            if not is_required:
+                new_combinations_counts[tokens_len] += combinations_count
+            new_combinations_counts[tokens_len + 1] += combinations_count * expansions_count
+        combinations_counts = new_combinations_counts
+
+    # Each combination of tokens_len tokens has tokens_len! permutations
+    passwords_count = 0
+    permutations_count = 1
+    for tokens_len, combinations_count in enumerate(combinations_counts):
+        if tokens_len > 1:
+            permutations_count *= tokens_len
+        if args.min_tokens <= tokens_len <= args.max_tokens:
+            passwords_count += permutations_count * combinations_count
+    return passwords_count
+
+# Returns the number of passwords produced by password_generator()'s modification_generators
+# (wildcard expansions and typos) for a single base password, ignoring any duplicates
+def count_password_modifications(password_base):
+    any_typos = args.typos_capslock or args.typos_swap or enabled_simple_typos or args.typos_insert
+    if has_any_wildcards:
+        if not any_typos:
+            return count_wildcard_expansions(password_base)
+        return sum(itertools.imap(count_typos, expand_wildcards_generator(password_base)))
+    return count_typos(password_base) if any_typos else 1
+
+# Returns the number of passwords produced by expand_wildcards_generator(password_with_wildcards)
+def count_wildcard_expansions(password_with_wildcards):
+    if password_with_wildcards.find("%") == -1:
+        return 1
+    literals, wildcards = compile_wildcards(password_with_wildcards)
+
+    # The number of choices a backreference wildcard has depends on the
+    # (expanded) password before it, so these must be expanded to be counted
+    if any(wildcard[0] == WILDCARD_BACKREFERENCE for wildcard in wildcards):
+        return sum(1 for password in expand_wildcards_generator(password_with_wildcards))
+
+    # The number of choices a contracting wildcard has depends on the length of the literals
+    # around it, which can be shortened by a contracting wildcard to its left, so this
+    # maps each possible skip (see wildcard_choices()) to the # of ways it can be reached
+    skip_counts = {0: 1}
+    for level, wildcard in enumerate(wildcards):
+        wildcard_type, wildcard_minlen, wildcard_maxlen = wildcard[:3]
+
+        if wildcard_type == WILDCARD_EXPANDING:
+            all_expansions = wildcard[4]
+            expansions_count = len(all_expansions) if all_expansions is not None else \
+                sum(len(wildcard[3]) ** l for l in xrange(wildcard_minlen, wildcard_maxlen+1))
+            skip_counts = {0: sum(skip_counts.itervalues()) * expansions_count}
+
+        else:  # it's a contracting wildcard (see wildcard_choices() for details)
+            m_type = wildcard[3]
+            new_skip_counts = collections.defaultdict(int)
+            for skip, skip_count in skip_counts.iteritems():
+                max_from_left  = len(literals[level]) - skip if m_type in "<-" else 0
+                max_from_right = len(literals[level+1])      if m_type in ">-" else 0
+                for remove_total in xrange(wildcard_minlen, min(wildcard_maxlen, max_from_left+max_from_right) + 1):
+                    for remove_right in xrange(max(0, remove_total-max_from_left), min(remove_total, max_from_right) + 1):
+                        new_skip_counts[remove_right] += skip_count
+            skip_counts = new_skip_counts
+
+    return sum(skip_counts.itervalues())
+
+# Returns the number of passwords produced by the typo generators (the capslock, swap, simple, and
+# insert typo generators in that order, as enabled) for a single password after wildcard expansion,
+# including only those with at least --min-typos typos, and ignoring any duplicates. Instead of
+# producing them, the # of ways each typo generator can reach each # of typos so far is calculated.
+def count_typos(password):
+    # The capslock typo generator produces the password, plus possibly one with a single typo
+    capslock_choices = [(password, 0)]
+    if args.typos_capslock:
+        password_swapped = password.swapcase()
+        if password_swapped != password:
+            capslock_choices.append((password_swapped, 1))
+
+    passwords_count = 0
+    for password, typos_sofar in capslock_choices:
+
+        if not args.typos_swap:
+            passwords_count += count_simple_and_insert_typos(password, typos_sofar)
+
+        # If a simple typo generator might depend on the characters around the one being replaced,
+        # the passwords produced by the swap typo generator must be produced to count their typos
+        elif enabled_simple_typos and not CHARACTER_ONLY_SIMPLE_TYPOS.issuperset(enabled_simple_typos):
+            for password_swapped, swaps_count in swap_typos_variations(password, typos_sofar):
+                passwords_count += count_simple_and_insert_typos(password_swapped, typos_sofar + swaps_count)
+
+        # Otherwise the simple typos counts don't depend on which characters were swapped
+        # (the same replacements are available for the same characters, just moved around)
+        else:
+            simple_typos_counts = count_simple_typos(password, args.typos - typos_sofar)
+            for swaps_count, swaps_ways in enumerate(count_swap_typos(password, typos_sofar)):
+                if swaps_ways:
+                    passwords_count += swaps_ways * count_simple_and_insert_typos(
+                        password, typos_sofar + swaps_count, simple_typos_counts)
+
+    return passwords_count
+
+# Returns a list whose i'th element is the number of passwords the swap typo generator
+# produces for password which have exactly i swaps (see swap_typos_generator() for details)
+def count_swap_typos(password, typos_sofar):
+    password_len = len(password)
+    max_swaps    = min(args.max_typos_swap, args.typos - typos_sofar, password_len // 2)
+    # Working from the end of the password towards its beginning, swaps_counts_after[i] is the number
+    # of ways to choose i non-adjacent swaps out of the positions after the current one, and
+    # swaps_counts_after_next[i] is the same for the positions after the one after the current one
+    swaps_counts_after      = [1] + [0] * max_swaps
+    swaps_counts_after_next = [1] + [0] * max_swaps
+    for i in reversed(xrange(password_len - 1)):
+        swaps_counts = list(swaps_counts_after)
+        # "swapping" identical characters would generate a duplicate guess (this is checked on the
+        # unswapped password because swapped characters are never adjacent to another swap)
+        if password[i] != password[i+1] or args.no_dupchecks >= 4:
+            for swaps_count in xrange(1, max_swaps + 1):
+                swaps_counts[swaps_count] += swaps_counts_after_next[swaps_count - 1]
+        swaps_counts_after_next, swaps_counts_after = swaps_counts_after, swaps_counts
+    return swaps_counts_after
+
+# Produces the same passwords as swap_typos_generator(), each in a tuple with its number of swaps
+def swap_typos_variations(password, typos_sofar_before):
+    global typos_sofar
+    saved_typos_sofar = typos_sofar
+    typos_sofar = typos_sofar_before
+    try:
+        for password_swapped in swap_typos_generator(password):
+            yield password_swapped, typos_sofar - typos_sofar_before
+    finally:
+        typos_sofar = saved_typos_sofar
+
+# Returns a dict mapping (typos_count, length_change) tuples to the number of passwords the simple
+# typo generator produces for password which have exactly typos_count typos and whose length differs
+# from password's by length_change, for up to max_typos typos (see simple_typos_generator())
+def count_simple_typos(password, max_typos):
+    if not enabled_simple_typos:
+        return {(0, 0): 1}
+    max_typos = min(max_typos, len(password))  # (sum_max_simple_typos is enforced via max_simple_typos)
+
+    # Each state is a (typos_count, length_change, typos_per_generator) tuple (typos_per_generator is
+    # only tracked if there are max_simple_typos limits), mapped to the # of ways to reach it
+    no_typos_per_generator = (0,) * len(enabled_simple_typos) if max_simple_typos else ()
+    states = {(0, 0, no_typos_per_generator): 1}
+    for i in xrange(len(password)):
+
+        # Collect the replacements for the character at position i, grouped by generator and length change
+        replacements = []
+        for generator_num, generator in enumerate(enabled_simple_typos):
+            length_changes = collections.defaultdict(int)
+            for replacement in generator(password, i):
+                length_changes[len(replacement) - 1] += 1
+            replacements.extend((generator_num, length_change, count) for length_change, count in length_changes.iteritems())
+        if not replacements: continue
+
+        new_states = collections.defaultdict(int, states)  # (these are the ones with no typo at position i)
+        for (typos_count, length_change, typos_per_generator), ways in states.iteritems():
+            if typos_count >= max_typos: continue
+            for generator_num, replacement_length_change, replacements_count in replacements:
+                if typos_per_generator:
+                    generator_typos = typos_per_generator[generator_num]
+                    if generator_typos >= max_simple_typos[generator_num]: continue
+                    new_typos_per_generator = typos_per_generator[:generator_num] + (generator_typos + 1,) + typos_per_generator[generator_num+1:]
+                else:
+                    new_typos_per_generator = typos_per_generator
+                new_states[(typos_count + 1, length_change + replacement_length_change, new_typos_per_generator)] += ways * replacements_count
+        states = new_states
+
+    simple_typos_counts = collections.defaultdict(int)
+    for (typos_count, length_change, typos_per_generator), ways in states.iteritems():
+        simple_typos_counts[(typos_count, length_change)] += ways
+    return simple_typos_counts
+
+# Returns the number of passwords produced by the simple and insert typo generators for a
+# password (with typos_sofar typos already) with at least --min-typos typos in total
+def count_simple_and_insert_typos(password, typos_sofar, simple_typos_counts = None):
+    max_simple_typos_count = args.typos - typos_sofar if args.typos else 0
+    if simple_typos_counts is None:
+        simple_typos_counts = count_simple_typos(password, max_simple_typos_count)
+    password_len = len(password)
+    passwords_count = 0
+    for (typos_count, length_change), ways in simple_typos_counts.iteritems():
+        if typos_count <= max_simple_typos_count:
+            passwords_count += ways * count_insert_typos(password_len + length_change, typos_sofar + typos_count)
+    return passwords_count
+
+# Returns the number of passwords produced by the insert typo generator for a password of
+# length password_len (with typos_sofar typos already) with at least --min-typos typos in total
+insert_typos_counts_cache = dict()
+def count_insert_typos(password_len, typos_sofar):
+    min_inserts = max(args.min_typos - typos_sofar, 0)
+    if not args.typos_insert:
+        return 1 if min_inserts == 0 else 0
+
+    passwords_count = insert_typos_counts_cache.get((password_len, typos_sofar))
+    if passwords_count is not None:
+        return passwords_count
+
+    max_adjacent_inserts = args.max_adjacent_inserts
+    max_inserts = min(args.max_typos_insert, args.typos - typos_sofar)
+    if max_adjacent_inserts == 1:
+        max_inserts = min(max_inserts, password_len + 1)
+    insertions_count = len(typos_insert_expanded)
+
+    # For each count of inserts, the number of ways to choose their (possibly identical, up to
+    # max_adjacent_inserts) locations times the number of ways to choose what gets inserted
+    passwords_count = 0
+    for inserts_count in xrange(min_inserts, max_inserts + 1):
+        passwords_count += bounded_multisets_count(password_len + 1, inserts_count, max_adjacent_inserts) \
+                           * insertions_count ** inserts_count
+
+    insert_typos_counts_cache[(password_len, typos_sofar)] = passwords_count
+    return passwords_count
+
+# Returns the number of ways to choose size items from n distinct items where each item
+# may be chosen up to max_repeats times (regardless of order), by inclusion-exclusion
+def bounded_multisets_count(n, size, max_repeats):
+    if max_repeats == 1:
+        return binomial(n, size)
+    multisets_count = 0
+    for too_many in xrange(min(n, size // (max_repeats + 1)) + 1):
+        multisets_count += (-1) ** too_many * binomial(n, too_many) \
+                           * binomial(n + size - too_many * (max_repeats + 1) - 1, n - 1)
+    return multisets_count
+#
+def binomial(n, k):
+    if k < 0 or k > n or n < 0:
+        return 0
+    k = min(k, n - k)
+    result = 1
+    for i in xrange(1, k + 1):
+        result = result * (n - k + i) // i
+    return result
+
+
 ################################### Main ###################################
 
 
@@ -4468,6 +6167,343 @@ def insert_typos_generator(password_base):
 # member function of the currently loaded global wallet
 def return_verified_password_or_false(passwords):
     return loaded_wallet.return_verified_password_or_false(passwords)
+#
+# Same as above, except the passwords may instead be the number of a slot in shared_password_slots;
+# if its passwords are packed, the index of the correct one is returned instead of the password
+# (SharedPasswordSlots.releasing_results() replaces it with the password in the main process)
+def return_verified_slot_password_or_false(passwords_or_slot_num):
+    if isinstance(passwords_or_slot_num, int):
+        if shared_password_slots.packed:
+            index, count = loaded_wallet.return_verified_packed_index_or_none(
+                *shared_password_slots.read_packed(passwords_or_slot_num))
+            return (False if index is None else index), count
+        passwords_or_slot_num = shared_password_slots.read(passwords_or_slot_num)
+    return loaded_wallet.return_verified_password_or_false(passwords_or_slot_num)
+#
+# Same as above, except two more elements are added to the returned tuple for the ChunksizeController:
+# the seconds spent verifying the passwords, and the seconds this worker spent idle before that
+# (since it finished verifying its previous chunk, or zero if this is its first chunk)
+# (with --backend threads, each worker thread keeps track of its own last_finished time)
+worker_timing = threading.local()
+def return_verified_password_or_false_timed(passwords_or_slot_num):
+    start  = time.time()
+    result = return_verified_slot_password_or_false(passwords_or_slot_num)
+    finish = time.time()
+    last_finished = getattr(worker_timing, "last_finished", None)
+    idle_seconds  = start - last_finished if last_finished else 0.0
+    worker_timing.last_finished = finish
+    return result + (finish - start, idle_seconds)
+
+
+# With --backend threads, limits the number of chunks produced by limiting() whose results
+# haven't yet been produced by releasing_results() (which must be in the same order)
+class BoundedChunks(object):
+
+    def __init__(self, limit):
+        self._available = threading.Semaphore(limit)
+        self._closed    = False
+
+    def limiting(self, chunks):
+        for chunk in chunks:
+            self._available.acquire()
+            if self._closed:
+                return
+            yield chunk
+
+    def releasing_results(self, results):
+        for result in results:
+            self._available.release()
+            yield result
+
+    # Stops limiting() from producing any more chunks (even if it's waiting)
+    def close(self):
+        self._closed = True
+        self._available.release()
+
+
+# For --backend auto, measures how quickly the worker processes in process_pool and the same number of
+# worker threads verify a few chunks of dummy passwords, and returns whichever backend was faster. The
+# threads can only run in parallel if the wallet's key derivation function releases Python's GIL (e.g.
+# hashlib.pbkdf2_hmac or an scrypt C library), but they needn't pickle the chunks and share one wallet.
+# The chunks are sent to the processes the same way the search sends them (in shared_password_slots,
+# if it's been created), so that the comparison includes the cost of each backend's transport.
+# The result is remembered for future calls to main() with the same wallet (see measured_performance).
+measured_backend = None  # a tuple: (wallet, workers, backend)
+def fastest_verification_backend(process_pool, workers, chunksize, est_secs_per_password):
+    global measured_backend
+    backend = remembered_verification_backend(workers)
+    if backend:
+        return backend
+    BENCHMARK_SECONDS = 0.5  # for each backend
+    chunks_count = workers * max(int(BENCHMARK_SECONDS / (chunksize * est_secs_per_password)), 2)
+    performance_generator = performance_base_password_generator()  # generates dummy passwords
+    chunks = [list(itertools.islice(itertools.ifilter(custom_final_checker, performance_generator), chunksize))
+              for i in xrange(chunks_count)]
+    del performance_generator
+    def verify_all(backend, pool, chunks):
+        if backend == "processes" and shared_password_slots:
+            results = pool.imap(return_verified_slot_password_or_false, shared_password_slots.packed_chunks(iter(chunks)))
+            results = shared_password_slots.releasing_results(results)
+        else:
+            results = pool.imap(return_verified_password_or_false, chunks)
+        for result in results: pass
+    thread_pool = multiprocessing.pool.ThreadPool(workers)
+    try:
+        seconds = {}
+        for backend, pool in ("processes", process_pool), ("threads", thread_pool):
+            verify_all(backend, pool, chunks[:workers])  # (waits for the workers to start)
+            start = time.time()
+            verify_all(backend, pool, chunks)
+            seconds[backend] = time.time() - start
+    finally:
+        thread_pool.terminate()
+    backend = "threads" if seconds["threads"] < seconds["processes"] else "processes"
+    measured_backend = loaded_wallet, workers, backend
+    return backend
+#
+# Returns the backend chosen by an earlier call to fastest_verification_backend() for the
+# loaded_wallet and the same number of workers, or None if there wasn't one
+def remembered_verification_backend(workers):
+    if measured_backend and measured_backend[0] is loaded_wallet and measured_backend[1] == workers:
+        return measured_backend[2]
+    return None
+
+
+# Adjusts the chunksize used by password_generator() while a search is running so that each chunk
+# takes about target_seconds to verify. The time each chunk took to verify and the time the worker
+# spent idle before it are reported by return_verified_password_or_false_timed() and passed to
+# observing_results(); they're averaged over recent chunks, so the chunksize follows changes in
+# the verification speed. When the workers are often idle (when they're waiting for the main process
+# to produce passwords), the target time is increased so that there's less overhead per chunk. Near
+# the end of the search (if the total number of passwords is known), chunks are made smaller so that
+# the remaining passwords are evenly spread out among the workers. Only password_generator() changes
+# the size of chunks, so the passwords_tried counts (and therefore autosaves) remain exact.
+class ChunksizeController(object):
+
+    SMOOTHING    = 0.2  # the weight of the most recent chunk in the averages
+    MAX_GROWTH   = 16   # the chunksize is kept <= MAX_GROWTH times the initial chunksize
+    MAX_STEP     = 2.0  # the chunksize changes by no more than this factor after each chunk
+    IDLE_STRETCH = 3.0  # the target time is multiplied by up to 1 + IDLE_STRETCH when idle
+
+    def __init__(self, chunksize, workers, target_seconds, total_passwords = None):
+        assert chunksize > 0 and workers > 0 and target_seconds > 0.0
+        self.max_chunksize      = chunksize * self.MAX_GROWTH
+        self._chunksize         = chunksize
+        self._workers           = workers
+        self._target_seconds    = target_seconds
+        self._total_passwords   = total_passwords  # including any skipped passwords, or None if unknown
+        self._secs_per_password = None
+        self._idle_fraction     = 0.0
+
+    # Called if the total number of passwords becomes known after the search has started
+    def set_total_passwords(self, total_passwords):
+        self._total_passwords = total_passwords
+
+    # Called by password_generator() each time it produces a chunk with the total number
+    # of passwords produced so far (including skipped passwords); returns the next chunksize
+    def next_chunksize(self, passwords_produced):
+        chunksize = self._chunksize
+        if self._total_passwords is not None:
+            tail_chunksize = (self._total_passwords - passwords_produced) // (2 * self._workers)
+            if tail_chunksize < chunksize:
+                chunksize = tail_chunksize if tail_chunksize > 0 else 1
+        return chunksize
+
+    # Updates the chunksize given the results of verifying a chunk of passwords_count passwords
+    def observe(self, passwords_count, verify_seconds, idle_seconds):
+        if passwords_count <= 0 or verify_seconds <= 0.0:
+            return
+        secs_per_password = verify_seconds / passwords_count
+        if self._secs_per_password is None:
+            self._secs_per_password = secs_per_password
+        else:
+            self._secs_per_password += self.SMOOTHING * (secs_per_password - self._secs_per_password)
+        self._idle_fraction += self.SMOOTHING * (idle_seconds / (idle_seconds + verify_seconds) - self._idle_fraction)
+        #
+        target_seconds = self._target_seconds * (1.0 + self.IDLE_STRETCH * self._idle_fraction)
+        chunksize      = int(round(target_seconds / self._secs_per_password)) or 1
+        chunksize      = max(chunksize, int(self._chunksize / self.MAX_STEP) or 1)
+        chunksize      = min(chunksize, int(self._chunksize * self.MAX_STEP), self.max_chunksize)
+        self._chunksize = chunksize
+
+    # Produces the results from results_iterator (which are produced by return_verified_password_or_false_timed()),
+    # observing each and removing the added timing elements so they're the same as return_verified_password_or_false()'s
+    def observing_results(self, results_iterator):
+        for password_found, passwords_tried, verify_seconds, idle_seconds in results_iterator:
+            if not password_found:
+                self.observe(passwords_tried, verify_seconds, idle_seconds)
+            yield password_found, passwords_tried
+
+
+# Passes chunks of passwords from the main process to the worker processes in shared memory instead
+# of pickling them and sending them through a pipe. It's created before the worker processes are forked
+# (so it's not supported on Windows), and consists of a number of fixed-size slots of anonymous shared
+# memory, each of which holds a single chunk: the byte length of the data (as 4 little-endian bytes)
+# followed by the passwords (UTF-8 encoded if unicode), separated by NULs. The main process fills the
+# free slots via packed_chunks() (which blocks until one is available), and a slot is freed again after
+# the result for its chunk has been produced by releasing_results(). Chunks which don't fit in a slot,
+# which contain a NUL, or which contain something other than strings (e.g. seedrecover's mnemonic ids)
+# are passed as usual instead. If the wallet supports packed passwords (see PackedPasswordsWallet),
+# each slot instead holds the password count and the byte length of the data (as 4 little-endian
+# bytes each), the end offset of each password, and then the passwords already converted by the
+# wallet's encode_password (so NULs are permitted); the workers' results for these chunks are
+# the index of the correct password, which releasing_results() replaces with the password.
+class SharedPasswordSlots(object):
+
+    HEADER        = struct.Struct(b"<I")
+    PACKED_HEADER = struct.Struct(b"<II")
+
+    def __init__(self, slots_count, slot_size, wallet = None):
+        self._slot_size  = slot_size
+        self._slots      = [mmap.mmap(-1, slot_size) for i in xrange(slots_count)]
+        self._free_slots = Queue.Queue()
+        for slot_num in xrange(slots_count):
+            self._free_slots.put(slot_num)
+        self._used_slots = collections.deque()  # (slot number or None, packed chunk or None) in the order chunks were produced
+        self._closed     = False
+        self.packed      = hasattr(wallet, "return_verified_packed_index_or_none")
+        if self.packed:
+            self._encode_password = wallet.encode_password
+
+    # Produces either slot numbers or (if they couldn't be put into a slot) the
+    # original chunks of passwords, for each chunk produced by password_iterator
+    def packed_chunks(self, password_iterator):
+        return (self._encoded_chunks if self.packed else self._separated_chunks)(password_iterator)
+
+    # The passwords are NUL-separated (UTF-8 in the Unicode version)
+    def _separated_chunks(self, password_iterator):
+        max_data_len = self._slot_size - self.HEADER.size
+        separator    = tstr("\0")
+        for passwords in password_iterator:
+            slot_num = self._free_slots.get()
+            if self._closed:
+                return
+            data = None
+            if isinstance(passwords[0], tstr):
+                try:
+                    data = separator.join(passwords)
+                except TypeError: pass
+            if data is not None and data.count(separator) == len(passwords) - 1:
+                if tstr == unicode:
+                    data = data.encode("utf_8")
+                if len(data) <= max_data_len:
+                    slot = self._slots[slot_num]
+                    self.HEADER.pack_into(slot, 0, len(data))
+                    slot[self.HEADER.size : self.HEADER.size + len(data)] = data
+                    self._used_slots.append((slot_num, None))
+                    yield slot_num
+                    continue
+            self._free_slots.put(slot_num)
+            self._used_slots.append((None, None))
+            yield passwords
+
+    # The passwords are packed after being converted by the wallet's encode_password
+    def _encoded_chunks(self, password_iterator):
+        for passwords in password_iterator:
+            slot_num = self._free_slots.get()
+            if self._closed:
+                return
+            packed = None
+            if isinstance(passwords[0], tstr):
+                try:
+                    packed = pack_passwords(passwords, self._encode_password)
+                except (TypeError, AttributeError, UnicodeError): pass
+            if packed:
+                data, ends = packed
+                ends = ends.tostring()
+                data_start = self.PACKED_HEADER.size + len(ends)
+                if data_start + len(data) <= self._slot_size:
+                    slot = self._slots[slot_num]
+                    self.PACKED_HEADER.pack_into(slot, 0, len(passwords), len(data))
+                    slot[self.PACKED_HEADER.size : data_start] = ends
+                    slot[data_start : data_start + len(data)] = data
+                    self._used_slots.append((slot_num, passwords))
+                    yield slot_num
+                    continue
+            self._free_slots.put(slot_num)
+            self._used_slots.append((None, None))
+            yield passwords
+
+    # Called by a worker process to retrieve the list of passwords in a slot
+    def read(self, slot_num):
+        slot     = self._slots[slot_num]
+        data_end = self.HEADER.size + self.HEADER.unpack_from(slot, 0)[0]
+        data     = slot[self.HEADER.size : data_end]
+        if tstr == unicode:
+            data = data.decode("utf_8")
+        return data.split(tstr("\0"))
+
+    # Called by a worker process to retrieve the packed passwords in a slot,
+    # the arguments for the wallet's return_verified_packed_index_or_none()
+    def read_packed(self, slot_num):
+        slot = self._slots[slot_num]
+        passwords_count, data_len = self.PACKED_HEADER.unpack_from(slot, 0)
+        ends = array.array(b"I")  # (the same typecode used by pack_passwords() )
+        data_start = self.PACKED_HEADER.size + passwords_count * ends.itemsize
+        ends.fromstring(slot[self.PACKED_HEADER.size : data_start])
+        return slot[data_start : data_start + data_len], ends
+
+    # Produces the results from results_iterator (which must be in the same order as the chunks
+    # produced by packed_chunks() ), freeing the corresponding slot before producing each one
+    # (and replacing the index returned for a packed chunk with its correct password, if found)
+    def releasing_results(self, results_iterator):
+        for result in results_iterator:
+            slot_num, passwords = self._used_slots.popleft()
+            if slot_num is not None:
+                self._free_slots.put(slot_num)
+                if passwords is not None and result[0] is not False:
+                    result = (passwords[result[0]],) + result[1:]
+            yield result
+
+    # Stops packed_chunks() from producing any more chunks (even if it's waiting on a free slot)
+    def close(self):
+        self._closed = True
+        self._free_slots.put(None)
+
+# The number of bytes per password to allocate to each slot of the SharedPasswordSlots
+# (in main(), where the chunksize is known); chunks which need more are passed as usual
+SHARED_SLOT_BYTES_PER_PASSWORD = 64
+shared_password_slots = None
+
+# After a search finishes normally, main() keeps its (idle) worker processes along with the
+# SharedPasswordSlots, if any, that they were started with, so that the next call to main() with
+# the same wallet and number of workers (e.g. seedrecover.py calls it once per phase) can skip
+# starting new ones and sending the wallet to each again. The measured verification speed is
+# also remembered for the same reason.
+idle_worker_pool     = None  # a tuple: (pool, wallet, processes, shared_password_slots, pid_of_owner)
+measured_performance = None  # a tuple: (wallet, enable_gpu, est_secs_per_password)
+#
+# Returns a multiprocessing.Pool of processes which verify passwords using loaded_wallet, and
+# (if slots_count) sets shared_password_slots to a SharedPasswordSlots they can read from
+def open_worker_pool(processes, slots_count = None, slot_size = None):
+    global idle_worker_pool, shared_password_slots
+    if idle_worker_pool:
+        pool, wallet, pool_processes, slots, pid = idle_worker_pool
+        if pid == os.getpid() and wallet is loaded_wallet and pool_processes == processes \
+                and bool(slots) == bool(slots_count) \
+                and (not slots or len(slots._slots) >= slots_count and slots._slot_size >= slot_size):
+            idle_worker_pool      = None
+            shared_password_slots = slots
+            return pool
+        close_worker_pool()
+    # The slots must be created before the processes are (so that they're shared with them)
+    shared_password_slots = SharedPasswordSlots(slots_count, slot_size, loaded_wallet) if slots_count else None
+    return multiprocessing.Pool(processes, init_worker, (loaded_wallet,))
+#
+# Keeps a pool returned by open_worker_pool() whose workers are all idle for reuse
+def keep_worker_pool(pool):
+    global idle_worker_pool
+    close_worker_pool()
+    idle_worker_pool = pool, loaded_wallet, pool._processes, shared_password_slots, os.getpid()
+#
+# Stops the processes of a pool kept by keep_worker_pool(), if any
+def close_worker_pool():
+    global idle_worker_pool
+    if idle_worker_pool:
+        if idle_worker_pool[4] == os.getpid():  # (a child process doesn't own its parent's pool)
+            idle_worker_pool[0].terminate()
+        idle_worker_pool = None
+atexit.register(close_worker_pool)
 
 # Init function for the password verifying worker processes:
 #   (re-)loads the wallet (should only be necessary on Windows),
@@ -4479,7 +6515,14 @@ def init_worker(wallet):
     if not loaded_wallet:
         loaded_wallet = wallet
     set_process_priority_idle()
-    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    init_quiet_worker()
+#
+# Init function for other worker processes: begins ignoring SIGINTs, and restores the default
+# SIGTERM handler (if a previous call to main() changed it before this process was forked,
+# it would otherwise raise a KeyboardInterrupt when the process is terminated)
+def init_quiet_worker():
+    signal.signal(signal.SIGINT,  signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
 #
 def set_process_priority_idle():
     try:
@@ -4490,6 +6533,494 @@ def set_process_priority_idle():
             os.nice(19)
     except StandardError: pass
 
+# Target function for the worker processes used with --shard-generation: each generates and verifies its
+# own shard of the passwords (see password_generator()), and reports back to the main process the results
+# of verifying each chunk via results_queue. When finished, None is sent (or the exception if one occurs).
+def generate_and_verify_shard(shard_id, shards_total, chunksize, results_queue):
+    global generator_shard, passwordlist_file
+    generator_shard = shard_id, shards_total
+    set_process_priority_idle()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        # The file position is shared with the other processes, so each needs to open the file anew
+        if passwordlist_file and not passwordlist_allcached and args.passwordlist != b"__funccall":
+            passwordlist_file = open_or_use(args.passwordlist, "r")
+        for passwords in password_generator(chunksize):
+            password_found, passwords_tried = loaded_wallet.return_verified_password_or_false(passwords)
+            results_queue.put((password_found, passwords_tried))
+            if password_found: return
+    except BaseException as e:
+        results_queue.put(e)
+        return
+    results_queue.put(None)
+#
+# Produces the results sent by the generate_and_verify_shard() processes until either a password
+# is found or they've all finished, in the same format as return_verified_password_or_false().
+# If any of the shard_processes dies without sending its final result (e.g. if it runs out of
+# memory or crashes), exits with an error instead of waiting on it forever.
+SHARD_POLL_SECONDS = 1.0
+def shard_results_iterator(results_queue, shard_processes):
+    shards_finished = 0
+    maybe_died      = False
+    while shards_finished < len(shard_processes):
+        try:
+            result = results_queue.get(timeout=SHARD_POLL_SECONDS)
+        except Queue.Empty:
+            # A process which exits normally sends its final result first, so if more have exited
+            # than have finished (twice in a row, in case a final result was only just sent), one died
+            exited = [process for process in shard_processes if not process.is_alive()]
+            if len(exited) > shards_finished:
+                if maybe_died:
+                    exitcodes = set(process.exitcode for process in exited if process.exitcode)
+                    error_exit("a worker process exited unexpectedly" + (" (exit code {})".format(
+                        ", ".join(tstr(exitcode) for exitcode in sorted(exitcodes))) if exitcodes else ""))
+                maybe_died = True
+            continue
+        maybe_died = False
+        if result is None:
+            shards_finished += 1
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            yield result
+
+# With --coordinator, instead of searching, btcrecover hands out ranges of base password numbers on demand
+# to any number of --coordinated-by workers (possibly on other machines), each of which generates and
+# verifies just the passwords derived from the base passwords in each range it's given, and reports back
+# once it's done. Compared to --worker, where each server generates every password and discards those
+# which aren't its own, the work is divided as it's done, so faster workers end up with more of it.
+#
+# The protocol is one JSON object per line; each message from a worker receives exactly one reply:
+#   {"hello": true} -> {"challenge": hex_nonce}
+#   {"auth": hex_hmac_sha256_of_nonce_keyed_by_coordinator_secret} -> {"ok": true}
+#   {"request": true} -> {"range": [start, end]}, {"wait": seconds}, or {"done": true, "found": bool}
+#   {"completed": [start, end], "bases": count, "passwords": count, "seconds": float},
+#   {"found": base64_utf8_password}, or {"heartbeat": true} -> {"ok": true} or {"done": ...} as above
+# The first two messages authenticate the worker; a worker which fails to, or which sends anything
+# malformed, is disconnected (and its ranges are leased again). Nothing is encrypted, including a found
+# password, so on untrusted networks the connections should be tunneled (e.g. with ssh -L).
+#
+# Returns the (family, address) of a --coordinator or --coordinated-by ADDRESS, which is either
+# HOST:PORT (HOST defaults to 127.0.0.1) or the path of a Unix domain socket
+def coordinator_socket_address(address, passive = False):
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        family, socktype, proto, canonname, sockaddr = socket.getaddrinfo(host.strip("[]") or "127.0.0.1", int(port),
+            0, socket.SOCK_STREAM, 0, socket.AI_PASSIVE if passive else 0)[0]
+        return family, sockaddr
+    if not hasattr(socket, "AF_UNIX"):
+        raise ValueError("Unix domain sockets are not supported on this platform; use HOST:PORT")
+    return socket.AF_UNIX, address
+#
+# Returns the response to the coordinator's challenge nonce which proves that a worker knows the secret
+def coordinator_auth_response(challenge):
+    secret = args.coordinator_secret or b""
+    return hmac.new(secret.encode("utf_8") if tstr == unicode else secret, challenge, hashlib.sha256).hexdigest()
+#
+# Compares two strings in constant time (hmac.compare_digest requires Python 2.7.7+)
+def secrets_equal(a, b):
+    if hasattr(hmac, "compare_digest"):
+        return hmac.compare_digest(a, b)
+    if len(a) != len(b):
+        return False
+    return sum(ord(x) ^ ord(y) for x, y in zip(a, b)) == 0
+
+
+# Keeps track of which ranges of base password numbers have been leased to which workers, and which have been
+# completed, for --coordinator. Each worker's ranges are sized so that they take about RANGE_SECONDS each.
+# Ranges held by a worker which is released (it disconnected or stopped responding) are leased again, and
+# once every range has been leased, an idle worker is given a backup copy of the range which has been held
+# the longest, so that a slow or stalled worker doesn't hold up the end of the search.
+class CoordinatorSchedule(object):
+
+    INITIAL_RANGE_SIZE = 1
+    MAX_GROWTH         = 4     # the size of a worker's ranges grows by at most this factor each time
+    RANGE_SECONDS      = 60.0
+    MAX_BACKUPS        = 1     # the max number of backup copies leased of each range
+
+    # completed is a list of ranges from an earlier call to saved_state()
+    def __init__(self, completed = (), bases_total = None):
+        self.completed        = []           # a sorted list of disjoint (start, end) ranges which are finished
+        self.bases_total      = bases_total  # the total number of base passwords, once it's known
+        self.passwords_done   = 0            # the number of passwords in the completed ranges (in this session)
+        self.found            = None         # the password, once a worker has found it
+        self._leases          = collections.OrderedDict()  # (start, end) -> list of worker ids, oldest first
+        self._unleased        = []           # a sorted list of ranges which were leased before and must be again
+        self._next_range_size = {}           # worker id -> the size of its next range
+        for start, end in completed:
+            self._add_completed(start, end)
+        # Everything before the last completed range which isn't completed must be leased again
+        self._next_start = 0
+        for start, end in self.completed:
+            if start > self._next_start:
+                self._unleased.append((self._next_start, start))
+            self._next_start = end
+
+    # Returns everything needed to continue the search later, as the arguments to __init__()
+    def saved_state(self):
+        return list(self.completed), self.bases_total
+
+    def is_finished(self):
+        if self.found is not None or self.bases_total == 0:
+            return True
+        return self.bases_total is not None and bool(self.completed) and \
+               self.completed[0][0] == 0 and self.completed[0][1] >= self.bases_total
+
+    # Returns a new (start, end) range for the worker to search, None if the search is finished,
+    # or False if every range is either completed or already leased to this worker (so it should wait)
+    def lease(self, worker):
+        if self.is_finished():
+            return None
+        if self._unleased:
+            lease = self._unleased.pop(0)
+        elif self.bases_total is None or self._next_start < self.bases_total:
+            size  = self._next_range_size.setdefault(worker, self.INITIAL_RANGE_SIZE)
+            lease = self._next_start, self._next_start + size
+            self._next_start += size
+        else:
+            # Every range has been leased, so give the idle worker a backup copy of the one held the longest
+            for lease, workers in self._leases.iteritems():
+                if worker not in workers and len(workers) <= self.MAX_BACKUPS:
+                    workers.append(worker)
+                    return lease
+            return False
+        self._leases[lease] = [worker]
+        return lease
+
+    # Records that the worker finished searching the range, which contained bases_count base passwords
+    # (fewer than the range's length if it extended past the end) and passwords_count passwords;
+    # raises ValueError if the range was never leased
+    def complete(self, worker, lease, bases_count, passwords_count, seconds):
+        start, end = lease
+        if lease not in self._leases and lease not in self._unleased and not self._is_completed(start, end):
+            raise ValueError("range {} was never leased".format(lease))
+        self._leases.pop(lease, None)
+        if self._is_completed(start, end):
+            return  # the work was duplicated (e.g. a backup copy finished after the original)
+        if lease in self._unleased:
+            self._unleased.remove(lease)  # (the worker was released, but then finished anyway)
+        self._add_completed(start, end)
+        self.passwords_done += passwords_count
+        if bases_count < end - start:
+            # The end of the base passwords has been found; forget about any ranges which are past it
+            if self.bases_total is None or start + bases_count < self.bases_total:
+                self.bases_total = start + bases_count
+            for past_end in [past_end for past_end in self._leases if past_end[0] >= self.bases_total]:
+                del self._leases[past_end]
+            self._unleased = [unleased for unleased in self._unleased if unleased[0] < self.bases_total]
+        # Adjust the size of this worker's future ranges so that they take about RANGE_SECONDS each
+        size = end - start
+        self._next_range_size[worker] = max(1, min(int(size * self.RANGE_SECONDS / max(seconds, 0.001)),
+                                                   size * self.MAX_GROWTH))
+
+    # Forgets about the worker, leasing all of the ranges it held (and that no one else holds) again
+    def release(self, worker):
+        for lease, workers in self._leases.items():
+            if worker in workers:
+                workers.remove(worker)
+                if not workers:
+                    del self._leases[lease]
+                    bisect.insort(self._unleased, lease)
+        self._next_range_size.pop(worker, None)
+
+    def _is_completed(self, start, end):
+        i = bisect.bisect_right(self.completed, (start, sys.maxint)) - 1
+        return i >= 0 and self.completed[i][1] >= end
+
+    def _add_completed(self, start, end):
+        bisect.insort(self.completed, (start, end))
+        merged = []
+        for start, end in self.completed:
+            if merged and start <= merged[-1][1]:
+                merged[-1] = merged[-1][0], max(end, merged[-1][1])
+            else:
+                merged.append((start, end))
+        self.completed = merged
+
+
+# Serves a CoordinatorSchedule to the workers at args.coordinator until the search is finished, and
+# returns in the same format as main(). Progress and autosaves are kept here instead of in the workers.
+def run_coordinator():
+    LEASE_TIMEOUT  = 120.0  # seconds without hearing from a worker before releasing it
+    DONE_LINGER    = 30.0   # seconds to wait for the workers to be told the search is finished
+    AUTOSAVE_EVERY = 300.0
+    MAX_LINE       = 65536  # the max length of a message from a worker
+    SEND_TIMEOUT   = 5.0    # seconds to wait for a worker to read its replies before disconnecting it
+
+    if savestate and b"coordinator" in savestate:
+        schedule = CoordinatorSchedule(*savestate[b"coordinator"])
+    else:
+        schedule = CoordinatorSchedule()
+
+    family, sockaddr = coordinator_socket_address(args.coordinator, passive=True)
+    listener = socket.socket(family, socket.SOCK_STREAM)
+    if family != getattr(socket, "AF_UNIX", None):
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        listener.bind(sockaddr)
+    except socket.error as e:
+        error_exit("can't listen at --coordinator", args.coordinator+":", e)
+    listener.listen(16)
+    print("Coordinating the search for workers at", args.coordinator)
+
+    if have_progress:
+        progress = progressbar.ProgressBar(maxval=sys.maxint, widgets=[
+            progressbar.AnimatedMarker(),
+            progressbar.FormatLabel(b" %(value)d  elapsed: %(elapsed)s  rate: "),
+            progressbar.FileTransferSpeed(unit="P")
+        ])
+        progress.start()
+    else:
+        progress = None
+    if savestate:
+        do_autosave(args.skip)
+        next_autosave = time.time() + AUTOSAVE_EVERY
+
+    # Each connection has a worker id, its partially received line, the time it was last heard from,
+    # and its challenge nonce until it's authenticated (after which this is None)
+    workers   = {}  # socket -> [worker_id, buffer, last_heard, challenge]
+    worker_id = 0
+    done_at   = None
+    #
+    # Disconnects from the worker, leasing any ranges it held to others
+    def drop_worker(sock):
+        schedule.release(workers[sock][0])
+        del workers[sock]
+        sock.close()
+    try:
+        while True:
+            if schedule.is_finished():
+                if done_at is None:
+                    done_at = time.time()
+                if not workers or time.time() - done_at > DONE_LINGER:
+                    break
+            readable = select.select([listener] + workers.keys(), [], [], 1.0)[0]
+            now = time.time()
+            for sock in readable:
+                if sock is listener:
+                    worker_id += 1
+                    worker_sock = listener.accept()[0]
+                    worker_sock.settimeout(SEND_TIMEOUT)  # (recv() doesn't wait, it's only called once readable)
+                    workers[worker_sock] = [worker_id, b"", now, os.urandom(32)]
+                    continue
+                worker = workers[sock]
+                try:
+                    data = sock.recv(65536)
+                except socket.error:
+                    data = None
+                if not data:  # the connection was closed
+                    drop_worker(sock)
+                    continue
+                worker[2] = now
+                lines = (worker[1] + data).split(b"\n")
+                worker[1] = lines.pop()
+                try:
+                    if len(worker[1]) > MAX_LINE:
+                        raise ValueError("message too long")
+                    for line in lines:
+                        message = json.loads(line)
+                        if not isinstance(message, dict):
+                            raise TypeError("message isn't an object")
+                        if worker[3] is not None:  # if the worker hasn't yet been authenticated
+                            if "hello" in message:
+                                reply = {"challenge": base64.b16encode(worker[3])}
+                            elif not secrets_equal(bytes(message["auth"]), coordinator_auth_response(worker[3])):
+                                raise ValueError("wrong --coordinator-secret")
+                            else:
+                                reply = {"ok": True}
+                                worker[3] = None
+                        else:
+                            reply = coordinator_reply(schedule, worker[0], message)
+                        try:
+                            sock.sendall(json.dumps(reply) + b"\n")
+                        except socket.timeout:
+                            # (a worker which doesn't read its replies would otherwise hold up all the others)
+                            print(prog+": warning: disconnecting a worker which stopped reading its replies", file=sys.stderr)
+                            drop_worker(sock)
+                            break
+                        except socket.error:
+                            pass  # the closed connection is noticed by the next recv()
+                except (ValueError, KeyError, TypeError) as e:
+                    print(prog+": warning: disconnecting a worker which sent an invalid message:", e, file=sys.stderr)
+                    drop_worker(sock)
+            # Release any workers that haven't been heard from in too long (they've probably failed)
+            for sock, worker in workers.items():
+                if now - worker[2] > LEASE_TIMEOUT:
+                    print(prog+": warning: releasing a worker which stopped responding", file=sys.stderr)
+                    drop_worker(sock)
+            if progress:
+                progress.update(args.skip + schedule.passwords_done)
+            if savestate and now >= next_autosave:
+                savestate[b"coordinator"] = schedule.saved_state()
+                do_autosave(args.skip + schedule.passwords_done)
+                next_autosave = now + AUTOSAVE_EVERY
+        if progress:
+            progress.maxval = args.skip + schedule.passwords_done
+            progress.finish()
+
+    except BaseException as e:
+        print("\nInterrupted after finishing password #", args.skip + schedule.passwords_done, file=sys.stderr)
+        if not isinstance(e, KeyboardInterrupt): raise
+        schedule.found = False  # neither a password nor None -- unknown
+
+    finally:
+        for sock in workers:
+            sock.close()
+        listener.close()
+        if family == getattr(socket, "AF_UNIX", None):
+            os.remove(sockaddr)
+        if savestate:
+            savestate[b"coordinator"] = schedule.saved_state()
+            do_autosave(args.skip + schedule.passwords_done)
+            autosave_file.close()
+
+    if schedule.found is False:
+        return None, None
+    return schedule.found or False, "Password search exhausted" if schedule.found is None else None
+#
+# Handles one message from an authenticated worker (see above), returning the reply; raises
+# ValueError, KeyError, or TypeError if the message is malformed (without changing the schedule)
+def coordinator_reply(schedule, worker_id, message):
+    if "request" in message:
+        lease = schedule.lease(worker_id)
+        if lease:
+            return {"range": lease}
+        if lease is False:
+            return {"wait": 1.0}
+    elif "completed" in message:
+        start, end = message["completed"]
+        counts     = start, end, message["bases"], message["passwords"]
+        if not all(isinstance(count, (int, long)) and not isinstance(count, bool) for count in counts) or \
+           not isinstance(message["seconds"], (int, long, float)) or \
+           not 0 <= start < end or not 0 <= message["bases"] <= end - start or message["passwords"] < 0:
+            raise ValueError("invalid completed range")
+        schedule.complete(worker_id, (start, end), message["bases"], message["passwords"], message["seconds"])
+    elif "found" in message:
+        password = base64.b64decode(message["found"])
+        schedule.found = password.decode("utf_8") if tstr == unicode else password
+    if schedule.is_finished():
+        return {"done": True, "found": schedule.found is not None}
+    return {"ok": True}
+
+
+# Used with --coordinated-by to search the ranges of base passwords leased from a --coordinator (see above):
+# chunks() replaces password_generator(), and observing_results() reports back to the coordinator as each
+# range is finished (once all of its chunks have been verified, which happens in the order they're produced)
+class CoordinatedWork(object):
+
+    HEARTBEAT_SECONDS = 5.0  # (must be well below run_coordinator()'s LEASE_TIMEOUT)
+    MAX_RANGES_AHEAD  = 2    # the max number of ranges which can be produced but not yet verified
+
+    def __init__(self, address):
+        family, sockaddr = coordinator_socket_address(address)
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.connect(sockaddr)
+        self._reader = self._socket.makefile("rb")
+        self._lock   = threading.RLock()      # chunks() may be run by the worker pool's task handler thread
+        self._pending         = collections.deque()  # for each chunk produced, None, and after each range, its report
+        self._last_message_at = time.time()
+        self.done             = False  # set once the coordinator says the search is finished
+        self.found_elsewhere  = False  # set if that's because some other worker found the password
+        self._base_passwords  = None   # an iterator of all the base passwords, continued by each range
+        self._bases_position  = 0      # the number of base passwords taken from it so far
+        #
+        challenge = base64.b16decode(self._call(hello=True)["challenge"])
+        try:
+            self._call(auth=coordinator_auth_response(challenge))
+        except IOError:
+            raise IOError("the --coordinator rejected this worker's --coordinator-secret")
+
+    def _call(self, **message):
+        with self._lock:
+            self._socket.sendall(json.dumps(message) + b"\n")
+            line = self._reader.readline()
+            self._last_message_at = time.time()
+        if not line:
+            raise IOError("the --coordinator closed the connection")
+        reply = json.loads(line)
+        if reply.get("done"):
+            self.done            = True
+            self.found_elsewhere = reply["found"]
+        return reply
+
+    # Reports the ranges all of whose chunks have been verified
+    def _report_completed(self):
+        with self._lock:
+            while self._pending and self._pending[0] is not None:
+                lease, bases_count, passwords_count, seconds = self._pending.popleft()
+                self._call(completed=lease, bases=bases_count, passwords=passwords_count, seconds=seconds)
+
+    # Produces the chunks of passwords (like password_generator()) of each range leased from the coordinator
+    def chunks(self, chunksize):
+        global base_password_generator, token_combination_dups
+        all_base_passwords = base_password_generator
+        try:
+            while not self.done:
+                self._report_completed()
+                if sum(report is not None for report in self._pending) >= self.MAX_RANGES_AHEAD:
+                    time.sleep(0.01)  # wait for the worker processes to catch up
+                    continue
+                reply = self._call(request=True)
+                if "wait" in reply:
+                    time.sleep(reply["wait"])
+                    continue
+                if "range" not in reply:
+                    break
+                start, end = reply["range"]
+                started_at = time.time()
+                #
+                # password_generator() is limited to the range's base passwords, counting them as they're produced;
+                # they're taken from where the last range left off, unless this one starts before that point
+                range_bases_count = [0]
+                def range_base_password_generator():
+                    if self._base_passwords is None or start < self._bases_position:
+                        if passwordlist_file and passwordlist_file != sys.stdin:
+                            passwordlist_file.seek(0)
+                        self._base_passwords = self._counting(all_base_passwords() if callable(all_base_passwords)
+                                                              else all_base_passwords)
+                        self._bases_position = 0
+                    for password_base in itertools.islice(self._base_passwords,
+                                                          start - self._bases_position, end - self._bases_position):
+                        range_bases_count[0] += 1
+                        yield password_base
+                base_password_generator = range_base_password_generator
+                token_combination_dups  = None  # (each range starts a new run of duplicate checking)
+                #
+                passwords_count = 0
+                for passwords in password_generator(chunksize):
+                    self._pending.append(None)
+                    passwords_count += len(passwords)
+                    yield passwords
+                    if self.done: break
+                else:
+                    self._pending.append([(start, end), range_bases_count[0], passwords_count, time.time() - started_at])
+        finally:
+            base_password_generator = all_base_passwords
+    #
+    # Passes through the base passwords, keeping track of how many have been taken
+    def _counting(self, base_passwords):
+        for password_base in base_passwords:
+            self._bases_position += 1
+            yield password_base
+
+    # Passes through the results of verifying the chunks produced by chunks(), reporting back to the coordinator
+    def observing_results(self, results):
+        for password_found, passwords_tried in results:
+            with self._lock:
+                self._report_completed()
+                self._pending.popleft()
+            if password_found:
+                self._call(found=base64.b64encode(password_found.encode("utf_8") if tstr == unicode else password_found))
+            elif time.time() - self._last_message_at > self.HEARTBEAT_SECONDS:
+                self._call(heartbeat=True)
+            yield password_found, passwords_tried
+        self._report_completed()
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+
 # If an out-of-memory error occurs which can be handled, free up some memory, display
 # an informative error message, and then return True, otherwise return False.
 # Generally a call to handle_oom() should be followed by a sys.exit(1)
@@ -4512,6 +7043,60 @@ def handle_oom():
     return False
 
 
+# Once the passwords have been counted, the duplicate checkers have finished their first run (which is
+# what makes counting slow), and all they need for the second+ runs can be saved to a file beside the
+# autosave file. A restored session which finds a matching duplicate cache file can skip the counting.
+DUPS_CACHE_SUFFIX   = b".dups"
+dups_cache_filename = None  # initialized in parse_arguments()
+
+# Returns the parts of the savestate which identify the generated passwords (and not the search progress),
+# which includes the hashes of the typos map, the exclude list, the key, and the tokenlist
+def dups_cache_key():
+    return dict((k, v) for k, v in savestate.iteritems() if k not in (b"skip", b"position"))
+
+# Saves the duplicate checkers that have finished their first run to the duplicate cache file
+def save_dups_cache():
+    assert dups_cache_filename and savestate, "save_dups_cache: autosave is enabled"
+    saved_checkers = dict()
+    if password_dups and password_dups._run_number > 0:
+        saved_checkers[b"password_dups"] = password_dups.saved_duplicates()
+    if token_combination_dups and token_combination_dups._run_number > 0:
+        saved_checkers[b"token_combination_dups"] = token_combination_dups.saved_duplicates()
+    if not saved_checkers:
+        return
+    try:
+        with open(dups_cache_filename, "wb") as dups_cache_file:
+            dups_cache_file.write(zlib.compress(cPickle.dumps(
+                (dups_cache_key(), saved_checkers), cPickle.HIGHEST_PROTOCOL), 1))
+    except StandardError as e:
+        print(prog+": warning: can't save duplicate cache file '"+tstr(dups_cache_filename)+"':", e, file=sys.stderr)
+
+# Loads the duplicate checkers from the duplicate cache file, returning True if they're
+# usable (and False if the file doesn't exist, is damaged, or is from a different search)
+def load_dups_cache():
+    global password_dups, token_combination_dups
+    assert dups_cache_filename and savestate, "load_dups_cache: autosave is enabled"
+    if not os.path.isfile(dups_cache_filename):
+        return False
+    try:
+        with open(dups_cache_filename, "rb") as dups_cache_file:
+            dups_cache_key_loaded, saved_checkers = cPickle.loads(zlib.decompress(dups_cache_file.read()))
+    except StandardError as e:
+        print(prog+": warning: ignoring invalid duplicate cache file '"+tstr(dups_cache_filename)+"':", e, file=sys.stderr)
+        return False
+    if dups_cache_key_loaded != dups_cache_key():
+        print(prog+": warning: ignoring duplicate cache file '"+tstr(dups_cache_filename)+"' from a different search", file=sys.stderr)
+        return False
+    if b"password_dups" in saved_checkers:
+        password_dups = new_duplicate_checker()
+        password_dups.load_duplicates(saved_checkers[b"password_dups"])
+    if b"token_combination_dups" in saved_checkers:
+        token_combination_dups = new_duplicate_checker()
+        token_combination_dups.load_duplicates(saved_checkers[b"token_combination_dups"])
+    print("Using duplicate cache file '"+tstr(dups_cache_filename)+"'")
+    return True
+
+
 # Saves progress by overwriting the older (of two) slots in the autosave file
 # (autosave_nextslot is initialized in load_savestate() or parse_arguments() )
 def do_autosave(skip, inside_interrupt_handler = False):
@@ -4540,6 +7125,17 @@ def do_autosave(skip, inside_interrupt_handler = False):
         try:   os.fsync(autosave_file.fileno())
         except StandardError: pass
     savestate[b"skip"] = skip  # overwrite the one item which changes for each autosave
+    # If available, also save the password position of the base password which contains
+    # the skip'th password (discarding those which precede it, they're no longer needed)
+    if password_positions:
+        while len(password_positions) > 1 and password_positions[1][0] <= skip:
+            password_positions.popleft()
+        if password_positions[0][0] <= skip:
+            savestate[b"position"] = password_positions[0][1]
+        else:
+            savestate.pop(b"position", None)
+    else:
+        savestate.pop(b"position", None)
     cPickle.dump(savestate, autosave_file, cPickle.HIGHEST_PROTOCOL)
     assert autosave_file.tell() <= start_pos + SAVESLOT_SIZE, "do_autosave: data <= "+tstr(SAVESLOT_SIZE)+" bytes long"
     autosave_file.flush()
@@ -4556,10 +7152,115 @@ def do_autosave(skip, inside_interrupt_handler = False):
 # Given an est_secs_per_password, counts the *total* number of passwords generated by password_generator()
 # (including those skipped by args.skip), and returns the result, checking the --max-eta constraint along
 # the way (and exiting if it's violated). Displays messages to the user if the process is taking a while.
+# The count is first calculated analytically if possible; if this produces an exact count, it's returned
+# without generating all the passwords, otherwise it's an upper bound which is only used to check the
+# --max-eta constraint early, and then the passwords are counted by generating them as usual.
 def count_and_check_eta(est):
     assert est > 0.0, "count_and_check_eta: est_secs_per_password > 0.0"
+    max_seconds = args.max_eta * 3600  # max_eta is in hours
+
+    analytic_count = count_passwords_analytically()
+    if analytic_count:
+        passwords_count, is_exact = analytic_count
+        if is_exact:
+            if (passwords_count - args.skip) * est > max_seconds:
+                error_exit("at least {:,} passwords to try, ETA > --max-eta option ({} hours), exiting" \
+                    .format(passwords_count - args.skip, args.max_eta))
+            return passwords_count
+        #
+        # An upper bound that's within the --max-eta limit is all that's needed to satisfy it
+        if (passwords_count - args.skip) * est <= max_seconds and sys.stderr.isatty():
+            print("At most {:,} passwords to try (an upper bound before removing duplicates)".format(passwords_count),
+                  file=sys.stderr)
+
+    if can_count_in_parallel():
+        return count_passwords_in_parallel(est)
     return password_generator_factory(est_secs_per_password = est)[1]
 
+# Instead of counting all the passwords, estimates the count (see --eta-sample) by calling
+# estimate_passwords_count(), displays the estimate, and exits if the --max-eta constraint is
+# violated with 95% confidence. Returns None, or the exact count if it can be calculated quickly
+# (analytically), or if the base passwords can't be generated more than once (e.g. if they're
+# from an iterator) in which case the passwords are counted as usual by count_and_check_eta().
+def estimate_count_and_check_eta(est_secs_per_password):
+    assert est_secs_per_password > 0.0, "estimate_count_and_check_eta: est_secs_per_password > 0.0"
+    max_seconds = args.max_eta * 3600  # max_eta is in hours
+
+    analytic_count = count_passwords_analytically()
+    if analytic_count and analytic_count[1]:  # if it's exact
+        return count_and_check_eta(est_secs_per_password)
+    if not callable(base_password_generator) and iter(base_password_generator) is base_password_generator:
+        return count_and_check_eta(est_secs_per_password)
+
+    estimate, lower_bound, upper_bound, sample_size, base_passwords_count = estimate_passwords_count(args.eta_sample)
+    print("Estimated {:,} passwords (95% confidence interval {:,} to {:,}) from a sample of {:,} of {:,} base passwords"
+          .format(estimate, lower_bound, upper_bound, sample_size, base_passwords_count))
+    if (lower_bound - args.skip) * est_secs_per_password > max_seconds:
+        error_exit("at least {:,} passwords to try (with 95% confidence), ETA > --max-eta option ({} hours), exiting"
+                   .format(lower_bound - args.skip, args.max_eta))
+    if (upper_bound - args.skip) * est_secs_per_password > max_seconds:
+        print(prog+": warning: the ETA may be greater than the --max-eta option ({} hours)".format(args.max_eta), file=sys.stderr)
+    return None
+
+# Estimates the total number of passwords (including skipped ones) from a simple random sample of
+# sample_size base passwords: all the base passwords are generated (usually much faster than generating
+# all of their modifications), and the passwords produced from each of those sampled are counted.
+# Returns a tuple: (estimate, lower_bound, upper_bound, sample_size, base_passwords_count), where
+# the bounds are those of the 95% confidence interval, and sample_size <= the requested sample_size.
+#
+# Because duplicates produced from base passwords which weren't sampled can't be detected, the
+# estimate is biased upwards when duplicates are being removed (if every base password is sampled,
+# the estimate is exact). The base passwords must be re-iterable (not from an iterator).
+def estimate_passwords_count(sample_size):
+    global password_dups, base_password_generator
+    assert sample_size > 1, "estimate_passwords_count: sample_size > 1"
+
+    # Choose the sample of base passwords via reservoir sampling
+    sample      = []
+    base_passwords_count = 0
+    for base_passwords_count, password_base in enumerate(
+            base_password_generator() if callable(base_password_generator) else base_password_generator, 1):
+        if base_passwords_count <= sample_size:
+            sample.append(password_base)
+        else:
+            i = random.randrange(base_passwords_count)
+            if i < sample_size:
+                sample[i] = password_base
+    sample_size = len(sample)
+
+    # Generate the passwords of each sampled base password, and count them separately; password_generator()
+    # only advances to the next base password after it's produced all the passwords from the previous one
+    sample_counts = [0] * sample_size
+    sample_num    = [None]
+    def sample_base_password_generator():
+        for sample_num[0], password_base in enumerate(sample):
+            yield password_base
+    saved_globals = password_dups, base_password_generator
+    try:
+        if password_dups:  # if it's only being used for --exclude-passwordlist
+            password_dups = ExcludingDuplicateChecker(password_dups)
+            if args.no_dupchecks:
+                password_dups.disable_duplicate_tracking()
+        base_password_generator = sample_base_password_generator
+        for passwords_count in password_generator(1, only_yield_count=True):
+            sample_counts[sample_num[0]] += passwords_count
+    finally:
+        password_dups, base_password_generator = saved_globals
+
+    # Calculate the estimate and the half-width of its 95% confidence interval (the t distribution's
+    # critical value is approximated by 1.96, and the finite population correction is applied)
+    sample_mean = math.fsum(sample_counts) / sample_size if sample_size else 0.0
+    if sample_size > 1:
+        sample_variance = math.fsum((c - sample_mean) ** 2 for c in sample_counts) / (sample_size - 1)
+        standard_error  = base_passwords_count * math.sqrt(
+            sample_variance / sample_size * (1.0 - sample_size / base_passwords_count))
+    else:
+        standard_error  = 0.0
+    estimate    = int(round(base_passwords_count * sample_mean))
+    lower_bound = max(int(base_passwords_count * sample_mean - 1.96 * standard_error), 0)
+    upper_bound = int(math.ceil(base_passwords_count * sample_mean + 1.96 * standard_error))
+    return estimate, lower_bound, upper_bound, sample_size, base_passwords_count
+
 # Creates a password iterator from the chosen password_generator() and advances it past skipped passwords (as
 # per args.skip), returning a tuple: new_iterator, #_of_passwords_skipped. Displays messages to the user if the
 # process is taking a while. (Or does the work of count_and_check_eta() when passed est_secs_per_password.)
@@ -4574,9 +7275,11 @@ def password_generator_factory(chunksize = 1, est_secs_per_password = 0):
         # The simple case where there's nothing to skip, just return an unmodified password_generator()
         if args.skip <= 0:
             return password_generator(chunksize), 0
-        # The still fairly simple case where there's not much to skip, just skip it all at once
-        elif args.skip <= PASSWORDS_BETWEEN_UPDATES:
-            passwords_count_iterator = password_generator(args.skip, only_yield_count=True)
+        # The still fairly simple case where there's not much to skip, or where the passwords
+        # can be skipped without generating them (see password_seek_target()), skip it all at once
+        seek = password_seek_target()
+        if seek or args.skip <= PASSWORDS_BETWEEN_UPDATES:
+            passwords_count_iterator = password_generator(args.skip, only_yield_count=True, seek=seek)
             passwords_counted = 0
             try:
                 # Skip it all in a single iteration (or raise StopIteration if it's empty)
@@ -4596,7 +7299,6 @@ def password_generator_factory(chunksize = 1, est_secs_per_password = 0):
         # Iterate though the password counts in increments of size PASSWORDS_BETWEEN_UPDATES
         for passwords_counted_last in passwords_count_iterator:
             passwords_counted += passwords_counted_last
-            unskipped_passwords_counted = passwords_counted - args.skip
 
             # If it's taking a while, and if we're not almost done, display/update the on-screen message
 
@@ -4606,32 +7308,10 @@ def password_generator_factory(chunksize = 1, est_secs_per_password = 0):
                 is_displayed = True
 
             if is_displayed:
-                # If ETAs were requested, calculate and possibly display one
-                if est_secs_per_password:
-                    # Only display an ETA once unskipped passwords are being counted
-                    if unskipped_passwords_counted > 0:
-                        eta = unskipped_passwords_counted * est_secs_per_password / 60
-                        if eta < 90:     eta = tstr(int(eta)+1) + " minutes"  # round up
-                        else:
-                            eta /= 60
-                            if eta < 48: eta = tstr(int(round(eta))) + " hours"
-                            else:        eta = tstr(round(eta / 24, 1)) + " days"
-                        msg = "\r  {:,}".format(passwords_counted)
-                        if args.skip: msg += " (includes {:,} skipped)".format(args.skip)
-                        msg += "  ETA: " + eta + " and counting   "
-                        print(msg, end="", file=sys.stderr)
-                    # Else just indicate that all the passwords counted so far are skipped
-                    else:
-                        print("\r  {:,} (all skipped)".format(passwords_counted), end="", file=sys.stderr)
-                #
-                # Else no ETAs were requested, just display the count ("Skipping passwords ..." was already printed)
-                else:
-                    print("\r  {:,}".format(passwords_counted), end="", file=sys.stderr)
+                print_counting_progress(passwords_counted, est_secs_per_password)
 
             # If the ETA is past its max permitted limit, exit
-            if unskipped_passwords_counted * est_secs_per_password > max_seconds:
-                error_exit("\rat least {:,} passwords to try, ETA > --max-eta option ({} hours), exiting" \
-                    .format(passwords_counted - args.skip, args.max_eta))
+            check_counting_eta(passwords_counted, est_secs_per_password, max_seconds)
 
             # If not counting all the passwords, then break out of this loop before it's gone past args.skip
             # (actually it must leave at least one password left to count before the args.skip limit)
@@ -4670,6 +7350,281 @@ def password_generator_factory(chunksize = 1, est_secs_per_password = 0):
         raise
 
 
+# Displays (on the same line) the number of passwords counted so far, and if est_secs_per_password
+# is non-zero an ETA also (this is used while either counting or skipping passwords)
+def print_counting_progress(passwords_counted, est_secs_per_password):
+    # If ETAs were requested, calculate and possibly display one
+    if est_secs_per_password:
+        unskipped_passwords_counted = passwords_counted - args.skip
+        # Only display an ETA once unskipped passwords are being counted
+        if unskipped_passwords_counted > 0:
+            eta = unskipped_passwords_counted * est_secs_per_password / 60
+            if eta < 90:     eta = tstr(int(eta)+1) + " minutes"  # round up
+            else:
+                eta /= 60
+                if eta < 48: eta = tstr(int(round(eta))) + " hours"
+                else:        eta = tstr(round(eta / 24, 1)) + " days"
+            msg = "\r  {:,}".format(passwords_counted)
+            if args.skip: msg += " (includes {:,} skipped)".format(args.skip)
+            msg += "  ETA: " + eta + " and counting   "
+            print(msg, end="", file=sys.stderr)
+        # Else just indicate that all the passwords counted so far are skipped
+        else:
+            print("\r  {:,} (all skipped)".format(passwords_counted), end="", file=sys.stderr)
+    #
+    # Else no ETAs were requested, just display the count ("Skipping passwords ..." was already printed)
+    else:
+        print("\r  {:,}".format(passwords_counted), end="", file=sys.stderr)
+
+# If there are at least passwords_counted passwords (including skipped ones), and the
+# ETA to try them is past the --max-eta option's limit (max_seconds), exits
+def check_counting_eta(passwords_counted, est_secs_per_password, max_seconds):
+    if (passwords_counted - args.skip) * est_secs_per_password > max_seconds:
+        error_exit("\rat least {:,} passwords to try, ETA > --max-eta option ({} hours), exiting" \
+            .format(passwords_counted - args.skip, args.max_eta))
+
+
+# Returns True if counting the passwords can be split up between --threads worker processes by
+# count_passwords_in_parallel() (some of the same restrictions as --shard-generation apply, and
+# this can't be done in a BackgroundPasswordCounter because daemonic processes can't have children)
+def can_count_in_parallel():
+    return args.threads > 1 and sys.platform != "win32" and not (args.worker and not args.worker_bases or args.enable_gpu) \
+        and not (passwordlist_file == sys.stdin and not passwordlist_allcached) \
+        and not multiprocessing.current_process().daemon
+
+# Counts the passwords by calling count_and_check_eta() in a separate process, so that the search can begin
+# right away (see --background-count). The search checks finished() after each chunk, and once it's True,
+# gets the count from result(). If the --max-eta constraint is violated, result() exits with its error.
+class BackgroundPasswordCounter(object):
+
+    def __init__(self, est_secs_per_password):
+        self._results_queue = multiprocessing.Queue()
+        self._result        = None
+        self._process       = multiprocessing.Process(target=count_in_background,
+                                                      args=(est_secs_per_password, self._results_queue))
+        self._process.daemon = True
+        self._process.start()
+
+    def finished(self):
+        if self._result is None:
+            try:
+                self._result = self._results_queue.get_nowait()
+            except Queue.Empty:
+                return False
+        return True
+
+    # Returns the total number of passwords (including skipped ones)
+    def result(self):
+        assert self.finished(), "BackgroundPasswordCounter.result: finished counting"
+        if isinstance(self._result, BaseException):
+            raise self._result
+        return self._result
+
+    def close(self):
+        if self._process.is_alive():
+            self._process.terminate()
+#
+# Target function for the BackgroundPasswordCounter process: sends the count (or the exception) via results_queue
+def count_in_background(est_secs_per_password, results_queue):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sys.stderr = open(os.devnull, "w")  # don't display messages over the progress bar
+    try:
+        results_queue.put(count_and_check_eta(est_secs_per_password))
+    except BaseException as e:  # (this includes SystemExit if --max-eta is violated)
+        results_queue.put(e)
+
+# Counts the passwords in the same way as password_generator_factory(est_secs_per_password=...), except that
+# they're divided into args.threads shards which are counted by worker processes (see count_shard()). Because
+# the duplicate checkers of the shards can't detect duplicates in different shards, if duplicates are being
+# removed (without --no-dupchecks) each shard also saves the passwords it produces in temporary files, one per
+# bucket (chosen by the password's hash, so every copy of a password is in the same bucket), and then a second
+# set of worker processes counts the unique passwords in each bucket (see count_bucket()). Finally the duplicates
+# found by all of them finish the first run of this process's duplicate checkers (as though they had counted the
+# passwords themselves), so that the search (their second run) skips the duplicates, and they can be cached.
+def count_passwords_in_parallel(est_secs_per_password):
+    global password_dups, token_combination_dups
+    assert est_secs_per_password > 0.0, "count_passwords_in_parallel: est_secs_per_password > 0.0"
+    shards_total      = args.threads
+    max_seconds       = args.max_eta * 3600  # max_eta is in hours
+    sys_stderr_isatty = sys.stderr.isatty()
+    start             = time.time() if sys_stderr_isatty else None  # (wall time, this process mostly waits)
+    buckets_dir       = tempfile.mkdtemp(prefix="btcr-count-") if args.no_dupchecks < 1 else None
+    results_queue     = multiprocessing.Queue()
+    shard_processes   = [multiprocessing.Process(target=count_shard,
+                             args=(shard_id, shards_total, results_queue, buckets_dir))
+                         for shard_id in xrange(shards_total)]
+    passwords_counted = 0
+    is_displayed      = False
+    password_duplicates, token_duplicates = [], None
+    pool = None
+    try:
+        for process in shard_processes:
+            process.daemon = True
+            process.start()
+
+        for result in shard_results_iterator(results_queue, shard_processes):
+            if isinstance(result, tuple):  # a shard's duplicates, sent once it's finished
+                if result[0]: password_duplicates.append(result[0])
+                if result[1] is not None: token_duplicates = result[1]
+                continue
+            passwords_counted += result
+
+            if not is_displayed and sys_stderr_isatty and time.time() - start > SECONDS_BEFORE_DISPLAY:
+                print("Counting passwords in", shards_total, "processes ...", file=sys.stderr)
+                is_displayed = True
+
+            # Until duplicates have been removed across the shards, the count is only an upper bound
+            if buckets_dir:
+                if is_displayed:
+                    print("\r  {:,} (before removing duplicates)".format(passwords_counted), end="", file=sys.stderr)
+            else:
+                if is_displayed:
+                    print_counting_progress(passwords_counted, est_secs_per_password)
+                check_counting_eta(passwords_counted, est_secs_per_password, max_seconds)
+
+        if buckets_dir:
+            if is_displayed:
+                print("\r  removing duplicates ..." + " "*50, end="", file=sys.stderr)
+            pool = multiprocessing.Pool(shards_total, init_quiet_worker)
+            passwords_counted = 0
+            for bucket_count, bucket_duplicates in pool.imap_unordered(count_bucket,
+                    ((bucket, shards_total, buckets_dir) for bucket in xrange(shards_total))):
+                passwords_counted += bucket_count
+                password_duplicates.append(bucket_duplicates)
+                check_counting_eta(passwords_counted, est_secs_per_password, max_seconds)
+
+        # Finish the first run of this process's duplicate checkers (see password_generator()
+        # and tokenlist_base_password_generator() ) with the duplicates found while counting
+        if buckets_dir:
+            if password_dups is None:
+                password_dups = new_duplicate_checker()
+            if password_dups._run_number == 0:
+                password_dups.finish_first_run(itertools.chain.from_iterable(password_duplicates))
+        del password_duplicates
+        if token_duplicates is not None:
+            if token_combination_dups is None:
+                token_combination_dups = new_duplicate_checker()
+            if token_combination_dups._run_number == 0:
+                token_combination_dups.finish_first_run(token_duplicates)
+
+        # Erase the on-screen counter if it was being displayed
+        if is_displayed:
+            print("\rDone" + " "*74, file=sys.stderr)
+        return passwords_counted
+
+    except SystemExit: raise  # happens when error_exit is called above
+    except BaseException as e:
+        print(file=sys.stderr)
+        if isinstance(e, MemoryError):
+            print(prog+": error: out of memory", file=sys.stderr)
+            print(prog+": notice: the --no-dupchecks option will reduce memory usage at the possible expense of speed", file=sys.stderr)
+            sys.exit(1)
+        print("Interrupted after counting", passwords_counted, "passwords (including skipped ones)", file=sys.stderr)
+        if isinstance(e, KeyboardInterrupt): sys.exit(0)
+        raise
+    finally:
+        for process in shard_processes:
+            if process.is_alive():
+                process.terminate()
+        if pool:
+            pool.terminate()
+        if buckets_dir:
+            shutil.rmtree(buckets_dir, ignore_errors=True)
+
+# Target function for the worker processes used by count_passwords_in_parallel(): each counts its own shard of
+# the passwords (see password_generator()), and reports its progress back to the main process by sending counts
+# of passwords via results_queue. If buckets_dir is set, the passwords are also saved there, divided into buckets
+# (see count_bucket_filename() ). When finished, a tuple is sent with the list of duplicate passwords found in
+# this shard (or None if they're not being removed), and, from the first shard only, the list of duplicate token
+# combinations (or None), followed by None (or the exception if one occurs). (Every shard generates all of the
+# base passwords, so their token combination duplicate checkers are all the same.)
+def count_shard(shard_id, shards_total, results_queue, buckets_dir):
+    global generator_shard, passwordlist_file, password_dups, token_combination_dups
+    generator_shard = shard_id, shards_total
+    set_process_priority_idle()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        # The file position is shared with the other processes, so each needs to open the file anew
+        if passwordlist_file and not passwordlist_allcached and args.passwordlist != b"__funccall":
+            passwordlist_file = open_or_use(args.passwordlist, "r")
+        # The duplicate checkers (which are otherwise created when they're first needed) share --max-memory
+        if password_dups is None and args.no_dupchecks < 1:
+            password_dups = new_duplicate_checker(shards_total)
+        elif isinstance(password_dups, SpillingDuplicateChecker):  # (created for --exclude-passwordlist)
+            password_dups._max_memory //= shards_total
+        if token_combination_dups is None and args.no_dupchecks < 2 and has_any_duplicate_tokens:
+            token_combination_dups = new_duplicate_checker(shards_total)
+        if not buckets_dir:
+            for passwords_count in password_generator(PASSWORDS_BETWEEN_UPDATES, only_yield_count=True):
+                results_queue.put(passwords_count)
+        else:
+            buckets      = [[] for bucket in xrange(shards_total)]
+            bucket_files = [open(count_bucket_filename(buckets_dir, bucket, shard_id), "wb")
+                            for bucket in xrange(shards_total)]
+            for passwords in password_generator(PASSWORDS_BETWEEN_UPDATES):
+                for password in passwords:
+                    buckets[hash(password) % shards_total].append(password)
+                for bucket, bucket_file in zip(buckets, bucket_files):
+                    cPickle.dump(bucket, bucket_file, cPickle.HIGHEST_PROTOCOL)
+                    del bucket[:]
+                results_queue.put(len(passwords))
+            for bucket_file in bucket_files:
+                bucket_file.close()
+        results_queue.put((
+            password_dups.saved_duplicates()[0] if buckets_dir else None,
+            token_combination_dups.saved_duplicates()[0] if token_combination_dups and shard_id == 0 else None))
+    except BaseException as e:
+        results_queue.put(e)
+        return
+    results_queue.put(None)
+#
+def count_bucket_filename(buckets_dir, bucket, shard_id):
+    return os.path.join(buckets_dir, "{}-{}".format(bucket, shard_id))
+#
+# Returns the number of unique passwords which were saved by the count_shard() processes in one bucket,
+# and the list of duplicate passwords found among them, using the same kind of duplicate checker
+def count_bucket(bucket_args):
+    bucket, shards_total, buckets_dir = bucket_args
+    bucket_dups  = new_duplicate_checker(shards_total)
+    bucket_count = 0
+    for shard_id in xrange(shards_total):
+        with open(count_bucket_filename(buckets_dir, bucket, shard_id), "rb") as bucket_file:
+            while True:
+                try:
+                    passwords = cPickle.load(bucket_file)
+                except EOFError:
+                    break
+                for password in passwords:
+                    if not bucket_dups.is_duplicate(password):
+                        bucket_count += 1
+    bucket_dups.run_finished()
+    return bucket_count, bucket_dups.saved_duplicates()[0]
+
+
+# Returns the seek argument for password_generator() which skips the first args.skip passwords without
+# generating them, or None if this isn't possible: either the password position saved by do_autosave()
+# or, if the number of passwords produced from each base password can be counted analytically, args.skip.
+# Skipping base passwords also skips their duplicate checks, so this requires --no-dupchecks.
+def password_seek_target():
+    if args.no_dupchecks < 1:
+        return None
+    if savestate and savestate.get(b"skip") == args.skip and b"position" in savestate:
+        return savestate[b"position"]
+    if password_dups is None and not (regex_only or regex_never or custom_final_checker or exclude_index):
+        return args.skip
+    return None
+
+
+# Returns the widgets of a progressbar.ProgressBar which displays the progress and an ETA
+# (used once the number of passwords is known, otherwise the search rate is displayed instead)
+def progress_widgets_with_eta():
+    return [
+        progressbar.SimpleProgress(), b" ",
+        progressbar.Bar(left=b"[", fill=b"-", right=b"]"),
+        progressbar.FormatLabel(b" %(elapsed)s, "),
+        progressbar.ETA()
+    ]
+
 # Should be called after calling parse_arguments()
 # Returns a two-element tuple:
 #   the first element is the password, if found, otherwise False;
@@ -4725,17 +7680,25 @@ def main():
             raise
         return None, tstr(passwords_count) + " password combinations" + plus_skipped
 
-    # Measure the performance of the verification function
+    # With --coordinator, the workers do the searching
+    if args.coordinator:
+        return run_coordinator()
+
+    # Passwords are verified in "chunks" to reduce call overhead. One chunk includes enough passwords to
+    # last for about 1/100th of a second (determined experimentally to be about the best I could do, YMMV)
+    CHUNKSIZE_SECONDS = 1.0 / 100.0
+
+    # Measure the performance of the verification function (unless an earlier call to main() already did)
+    global measured_performance
     if args.performance and args.enable_gpu:  # skip this time-consuming & unnecessary measurement in this case
         est_secs_per_password = 0.01          # set this to something relatively big, it doesn't matter exactly what
+    elif measured_performance and measured_performance[0] is loaded_wallet and measured_performance[1] == args.enable_gpu:
+        est_secs_per_password = measured_performance[2]
     else:
         if args.enable_gpu:
             inner_iterations = sum(args.global_ws)
             outer_iterations = 1
         else:
-            # Passwords are verified in "chunks" to reduce call overhead. One chunk includes enough passwords to
-            # last for about 1/100th of a second (determined experimentally to be about the best I could do, YMMV)
-            CHUNKSIZE_SECONDS = 1.0 / 100.0
             measure_performance_iterations = loaded_wallet.passwords_per_seconds(0.5)
             inner_iterations = int(round(2*measure_performance_iterations * CHUNKSIZE_SECONDS)) or 1  # assumes 0.5 second's worth
             outer_iterations = int(round(measure_performance_iterations / inner_iterations))
@@ -4749,6 +7712,7 @@ def main():
         est_secs_per_password = (time.clock() - start) / (outer_iterations * inner_iterations)
         del performance_generator
         assert isinstance(est_secs_per_password, float) and est_secs_per_password > 0.0
+        measured_performance = loaded_wallet, args.enable_gpu, est_secs_per_password
 
     if args.enable_gpu:
         chunksize = sum(args.global_ws)
@@ -4758,7 +7722,12 @@ def main():
 
     # If the time to verify a password is short enough, the time to generate the passwords in this thread
     # becomes comparable to verifying passwords, therefore this should count towards being a "worker" thread
-    if est_secs_per_password < 1.0 / 75000.0:
+    # (unless the worker threads are generating their own passwords, in which case this thread just waits)
+    if args.shard_generation:
+        main_thread_is_worker = False
+        spawned_threads   = args.threads
+        verifying_threads = args.threads
+    elif est_secs_per_password < 1.0 / 75000.0:
         main_thread_is_worker = True
         spawned_threads   = args.threads - 1      # spawn 1 fewer than requested (might be 0)
         verifying_threads = spawned_threads or 1
@@ -4771,54 +7740,82 @@ def main():
     est_secs_per_password /= min(verifying_threads, cpus)
 
     # Count how many passwords there are (excluding skipped ones) so we can display and conform to ETAs
+    # (with --background-count, they're instead counted while searching, see BackgroundPasswordCounter)
+    background_counter = None
+    passwords_count    = None
     if not args.no_eta:
 
         assert args.skip >= 0
-        if l_savestate and b"total_passwords" in l_savestate and args.no_dupchecks:
+        if l_savestate and b"total_passwords" in l_savestate and (args.no_dupchecks or
+                restored and dups_cache_filename and load_dups_cache()):
             passwords_count = l_savestate[b"total_passwords"]  # we don't need to do a recount
             iterate_time = 0
+        elif args.eta_sample or args.background_count:
+            iterate_time = 0
+            if args.eta_sample:
+                passwords_count = estimate_count_and_check_eta(est_secs_per_password)  # (None unless it's exact)
+            if passwords_count is None and args.background_count:
+                background_counter = BackgroundPasswordCounter(est_secs_per_password)
         else:
-            start = time.clock()
+            start = time.time()  # (wall time, the passwords may be counted by other processes)
             passwords_count = count_and_check_eta(est_secs_per_password)
-            iterate_time = time.clock() - start
+            iterate_time = time.time() - start
             if l_savestate:
                 if b"total_passwords" in l_savestate:
                     assert l_savestate[b"total_passwords"] == passwords_count, "main: saved password count matches actual count"
                 else:
                     l_savestate[b"total_passwords"] = passwords_count
-
-        passwords_count -= args.skip
-        if passwords_count <= 0:
-            return False, "Skipped all "+tstr(passwords_count + args.skip)+" passwords, exiting"
-
-        # If additional ETA calculations are required
-        if l_savestate or not have_progress:
-            eta_seconds = passwords_count * est_secs_per_password
-            # if the main thread is sharing CPU time with a verifying thread
-            if spawned_threads == 0 and not args.enable_gpu or spawned_threads >= cpus:
-                eta_seconds += iterate_time
-            eta_seconds = int(round(eta_seconds)) or 1
-            if l_savestate:
-                est_passwords_per_5min = passwords_count // eta_seconds * 300
-
-    # else if args.no_eta and savestate, calculate a simple approximate of est_passwords_per_5min
-    elif l_savestate:
+                if dups_cache_filename and not args.no_dupchecks:
+                    save_dups_cache()
+
+        if passwords_count is not None:
+            passwords_count -= args.skip
+            if passwords_count <= 0:
+                return False, "Skipped all "+tstr(passwords_count + args.skip)+" passwords, exiting"
+
+            # If additional ETA calculations are required
+            if l_savestate or not have_progress:
+                eta_seconds = passwords_count * est_secs_per_password
+                # if the main thread is sharing CPU time with a verifying thread
+                if spawned_threads == 0 and not args.enable_gpu or spawned_threads >= cpus:
+                    eta_seconds += iterate_time
+                eta_seconds = int(round(eta_seconds)) or 1
+                if l_savestate:
+                    est_passwords_per_5min = passwords_count // eta_seconds * 300
+
+    # If args.no_eta (or the count isn't known yet) and savestate, calculate a simple approximate of est_passwords_per_5min
+    passwords_count_known = passwords_count is not None
+    if not passwords_count_known and l_savestate:
         est_passwords_per_5min = int(round(300.0 / est_secs_per_password))
         assert est_passwords_per_5min > 0
 
     # If there aren't many passwords, give each of the N workers 1/Nth of the passwords
     # (rounding up) and also don't bother spawning more threads than there are passwords
-    if not args.no_eta and spawned_threads * chunksize > passwords_count:
+    if passwords_count_known and spawned_threads * chunksize > passwords_count:
         if spawned_threads > passwords_count:
             spawned_threads = passwords_count
         chunksize = (passwords_count-1) // spawned_threads + 1
 
+    # If autosaving, keep track of the password positions (if possible) so that a restore can seek to them
+    global password_positions
+    password_positions = collections.deque() if l_savestate and args.no_dupchecks >= 1 else None
+
     # Create an iterator which produces the password permutations in chunks, skipping some if so instructed
     if args.skip > 0:
         print("Starting with password #", args.skip + 1)
-    password_iterator, skipped_count = password_generator_factory(chunksize)
+    if args.coordinated_by:
+        try:
+            coordinated_work = CoordinatedWork(args.coordinated_by)
+        except IOError as e:
+            error_exit("can't connect to the --coordinator at", args.coordinated_by+":", e)
+        password_iterator = coordinated_work.chunks(chunksize)
+        skipped_count     = 0
+    else:
+        coordinated_work  = None
+        password_iterator, skipped_count = password_generator_factory(chunksize)
     if skipped_count < args.skip:
-        assert args.no_eta, "discovering all passwords have been skipped this late only happens if --no-eta"
+        assert not passwords_count_known, "discovering all passwords have been skipped this late only happens if --no-eta"
+        if background_counter: background_counter.close()
         return False, "Skipped all "+tstr(skipped_count)+" passwords, exiting"
     assert skipped_count == args.skip
 
@@ -4834,22 +7831,17 @@ def main():
         print("Using", args.threads, "worker", "threads" if args.threads > 1 else "thread")  # (they're actually worker processes)
 
     if have_progress:
-        if args.no_eta:
+        if passwords_count_known:
+            progress = progressbar.ProgressBar(maxval=passwords_count, widgets=progress_widgets_with_eta())
+        else:
             progress = progressbar.ProgressBar(maxval=sys.maxint, widgets=[
                 progressbar.AnimatedMarker(),
                 progressbar.FormatLabel(b" %(value)d  elapsed: %(elapsed)s  rate: "),
                 progressbar.FileTransferSpeed(unit="P")
             ])
-        else:
-            progress = progressbar.ProgressBar(maxval=passwords_count, widgets=[
-                progressbar.SimpleProgress(), b" ",
-                progressbar.Bar(left=b"[", fill=b"-", right=b"]"),
-                progressbar.FormatLabel(b" %(elapsed)s, "),
-                progressbar.ETA()
-            ])
     else:
         progress = None
-        if args.no_eta:
+        if not passwords_count_known:
             print("Searching for password ...")
         else:
             # If progressbar is unavailable, print out a time estimate instead
@@ -4872,13 +7864,58 @@ def main():
 
     # Create an iterator which actually checks the (remaining) passwords produced by the password_iterator
     # by executing the return_verified_password_or_false worker function in possibly multiple threads
-    if spawned_threads == 0:
+    if args.shard_generation:
+        results_queue = multiprocessing.Queue()
+        shard_processes = [multiprocessing.Process(target=generate_and_verify_shard,
+                               args=(shard_id, spawned_threads, chunksize, results_queue))
+                           for shard_id in xrange(spawned_threads)]
+        for process in shard_processes:
+            process.daemon = True
+            process.start()
+        password_found_iterator = shard_results_iterator(results_queue, shard_processes)
+    elif spawned_threads == 0:
         password_found_iterator = itertools.imap(return_verified_password_or_false, password_iterator)
         set_process_priority_idle()  # this, the only thread, should be nice
     else:
-        pool = multiprocessing.Pool(spawned_threads, init_worker, (loaded_wallet,))
-        password_found_iterator = pool.imap(return_verified_password_or_false, password_iterator)
-        if main_thread_is_worker: set_process_priority_idle()  # if this thread is cpu-intensive, be nice
+        # The chunksize is adjusted as the search progresses (see ChunksizeController)
+        global chunksize_controller, shared_password_slots
+        chunksize_controller = ChunksizeController(chunksize, spawned_threads, CHUNKSIZE_SECONDS,
+                                                   args.skip + passwords_count if passwords_count_known else None)
+        backend = args.backend
+        if backend == "auto" and remembered_verification_backend(spawned_threads) == "threads":
+            backend = "threads"  # (don't bother opening a process pool just to terminate it)
+        if backend != "threads":
+            # Where supported, the password chunks are passed to the worker processes in shared memory
+            if sys.platform != "win32":
+                pool = open_worker_pool(spawned_threads, 2 * spawned_threads + 2,
+                                        SHARED_SLOT_BYTES_PER_PASSWORD * chunksize_controller.max_chunksize)
+            else:
+                pool = open_worker_pool(spawned_threads)
+            if backend == "auto":
+                backend = fastest_verification_backend(pool, spawned_threads, chunksize, est_secs_per_password)
+                if backend == "threads":
+                    print("Using threads instead of processes, they're faster with this wallet")
+                    shared_password_slots = None
+                    pool.terminate()
+        if backend == "threads":
+            # The worker threads share this process (and the wallet), so chunks needn't be pickled, but
+            # the number of chunks waiting to be verified must be limited (their queue is unbounded)
+            bounded_chunks    = BoundedChunks(2 * spawned_threads + 2)
+            password_iterator = bounded_chunks.limiting(password_iterator)
+            pool = multiprocessing.pool.ThreadPool(spawned_threads)
+            password_found_iterator = pool.imap(return_verified_password_or_false_timed, password_iterator)
+            password_found_iterator = bounded_chunks.releasing_results(password_found_iterator)
+            set_process_priority_idle()  # the worker threads should be nice
+        else:
+            if shared_password_slots:
+                password_iterator = shared_password_slots.packed_chunks(password_iterator)
+            password_found_iterator = pool.imap(return_verified_password_or_false_timed, password_iterator)
+            if shared_password_slots:
+                password_found_iterator = shared_password_slots.releasing_results(password_found_iterator)
+            if main_thread_is_worker: set_process_priority_idle()  # if this thread is cpu-intensive, be nice
+        password_found_iterator = chunksize_controller.observing_results(password_found_iterator)
+    if coordinated_work:
+        password_found_iterator = coordinated_work.observing_results(password_found_iterator)
 
     # Try to catch all types of intentional program shutdowns so we can
     # display password progress information and do a final autosave
@@ -4892,11 +7929,12 @@ def main():
             win32api.SetConsoleCtrlHandler(windows_ctrl_handler, True)
     except StandardError: pass
 
-    # Make est_passwords_per_5min evenly divisible by chunksize
-    # (so that passwords_tried % est_passwords_per_5min will eventually == 0)
+    # Autosave after (approximately) every est_passwords_per_5min passwords, always at the end of a chunk
+    # (the chunksize may change, so the threshold is advanced each time an autosave is done)
     if l_savestate:
         assert isinstance(est_passwords_per_5min, numbers.Integral)
-        est_passwords_per_5min = int(round(est_passwords_per_5min / chunksize)) * chunksize
+        est_passwords_per_5min = max(est_passwords_per_5min, 1)
+        next_autosave_at       = est_passwords_per_5min
 
     # Iterate through password_found_iterator looking for a successful guess
     password_found  = False
@@ -4911,12 +7949,28 @@ def main():
                     print()  # move down to the line below the progress bar
                 break
             passwords_tried += passwords_tried_last
+            # If the passwords are being counted in the background and they've just been counted,
+            # switch the progress bar from showing the rate to showing the progress and an ETA
+            if background_counter and background_counter.finished():
+                passwords_count = background_counter.result() - args.skip
+                background_counter = None
+                passwords_count_known = True
+                if l_savestate:
+                    l_savestate[b"total_passwords"] = args.skip + passwords_count
+                if chunksize_controller:
+                    chunksize_controller.set_total_passwords(args.skip + passwords_count)
+                if progress:
+                    progress.maxval          = max(passwords_count, passwords_tried)
+                    progress.widgets         = progress_widgets_with_eta()
+                    progress.update_interval = progress.maxval / progress.num_intervals
+                    progress.next_update     = 0
             if progress: progress.update(passwords_tried)
-            if l_savestate and passwords_tried % est_passwords_per_5min == 0:
+            if l_savestate and passwords_tried >= next_autosave_at:
                 do_autosave(args.skip + passwords_tried)
+                next_autosave_at = passwords_tried + est_passwords_per_5min
         else:  # if the for loop exits normally (without breaking)
             if progress:
-                if args.no_eta:
+                if not passwords_count_known:
                     progress.maxval = passwords_tried
                 else:
                     progress.widgets.pop()  # remove the ETA
@@ -4943,7 +7997,28 @@ def main():
         do_autosave(args.skip + passwords_tried)
         autosave_file.close()
 
-    if spawned_threads > 0: pool.terminate()
+    if background_counter:
+        background_counter.close()
+    if args.shard_generation:
+        for process in shard_processes:
+            process.terminate()
+    elif spawned_threads > 0:
+        if backend == "threads":
+            bounded_chunks.close()
+            pool.terminate()
+        # If the search finished normally, the workers are idle and can be reused by the next call to main()
+        elif password_found is False:
+            keep_worker_pool(pool)
+        else:
+            if shared_password_slots:
+                shared_password_slots.close()
+            pool.terminate()
+        shared_password_slots = None
+        chunksize_controller  = None
+    if coordinated_work:
+        coordinated_work.close()
+        if password_found is False and coordinated_work.found_elsewhere:
+            return False, "Password found by another worker"
     return (password_found, "Password search exhausted" if password_found is False else None)
 
 
@@ -752,7 +752,9 @@ class WalletBIP39(WalletBIP32):
         if not self._language_words:
             self._load_wordlists()
         pbkdf2_library_name = btcr.load_pbkdf2_library().__name__  # btcr's pbkdf2 library is used in _derive_seed()
-        self._kdf_overhead = 0.0039 if pbkdf2_library_name == "hashlib" else 0.015
+        # Each seed derivation requires 2048 PBKDF2-HMAC-SHA512 iterations
+        self._kdf_overhead = 2048 / btcr.calibrated_rate(b"pbkdf2_hmac_sha512", pbkdf2_library_name,
+                                                         btcr.pbkdf2_hmac_sha512_benchmark)
 
     def __setstate__(self, state):
         super(WalletBIP39, self).__setstate__(state)
@@ -1491,32 +1493,37 @@ def main(argv):
            len(mnemonic_ids_guess) <= 19 and passwords_per_seconds >= 2500:
             phases.append(dict(typos=3, big_typos=1, min_typos=3, extra_args=["--no-dupchecks"]))
 
-    for phase_num, phase_params in enumerate(phases, 1):
+    # btcr.main() keeps its worker processes between phases (and subphases); they're stopped once finished
+    try:
+        for phase_num, phase_params in enumerate(phases, 1):
 
-        # Print a friendly message describing this phase's search settings
-        print("Phase {}/{}: ".format(phase_num, len(phases)), end="")
-        if phase_params["typos"] == 1:
-            print("1 mistake", end="")
-        else:
-            print("up to {} mistakes".format(phase_params["typos"]), end="")
-        if phase_params.get("big_typos"):
-            if phase_params["big_typos"] == phase_params["typos"] == 1:
-                print(" which can be an entirely different seed word.")
+            # Print a friendly message describing this phase's search settings
+            print("Phase {}/{}: ".format(phase_num, len(phases)), end="")
+            if phase_params["typos"] == 1:
+                print("1 mistake", end="")
             else:
-                print(", {} of which can be an entirely different seed word.".format(phase_params["big_typos"]))
-        else:
-            print(", excluding entirely different seed words.")
+                print("up to {} mistakes".format(phase_params["typos"]), end="")
+            if phase_params.get("big_typos"):
+                if phase_params["big_typos"] == phase_params["typos"] == 1:
+                    print(" which can be an entirely different seed word.")
+                else:
+                    print(", {} of which can be an entirely different seed word.".format(phase_params["big_typos"]))
+            else:
+                print(", excluding entirely different seed words.")
 
-        # Perform this phase's search
-        phase_params.setdefault("extra_args", []).extend(extra_args)
-        mnemonic_found = run_btcrecover(**phase_params)
+            # Perform this phase's search
+            phase_params.setdefault("extra_args", []).extend(extra_args)
+            mnemonic_found = run_btcrecover(**phase_params)
 
-        if mnemonic_found:
-            return " ".join(loaded_wallet.id_to_word(i) for i in mnemonic_found).decode("utf_8")
-        elif mnemonic_found is None:
-            return None  # An error occurred or Ctrl-C was pressed inside btcr.main()
-        else:
-            print("Seed not found" + ( ", sorry..." if phase_num==len(phases) else "" ))
+            if mnemonic_found:
+                return " ".join(loaded_wallet.id_to_word(i) for i in mnemonic_found).decode("utf_8")
+            elif mnemonic_found is None:
+                return None  # An error occurred or Ctrl-C was pressed inside btcr.main()
+            else:
+                print("Seed not found" + ( ", sorry..." if phase_num==len(phases) else "" ))
+
+    finally:
+        btcr.close_worker_pool()
 
     return False  # No error occurred; the mnemonic wasn't found
 
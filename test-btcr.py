@@ -55,7 +55,11 @@ warnings.filterwarnings("ignore", r"Non-empty compiler output encountered\. Set
 # and except this from Armory:
 warnings.filterwarnings("ignore", r"the sha module is deprecated; use the hashlib module instead", DeprecationWarning)
 
-import unittest, os, cPickle, tempfile, shutil, filecmp, sys
+import unittest, os, cPickle, tempfile, shutil, filecmp, sys, time, random, socket, multiprocessing, base64, struct, zlib, hashlib, \
+       hmac, json, threading, collections
+
+# Measure crypto backends afresh instead of using (or overwriting) the user's calibration file
+btcrecover.calibration_filename = None
 
 wallet_dir = os.path.join(os.path.dirname(__file__), "test-wallets")
 typos_dir  = os.path.join(os.path.dirname(__file__), "typos")
@@ -388,6 +392,13 @@ class Test03WildCards(GeneratorTester):
     def test_backreference_bounds(self):
         self.do_generator_test(["%[ab]%1,3;3b"], ["a", "aa", "b", "bb"], b"--has-wildcards -d", True)
 
+    def test_mixed_order(self):
+        self.do_generator_test(["%[ab]%0,1>cd%1,2b"],
+            ["acdd", "acddd", "add", "addd", "bcdd", "bcddd", "bdd", "bddd"], b"--has-wildcards -d", True)
+    def test_mixed_contracting_order(self):
+        self.do_generator_test(["%0,1-a%[XY]b%0,1<"],
+            ["aXb", "aX", "aYb", "aY", "Xb", "X", "Yb", "Y"], b"--has-wildcards -d", True)
+
     @unittest.skipUnless(os.path.isfile(LEET_MAP_FILE), "requires leet-map.txt file")
     def test_backreference_map(self):
         self.do_generator_test(["%[bc]%;"+LEET_MAP_FILE+";b"],
@@ -651,6 +662,251 @@ class Test05CommandLine(GeneratorTester):
             data_extract = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")  # dummy data-extract not actually tested
         # 360s * 10 passwords <= 1 hour, but count_and_check_eta still returns the total count of 15
         self.assertEqual(btcrecover.count_and_check_eta(360.0), 15)
+    def test_max_eta_analytic(self):
+        btcrecover.parse_arguments(b"-d --max-eta 1 --tokenlist __funccall --data-extract".split(),
+            tokenlist    = StringIO("%10d"),
+            data_extract = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")  # dummy data-extract not actually tested
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.count_and_check_eta(0.001)  # too many to enumerate in a reasonable time
+        self.assertIn("at least 10,000,000,000 passwords to try", cm.exception.code)
+
+    # Compare the closed-form counts against the (slow) enumerated counts
+    def test_count_analytic_exact(self):
+        btcrecover.parse_arguments(b"-d --typos 2 --typos-capslock --typos-swap --typos-case --typos-delete"
+                                   b" --typos-insert %[ab] --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("one + %1,2[xy]\n two \n ^three"))
+        count, is_exact = btcrecover.count_passwords_analytically()
+        self.assertTrue(is_exact)
+        self.assertEqual(count, sum(btcrecover.password_generator(1000, only_yield_count=True)))
+    def test_count_analytic_upper_bound(self):
+        btcrecover.parse_arguments(b"--typos 2 --typos-swap --typos-repeat --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("aab aab \n %[ab]"))
+        count, is_exact = btcrecover.count_passwords_analytically()
+        self.assertFalse(is_exact)
+        self.assertGreaterEqual(count, sum(btcrecover.password_generator(1000, only_yield_count=True)))
+
+    # Counting in parallel matches counting serially, including removing duplicates (of both passwords and
+    # token combinations) across the shards, and afterwards the search produces the same passwords
+    @unittest.skipIf(sys.platform == "win32", "counting in parallel is not supported on Windows")
+    def test_count_parallel(self):
+        for cmd_line in (b"--typos 2 --typos-case --typos-repeat",
+                         b"--typos 2 --typos-case --compact-dupchecks",
+                         b"-d --typos 2 --typos-case --regex-only a",
+                         b"-dd --typos 2 --typos-case"):
+            results = []
+            for threads in (b"1", b"3"):
+                btcrecover.parse_arguments((b"--tokenlist __funccall --listpass --threads " + threads + b" " + cmd_line).split(),
+                    tokenlist = StringIO("aa bb\nAa aa\ncc"))
+                self.assertEqual(btcrecover.can_count_in_parallel(), threads != b"1")
+                count     = btcrecover.count_and_check_eta(1e-9)
+                passwords = btcrecover.password_generator(sys.maxint).next()
+                self.assertEqual(count, len(passwords))
+                results.append((count, passwords))
+            self.assertEqual(results[0], results[1])
+    @unittest.skipIf(sys.platform == "win32", "--background-count is not supported on Windows")
+    def test_count_background(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass --threads 3 --typos 2 --typos-case --typos-repeat".split(),
+            tokenlist = StringIO("aa bb\nAa\ncc"))
+        for est_secs_per_password in (1e-9, 3600.0):
+            counter = btcrecover.BackgroundPasswordCounter(est_secs_per_password)
+            while not counter.finished():
+                time.sleep(0.01)
+            if est_secs_per_password < 1.0:
+                self.assertEqual(counter.result(), btcrecover.count_and_check_eta(est_secs_per_password))
+            else:
+                with self.assertRaises(SystemExit) as cm:
+                    counter.result()
+                self.assertIn("ETA > --max-eta option", cm.exception.code)
+            counter.close()
+    @unittest.skipIf(sys.platform == "win32", "--background-count is not supported on Windows")
+    def test_count_background_compact(self):
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.parse_arguments(b"--tokenlist __funccall --data-extract --background-count --compact-dupchecks".split(),
+                tokenlist = StringIO("one"), data_extract = E2E_DATA_EXTRACT)
+        self.assertIn("--compact-dupchecks can't be used with --background-count", cm.exception.code)
+    @unittest.skipIf(sys.platform == "win32", "counting in parallel is not supported on Windows")
+    def test_count_parallel_max_eta(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass --threads 3 --typos 2 --typos-case --typos-repeat".split(),
+            tokenlist = StringIO("aa bb\nAa\ncc"))
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.count_and_check_eta(3600.0)
+        self.assertIn("ETA > --max-eta option", cm.exception.code)
+
+    # A sample of all the base passwords produces an exact estimate; a smaller one produces a confidence interval
+    def test_eta_sample(self):
+        btcrecover.parse_arguments(b"--typos 2 --typos-case --typos-repeat --typos-swap --regex-only [ab] --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("aa bb\nAa cd ef\ncc xyz\n+ e f"))
+        count = sum(btcrecover.password_generator(1000, only_yield_count=True))
+        self.assertEqual(btcrecover.estimate_passwords_count(1000), (count, count, count, 798, 798))
+        random.seed(0)
+        estimate, lower_bound, upper_bound, sample_size, base_passwords_count = btcrecover.estimate_passwords_count(50)
+        self.assertEqual((sample_size, base_passwords_count), (50, 798))
+        self.assertTrue(lower_bound < estimate < upper_bound)
+        self.assertTrue(lower_bound < count < upper_bound)
+        # Sampling doesn't change the duplicate checking or the base passwords of the actual search
+        self.assertEqual(sum(btcrecover.password_generator(1000, only_yield_count=True)), count)
+    def test_eta_sample_exclude(self):
+        btcrecover.parse_arguments(b"--typos 1 --typos-case --regex-only [ab] --exclude-passwordlist __funccall --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("aa bb\nAa cd"), exclude_passwordlist = StringIO("aa\nAabb"))
+        count = sum(btcrecover.password_generator(1000, only_yield_count=True))
+        self.assertEqual(btcrecover.estimate_passwords_count(1000)[0], count)
+        self.assertEqual(btcrecover.password_dups.is_duplicate("aa"), True)  # still excluded
+    def test_eta_sample_invalid(self):
+        self.expect_syntax_failure(["one"], "--eta-sample COUNT must be >= 2", b"--eta-sample 1")
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.parse_arguments(b"--tokenlist __funccall --data-extract --eta-sample --compact-dupchecks".split(),
+                tokenlist = StringIO("one"), data_extract = E2E_DATA_EXTRACT)
+        self.assertIn("--compact-dupchecks can't be used with --eta-sample", cm.exception.code)
+
+    # With --no-dupchecks, skipped base passwords don't need to have their typos generated
+    def test_skip_seek(self):
+        cmd_line = b"-d --typos 2 --typos-swap --typos-insert %[ab] --worker 2/3"
+        btcrecover.parse_arguments((b"--tokenlist __funccall --listpass " + cmd_line).split(),
+            tokenlist = StringIO("one + %1,2[xy]\n two \n ^three"))
+        all_passwords = btcrecover.password_generator(sys.maxint).next()
+        for skip in 1, 50, 333, len(all_passwords) - 1:
+            self.do_generator_test(["one + %1,2[xy]", " two ", "^three"], all_passwords[skip:],
+                cmd_line + b" --skip " + str(skip), False, sys.maxint, skip)
+    def test_skip_seek_pastend(self):
+        self.do_generator_test(["one %[ab]"], [], b"-d --typos-capslock --skip 10 --worker 2/2", False, sys.maxint, 3)
+
+    # Each shard produces a disjoint part of the passwords, dividing up either the first modification's values or the base passwords
+    def test_shard_generation(self):
+        for cmd_line in b"--typos 2 --typos-capslock --typos-swap", b"--typos 2 --typos-swap", b"":
+            btcrecover.parse_arguments((b"-d --tokenlist __funccall --listpass " + cmd_line).split(),
+                tokenlist = StringIO("one + %1,2[xy]\n two \n ^three"))
+            all_passwords = btcrecover.password_generator(sys.maxint).next()
+            shards_passwords = []
+            for shard_id in xrange(3):
+                btcrecover.generator_shard = shard_id, 3
+                shard_passwords = btcrecover.password_generator(sys.maxint).next()
+                self.assertLess(len(shard_passwords), len(all_passwords))
+                shards_passwords.extend(shard_passwords)
+            self.assertEqual(sorted(shards_passwords), sorted(all_passwords))
+
+    # Ranges are sized to take about RANGE_SECONDS each, those of released workers are leased again,
+    # and once every range has been leased, idle workers are given backup copies of the oldest ones
+    def test_coordinator_schedule(self):
+        schedule = btcrecover.CoordinatorSchedule()
+        self.assertEqual(schedule.lease(1), (0, 1))
+        self.assertEqual(schedule.lease(2), (1, 2))
+        schedule.complete(1, (0, 1), 1, 10, schedule.RANGE_SECONDS / 2)
+        self.assertEqual(schedule.lease(1), (2, 4))  # twice the size after finishing in half the time
+        schedule.release(2)
+        self.assertEqual(schedule.lease(3), (1, 2))
+        schedule.complete(1, (2, 4), 1, 5, 1.0)      # only 1 of the 2 base passwords exists
+        self.assertEqual(schedule.bases_total, 3)
+        self.assertEqual(schedule.lease(1), (1, 2))  # a backup copy
+        self.assertIs(schedule.lease(4), False)
+        self.assertEqual(schedule.saved_state(), ([(0, 1), (2, 4)], 3))
+        #
+        restored = btcrecover.CoordinatorSchedule(*schedule.saved_state())
+        self.assertEqual(restored.lease(5), (1, 2))
+        self.assertIs(restored.lease(5), False)
+        #
+        self.assertFalse(schedule.is_finished())
+        schedule.complete(3, (1, 2), 1, 7, 1.0)
+        schedule.complete(1, (1, 2), 1, 7, 1.0)      # the backup copy's results are ignored
+        self.assertTrue(schedule.is_finished())
+        self.assertEqual(schedule.passwords_done, 22)
+        self.assertIsNone(schedule.lease(1))
+    #
+    # Each range continues from the base password where the last one left off (unless it starts before it)
+    def test_coordinated_work_ranges(self):
+        btcrecover.parse_arguments(b"--passwordlist __funccall --listpass --no-dupchecks".split(),
+            passwordlist = StringIO("\n".join("p" + str(i) for i in xrange(8))))
+        all_base_passwords = btcrecover.base_password_generator
+        base_password_calls = [0]
+        def base_password_generator():
+            base_password_calls[0] += 1
+            return all_base_passwords()
+        btcrecover.base_password_generator = base_password_generator
+        #
+        class ScriptedCoordinatedWork(btcrecover.CoordinatedWork):
+            def __init__(self, ranges):  # (instead of connecting to a coordinator)
+                self._lock            = threading.RLock()
+                self._pending         = collections.deque()
+                self._last_message_at = time.time()
+                self.done             = False
+                self.found_elsewhere  = False
+                self._base_passwords  = None
+                self._bases_position  = 0
+                self.ranges    = list(ranges)
+                self.completed = []
+            def _call(self, **message):
+                if "completed" in message:
+                    self.completed.append((tuple(message["completed"]), message["bases"]))
+                if "request" in message:
+                    if self.ranges:
+                        return {"range": self.ranges.pop(0)}
+                    self.done = True
+                    return {"done": True, "found": False}
+                return {"ok": True}
+        work = ScriptedCoordinatedWork([(0, 2), (2, 5), (1, 2), (5, 100)])
+        passwords = []
+        def results():
+            for chunk in work.chunks(2):
+                passwords.extend(chunk)
+                yield False, len(chunk)
+        list(work.observing_results(results()))
+        self.assertEqual(passwords, ["p0", "p1", "p2", "p3", "p4", "p1", "p5", "p6", "p7"])
+        self.assertEqual(work.completed, [((0, 2), 2), ((2, 5), 3), ((1, 2), 1), ((5, 100), 3)])
+        self.assertEqual(base_password_calls[0], 2)  # (once more only for the range before the last one)
+    #
+    def test_coordinator_invalid(self):
+        self.expect_syntax_failure(["one"], "--coordinator can't be used with --coordinated-by",
+                                   b"--coordinator :1234 --coordinated-by localhost:1234")
+        self.expect_syntax_failure(["one"], "--coordinated-by can't be used with --worker",
+                                   b"--coordinated-by localhost:1234 --coordinator-secret s --worker 1/2")
+        self.expect_syntax_failure(["one"], "--coordinator requires a --coordinator-secret",
+                                   b"--coordinator :1234")
+
+    @unittest.skipIf(sys.platform == "win32", "shared memory password slots are not supported on Windows")
+    def test_shared_password_slots(self):
+        slots  = btcrecover.SharedPasswordSlots(2, 16)
+        chunks = [["one", "two"], ["three", "four", "five"], ["o\0ne"], [("one", "two")], [""]]
+        packed = slots.packed_chunks(iter(chunks))
+        self.assertEqual(slots.read(packed.next()), ["one", "two"])
+        self.assertEqual(packed.next(), ["three", "four", "five"])  # too long for a slot
+        self.assertEqual(packed.next(), ["o\0ne"])                  # contains a NUL
+        self.assertEqual(packed.next(), [("one", "two")])           # not strings
+        results = slots.releasing_results(iter(xrange(4)))
+        self.assertEqual(list(results), range(4))
+        self.assertEqual(slots.read(packed.next()), [""])
+        slots.close()
+
+    @unittest.skipIf(sys.platform == "win32", "shared memory password slots are not supported on Windows")
+    def test_shared_password_slots_packed(self):
+        class PackedWallet(btcrecover.PackedPasswordsWallet):
+            encode_password = staticmethod(lambda p: p.encode("utf_16_be"))
+        slots  = btcrecover.SharedPasswordSlots(3, 32, PackedWallet())
+        chunks = [["one", "two"], ["three", "four", "five"], ["o\0ne"], [("one", "two")]]
+        packed = slots.packed_chunks(iter(chunks))
+        data, ends = slots.read_packed(packed.next())
+        self.assertEqual(data, "onetwo".encode("utf_16_be"))
+        self.assertEqual(list(ends), [6, 12])
+        self.assertEqual(packed.next(), ["three", "four", "five"])  # too long for a slot
+        data, ends = slots.read_packed(packed.next())               # (NULs are permitted)
+        self.assertEqual(data.decode("utf_16_be"), "o\0ne")
+        self.assertEqual(packed.next(), [("one", "two")])           # not strings
+        # The index returned for a packed chunk is replaced by its password
+        results = slots.releasing_results(iter([(1, 2), (False, 3), (0, 1), (False, 1)]))
+        self.assertEqual(list(results), [("two", 2), (False, 3), ("o\0ne", 1), (False, 1)])
+        slots.close()
+
+    def test_chunksize_controller(self):
+        controller = btcrecover.ChunksizeController(1000, 2, 0.01, 100000)
+        self.assertEqual(controller.next_chunksize(1000), 1000)
+        controller.observe(1000, 0.02, 0.0)      # twice as slow as targeted
+        self.assertEqual(controller.next_chunksize(2000), 500)
+        for i in xrange(50):
+            controller.observe(500, 0.0001, 0.0) # much faster than targeted
+        self.assertEqual(controller.next_chunksize(3000), 16000)  # and by MAX_GROWTH
+        self.assertEqual(controller.next_chunksize(96000), 1000)  # smaller near the end
+        self.assertEqual(controller.next_chunksize(99999), 1)
+        controller = btcrecover.ChunksizeController(1000, 2, 0.01)
+        controller.observe(1000, 0.01, 0.01)     # idle workers lengthen the target time
+        self.assertGreater(controller.next_chunksize(1000), 1000)
 
     def test_worker(self):
         self.do_generator_test(["one two three four five six seven eight"], ["one", "four", "seven"],
@@ -660,6 +916,50 @@ class Test05CommandLine(GeneratorTester):
         self.do_generator_test(["one two three four five six seven eight"], ["three", "six"],
             b"--worker 3/3")
 
+    # With --worker-bases, each worker gets every TOTAL#'th base password along with all of its typos
+    def test_worker_bases(self):
+        self.do_generator_test(["one two three four five"], ["one", "ONE", "four", "FOUR"],
+            b"--worker 1/3 --worker-bases --typos-capslock")
+        self.do_generator_test(["one two three four five"], ["three", "THREE"],
+            b"--worker 3/3 --worker-bases --typos-capslock")
+    #
+    # Every password is produced by one of the workers, which each count and skip only their own
+    def test_worker_bases_skip(self):
+        tokenlist = "one + %1,2[xy]\n two \n ^three"
+        btcrecover.parse_arguments(b"-d --typos 2 --typos-swap --typos-insert %[ab] --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO(tokenlist))
+        all_passwords = btcrecover.password_generator(sys.maxint).next()
+        workers_passwords = []
+        for worker in xrange(1, 4):
+            cmd_line = b"-d --typos 2 --typos-swap --typos-insert %[ab] --worker-bases --worker " + str(worker) + b"/3"
+            btcrecover.parse_arguments((b"--tokenlist __funccall --listpass " + cmd_line).split(),
+                tokenlist = StringIO(tokenlist))
+            worker_passwords = btcrecover.password_generator(sys.maxint).next()
+            self.assertEqual(btcrecover.count_passwords_analytically(), (len(worker_passwords), True))
+            for skip in 1, len(worker_passwords) // 2, len(worker_passwords) - 1:
+                self.do_generator_test(tokenlist.split("\n"), worker_passwords[skip:],
+                    cmd_line + b" --skip " + str(skip), False, sys.maxint, skip)
+            workers_passwords.extend(worker_passwords)
+        self.assertEqual(sorted(workers_passwords), sorted(all_passwords))
+    #
+    def test_worker_bases_invalid(self):
+        self.expect_syntax_failure(["one"], "--worker-bases requires --worker", b"--worker-bases")
+
+    def test_backend_invalid(self):
+        self.expect_syntax_failure(["one"], "--backend threads can't be used with --shard-generation",
+                                   b"--backend threads --shard-generation")
+
+    def test_bounded_chunks(self):
+        bounded_chunks = btcrecover.BoundedChunks(2)
+        chunks  = bounded_chunks.limiting(iter(xrange(10)))
+        results = bounded_chunks.releasing_results(iter(xrange(10)))
+        self.assertEqual([chunks.next(), chunks.next()], [0, 1])
+        self.assertFalse(bounded_chunks._available.acquire(False))  # a third chunk would block
+        results.next()
+        self.assertEqual(chunks.next(), 2)
+        bounded_chunks.close()
+        self.assertEqual(list(chunks), [])
+
     def test_no_dupchecks_1(self):
         self.do_generator_test(["one", "one"], ["one", "one", "oneone", "oneone"], b"-ddd")
         self.do_generator_test(["one", "one"], ["one", "one", "oneone"], b"-dd")
@@ -675,6 +975,48 @@ class Test05CommandLine(GeneratorTester):
         # Duplicate code works differently the second time around; test it also
         self.assertEqual(btcrecover.password_generator(3).next(), ["a", "b"])
 
+    def test_compact_dupchecks(self):
+        self.do_generator_test(["one", "one"], ["one", "oneone"], b"-d --compact-dupchecks")
+        self.do_generator_test(["%[ab] %[a-b]"], ["a", "b"], b"--compact-dupchecks 32")
+        # Duplicate code works differently the second time around; test it also
+        self.assertEqual(btcrecover.password_generator(3).next(), ["a", "b"])
+        self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], b"--exclude-passwordlist __funccall --compact-dupchecks",
+                               exclude_passwordlist=StringIO("exc1\nexc2"))
+    def test_compact_dupchecks_collisions(self):
+        dups = btcrecover.CompactDuplicateChecker(1)  # every fingerprint is the same
+        self.assertEqual([dups.is_duplicate(x) for x in "abca"], [False, True, True, True])
+        dups.run_finished()
+        # Items mistaken for duplicates in the first run aren't in later runs
+        self.assertEqual([dups.is_duplicate(x) for x in "abca"], [False, False, False, True])
+    def test_compact_dupchecks_invalid(self):
+        self.expect_syntax_failure(["one"], "--compact-dupchecks BITS must be between 32 and", b"--compact-dupchecks 16")
+
+    def test_max_memory(self):
+        self.do_generator_test(["one", "one"], ["one", "oneone"], b"-d --max-memory 1")
+        self.do_generator_test(["^%[ab] %[a-b]$"], ["a", "b"], b"--max-memory 1")
+        self.assertEqual(btcrecover.password_generator(3).next(), ["a", "b"])
+    def test_max_memory_spilled(self):
+        dups = btcrecover.SpillingDuplicateChecker(1000)  # spills about every 9 items
+        dups.exclude("excluded")
+        items = [str(i) for i in xrange(500)] + [u"\u00e9", (u"a", "b")]
+        self.assertFalse(any(dups.is_duplicate(x) for x in items))
+        self.assertTrue(1 < len(dups._runs) <= dups.MAX_RUNS)  # runs were spilled and merged
+        self.assertTrue(all(dups.is_duplicate(x) for x in items[::7] + ["excluded"]))
+        self.assertFalse(dups.is_duplicate("new"))
+        dups.run_finished()
+        # Only items seen twice in the first run are tracked in later runs
+        self.assertEqual([dups.is_duplicate(x) for x in ["0", "0", "1", "1", "excluded", "new"]],
+                         [False, True, False, False, True, False])
+    def test_spilled_items(self):
+        keys = sorted(str(i) for i in xrange(1000))
+        run  = btcrecover.SpilledItems(iter(keys), len(keys))
+        self.assertEqual(list(run), keys)
+        self.assertTrue(all(key in run for key in keys))
+        self.assertFalse(any(key in run for key in (b"", b"-1", b"1000", b"999a", b"\xff")))
+        run.close()
+    def test_max_memory_invalid(self):
+        self.expect_syntax_failure(["one"], "--max-memory must be >= 1", b"--max-memory 0")
+
     # Need to check four different code paths for --exclude-passwordlist
     def test_exclude(self):
         self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], b"--exclude-passwordlist __funccall",
@@ -689,6 +1031,44 @@ class Test05CommandLine(GeneratorTester):
         self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], b"--exclude-passwordlist __funccall --no-eta -dd",
                                exclude_passwordlist=StringIO("exc1\nexc2"))
 
+    def test_exclude_index(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        try:
+            index_filename = os.path.join(temp_dir, "exclude-index")
+            with self.assertRaises(SystemExit) as cm:
+                btcrecover.parse_arguments(
+                    b"--exclude-passwordlist __funccall --build-exclude-index".split() + [index_filename],
+                    exclude_passwordlist=StringIO("exc1\nexc2\nexc1"))
+            self.assertEqual(cm.exception.code, 0)
+            self.assertEqual(len(btcrecover.ExcludeIndex(open(index_filename, "rb"))), 2)
+            for extra_cmd_line in (b"", b" -dd", b" --no-eta", b" --no-eta -dd"):
+                self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"],
+                                       b"--exclude-index " + index_filename + extra_cmd_line)
+            with self.assertRaises(SystemExit) as cm:
+                btcrecover.parse_arguments(
+                    b"--exclude-passwordlist __funccall --build-exclude-index".split() + [index_filename],
+                    exclude_passwordlist=StringIO("exc1"))
+            self.assertIn("already exists, won't overwrite", cm.exception.code)
+        finally:
+            shutil.rmtree(temp_dir)
+    def test_exclude_index_runs(self):
+        passwords = [tstr(i) for i in xrange(0, 1000, 2)]
+        index_file = tempfile.TemporaryFile()
+        keys_per_run = btcrecover.EXCLUDE_INDEX_KEYS_PER_RUN
+        btcrecover.EXCLUDE_INDEX_KEYS_PER_RUN = 64  # so that several runs are merged
+        try:
+            self.assertEqual(btcrecover.build_exclude_index(StringIO("\n".join(passwords * 2)), index_file), 500)
+        finally:
+            btcrecover.EXCLUDE_INDEX_KEYS_PER_RUN = keys_per_run
+        index = btcrecover.ExcludeIndex(index_file)
+        self.assertEqual([tstr(i) in index for i in xrange(1000)], [i % 2 == 0 for i in xrange(1000)])
+        index.close()
+    def test_exclude_index_invalid(self):
+        with tempfile.NamedTemporaryFile() as index_file:
+            index_file.write(b"not an index" * 10)
+            index_file.flush()
+            self.expect_syntax_failure(["one"], "not an exclude index file", b"--exclude-index " + index_file.name)
+
 
 SAVESLOT_SIZE = 4096
 AUTOSAVE_ARGS = b"--autosave __funccall --tokenlist __funccall --data-extract --no-progress --threads 1".split()
@@ -772,6 +1152,64 @@ class Test06AutosaveRestore(unittest.TestCase):
                 data_extract = "bWI6ACkebfNQTLk75CfI5X3svX6AC7NFeGsgUxKNFg==")  # has a valid CRC
         self.assertIn("can't restore previous session: the encrypted key entered is not the same", cm.exception.code)
 
+    # With --no-dupchecks, the password position is also saved and then used to seek during a restore
+    def test_restore_position(self):
+        autosave_file = BytesIONonClosing()
+        btcrecover.parse_arguments(AUTOSAVE_ARGS + [b"-d"],
+            autosave     = autosave_file,
+            tokenlist    = StringIO(AUTOSAVE_TOKENLIST),
+            data_extract = AUTOSAVE_DATA_EXTRACT)
+        self.assertIn("Password search exhausted", btcrecover.main()[1])
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 9)
+        self.assertEqual(savestate.get(b"position"), (8, 8, 0))  # the last of 9 base passwords
+        #
+        # Move the saved position back to the fifth base password, and restore from there
+        savestate[b"skip"]     = 6
+        savestate[b"position"] = (4, 4, 0)
+        autosave_file.seek(SAVESLOT_SIZE)
+        autosave_file.truncate()
+        cPickle.dump(savestate, autosave_file, cPickle.HIGHEST_PROTOCOL)
+        btcrecover.parse_arguments(b"--restore __funccall".split(),
+            restore      = autosave_file,
+            tokenlist    = StringIO(AUTOSAVE_TOKENLIST),
+            data_extract = AUTOSAVE_DATA_EXTRACT)
+        password_iterator, skipped_count = btcrecover.password_generator_factory(sys.maxint)
+        self.assertEqual(skipped_count, 6)
+        self.assertEqual(password_iterator.next(), ["twothree", "onethreetwo", "onetwothree"])
+
+    # The duplicate cache saved beside the autosave file lets a restore skip counting passwords
+    def test_restore_dups_cache(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        try:
+            autosave_filename = os.path.join(temp_dir, "autosave")
+            tokenlist = "^one \n two \n two \n three \n"  # the duplicate tokens need duplicate checking
+            btcrecover.parse_arguments(AUTOSAVE_ARGS[:1] + [autosave_filename] + AUTOSAVE_ARGS[2:],
+                tokenlist    = StringIO(tokenlist),
+                data_extract = AUTOSAVE_DATA_EXTRACT)
+            self.assertIn("Password search exhausted", btcrecover.main()[1])
+            btcrecover.autosave_file.close()
+            self.assertTrue(os.path.isfile(autosave_filename + btcrecover.DUPS_CACHE_SUFFIX))
+            #
+            btcrecover.parse_arguments(b"--restore".split() + [autosave_filename],
+                tokenlist    = StringIO(tokenlist),
+                data_extract = AUTOSAVE_DATA_EXTRACT)
+            btcrecover.args.skip = 0
+            self.assertTrue(btcrecover.load_dups_cache())
+            self.assertEqual(btcrecover.token_combination_dups._run_number, 1)
+            self.assertEqual(list(btcrecover.password_generator(sys.maxint).next()),
+                ["one", "two", "onetwo", "twotwo", "onetwotwo", "three", "onethree", "threetwo", "twothree",
+                 "onethreetwo", "onetwothree", "threetwotwo", "twothreetwo", "twotwothree", "onethreetwotwo",
+                 "onetwothreetwo", "onetwotwothree"])
+            btcrecover.autosave_file.close()
+            #
+            # A cache from a different search (e.g. a changed data_extract) is ignored
+            btcrecover.savestate[b"key_crc"] += 1
+            self.assertFalse(btcrecover.load_dups_cache())
+        finally:
+            shutil.rmtree(temp_dir)
+
     # Using --restore, restore the autosave data created by test_autosave(),
     # but remove the last byte from slot 1 to make it invalid
     def test_restore_truncated(self):
@@ -823,6 +1261,17 @@ def can_load_protobuf():
             is_protobuf_loadable = False
     return is_protobuf_loadable
 
+is_numpy_loadable = None
+def can_load_numpy():
+    global is_numpy_loadable
+    if is_numpy_loadable is None:
+        try:
+            import numpy
+            is_numpy_loadable = True
+        except ImportError:
+            is_numpy_loadable = False
+    return is_numpy_loadable
+
 pylibscrypt = None
 def can_load_scrypt():
     global pylibscrypt
@@ -831,7 +1280,12 @@ def can_load_scrypt():
             import pylibscrypt
         except ImportError:
             pylibscrypt = False
-    return pylibscrypt and pylibscrypt._done  # True iff a binary implementation was found
+    if pylibscrypt and pylibscrypt._done:  # True iff a binary implementation was found
+        return True
+    return can_load_libcrypto() and hasattr(btcrecover.libcrypto, b"EVP_PBE_scrypt")
+
+def can_load_libcrypto():
+    return btcrecover.load_libcrypto() is not None
 
 
 class Test07WalletDecryption(unittest.TestCase):
@@ -865,6 +1319,9 @@ class Test07WalletDecryption(unittest.TestCase):
             ["btcr-wrong-password-1", "btcr-wrong-password-2"]), (False, 2))
         self.assertEqual(wallet.return_verified_password_or_false(
             ["btcr-wrong-password-3", correct_pass, "btcr-wrong-password-4"]), (correct_pass, 2))
+        if isinstance(wallet, btcrecover.PackedPasswordsWallet):
+            self.assertEqual(wallet.return_verified_packed_index_or_none(*btcrecover.pack_passwords(
+                ["btcr-wrong-password-3", correct_pass, "btcr-wrong-password-4"], wallet.encode_password)), (1, 2))
 
         del wallet
         self.assertTrue(filecmp.cmp(wallet_filename, temp_wallet_filename, False))  # False == always compare file contents
@@ -894,30 +1351,30 @@ class Test07WalletDecryption(unittest.TestCase):
         self.wallet_tester("multibit-wallet.key")
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_multibithd(self):
         self.wallet_tester("mbhd.wallet.aes")
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
     @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
-    @unittest.skipUnless(can_load_scrypt(),   "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
     def test_bitcoinj(self):
         self.wallet_tester("bitcoinj-wallet.wallet")
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
     @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
-    @unittest.skipUnless(can_load_scrypt(),   "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
     def test_androidpin(self):
         self.wallet_tester("android-bitcoin-wallet-backup",
                            android_backuppass="btcr-test-password", correct_pass="123456")
 
     @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
-    @unittest.skipUnless(can_load_scrypt(),   "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
     def test_androidpin_unencrypted(self):
         self.wallet_tester("bitcoinj-wallet.wallet", android_backuppass="IGNORED")
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_bither(self):
         self.wallet_tester("bither-wallet.db")
 
@@ -926,30 +1383,30 @@ class Test07WalletDecryption(unittest.TestCase):
         self.wallet_tester("msigna-wallet.vault")
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
-                         btcrecover.load_pbkdf2_library().__name__ == b"hashlib",
+                         hasattr(hashlib, b"pbkdf2_hmac"),
                          "requires PyCrypto and Python 2.7.8+")
     def test_blockchain_v0(self):
         self.wallet_tester("blockchain-v0.0-wallet.aes.json")
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
-                         btcrecover.load_pbkdf2_library().__name__ == b"hashlib",
+                         hasattr(hashlib, b"pbkdf2_hmac"),
                          "requires PyCrypto and Python 2.7.8+")
     def test_blockchain_v2(self):
         self.wallet_tester("blockchain-v2.0-wallet.aes.json")
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
-                         btcrecover.load_pbkdf2_library().__name__ == b"hashlib",
+                         hasattr(hashlib, b"pbkdf2_hmac"),
                          "requires PyCrypto and Python 2.7.8+")
     def test_blockchain_secondpass_v0(self):
         self.wallet_tester("blockchain-v0.0-wallet.aes.json", blockchain_mainpass="btcr-test-password")
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
-                         btcrecover.load_pbkdf2_library().__name__ == b"hashlib",
+                         hasattr(hashlib, b"pbkdf2_hmac"),
                          "requires PyCrypto and Python 2.7.8+")
     def test_blockchain_secondpass_v2(self):
         self.wallet_tester("blockchain-v2.0-wallet.aes.json", blockchain_mainpass="btcr-test-password")
 
-    @unittest.skipUnless(btcrecover.load_pbkdf2_library().__name__ == b"hashlib", "requires Python 2.7.8+")
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
     def test_blockchain_secondpass_unencrypted(self):  # this wallet has no second-password iter_count, so this case is also tested here
         self.wallet_tester("blockchain-unencrypted-wallet.aes.json", blockchain_mainpass="IGNORED")
 
@@ -976,22 +1433,22 @@ class Test07WalletDecryption(unittest.TestCase):
     def test_multibit_pp(self):
         self.wallet_tester("multibit-wallet.key", force_purepython=True)
 
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_multibithd_pp(self):
         self.wallet_tester("mbhd.wallet.aes", force_purepython=True)
 
     @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
-    @unittest.skipUnless(can_load_scrypt(),   "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
     def test_bitcoinj_pp(self):
         self.wallet_tester("bitcoinj-wallet.wallet", force_purepython=True)
 
     @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
-    @unittest.skipUnless(can_load_scrypt(),   "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
     def test_androidpin_pp(self):
         self.wallet_tester("android-bitcoin-wallet-backup", force_purepython=True,
                            android_backuppass="btcr-test-password", correct_pass="123456")
 
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_bither_pp(self):
         self.wallet_tester("bither-wallet.db", force_purepython=True)
 
@@ -1035,7 +1492,7 @@ class Test08BIP39Passwords(unittest.TestCase):
             ["btcr-wrong-password-3", correct_pw, "btcr-wrong-password-4"]), (correct_pw, 2))
 
     @unittest.skipUnless(can_load_armory(permit_unicode=True), "requires Armory")
-    @unittest.skipUnless(btcrecover.load_pbkdf2_library().__name__ == b"hashlib",
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"),
                          "requires Python 2.7.8+")
     def test_bip39_mpk(self):
         self.bip39_tester(
@@ -1084,10 +1541,12 @@ def has_any_opencl_devices():
 
 class Test08KeyDecryption(unittest.TestCase):
 
-    def key_tester(self, key_crc_base64, force_purepython = False, force_kdf_purepython = False, unicode_pw = False):
+    def key_tester(self, key_crc_base64, force_purepython = False, force_kdf_purepython = False, unicode_pw = False,
+                   force_sha512_lanes = False):
         btcrecover.load_from_base64_key(key_crc_base64)
         if force_purepython:     btcrecover.load_aes256_library(force_purepython=True)
         if force_kdf_purepython: btcrecover.load_pbkdf2_library(force_purepython=True)
+        if force_sha512_lanes:   btcrecover.loaded_wallet._sha512_lanes_min = 1
 
         correct_pw = "btcr-test-password" if not unicode_pw else "btcr-тест-пароль"
         self.assertEqual(btcrecover.return_verified_password_or_false(
@@ -1107,6 +1566,21 @@ class Test08KeyDecryption(unittest.TestCase):
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
     def test_bitcoincore_unicode(self):
         self.key_tester("YmM6XAL2X19VfzlKJfc+7LIeNrB2KC8E9DWe1YhhOchPoClvwftbuqjXKkfdAAARmggo", unicode_pw=True)
+    #
+    # The test key above uses too many iterations to verify with NumPy in a reasonable time when there
+    # are only a few passwords, so this encrypts a key (well, just its padding) with only a few iterations
+    @unittest.skipUnless(can_load_numpy(), "requires NumPy")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_bitcoincore_lanes(self):
+        import Crypto.Cipher.AES
+        salt, iter_count, iv = b"saltsalt", 5, b"\x42" * 16
+        derived_key = btcrecover.sha512_chain(b"btcr-test-password" + salt, iter_count)
+        self.assertEqual(btcrecover.sha512_chains_lanes([b"btcr-test-password" + salt, b""], iter_count),
+                         [derived_key, btcrecover.sha512_chain(b"", iter_count)])
+        padding  = Crypto.Cipher.AES.new(derived_key[:32], Crypto.Cipher.AES.MODE_CBC, iv).encrypt(b"\x10" * 16)
+        key_data = b"bc:" + struct.pack(b"< 32s 8s I", iv + padding, salt, iter_count)
+        self.key_tester(base64.b64encode(key_data + struct.pack(b"< I", zlib.crc32(key_data) & 0xffffffff)),
+                        force_sha512_lanes=True)
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
     def test_multibit(self):
@@ -1145,36 +1619,36 @@ class Test08KeyDecryption(unittest.TestCase):
         self.key_tester("bWI6TaEiZOBE+52jqe09jKcVa39KqvOpJxbpEtCVPQ==", unicode_pw=True)
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_multibithd(self):
         self.key_tester("bTI6LbH/+ROEa0cQ0inH7V3thbdFJV4=")
     #
     @unittest.skipUnless(tstr == unicode, "Unicode builds only")
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_multibithd_unicode(self):
         self.key_tester("bTI6M7wXqwXQWo4o22eN50PNnlkc/Qs=", unicode_pw=True)
 
     @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
-    @unittest.skipUnless(can_load_scrypt(),   "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
     def test_bitcoinj(self):
         self.key_tester("Ymo6MacXiCd1+6/qtPc5rCaj6qIGJbu5tX2PXQXqF4Df/kFrjNGMDMHqrwBAAAAIAAEAZwdBow==")
     #
     @unittest.skipUnless(tstr == unicode, "Unicode builds only")
     @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
-    @unittest.skipUnless(can_load_scrypt(),   "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
     def test_bitcoinj_unicode(self):
         self.key_tester("Ymo6hgWTejxVYfL/LLF4af8j2RfEsi5y16kTQhECWnn9iCt8AmGWPoPomQBAAAAIAAEAfNRA3A==", unicode_pw=True)
 
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
     def test_bither(self):
         self.key_tester("YnQ6PocfHvWGVbCzlVb9cUtPDjosnuB7RoyspTEzZZAqURlCsLudQaQ4IkIW8YE=")
     #
     @unittest.skipUnless(tstr == unicode, "Unicode builds only")
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
     def test_bither_unicode(self):
         self.key_tester("YnQ6ENNU1KSJlzC8FMfAq/MHgWgaZkxpiByt/vLQ/UdP2NlCsLudQaQ4IjTbPcw=", unicode_pw=True)
@@ -1207,34 +1681,34 @@ class Test08KeyDecryption(unittest.TestCase):
         self.key_tester("ZTI6k2tz83Lzs83hyQPRj2g90f7nVYHYM20qLv4NIVIzUNNqVWv8", unicode_pw=True)
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
-                         btcrecover.load_pbkdf2_library().__name__ == b"hashlib",
+                         hasattr(hashlib, b"pbkdf2_hmac"),
                          "requires PyCrypto and Python 2.7.8+")
     def test_blockchain_v0(self):
         self.key_tester("Yms69Z9y1J66ceYKkrXy11mHR+YDD8WrPJeTNaAnO7LO7YgAAAAAbnp7YQ==")
     #
     @unittest.skipUnless(tstr == unicode, "Unicode builds only")
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
-                         btcrecover.load_pbkdf2_library().__name__ == b"hashlib",
+                         hasattr(hashlib, b"pbkdf2_hmac"),
                          "requires PyCrypto and Python 2.7.8+")
     def test_blockchain_v0_unicode(self):
         self.key_tester("Yms68OsennSoypcGGUvhrhEBFCiIkAK2Qphnfdc3Ungk/SoAAAAAcr6jYQ==", unicode_pw=True)
 
     @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
-                         btcrecover.load_pbkdf2_library().__name__ == b"hashlib",
+                         hasattr(hashlib, b"pbkdf2_hmac"),
                          "requires PyCrypto and Python 2.7.8+")
     def test_blockchain_v2(self):
         self.key_tester("Yms6abF6aZYdu5sKpStKA4ihra6GEAeZTumFiIM0YQUkTjcQJwAAj8ekAQ==")
 
-    @unittest.skipUnless(btcrecover.load_pbkdf2_library().__name__ == b"hashlib", "requires Python 2.7.8+")
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
     def test_blockchain_secondpass(self):                # extracted from blockchain-v0.0-wallet.aes.json which has a second password iter_count
         self.key_tester("YnM6ujsYxz3SE7fEEekfMuIC1oII7KY//j5FMObBn7HydqVyjnaeTCZDAaC4LbJcVkxaCgAAACsWXkw=")
     #
     @unittest.skipUnless(tstr == unicode, "Unicode builds only")
-    @unittest.skipUnless(btcrecover.load_pbkdf2_library().__name__ == b"hashlib", "requires Python 2.7.8+")
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
     def test_blockchain_secondpass_unicode(self):
         self.key_tester("YnM6/e8Inpbesj+CYE0YvdXLewgN5UH9KFvliZrI43OmYnyHbCa71RBD57XO0CbuADDTCgAAACCVL/w=", unicode_pw=True)
 
-    @unittest.skipUnless(btcrecover.load_pbkdf2_library().__name__ == b"hashlib", "requires Python 2.7.8+")
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
     def test_blockchain_secondpass_no_iter_count(self):  # extracted from blockchain-unencrypted-wallet.aes.json which is missing a second password iter_count
         self.key_tester("YnM6ujsYxz3SE7fEEekfMuIC1oII7KY//j5FMObBn7HydqVyjnaeTCZDAaC4LbJcVkxaAAAAAE/24yM=")
 
@@ -1251,6 +1725,27 @@ class Test08KeyDecryption(unittest.TestCase):
     @unittest.skipUnless(tstr == unicode, "Unicode builds only")
     def test_multibit_unicode_pp(self):
         self.key_tester("bWI6YK6OX8bVP2Ar/j2dZBBQ+F0pEn8kZK6rlXiAWA==", force_purepython=True, unicode_pw=True)
+    #
+    # With enough passwords in a chunk, the pure python AES uses NumPy to decrypt with all their keys at once
+    @unittest.skipUnless(can_load_numpy(), "requires NumPy")
+    def test_multibit_numpy_pp(self):
+        btcrecover.load_from_base64_key("bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")
+        btcrecover.load_aes256_library(force_purepython=True)
+        passwords = ["btcr-wrong-password-" + tstr(i) for i in xrange(btcrecover.AES_KEYS_NUMPY_MIN)]
+        self.assertEqual(btcrecover.return_verified_password_or_false(passwords), (False, len(passwords)))
+        passwords[-2] = "btcr-test-password"
+        self.assertEqual(btcrecover.return_verified_password_or_false(passwords), ("btcr-test-password", len(passwords) - 1))
+
+    @unittest.skipUnless(can_load_numpy(), "requires NumPy")
+    def test_aes256_cbc_decrypt_keys_numpy(self):
+        btcrecover.load_aes256_library(force_purepython=True)
+        keys       = [os.urandom(32) for i in xrange(btcrecover.AES_KEYS_NUMPY_MIN)]
+        ivs        = [os.urandom(16) for i in xrange(btcrecover.AES_KEYS_NUMPY_MIN)]
+        ciphertext = os.urandom(16)
+        self.assertEqual(btcrecover.aes256_cbc_decrypt_keys(keys, ivs[0], ciphertext),
+                         [btcrecover.aes256_cbc_decrypt(key, ivs[0], ciphertext) for key in keys])
+        self.assertEqual(btcrecover.aes256_cbc_decrypt_keys(keys, ivs, ciphertext),
+                         [btcrecover.aes256_cbc_decrypt(key, iv, ciphertext) for key, iv in zip(keys, ivs)])
 
     def test_multidoge_pp(self):
         self.key_tester("bWI6IdK25nMhHI9n4zlb1cUtWBl7mL7gh7ZtxkYaDw==", force_purepython=True)
@@ -1273,32 +1768,32 @@ class Test08KeyDecryption(unittest.TestCase):
     def test_androidknc_unicode_pp(self):
         self.key_tester("bWI6TaEiZOBE+52jqe09jKcVa39KqvOpJxbpEtCVPQ==", force_purepython=True, unicode_pw=True)
 
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_multibithd_pp(self):
         self.key_tester("bTI6LbH/+ROEa0cQ0inH7V3thbdFJV4=", force_purepython=True)
     #
     @unittest.skipUnless(tstr == unicode,   "Unicode builds only")
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_multibithd_unicode_pp(self):
         self.key_tester("bTI6M7wXqwXQWo4o22eN50PNnlkc/Qs=", force_purepython=True, unicode_pw=True)
 
     @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
-    @unittest.skipUnless(can_load_scrypt(),   "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
     def test_bitcoinj_pp(self):
         self.key_tester("Ymo6MacXiCd1+6/qtPc5rCaj6qIGJbu5tX2PXQXqF4Df/kFrjNGMDMHqrwBAAAAIAAEAZwdBow==", force_purepython=True)
     #
     @unittest.skipUnless(tstr == unicode, "Unicode builds only")
     @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
-    @unittest.skipUnless(can_load_scrypt(),   "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
     def test_bitcoinj_unicode_pp(self):
         self.key_tester("Ymo6hgWTejxVYfL/LLF4af8j2RfEsi5y16kTQhECWnn9iCt8AmGWPoPomQBAAAAIAAEAfNRA3A==", force_purepython=True, unicode_pw=True)
 
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_bither_pp(self):
         self.key_tester("YnQ6PocfHvWGVbCzlVb9cUtPDjosnuB7RoyspTEzZZAqURlCsLudQaQ4IkIW8YE=", force_purepython=True)
     #
     @unittest.skipUnless(tstr == unicode, "Unicode builds only")
-    @unittest.skipUnless(can_load_scrypt(), "requires a binary implementation of pylibscrypt")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
     def test_bither_unicode_pp(self):
         self.key_tester("YnQ6ENNU1KSJlzC8FMfAq/MHgWgaZkxpiByt/vLQ/UdP2NlCsLudQaQ4IjTbPcw=", force_purepython=True, unicode_pw=True)
 
@@ -1333,6 +1828,91 @@ class Test08KeyDecryption(unittest.TestCase):
     def test_blockchain_v2_pp(self):
         self.key_tester("Yms6abF6aZYdu5sKpStKA4ihra6GEAeZTumFiIM0YQUkTjcQJwAAj8ekAQ==", force_purepython=True, force_kdf_purepython=True)
 
+    def test_pbkdf2_hmac_checkpoints(self):
+        btcrecover.load_pbkdf2_library(force_purepython=True)
+        for hash_name, key_len in (b"sha1", 32), (b"sha512", 64):
+            self.assertEqual(btcrecover.pbkdf2_hmac_checkpoints_purepython(hash_name, b"password", b"salt", (1, 2, 10), key_len),
+                             [btcrecover.pbkdf2_hmac(hash_name, b"password", b"salt", iter_count, key_len) for iter_count in (1, 2, 10)])
+
+    def test_pbkdf2_hmac_fixed_key(self):
+        btcrecover.load_pbkdf2_library(force_purepython=True)
+        salts = [b"salt", b"mnemonic", b""]
+        for hash_name, key_len in (b"sha1", 32), (b"sha512", 64), (b"sha512", 100):
+            self.assertEqual(btcrecover.pbkdf2_hmac_fixed_key_purepython(hash_name, b"password" * 20)(salts, 3, key_len),
+                             [btcrecover.pbkdf2_hmac(hash_name, b"password" * 20, salt, 3, key_len) for salt in salts])
+
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
+    def test_pbkdf2_hmac_purepython(self):
+        for hash_name, key_len in (b"sha1", None), (b"sha1", 32), (b"sha512", 64), (b"sha512", 150):
+            self.assertEqual(btcrecover.pbkdf2_hmac_purepython(hash_name, b"password", b"salt", 10, key_len),
+                             hashlib.pbkdf2_hmac(hash_name, b"password", b"salt", 10, key_len))
+
+    def test_calibration_file(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        saved_rates = btcrecover.calibration_rates
+        try:
+            btcrecover.calibration_filename = os.path.join(temp_dir, "calibration.json")
+            btcrecover.calibration_rates    = None
+            rate = btcrecover.calibrated_rate(b"test", b"xrange", lambda count: sum(xrange(count)))
+            self.assertGreater(rate, 0)
+            # Once it's saved, the rate is reloaded instead of being remeasured
+            btcrecover.calibration_rates = None
+            self.assertEqual(btcrecover.calibrated_rate(b"test", b"xrange", None), rate)
+            # but not after a library is installed or upgraded
+            try:
+                import numpy
+                self.assertIn(b"numpy-" + numpy.__version__, btcrecover.calibration_host_id())
+            except ImportError:
+                self.assertNotIn(b"numpy-", btcrecover.calibration_host_id())
+        finally:
+            btcrecover.calibration_filename = None
+            btcrecover.calibration_rates    = saved_rates
+            shutil.rmtree(temp_dir)
+
+    def test_fastest_backend(self):
+        saved_rates = btcrecover.calibration_rates
+        try:
+            btcrecover.calibration_rates = {b"test/a": 100.0, b"test/b": 120.0, b"test/c": 200.0}
+            self.assertEqual(btcrecover.fastest_backend(b"test", None, (b"a", None), (b"b", None)), b"a")  # within the margin
+            self.assertEqual(btcrecover.fastest_backend(b"test", None, (b"a", None), (b"c", None)), b"c")
+            #
+            # A candidate which fails is skipped
+            def failed_loader():
+                raise ValueError("unsupported hash type")
+            self.assertEqual(btcrecover.fastest_backend(b"test", None, (b"failed", failed_loader), (b"b", None)), b"b")
+            self.assertIn(b"test/failed", btcrecover.failed_backends)
+        finally:
+            btcrecover.calibration_rates = saved_rates
+            btcrecover.failed_backends.discard(b"test/failed")
+
+    @unittest.skipUnless(can_load_libcrypto(), "requires OpenSSL's libcrypto")
+    def test_libcrypto_aes(self):
+        keys = [struct.pack(b"32B", *range(i, i + 32)) for i in xrange(20)]
+        ivs  = [struct.pack(b"16B", *range(i, i + 16)) for i in xrange(20)]
+        ciphertext = hashlib.sha512(b"ciphertext").digest()[:48]
+        plaintexts = []
+        for backend in b"libcrypto", b"aespython":
+            btcrecover.load_aes256_library(backend=backend)
+            plaintexts.append((btcrecover.aes256_cbc_decrypt(keys[0], ivs[0], ciphertext),
+                               btcrecover.aes256_ofb_decrypt(keys[0], ivs[0], ciphertext),
+                               btcrecover.aes256_cbc_decrypt_keys(keys, ivs,    ciphertext[:16]),
+                               btcrecover.aes256_cbc_decrypt_keys(keys, ivs[0], ciphertext[:16])))
+        self.assertEqual(plaintexts[0], plaintexts[1])
+
+    @unittest.skipUnless(can_load_libcrypto(), "requires OpenSSL's libcrypto")
+    def test_libcrypto_pbkdf2(self):
+        btcrecover.load_pbkdf2_library(backend=b"libcrypto")
+        for hash_name, key_len in (b"sha1", None), (b"sha1", 32), (b"sha512", 64), (b"sha512", 150):
+            self.assertEqual(btcrecover.pbkdf2_hmac(hash_name, b"password", b"salt", 10, key_len),
+                             btcrecover.pbkdf2_hmac_purepython(hash_name, b"password", b"salt", 10, key_len))
+
+    @unittest.skipUnless(can_load_libcrypto() and hasattr(btcrecover.libcrypto, b"EVP_PBE_scrypt"),
+                         "requires OpenSSL 1.1.0+'s libcrypto")
+    def test_libcrypto_scrypt(self):
+        btcrecover.load_scrypt_library(backend=b"libcrypto")
+        self.assertEqual(btcrecover.scrypt(b"password", b"NaCl", 1024, 8, 16, 64), base64.b16decode(   # from RFC 7914
+            b"FDBABE1C9D3472007856E7190D01E9FE7C6AD7CBC8237830E77376634B3731622EAF30D92E22A3886FF109279D9830DAC727AFB94A83EE6D8360CBDFA2CC0640"))
+
     def test_blockchain_secondpass_pp(self):                # extracted from blockchain-v0.0-wallet.aes.json which has a second password iter_count
         self.key_tester("YnM6ujsYxz3SE7fEEekfMuIC1oII7KY//j5FMObBn7HydqVyjnaeTCZDAaC4LbJcVkxaCgAAACsWXkw=", force_kdf_purepython=True)
     #
@@ -1497,6 +2077,71 @@ E2E_ARGS = b"--tokenlist __funccall --exclude-passwordlist __funccall --data-ext
 E2E_TOKENLIST    = "+ ^%0,1[b-c]tcr-- \n"  "+ ^,$%0,1<Test- \n"  "^3$pas \n"  "+ wrod$"
 E2E_EXCLUDELIST  = "tCr--Test-wrod\n" "btcr-Tsett-paaswrod\n" "ctcr--Test-pAssrwod"  # passwords #4, #100004, & #120004
 E2E_DATA_EXTRACT = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA=="
+E2E_COORDINATOR_SECRET = b"e2e-secret"
+# Target functions for the worker processes of Test09EndToEnd.test_coordinator()
+def e2e_coordinated_worker(address, threads):
+    while not os.path.exists(address):
+        time.sleep(0.05)
+    autosave_index = E2E_ARGS.index(b"--autosave")
+    btcrecover.parse_arguments(E2E_ARGS[:autosave_index] + E2E_ARGS[autosave_index+2:] +
+                               [b"--coordinated-by", address, b"--threads", threads,
+                                b"--coordinator-secret", E2E_COORDINATOR_SECRET],
+        tokenlist            = StringIO(E2E_TOKENLIST),
+        exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+        data_extract         = E2E_DATA_EXTRACT)
+    btcrecover.main()
+#
+# Connects to the coordinator, optionally authenticating with secret
+def e2e_connect(address, secret = None):
+    while not os.path.exists(address):
+        time.sleep(0.05)
+    worker = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    worker.connect(address)
+    if secret is not None:
+        worker.sendall(b'{"hello": true}\n')
+        challenge = base64.b16decode(json.loads(worker.recv(1024))["challenge"])
+        worker.sendall(json.dumps({"auth": hmac.new(secret, challenge, hashlib.sha256).hexdigest()}) + b"\n")
+        assert json.loads(worker.recv(1024)) == {"ok": True}
+    return worker
+#
+# Leases a range and then fails without finishing it
+def e2e_failed_worker(address):
+    worker = e2e_connect(address, E2E_COORDINATOR_SECRET)
+    worker.sendall(b'{"request": true}\n')
+    worker.recv(1024)
+    worker.close()
+#
+# Sends messages which should each cause the coordinator to disconnect it (without affecting the search)
+def e2e_invalid_worker(address):
+    for secret, message in (
+            (None,                   b'[not json'),
+            (None,                   b'{"found": "d3JvbmctcGFzc3dvcmQ="}'),  # not authenticated
+            (b"wrong-secret",        None),
+            (E2E_COORDINATOR_SECRET, b'{"completed": [0, 1000000], "bases": 1000000, "passwords": 0, "seconds": 1}'),
+            (E2E_COORDINATOR_SECRET, b'{"completed": "0-1"}'),
+            (E2E_COORDINATOR_SECRET, b'["request"]')):
+        try:
+            worker = e2e_connect(address, secret)
+        except (AssertionError, ValueError):
+            assert secret != E2E_COORDINATOR_SECRET
+            continue  # the wrong secret was rejected
+        assert message, "the wrong secret was accepted"
+        worker.sendall(message + b"\n")
+        assert worker.recv(1024) == b"", "the invalid message was accepted"
+        worker.close()
+
+#
+# Sends messages without ever reading the replies until the coordinator disconnects it
+def e2e_stalled_worker(address):
+    worker = e2e_connect(address, E2E_COORDINATOR_SECRET)
+    give_up_at = time.time() + 60.0
+    try:
+        while time.time() < give_up_at:
+            worker.sendall(b'{"heartbeat": true}\n' * 1000)
+    except socket.error:
+        return
+    assert False, "the stalled worker wasn't disconnected"
+
 class Test09EndToEnd(unittest.TestCase):
 
     autosave_file = BytesIONonClosing()
@@ -1528,6 +2173,195 @@ class Test09EndToEnd(unittest.TestCase):
         savestate = cPickle.load(autosave_file)
         self.assertEqual(savestate.get(b"skip"), 103762)
 
+    # Repeat the first test with a coordinator handing out parts of the search to local worker processes
+    # (one of which fails after being given its first part, one of which only sends invalid messages, and one
+    # of which stops reading the replies), while the coordinator autosaves the progress
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix domain sockets are not supported")
+    def test_coordinator(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        try:
+            address = os.path.join(temp_dir, "coordinator")
+            workers = [multiprocessing.Process(target=e2e_failed_worker,  args=(address,)),
+                       multiprocessing.Process(target=e2e_invalid_worker, args=(address,)),
+                       multiprocessing.Process(target=e2e_stalled_worker, args=(address,))] + \
+                      [multiprocessing.Process(target=e2e_coordinated_worker, args=(address, threads)) for threads in (b"1", b"2")]
+            for worker in workers:
+                worker.start()
+            autosave_file = BytesIONonClosing()
+            btcrecover.parse_arguments(E2E_ARGS + [b"--coordinator", address, b"--coordinator-secret", E2E_COORDINATOR_SECRET],
+                tokenlist            = StringIO(E2E_TOKENLIST),
+                exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+                data_extract         = E2E_DATA_EXTRACT,
+                autosave             = autosave_file)
+            self.assertEqual("btcr-test-password", btcrecover.main()[0])
+            for worker in workers:
+                worker.join()
+                self.assertEqual(worker.exitcode, 0)
+        finally:
+            shutil.rmtree(temp_dir)
+        self.assertFalse(os.path.exists(address))
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertIn(b"coordinator", savestate)
+
+    # Repeat the first test with a new autosave file using worker processes: the passwords are counted in parallel,
+    # and the duplicates found by the counting processes finish this process's duplicate checkers' first run (so
+    # they can be cached) before searching
+    def test_threads_dupchecks(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        try:
+            autosave_filename = os.path.join(temp_dir, "autosave")
+            args = E2E_ARGS[:]
+            args[args.index(b"--autosave") + 1] = autosave_filename
+            btcrecover.parse_arguments(args + [b"--threads", b"3"],
+                tokenlist            = StringIO(E2E_TOKENLIST),
+                exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+                data_extract         = E2E_DATA_EXTRACT)
+            self.assertTrue(btcrecover.can_count_in_parallel())
+            self.assertEqual("btcr-test-password", btcrecover.main()[0])
+            self.assertEqual(btcrecover.password_dups._run_number, 1)  # (the search didn't finish its run)
+            self.assertTrue(os.path.isfile(autosave_filename + btcrecover.DUPS_CACHE_SUFFIX))
+            btcrecover.autosave_file.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    # Calling main() again with the same wallet after a search which finished normally
+    # reuses the worker processes and the measured verification speed
+    def test_reuse_worker_pool(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --data-extract --threads 3 --no-progress".split(),
+            tokenlist    = StringIO("one two three"),
+            data_extract = E2E_DATA_EXTRACT)
+        self.assertEqual(btcrecover.main(), (False, "Password search exhausted"))
+        idle_worker_pool     = btcrecover.idle_worker_pool
+        measured_performance = btcrecover.measured_performance
+        self.assertIsNotNone(idle_worker_pool)
+        #
+        wallet = btcrecover.loaded_wallet
+        btcrecover.parse_arguments(b"--tokenlist __funccall --threads 3 --no-progress".split(),
+            tokenlist = StringIO("four five"), wallet = wallet)
+        self.assertEqual(btcrecover.main(), (False, "Password search exhausted"))
+        self.assertIs(btcrecover.idle_worker_pool[0], idle_worker_pool[0])
+        self.assertIs(btcrecover.measured_performance, measured_performance)
+        #
+        # A pool with a different number of workers isn't reused
+        btcrecover.parse_arguments(b"--tokenlist __funccall --threads 2 --no-progress".split(),
+            tokenlist = StringIO("six seven"), wallet = wallet)
+        self.assertEqual(btcrecover.main(), (False, "Password search exhausted"))
+        self.assertIsNot(btcrecover.idle_worker_pool[0], idle_worker_pool[0])
+        self.assertLess(btcrecover.idle_worker_pool[2], idle_worker_pool[2])
+        #
+        btcrecover.parse_arguments(b"--tokenlist __funccall --threads 3 --no-progress".split(),
+            tokenlist = StringIO("btcr-test-password"), wallet = wallet)
+        self.assertEqual(btcrecover.main()[0], "btcr-test-password")
+        self.assertIsNone(btcrecover.idle_worker_pool)
+
+    # Repeat the first test without an autosave file, with each worker generating its own passwords
+    @unittest.skipIf(sys.platform == "win32", "--shard-generation is not supported on Windows")
+    def test_shard_generation(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --exclude-passwordlist __funccall --data-extract --typos 3"
+                                   b" --typos-case --typos-repeat --typos-swap --no-progress --shard-generation --threads 3".split(),
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT)
+        self.assertEqual(btcrecover.args.no_dupchecks, 1)
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+
+    # If a shard's process dies without sending its final result, the search ends instead of hanging
+    @unittest.skipIf(sys.platform == "win32", "--shard-generation is not supported on Windows")
+    def test_shard_died(self):
+        results_queue = multiprocessing.Queue()
+        shard_processes = [multiprocessing.Process(target=results_queue.put, args=(None,)),
+                           multiprocessing.Process(target=os._exit, args=(9,))]
+        for process in shard_processes:
+            process.start()
+        with self.assertRaises(SystemExit) as cm:
+            list(btcrecover.shard_results_iterator(results_queue, shard_processes))
+        self.assertIn("a worker process exited unexpectedly (exit code 9)", cm.exception.code)
+
+    # Repeat the first test with a new autosave file, using worker processes which receive passwords via
+    # shared memory in chunks whose size varies, and make sure the autosaved password number is still exact
+    @unittest.skipIf(sys.platform == "win32", "shared memory password slots are not supported on Windows")
+    def test_shared_memory(self):
+        autosave_file = BytesIONonClosing()
+        btcrecover.parse_arguments(E2E_ARGS + [b"--threads", b"3"],
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = autosave_file)
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 103762)
+
+    # Repeat the first test with a new autosave file, using worker threads which share the wallet
+    # instead of worker processes, and make sure the autosaved password number is still exact
+    def test_backend_threads(self):
+        autosave_file = BytesIONonClosing()
+        btcrecover.parse_arguments(E2E_ARGS + [b"--threads", b"3", b"--backend", b"threads"],
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = autosave_file)
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 103762)
+
+    # With --backend auto, the faster backend is chosen (and remembered for the same wallet)
+    def test_backend_auto(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --data-extract --threads 2 --no-progress --backend auto".split(),
+            tokenlist    = StringIO("one two btcr-test-password"),
+            data_extract = E2E_DATA_EXTRACT)
+        packed_chunks = btcrecover.SharedPasswordSlots.packed_chunks
+        packed_chunks_calls = [0]
+        def counting_packed_chunks(self, password_iterator):
+            packed_chunks_calls[0] += 1
+            return packed_chunks(self, password_iterator)
+        btcrecover.SharedPasswordSlots.packed_chunks = counting_packed_chunks
+        try:
+            self.assertEqual(btcrecover.main()[0], "btcr-test-password")
+        finally:
+            btcrecover.SharedPasswordSlots.packed_chunks = packed_chunks
+        wallet, workers, backend = btcrecover.measured_backend
+        self.assertIs(wallet, btcrecover.loaded_wallet)
+        self.assertIn(workers, (1, 2))  # (one fewer is spawned if the main thread also counts as a worker)
+        self.assertIn(backend, ("processes", "threads"))
+        if sys.platform != "win32":
+            # The processes were benchmarked using shared memory (twice, after waiting for them to start)
+            self.assertGreaterEqual(packed_chunks_calls[0], 2)
+        #
+        # When threads were chosen earlier, no process pool is opened for the next search
+        btcrecover.measured_backend = wallet, workers, "threads"
+        btcrecover.parse_arguments(b"--tokenlist __funccall --threads 2 --no-progress --backend auto".split(),
+            tokenlist = StringIO("one two btcr-test-password"), wallet = wallet)
+        open_worker_pool = btcrecover.open_worker_pool
+        btcrecover.open_worker_pool = None  # (calling it would raise a TypeError)
+        try:
+            self.assertEqual(btcrecover.main()[0], "btcr-test-password")
+        finally:
+            btcrecover.open_worker_pool = open_worker_pool
+
+    @unittest.skipIf(sys.platform == "win32", "--background-count is not supported on Windows")
+    def test_background_count(self):
+        autosave_file = BytesIONonClosing()
+        btcrecover.parse_arguments(E2E_ARGS + [b"--background-count"],
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = autosave_file)
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 103762)
+
+    def test_eta_sample(self):
+        btcrecover.parse_arguments(E2E_ARGS + [b"--eta-sample"],
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = BytesIONonClosing())
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+
     # Repeat the first test with a new autosave file, using --skip to start just after the password is located
     def test_skip(self):
         autosave_file = BytesIONonClosing()
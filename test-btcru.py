@@ -0,0 +1,2474 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# test-btcr.py -- unit tests for btcrecovery.py
+# Copyright (C) 2014, 2015 Christopher Gurnee
+#
+# This file is part of btcrecover.
+#
+# btcrecover is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version
+# 2 of the License, or (at your option) any later version.
+#
+# btcrecover is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses/
+
+# If you find this program helpful, please consider a small
+# donation to the developer at the following Bitcoin address:
+#
+#           17LGpN2z62zp7RS825jXwYtE7zZ19Mxxu8
+#
+#                      Thank You!
+
+# (all futures as of 2.6 and 2.7 except unicode_literals)
+from __future__ import print_function, absolute_import, division, \
+                       generators, nested_scopes, with_statement
+
+# Uncomment for Unicode support (and comment out the next block)
+from __future__ import unicode_literals
+import btcrecoveru as btcrecover, io
+StringIOSubclassable = io.StringIO
+BytesIO  = io.BytesIO
+StringIO = io.StringIO
+tstr = unicode
+tchr = unichr
+
+# Uncomment for ASCII-only support (and comment out the previous block)
+#import btcrecover, StringIO, cStringIO
+#StringIOSubclassable = StringIO.StringIO
+#BytesIO  = StringIO.StringIO
+#StringIO = cStringIO.StringIO
+#tstr = str
+#tchr = chr
+
+import warnings
+# Convert warnings to errors:
+warnings.simplefilter("error")
+# except this from Intel's OpenCL compiler:
+warnings.filterwarnings("ignore", r"Non-empty compiler output encountered\. Set the environment variable PYOPENCL_COMPILER_OUTPUT=1 to see more\.", UserWarning)
+# and except this from Armory:
+warnings.filterwarnings("ignore", r"the sha module is deprecated; use the hashlib module instead", DeprecationWarning)
+
+import unittest, os, cPickle, tempfile, shutil, filecmp, sys, time, random, socket, multiprocessing, base64, struct, zlib, hashlib, \
+       hmac, json, threading, collections
+
+# Measure crypto backends afresh instead of using (or overwriting) the user's calibration file
+btcrecover.calibration_filename = None
+
+wallet_dir = os.path.join(os.path.dirname(__file__), "test-wallets")
+typos_dir  = os.path.join(os.path.dirname(__file__), "typos")
+
+
+class NonClosingBase(object):
+    pass
+
+class StringIONonClosing(StringIOSubclassable, NonClosingBase):
+    def close(self): pass
+
+class BytesIONonClosing(BytesIO, NonClosingBase):
+    def close(self): pass
+
+class GeneratorTester(unittest.TestCase):
+
+    # tokenlist == a list of lines (w/o "\n") which will become the tokenlist file
+    # expected_passwords == a list of passwords which should be produced from the tokenlist
+    # extra_cmd_line == a single string of additional command-line options
+    # test_passwordlist == whether or not to also test --passwordlist
+    # chunksize == the password generator chunksize
+    # expected_skipped == the expected # of skipped passwords, if any
+    # extra_kwds == additional StringIO objects to act as file stand-ins
+    def do_generator_test(self, tokenlist, expected_passwords, extra_cmd_line = b"", test_passwordlist = False,
+                          chunksize = sys.maxint, expected_skipped = None, **extra_kwds):
+        assert isinstance(tokenlist, list)
+        assert isinstance(expected_passwords, list)
+        tokenlist_str = "\n".join(tokenlist)
+        args          = (b" __funccall --listpass "+extra_cmd_line).split()
+
+        btcrecover.parse_arguments([b"--tokenlist"] + args, tokenlist=StringIO(tokenlist_str), **extra_kwds)
+        tok_it, skipped = btcrecover.password_generator_factory(chunksize)
+        if expected_skipped is not None:
+            self.assertEqual(skipped, expected_skipped)
+        try:
+            self.assertEqual(tok_it.next(), expected_passwords)
+        except StopIteration:
+            self.assertEqual([], expected_passwords)
+        if not test_passwordlist: return tok_it,
+
+        # Reset any files passed in as extra parameters
+        for sio in filter(lambda s: isinstance(s, NonClosingBase), extra_kwds.values()):
+            sio.seek(0)
+
+        btcrecover.parse_arguments([b"--passwordlist"] + args, passwordlist=StringIO(tokenlist_str), **extra_kwds)
+        pwl_it, skipped = btcrecover.password_generator_factory(chunksize)
+        if expected_skipped is not None:
+            self.assertEqual(skipped, expected_skipped)
+        try:
+            self.assertEqual(pwl_it.next(), expected_passwords)
+        except StopIteration:
+            self.assertEqual([], expected_passwords)
+        return tok_it, pwl_it
+
+    # tokenlist == a list of lines (w/o "\n") which will become the tokenlist file
+    # expected_error == a (partial) error message that should be produced from the tokenlist
+    # extra_cmd_line == a single string of additional command-line options
+    # extra_kwds == additional StringIO objects to act as file stand-ins
+    def expect_syntax_failure(self, tokenlist, expected_error, extra_cmd_line = b"", **extra_kwds):
+        assert isinstance(tokenlist, list)
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.parse_arguments(
+                (b"--tokenlist __funccall --listpass "+extra_cmd_line).split(),
+                tokenlist = StringIO("\n".join(tokenlist)),
+                **extra_kwds)
+        self.assertIn(expected_error, cm.exception.code)
+
+
+class Test01Basics(GeneratorTester):
+
+    def test_alternate(self):
+        self.do_generator_test(["one", "two"], ["one", "two", "twoone", "onetwo"])
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_alternate_unicode(self):
+        self.do_generator_test(["один", "два"], ["один", "два", "дваодин", "одиндва"])
+
+    def test_mutex(self):
+        self.do_generator_test(["one two three"], ["one", "two", "three"])
+
+    def test_require(self):
+        self.do_generator_test(["one", "+ two", "+ three"],
+            ["threetwo", "twothree", "threetwoone", "threeonetwo",
+            "twothreeone", "twoonethree", "onethreetwo", "onetwothree"])
+
+    def test_chunksize_divisible(self):
+        tok_it, = self.do_generator_test(["one two three four five six"], ["one", "two", "three"], b"", False, 3)
+        self.assertEqual(tok_it.next(), ["four", "five", "six"])
+        self.assertRaises(StopIteration, tok_it.next)
+    def test_chunksize_indivisible(self):
+        tok_it, = self.do_generator_test(["one two three four five"], ["one", "two", "three"], b"", False, 3)
+        self.assertEqual(tok_it.next(), ["four", "five"])
+        self.assertRaises(StopIteration, tok_it.next)
+    def test_chunksize_modified(self):
+        tok_it, = self.do_generator_test(["one two three four five six"], ["one", "two"], b"", False, 2)
+        self.assertIsNone(tok_it.send( (3, False) ))
+        self.assertEqual(tok_it.next(), ["three", "four", "five"])
+        self.assertEqual(tok_it.next(), ["six"])
+        self.assertRaises(StopIteration, tok_it.next)
+
+    def test_only_yield_count(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("one two three four five six"))
+        tok_it = btcrecover.password_generator(2, only_yield_count=True)
+        self.assertEqual(tok_it.next(), 2)
+        self.assertIsNone(tok_it.send( (3, True) ))
+        self.assertEqual(tok_it.next(), 3)
+        self.assertIsNone(tok_it.send( (3, False) ))
+        self.assertEqual(tok_it.next(), ["six"])
+        self.assertRaises(StopIteration, tok_it.next)
+
+        btcrecover.parse_arguments(b"--passwordlist __funccall --listpass".split(),
+            passwordlist = StringIO("one two three four five six".replace(" ", "\n")))
+        pwl_it = btcrecover.password_generator(2, only_yield_count=True)
+        self.assertEqual(pwl_it.next(), 2)
+        self.assertIsNone(pwl_it.send( (3, True) ))
+        self.assertEqual(pwl_it.next(), 3)
+        self.assertIsNone(pwl_it.send( (3, False) ))
+        self.assertEqual(pwl_it.next(), ["six"])
+        self.assertRaises(StopIteration, pwl_it.next)
+
+    def test_only_yield_count_all(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("one two three"))
+        tok_it = btcrecover.password_generator(4, only_yield_count=True)
+        self.assertEqual(tok_it.next(), 3)
+        self.assertRaises(StopIteration, tok_it.next)
+
+        btcrecover.parse_arguments(b"--passwordlist __funccall --listpass".split(),
+            passwordlist = StringIO("one two three".replace(" ", "\n")))
+        pwl_it = btcrecover.password_generator(4, only_yield_count=True)
+        self.assertEqual(pwl_it.next(), 3)
+        self.assertRaises(StopIteration, pwl_it.next)
+
+    def test_count(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("one two three"))
+        self.assertEqual(btcrecover.count_and_check_eta(1.0), 3)
+    def test_count_zero(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO(""))
+        self.assertEqual(btcrecover.count_and_check_eta(1.0), 0)
+    # the size of a "chunk" is == btcrecover.PASSWORDS_BETWEEN_UPDATES == 100000
+    def test_count_one_chunk(self):
+        assert btcrecover.PASSWORDS_BETWEEN_UPDATES == 100000
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("%5d"))
+        self.assertEqual(btcrecover.count_and_check_eta(1.0), 100000)
+    def test_count_two_chunks(self):
+        assert btcrecover.PASSWORDS_BETWEEN_UPDATES == 100000
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("%5d 100000"))
+        self.assertEqual(btcrecover.count_and_check_eta(1.0), 100001)
+
+    def test_token_counts_min_0(self):
+        self.do_generator_test(["one"], ["", "one"], b"--min-tokens 0")
+    def test_token_counts_min_2(self):
+        self.do_generator_test(["one", "two", "three"],
+            ["twoone", "onetwo", "threeone", "onethree", "threetwo", "twothree", "threetwoone",
+            "threeonetwo", "twothreeone", "twoonethree", "onethreetwo", "onetwothree"],
+            b"--min-tokens 2")
+    def test_token_counts_max_2(self):
+        self.do_generator_test(["one", "two", "three"],
+            ["one", "two", "twoone", "onetwo", "three", "threeone", "onethree", "threetwo", "twothree"],
+            b"--max-tokens 2")
+    def test_token_counts_min_max_2(self):
+        self.do_generator_test(["one", "two", "three"],
+            ["twoone", "onetwo", "threeone", "onethree", "threetwo", "twothree"],
+            b"--min-tokens 2 --max-tokens 2")
+
+    def test_empty_file(self):
+        self.do_generator_test([], [], test_passwordlist=True)
+    def test_one_char_file(self):
+        self.do_generator_test(["a"], ["a"], test_passwordlist=True)
+    def test_comments(self):
+        self.do_generator_test(["#one", " #two", "#three"], ["#two"])
+
+    def test_z_all(self):
+        self.do_generator_test(["1", "2 3", "+ 4 5"], map(tstr, [
+            4,41,14,42,24,421,412,241,214,142,124,43,34,431,413,341,314,143,134,
+            5,51,15,52,25,521,512,251,215,152,125,53,35,531,513,351,315,153,135]))
+
+
+class Test02Anchors(GeneratorTester):
+
+    def test_begin(self):
+        self.do_generator_test(["^one", "^two", "three"],
+            ["one", "two", "three", "onethree", "twothree"])
+    def test_begin_0len(self):
+        self.do_generator_test(["^"], [""])
+
+    def test_end(self):
+        self.do_generator_test(["one$", "two$", "three"],
+            ["one", "two", "three", "threeone", "threetwo"])
+    def test_end_0len(self):
+        self.do_generator_test(["$"], [""])
+
+    def test_begin_and_end(self):
+        self.expect_syntax_failure(["^one$"], "token on line 1 is anchored with both ^ at the beginning and $ at the end")
+
+    def test_positional(self):
+        self.do_generator_test(["one", "^2^two", "^3^three"], ["one", "onetwo", "onetwothree"])
+    def test_positional_old(self):
+        self.do_generator_test(["one", "^2$two", "^3$three"], ["one", "onetwo", "onetwothree"])
+    def test_positional_0len(self):
+        self.do_generator_test(["+ ^1^", "^2^two"], ["", "two"])
+
+    def test_positional_invalid(self):
+        self.expect_syntax_failure(["^0^zero"], "anchor position of token on line 1 must be 1 or greater")
+
+    def test_middle(self):
+        self.do_generator_test(["^one", "^2,2^two", "^,3^three", "^,^four", "five$"],
+            ["one", "five", "onefive", "onetwofive", "onethreefive", "onetwothreefive", "onefourfive",
+            "onetwofourfive", "onefourthreefive", "onethreefourfive", "onetwothreefourfive"])
+    def test_middle_old(self):
+        self.do_generator_test(["^one", "^2,2$two", "^,3$three", "^,$four", "five$"],
+            ["one", "five", "onefive", "onetwofive", "onethreefive", "onetwothreefive", "onefourfive",
+            "onetwofourfive", "onefourthreefive", "onethreefourfive", "onetwothreefourfive"])
+    def test_middle_0len(self):
+        self.do_generator_test(["one", "+ ^,^", "^3^three"], ["onethree"])
+
+    def test_middle_invalid_begin(self):
+        self.expect_syntax_failure(["^1,^one"],  "anchor range of token on line 1 must begin with 2 or greater")
+    def test_middle_invalid_range(self):
+        self.expect_syntax_failure(["^3,2^one"], "anchor range of token on line 1 is invalid")
+    def test_not_middle(self):
+        self.do_generator_test(["^2,3one"], ["2,3one"])
+
+    # test for the bug fixed in v0.11.1
+    def test_tokens_duplicate(self):
+        self.do_generator_test(["one", "one", "^,$two"], ["one", "oneone", "onetwoone"], b"-d")
+
+
+LEET_MAP_FILE = os.path.join(typos_dir, "leet-map.txt")
+class Test03WildCards(GeneratorTester):
+
+    def test_basics_1(self):
+        self.do_generator_test(["%d"], map(tstr, xrange(10)), b"--has-wildcards", True)
+    def test_basics_2(self):
+        self.do_generator_test(["%dtest"], [tstr(i)+"test" for i in xrange(10)], b"--has-wildcards", True)
+    def test_basics_3(self):
+        self.do_generator_test(["te%dst"], ["te"+tstr(i)+"st" for i in xrange(10)], b"--has-wildcards", True)
+    def test_basics_4(self):
+        self.do_generator_test(["test%d"], ["test"+tstr(i) for i in xrange(10)], b"--has-wildcards", True)
+
+    def test_invalid_nocust(self):
+        self.expect_syntax_failure(["%c"],    "invalid wildcard")
+    def test_invalid_nocust_cap(self):
+        self.expect_syntax_failure(["%C"],    "invalid wildcard")
+    def test_invalid_notype(self):
+        self.expect_syntax_failure(["test%"], "invalid wildcard")
+
+    def test_multiple(self):
+        self.do_generator_test(["%d%d"], ["{:02}".format(i) for i in xrange(100)], b"--has-wildcards", True)
+
+    def test_length_2(self):
+        self.do_generator_test(["%2d"],  ["{:02}".format(i) for i in xrange(100)], b"--has-wildcards", True)
+    def test_length_range(self):
+        self.do_generator_test(["%0,2d"],
+            [""] +
+            map(tstr, xrange(10)) +
+            ["{:02}".format(i) for i in xrange(100)],
+            b"--has-wildcards", True)
+
+    def test_length_invalid_range(self):
+        self.expect_syntax_failure(["%2,1d"], "on line 1: max wildcard length (1) must be >= min length (2)")
+    def test_invalid_length_1(self):
+        self.expect_syntax_failure(["%2,d"],  "invalid wildcard")
+    def test_invalid_length_2(self):
+        self.expect_syntax_failure(["%,2d"],  "invalid wildcard")
+
+    def test_case_lower(self):
+        self.do_generator_test(["%a"], map(tchr, xrange(ord("a"), ord("z")+1)), b"--has-wildcards", True)
+    def test_case_upper(self):
+        self.do_generator_test(["%A"], map(tchr, xrange(ord("A"), ord("Z")+1)), b"--has-wildcards", True)
+    def test_case_insensitive_1(self):
+        self.do_generator_test(["%ia"],
+            map(tchr, xrange(ord("a"), ord("z")+1)) + map(tchr, xrange(ord("A"), ord("Z")+1)), b"--has-wildcards", True)
+    def test_case_insensitive_2(self):
+        self.do_generator_test(["%iA"],
+            map(tchr, xrange(ord("A"), ord("Z")+1)) + map(tchr, xrange(ord("a"), ord("z")+1)), b"--has-wildcards", True)
+
+    def test_custom(self):
+        self.do_generator_test(["%c"],  ["a", "b", "c", "D", "2"], b"--has-wildcards --custom-wild a-cD2", True)
+    def test_custom_upper(self):
+        self.do_generator_test(["%C"],  ["A", "B", "C", "D", "2"], b"--has-wildcards --custom-wild a-cD2", True)
+    def test_custom_insensitive_1(self):
+        self.do_generator_test(["%ic"], ["a", "b", "c", "D", "2", "A", "B", "C", "d"],
+            b"--has-wildcards --custom-wild a-cD2 -d", True)
+    def test_custom_insensitive_2(self):
+        self.do_generator_test(["%iC"], ["A", "B", "C", "d", "2", "a", "b", "c", "D"],
+            b"--has-wildcards --custom-wild a-cD2 -d", True)
+
+    def test_set(self):
+        self.do_generator_test(["%[abcc-]"], ["a", "b", "c", "-"], b"--has-wildcards -d", True)
+    def test_set_insensitive(self):
+        self.do_generator_test(["%i[abcc-]"], ["a", "b", "c", "-", "A", "B", "C"], b"--has-wildcards -d", True)
+    def test_noset(self):
+        self.do_generator_test(["%%[not-a-range]"], ["%[not-a-range]"], b"--has-wildcards", True)
+
+    def test_range_1(self):
+        self.do_generator_test(["%[1dc-f]"],  ["1", "d", "c", "e", "f"], b"--has-wildcards -d", True)
+    def test_range_2(self):
+        self.do_generator_test(["%[a-c-e]"], ["a", "b", "c", "-", "e"], b"--has-wildcards", True)
+    def test_range_insensitive(self):
+        self.do_generator_test(["%i[1dc-f]"], ["1", "d", "c", "e", "f", "D", "C", "E", "F"], b"--has-wildcards -d", True)
+
+    def test_range_invalid(self):
+        self.expect_syntax_failure(["%[c-a]"],  "first character in wildcard range 'c' > last 'a'")
+
+    def test_contracting_1(self):
+        self.do_generator_test(["a%0,2-bcd"], ["abcd", "bcd", "acd", "cd", "ad"], b"--has-wildcards -d", True)
+    def test_contracting_2(self):
+        self.do_generator_test(["abcd%1,2-"], ["abc", "ab"], b"--has-wildcards -d", True)
+    def test_contracting_right(self):
+        self.do_generator_test(["ab%0,1>cd"], ["abcd", "abd"], b"--has-wildcards -d", True)
+    def test_contracting_left(self):
+        self.do_generator_test(["ab%0,3<cd"], ["abcd", "acd", "cd"], b"--has-wildcards -d", True)
+    def test_contracting_multiple(self):
+        self.do_generator_test(["%0,3-ab%[X]cd%0,3-"],
+            ["abXcd", "abXc", "abX", "bXcd", "bXc", "bX", "Xcd", "Xc", "X"], b"--has-wildcards -d", True)
+
+    def test_backreference(self):
+        self.do_generator_test(["%[ab]%b"], ["aa", "bb"], b"--has-wildcards -d", True)
+    def test_backreference_length(self):
+        self.do_generator_test(["%[ab]%2,3b"], ["aaa", "aaaa", "bbb", "bbbb"], b"--has-wildcards -d", True)
+    def test_backreference_pos(self):
+        self.do_generator_test(["%[ab]X%;2b"], ["aXa", "bXb"], b"--has-wildcards -d", True)
+    def test_backreference_pos_length(self):
+        self.do_generator_test(["%[ab]X%2,3;2b"], ["aXaX", "aXaXa", "bXbX", "bXbXb"], b"--has-wildcards -d", True)
+    def test_backreference_bounds(self):
+        self.do_generator_test(["%[ab]%1,3;3b"], ["a", "aa", "b", "bb"], b"--has-wildcards -d", True)
+
+    def test_mixed_order(self):
+        self.do_generator_test(["%[ab]%0,1>cd%1,2b"],
+            ["acdd", "acddd", "add", "addd", "bcdd", "bcddd", "bdd", "bddd"], b"--has-wildcards -d", True)
+    def test_mixed_contracting_order(self):
+        self.do_generator_test(["%0,1-a%[XY]b%0,1<"],
+            ["aXb", "aX", "aYb", "aY", "Xb", "X", "Yb", "Y"], b"--has-wildcards -d", True)
+
+    @unittest.skipUnless(os.path.isfile(LEET_MAP_FILE), "requires leet-map.txt file")
+    def test_backreference_map(self):
+        self.do_generator_test(["%[bc]%;"+LEET_MAP_FILE+";b"],
+            ["b8", "b6", "c("], b"--has-wildcards -d", True)
+    @unittest.skipUnless(os.path.isfile(LEET_MAP_FILE), "requires leet-map.txt file")
+    def test_backreference_map_missing(self):
+        self.do_generator_test(["%[cd]%;"+LEET_MAP_FILE+";b"],
+            ["c(", "dd"], b"--has-wildcards -d", True)
+    @unittest.skipUnless(os.path.isfile(LEET_MAP_FILE), "requires leet-map.txt file")
+    def test_backreference_map_length(self):
+        self.do_generator_test(["%[bc]%2,3;"+LEET_MAP_FILE+";b"],
+            ["b88", "b888", "b66", "b666", "c((", "c((("], b"--has-wildcards -d", True)
+    @unittest.skipUnless(os.path.isfile(LEET_MAP_FILE), "requires leet-map.txt file")
+    def test_backreference_map_pos(self):
+        self.do_generator_test(["%[bc]X%;"+LEET_MAP_FILE+";2b"],
+            ["bX8", "bX6", "cX("], b"--has-wildcards -d", True)
+    @unittest.skipUnless(os.path.isfile(LEET_MAP_FILE), "requires leet-map.txt file")
+    def test_backreference_map_pos_length(self):
+        self.do_generator_test(["%[bc]X%2,3;"+LEET_MAP_FILE+";2b"],
+            ["bX8%", "bX8%8", "bX6%", "bX6%6", "cX(%", "cX(%("], b"--has-wildcards -d", True)
+    @unittest.skipUnless(os.path.isfile(LEET_MAP_FILE), "requires leet-map.txt file")
+    def test_backreference_map_bounds(self):
+        self.do_generator_test(["%[bc]%1,3;"+LEET_MAP_FILE+";3b"],
+            ["b", "b8", "b6", "c", "c("], b"--has-wildcards -d", True)
+
+
+class Test04Typos(GeneratorTester):
+
+    def test_capslock(self):
+        self.do_generator_test(["One2Three"], ["One2Three", "oNE2tHREE"],
+            b"--typos-capslock --typos 2 -d", True)
+    def test_capslock_nocaps(self):
+        self.do_generator_test(["123"], ["123"],
+            b"--typos-capslock --typos 2 -d", True)
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_capslock_unicode(self):
+        self.do_generator_test(["Один2Три"], ["Один2Три", "оДИН2тРИ"],
+            b"--typos-capslock --typos 2 -d", True)
+
+    def test_swap(self):
+        self.do_generator_test(["abcdd"], ["abcdd", "bacdd", "acbdd", "abdcd", "badcd"],
+            b"--typos-swap --typos 2 -d", True)
+    def test_swap_max(self):
+        self.do_generator_test(["abcdd"], ["abcdd", "bacdd", "acbdd", "abdcd"],
+            b"--typos-swap --max-typos-swap 1 --typos 2 -d", True)
+
+    def test_repeat(self):
+        self.do_generator_test(["abc"], ["abc", "aabc", "abbc", "abcc", "aabbc", "aabcc", "abbcc"],
+            b"--typos-repeat --typos 2 -d", True)
+    def test_repeat_max(self):
+        self.do_generator_test(["abc"], ["abc", "aabc", "abbc", "abcc"],
+            b"--typos-repeat --max-typos-repeat 1 --typos 2 -d", True)
+
+    def test_delete(self):
+        self.do_generator_test(["abc"], ["abc", "bc", "ac", "ab", "c", "b", "a"],
+            b"--typos-delete --typos 2 -d", True)
+    def test_delete_max(self):
+        self.do_generator_test(["abc"], ["abc", "bc", "ac", "ab"],
+            b"--typos-delete --max-typos-delete 1 --typos 2 -d", True)
+
+    def test_case(self):
+        self.do_generator_test(["abC1"], ["abC1", "AbC1", "aBC1", "abc1", "ABC1", "Abc1", "aBc1"],
+            b"--typos-case --typos 2 -d", True)
+    def test_case_max(self):
+        self.do_generator_test(["abC1"], ["abC1", "AbC1", "aBC1", "abc1"],
+            b"--typos-case --max-typos-case 1 --typos 2 -d", True)
+
+    def test_closecase(self):
+        self.do_generator_test(["one2Three"],
+            ["one2Three", "One2Three", "one2three", "one2THree", "one2ThreE", "One2three",
+            "One2THree", "One2ThreE", "one2tHree", "one2threE", "one2THreE"],
+            b"--typos-closecase --typos 2 -d", True)
+    def test_closecase_max(self):
+        self.do_generator_test(["one2Three"],
+            ["one2Three", "One2Three", "one2three", "one2THree", "one2ThreE"],
+            b"--typos-closecase --max-typos-closecase 1 --typos 2 -d", True)
+
+    def test_insert(self):
+        self.do_generator_test(["abc"],
+            ["abc", "Xabc", "aXbc", "abXc", "abcX", "XaXbc", "XabXc", "XabcX", "aXbXc", "aXbcX", "abXcX"],
+            b"--typos-insert X --typos 2 -d", True)
+    def test_insert_max(self):
+        self.do_generator_test(["abc"],
+            ["abc", "Xabc", "aXbc", "abXc", "abcX"],
+            b"--typos-insert X --max-typos-insert 1 --typos 2 -d", True)
+    def test_insert_adjacent_1(self):
+        self.do_generator_test(["ab"], ["ab", "Xab", "aXb", "abX", "XXab", "XaXb", "XabX", "aXXb", "aXbX", "abXX"],
+            b"--typos-insert X --typos 2 --max-adjacent-inserts 2 -d", True)
+    def test_insert_adjacent_2(self):
+        self.do_generator_test(["a"], ["a", "Xa", "aX", "XXa", "XaX", "aXX", "XXaX", "XaXX" ],
+            b"--typos-insert X --typos 3 --max-adjacent-inserts 2 -d", True)
+    def test_insert_wildcard(self):
+        self.do_generator_test(["abc"], ["abc", "Xabc", "Yabc", "aXbc", "aYbc", "abXc", "abYc", "abcX", "abcY"],
+            b"--typos-insert %[XY] -d", True)
+    def test_insert_wildcard_adjacent(self):
+        self.do_generator_test(["a"],
+            ["a", "Xa", "Ya", "aX", "aY", "XXa", "XYa", "YXa", "YYa",
+            b"XaX", "XaY", "YaX", "YaY", "aXX", "aXY", "aYX", "aYY"],
+            b"--typos-insert %[XY] --typos 2 --max-adjacent-inserts 2 -d", True)
+    def test_insert_invalid(self):
+        self.expect_syntax_failure(["abc"], "contracting wildcards are not permitted here",
+            b"--typos-insert %0,1-")
+
+    def test_replace(self):
+        self.do_generator_test(["abc"], ["abc", "Xbc", "aXc", "abX", "XXc", "XbX", "aXX"],
+            b"--typos-replace X --typos 2 -d", True)
+    def test_replace_max(self):
+        self.do_generator_test(["abc"], ["abc", "Xbc", "aXc", "abX"],
+            b"--typos-replace X --max-typos-replace 1 --typos 2 -d", True)
+    def test_replace_wildcard(self):
+        self.do_generator_test(["abc"], ["abc", "Xbc", "Ybc", "aXc", "aYc", "abX", "abY"],
+            b"--typos-replace %[X-Y] -d", True)
+    def test_replace_invalid(self):
+        self.expect_syntax_failure(["abc"], "contracting wildcards are not permitted here",
+            b"--typos-replace %>")
+
+    def test_map(self):
+        self.do_generator_test(["axb"],
+            ["axb", "Axb", "Bxb", "axA", "axB", "AxA", "AxB", "BxA", "BxB"],
+            b"--typos-map __funccall --typos 2 -d", True,
+            typos_map=StringIONonClosing(" ab \t AB \n x x \n a aB "))
+    def test_map_max(self):
+        self.do_generator_test(["axb"],
+            ["axb", "Axb", "Bxb", "axA", "axB"],
+            b"--typos-map __funccall --max-typos-map 1 --typos 2 -d", True,
+            typos_map=StringIONonClosing(" ab \t AB \n x x \n a aB "))
+
+    def test_z_all(self):
+        self.do_generator_test(["12"],
+            map(tstr, [12,812,182,128,8812,8182,8128,1882,1828,1288,112,8112,1812,1182,
+                1128,2,82,28,92,892,982,928,122,8122,1822,1282,1228,1,81,18,19,819,189,
+                198,1122,11,119,22,"",9,922,9,99,21,821,281,218,221,1,91,211,2,29]),
+            b"--typos-swap --typos-repeat --typos-delete --typos-case --typos-insert 8 --typos-replace 9 --typos 2 --max-adjacent-inserts 2 -d",
+            True)
+
+    def test_z_all_max(self):
+        self.do_generator_test(["12"],
+            map(tstr, [12,812,182,128,112,8112,1812,1182,1128,2,82,28,92,892,982,928,122,8122,1822,
+                1282,1228,1,81,18,19,819,189,198,11,119,22,9,922,9,21,821,281,218,221,1,91,211,2,29]),
+            b"--typos-swap --max-typos-swap 1 --typos-repeat --max-typos-repeat 1 --typos-delete --max-typos-delete 1 " + \
+            b"--typos-case --typos-insert 8 --max-typos-insert 1 --typos-replace 9 --max-typos-replace 1 --typos 2 -d",
+            True)
+
+    def test_z_min_typos_1(self):
+        self.do_generator_test(["12"],
+            map(tstr, [88182,88128,81882,81828,81288,18828,18288,88112,81812,81182,81128,
+                18812,18182,18128,11882,11828,11288,882,828,288,8892,8982,8928,9882,9828,
+                9288,88122,81822,81282,81228,18822,18282,18228,12882,12828,12288,881,818,
+                188,8819,8189,8198,1889,1898,1988,81122,18122,11822,11282,11228,811,181,
+                118,8119,1819,1189,1198,822,282,228,8,89,98,8922,9822,9282,9228,89,98,899,
+                989,998,8821,8281,8218,2881,2818,2188,8221,2821,2281,2218,81,18,891,981,
+                918,8211,2811,2181,2118,82,28,829,289,298,2211,22,229,11,"",9,911,9,99]),
+            b"--typos-swap --typos-repeat --typos-delete --typos-case --typos-insert 8 --typos-replace 9 --typos 3 --max-adjacent-inserts 2 --min-typos 3 -d",
+            True)
+    def test_z_min_typos_2(self):
+        self.do_generator_test(["12"], [],
+            b"--typos-swap --typos-repeat --typos-delete --typos-case --typos-replace 8 --typos 4 -d --min-typos 4",
+            True)
+
+
+LARGE_TOKENLIST_LEN = 2 * btcrecover.PASSWORDS_BETWEEN_UPDATES
+LARGE_TOKENLIST     = " ".join(tstr(i) for i in xrange(LARGE_TOKENLIST_LEN))
+LARGE_LAST_TOKEN    = tstr(LARGE_TOKENLIST_LEN - 1)
+class Test05CommandLine(GeneratorTester):
+
+    def test_embedded_tokenlist_option(self):
+        self.do_generator_test(["#--typos-capslock", "one"], ["one", "ONE"])
+    def test_embedded_tokenlist_overwridden_option(self):
+        self.do_generator_test(["#--skip 1", "one two"], [], b"--skip 2")
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_embedded_tokenlist_option_unicode(self):
+        self.do_generator_test(["#--typos-insert в", "да"], ["да", "вда", "два", "дав"])
+    def test_embedded_tokenlist_option_invalid(self):
+        self.expect_syntax_failure(["#--tokenlist file"], "--tokenlist option is not permitted inside a tokenlist file")
+
+    def test_passwordlist_no_wildcards(self):
+        btcrecover.parse_arguments(b"--passwordlist __funccall --listpass".split(),
+            passwordlist = StringIO("%%"))
+        tok_it, skipped = btcrecover.password_generator_factory(2)
+        self.assertEqual(tok_it.next(), ["%%"])
+
+    def test_regex_only(self):
+        self.do_generator_test(["one", "two"], ["one", "twoone", "onetwo"], b"--regex-only o.e")
+
+    def test_regex_never(self):
+        self.do_generator_test(["one", "two"], ["two"], b"--regex-never o.e", True)
+
+    def test_delimiter_tokenlist(self):
+        self.do_generator_test([" one ** two **** "], [" one ", " two ", "", " "], b"--delimiter **")
+
+    def test_delimiter_typosmap(self):
+        self.do_generator_test(["axb"], ["axb", "Axb", " xb", "axA", "ax ", "AxA", "Ax ", " xA", " x " ],
+            b"--delimiter ** --typos-map __funccall --typos 2 -d",
+            True, typos_map=StringIONonClosing(" ab **A \n x **x"))
+
+    # Try to test the myriad of --skip related boundary conditions in password_generator_factory()
+    def test_skip(self):
+        self.do_generator_test(["one", "two"], ["twoone", "onetwo"], b"--skip 2", False, sys.maxint, 2)
+    def test_skip_all_exact(self):
+        self.do_generator_test(["one"], [], b"--skip 1", True, sys.maxint, 1)
+    def test_skip_all_pastend_1(self):
+        self.do_generator_test(["one"], [], b"--skip 2", True, sys.maxint, 1)
+    def test_skip_all_pastend_2(self):
+        self.do_generator_test(["one"], [], b"--skip " + str(LARGE_TOKENLIST_LEN), True, sys.maxint, 1)
+    def test_skip_empty_1(self):
+        self.do_generator_test([], [], b"--skip 1", True, sys.maxint, 0)
+    def test_skip_empty_2(self):
+        self.do_generator_test([], [], b"--skip " + str(LARGE_TOKENLIST_LEN), True, sys.maxint, 0)
+    def test_skip_large_1(self):
+        self.do_generator_test([LARGE_TOKENLIST], [LARGE_LAST_TOKEN], b"-d --skip "+str(LARGE_TOKENLIST_LEN-1), False, sys.maxint, LARGE_TOKENLIST_LEN-1)
+    def test_skip_large_1_all_exact(self):
+        self.do_generator_test([LARGE_TOKENLIST], [],                 b"-d --skip "+str(LARGE_TOKENLIST_LEN  ), False, sys.maxint, LARGE_TOKENLIST_LEN)
+    def test_skip_large_1_all_pastend(self):
+        self.do_generator_test([LARGE_TOKENLIST], [],                 b"-d --skip "+str(LARGE_TOKENLIST_LEN+1), False, sys.maxint, LARGE_TOKENLIST_LEN)
+    def test_skip_large_2(self):
+        self.do_generator_test([LARGE_TOKENLIST + " last"], ["last"], b"-d --skip "+str(LARGE_TOKENLIST_LEN  ), False, sys.maxint, LARGE_TOKENLIST_LEN)
+    def test_skip_large_2_all_exact(self):
+        self.do_generator_test([LARGE_TOKENLIST + " last"], [],       b"-d --skip "+str(LARGE_TOKENLIST_LEN+1), False, sys.maxint, LARGE_TOKENLIST_LEN+1)
+    def test_skip_large_2_all_pastend(self):
+        self.do_generator_test([LARGE_TOKENLIST + " last"], [],       b"-d --skip "+str(LARGE_TOKENLIST_LEN+2), False, sys.maxint, LARGE_TOKENLIST_LEN+1)
+    def test_skip_end2end(self):
+        btcrecover.parse_arguments(b"--skip 2 --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("one \n two"))
+        self.assertIn("2 password combinations (plus 2 skipped)", btcrecover.main()[1])
+    def test_skip_end2end_all_exact(self):
+        btcrecover.parse_arguments(b"--skip 4 --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("one \n two"))
+        self.assertIn("0 password combinations (plus 4 skipped)", btcrecover.main()[1])
+    def test_skip_end2end_all_pastend(self):
+        btcrecover.parse_arguments(b"--skip 5 --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("one \n two"))
+        self.assertIn("0 password combinations (plus 4 skipped)", btcrecover.main()[1])
+    def test_skip_end2end_all_noeta(self):
+        btcrecover.parse_arguments(b"--skip 5 --tokenlist __funccall --no-eta --data-extract".split(),
+            tokenlist    = StringIO("one \n two"),
+            data_extract = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")  # dummy data-extract not actually tested
+        self.assertIn("Skipped all 4 passwords", btcrecover.main()[1])
+
+    def test_max_eta(self):
+        btcrecover.parse_arguments(b"--max-eta 1 --tokenlist __funccall --data-extract".split(),
+            tokenlist    = StringIO("1 2 3 4 5 6 7 8 9 10 11"),
+            data_extract = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")  # dummy data-extract not actually tested
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.count_and_check_eta(360.0)  # 360s * 11 passwords > 1 hour
+        self.assertIn("at least 11 passwords to try, ETA > --max-eta option (1 hours)", cm.exception.code)
+    def test_max_eta_ok(self):
+        btcrecover.parse_arguments(b"--max-eta 1 --tokenlist __funccall --data-extract".split(),
+            tokenlist    = StringIO("1 2 3 4 5 6 7 8 9 10"),
+            data_extract = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")  # dummy data-extract not actually tested
+        self.assertEqual(btcrecover.count_and_check_eta(360.0), 10)  # 360s * 10 passwords <= 1 hour
+    def test_max_eta_skip(self):
+        btcrecover.parse_arguments(b"--max-eta 1 --skip 4 --tokenlist __funccall --data-extract".split(),
+            tokenlist    = StringIO("1 2 3 4 5 6 7 8 9 10 11 12 13 14 15"),
+            data_extract = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")  # dummy data-extract not actually tested
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.count_and_check_eta(360.0)  # 360s * 11 passwords > 1 hour
+        self.assertIn("at least 11 passwords to try, ETA > --max-eta option (1 hours)", cm.exception.code)
+    def test_max_eta_skip_ok(self):
+        btcrecover.parse_arguments(b"--max-eta 1 --skip 5 --tokenlist __funccall --data-extract".split(),
+            tokenlist    = StringIO("1 2 3 4 5 6 7 8 9 10 11 12 13 14 15"),
+            data_extract = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")  # dummy data-extract not actually tested
+        # 360s * 10 passwords <= 1 hour, but count_and_check_eta still returns the total count of 15
+        self.assertEqual(btcrecover.count_and_check_eta(360.0), 15)
+    def test_max_eta_analytic(self):
+        btcrecover.parse_arguments(b"-d --max-eta 1 --tokenlist __funccall --data-extract".split(),
+            tokenlist    = StringIO("%10d"),
+            data_extract = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")  # dummy data-extract not actually tested
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.count_and_check_eta(0.001)  # too many to enumerate in a reasonable time
+        self.assertIn("at least 10,000,000,000 passwords to try", cm.exception.code)
+
+    # Compare the closed-form counts against the (slow) enumerated counts
+    def test_count_analytic_exact(self):
+        btcrecover.parse_arguments(b"-d --typos 2 --typos-capslock --typos-swap --typos-case --typos-delete"
+                                   b" --typos-insert %[ab] --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("one + %1,2[xy]\n two \n ^three"))
+        count, is_exact = btcrecover.count_passwords_analytically()
+        self.assertTrue(is_exact)
+        self.assertEqual(count, sum(btcrecover.password_generator(1000, only_yield_count=True)))
+    def test_count_analytic_upper_bound(self):
+        btcrecover.parse_arguments(b"--typos 2 --typos-swap --typos-repeat --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("aab aab \n %[ab]"))
+        count, is_exact = btcrecover.count_passwords_analytically()
+        self.assertFalse(is_exact)
+        self.assertGreaterEqual(count, sum(btcrecover.password_generator(1000, only_yield_count=True)))
+
+    # Counting in parallel matches counting serially, including removing duplicates (of both passwords and
+    # token combinations) across the shards, and afterwards the search produces the same passwords
+    @unittest.skipIf(sys.platform == "win32", "counting in parallel is not supported on Windows")
+    def test_count_parallel(self):
+        for cmd_line in (b"--typos 2 --typos-case --typos-repeat",
+                         b"--typos 2 --typos-case --compact-dupchecks",
+                         b"-d --typos 2 --typos-case --regex-only a",
+                         b"-dd --typos 2 --typos-case"):
+            results = []
+            for threads in (b"1", b"3"):
+                btcrecover.parse_arguments((b"--tokenlist __funccall --listpass --threads " + threads + b" " + cmd_line).split(),
+                    tokenlist = StringIO("aa bb\nAa aa\ncc"))
+                self.assertEqual(btcrecover.can_count_in_parallel(), threads != b"1")
+                count     = btcrecover.count_and_check_eta(1e-9)
+                passwords = btcrecover.password_generator(sys.maxint).next()
+                self.assertEqual(count, len(passwords))
+                results.append((count, passwords))
+            self.assertEqual(results[0], results[1])
+    @unittest.skipIf(sys.platform == "win32", "--background-count is not supported on Windows")
+    def test_count_background(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass --threads 3 --typos 2 --typos-case --typos-repeat".split(),
+            tokenlist = StringIO("aa bb\nAa\ncc"))
+        for est_secs_per_password in (1e-9, 3600.0):
+            counter = btcrecover.BackgroundPasswordCounter(est_secs_per_password)
+            while not counter.finished():
+                time.sleep(0.01)
+            if est_secs_per_password < 1.0:
+                self.assertEqual(counter.result(), btcrecover.count_and_check_eta(est_secs_per_password))
+            else:
+                with self.assertRaises(SystemExit) as cm:
+                    counter.result()
+                self.assertIn("ETA > --max-eta option", cm.exception.code)
+            counter.close()
+    @unittest.skipIf(sys.platform == "win32", "--background-count is not supported on Windows")
+    def test_count_background_compact(self):
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.parse_arguments(b"--tokenlist __funccall --data-extract --background-count --compact-dupchecks".split(),
+                tokenlist = StringIO("one"), data_extract = E2E_DATA_EXTRACT)
+        self.assertIn("--compact-dupchecks can't be used with --background-count", cm.exception.code)
+    @unittest.skipIf(sys.platform == "win32", "counting in parallel is not supported on Windows")
+    def test_count_parallel_max_eta(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --listpass --threads 3 --typos 2 --typos-case --typos-repeat".split(),
+            tokenlist = StringIO("aa bb\nAa\ncc"))
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.count_and_check_eta(3600.0)
+        self.assertIn("ETA > --max-eta option", cm.exception.code)
+
+    # A sample of all the base passwords produces an exact estimate; a smaller one produces a confidence interval
+    def test_eta_sample(self):
+        btcrecover.parse_arguments(b"--typos 2 --typos-case --typos-repeat --typos-swap --regex-only [ab] --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("aa bb\nAa cd ef\ncc xyz\n+ e f"))
+        count = sum(btcrecover.password_generator(1000, only_yield_count=True))
+        self.assertEqual(btcrecover.estimate_passwords_count(1000), (count, count, count, 798, 798))
+        random.seed(0)
+        estimate, lower_bound, upper_bound, sample_size, base_passwords_count = btcrecover.estimate_passwords_count(50)
+        self.assertEqual((sample_size, base_passwords_count), (50, 798))
+        self.assertTrue(lower_bound < estimate < upper_bound)
+        self.assertTrue(lower_bound < count < upper_bound)
+        # Sampling doesn't change the duplicate checking or the base passwords of the actual search
+        self.assertEqual(sum(btcrecover.password_generator(1000, only_yield_count=True)), count)
+    def test_eta_sample_exclude(self):
+        btcrecover.parse_arguments(b"--typos 1 --typos-case --regex-only [ab] --exclude-passwordlist __funccall --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO("aa bb\nAa cd"), exclude_passwordlist = StringIO("aa\nAabb"))
+        count = sum(btcrecover.password_generator(1000, only_yield_count=True))
+        self.assertEqual(btcrecover.estimate_passwords_count(1000)[0], count)
+        self.assertEqual(btcrecover.password_dups.is_duplicate("aa"), True)  # still excluded
+    def test_eta_sample_invalid(self):
+        self.expect_syntax_failure(["one"], "--eta-sample COUNT must be >= 2", b"--eta-sample 1")
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.parse_arguments(b"--tokenlist __funccall --data-extract --eta-sample --compact-dupchecks".split(),
+                tokenlist = StringIO("one"), data_extract = E2E_DATA_EXTRACT)
+        self.assertIn("--compact-dupchecks can't be used with --eta-sample", cm.exception.code)
+
+    # With --no-dupchecks, skipped base passwords don't need to have their typos generated
+    def test_skip_seek(self):
+        cmd_line = b"-d --typos 2 --typos-swap --typos-insert %[ab] --worker 2/3"
+        btcrecover.parse_arguments((b"--tokenlist __funccall --listpass " + cmd_line).split(),
+            tokenlist = StringIO("one + %1,2[xy]\n two \n ^three"))
+        all_passwords = btcrecover.password_generator(sys.maxint).next()
+        for skip in 1, 50, 333, len(all_passwords) - 1:
+            self.do_generator_test(["one + %1,2[xy]", " two ", "^three"], all_passwords[skip:],
+                cmd_line + b" --skip " + str(skip), False, sys.maxint, skip)
+    def test_skip_seek_pastend(self):
+        self.do_generator_test(["one %[ab]"], [], b"-d --typos-capslock --skip 10 --worker 2/2", False, sys.maxint, 3)
+
+    # Each shard produces a disjoint part of the passwords, dividing up either the first modification's values or the base passwords
+    def test_shard_generation(self):
+        for cmd_line in b"--typos 2 --typos-capslock --typos-swap", b"--typos 2 --typos-swap", b"":
+            btcrecover.parse_arguments((b"-d --tokenlist __funccall --listpass " + cmd_line).split(),
+                tokenlist = StringIO("one + %1,2[xy]\n two \n ^three"))
+            all_passwords = btcrecover.password_generator(sys.maxint).next()
+            shards_passwords = []
+            for shard_id in xrange(3):
+                btcrecover.generator_shard = shard_id, 3
+                shard_passwords = btcrecover.password_generator(sys.maxint).next()
+                self.assertLess(len(shard_passwords), len(all_passwords))
+                shards_passwords.extend(shard_passwords)
+            self.assertEqual(sorted(shards_passwords), sorted(all_passwords))
+
+    # Ranges are sized to take about RANGE_SECONDS each, those of released workers are leased again,
+    # and once every range has been leased, idle workers are given backup copies of the oldest ones
+    def test_coordinator_schedule(self):
+        schedule = btcrecover.CoordinatorSchedule()
+        self.assertEqual(schedule.lease(1), (0, 1))
+        self.assertEqual(schedule.lease(2), (1, 2))
+        schedule.complete(1, (0, 1), 1, 10, schedule.RANGE_SECONDS / 2)
+        self.assertEqual(schedule.lease(1), (2, 4))  # twice the size after finishing in half the time
+        schedule.release(2)
+        self.assertEqual(schedule.lease(3), (1, 2))
+        schedule.complete(1, (2, 4), 1, 5, 1.0)      # only 1 of the 2 base passwords exists
+        self.assertEqual(schedule.bases_total, 3)
+        self.assertEqual(schedule.lease(1), (1, 2))  # a backup copy
+        self.assertIs(schedule.lease(4), False)
+        self.assertEqual(schedule.saved_state(), ([(0, 1), (2, 4)], 3))
+        #
+        restored = btcrecover.CoordinatorSchedule(*schedule.saved_state())
+        self.assertEqual(restored.lease(5), (1, 2))
+        self.assertIs(restored.lease(5), False)
+        #
+        self.assertFalse(schedule.is_finished())
+        schedule.complete(3, (1, 2), 1, 7, 1.0)
+        schedule.complete(1, (1, 2), 1, 7, 1.0)      # the backup copy's results are ignored
+        self.assertTrue(schedule.is_finished())
+        self.assertEqual(schedule.passwords_done, 22)
+        self.assertIsNone(schedule.lease(1))
+    #
+    # Each range continues from the base password where the last one left off (unless it starts before it)
+    def test_coordinated_work_ranges(self):
+        btcrecover.parse_arguments(b"--passwordlist __funccall --listpass --no-dupchecks".split(),
+            passwordlist = StringIO("\n".join("p" + str(i) for i in xrange(8))))
+        all_base_passwords = btcrecover.base_password_generator
+        base_password_calls = [0]
+        def base_password_generator():
+            base_password_calls[0] += 1
+            return all_base_passwords()
+        btcrecover.base_password_generator = base_password_generator
+        #
+        class ScriptedCoordinatedWork(btcrecover.CoordinatedWork):
+            def __init__(self, ranges):  # (instead of connecting to a coordinator)
+                self._lock            = threading.RLock()
+                self._pending         = collections.deque()
+                self._last_message_at = time.time()
+                self.done             = False
+                self.found_elsewhere  = False
+                self._base_passwords  = None
+                self._bases_position  = 0
+                self.ranges    = list(ranges)
+                self.completed = []
+            def _call(self, **message):
+                if "completed" in message:
+                    self.completed.append((tuple(message["completed"]), message["bases"]))
+                if "request" in message:
+                    if self.ranges:
+                        return {"range": self.ranges.pop(0)}
+                    self.done = True
+                    return {"done": True, "found": False}
+                return {"ok": True}
+        work = ScriptedCoordinatedWork([(0, 2), (2, 5), (1, 2), (5, 100)])
+        passwords = []
+        def results():
+            for chunk in work.chunks(2):
+                passwords.extend(chunk)
+                yield False, len(chunk)
+        list(work.observing_results(results()))
+        self.assertEqual(passwords, ["p0", "p1", "p2", "p3", "p4", "p1", "p5", "p6", "p7"])
+        self.assertEqual(work.completed, [((0, 2), 2), ((2, 5), 3), ((1, 2), 1), ((5, 100), 3)])
+        self.assertEqual(base_password_calls[0], 2)  # (once more only for the range before the last one)
+    #
+    def test_coordinator_invalid(self):
+        self.expect_syntax_failure(["one"], "--coordinator can't be used with --coordinated-by",
+                                   b"--coordinator :1234 --coordinated-by localhost:1234")
+        self.expect_syntax_failure(["one"], "--coordinated-by can't be used with --worker",
+                                   b"--coordinated-by localhost:1234 --coordinator-secret s --worker 1/2")
+        self.expect_syntax_failure(["one"], "--coordinator requires a --coordinator-secret",
+                                   b"--coordinator :1234")
+
+    @unittest.skipIf(sys.platform == "win32", "shared memory password slots are not supported on Windows")
+    def test_shared_password_slots(self):
+        slots  = btcrecover.SharedPasswordSlots(2, 16)
+        chunks = [["one", "two"], ["three", "four", "five"], ["o\0ne"], [("one", "two")], [""]]
+        packed = slots.packed_chunks(iter(chunks))
+        self.assertEqual(slots.read(packed.next()), ["one", "two"])
+        self.assertEqual(packed.next(), ["three", "four", "five"])  # too long for a slot
+        self.assertEqual(packed.next(), ["o\0ne"])                  # contains a NUL
+        self.assertEqual(packed.next(), [("one", "two")])           # not strings
+        results = slots.releasing_results(iter(xrange(4)))
+        self.assertEqual(list(results), range(4))
+        self.assertEqual(slots.read(packed.next()), [""])
+        slots.close()
+
+    @unittest.skipIf(sys.platform == "win32", "shared memory password slots are not supported on Windows")
+    def test_shared_password_slots_packed(self):
+        class PackedWallet(btcrecover.PackedPasswordsWallet):
+            encode_password = staticmethod(lambda p: p.encode("utf_16_be"))
+        slots  = btcrecover.SharedPasswordSlots(3, 32, PackedWallet())
+        chunks = [["one", "two"], ["three", "four", "five"], ["o\0ne"], [("one", "two")]]
+        packed = slots.packed_chunks(iter(chunks))
+        data, ends = slots.read_packed(packed.next())
+        self.assertEqual(data, "onetwo".encode("utf_16_be"))
+        self.assertEqual(list(ends), [6, 12])
+        self.assertEqual(packed.next(), ["three", "four", "five"])  # too long for a slot
+        data, ends = slots.read_packed(packed.next())               # (NULs are permitted)
+        self.assertEqual(data.decode("utf_16_be"), "o\0ne")
+        self.assertEqual(packed.next(), [("one", "two")])           # not strings
+        # The index returned for a packed chunk is replaced by its password
+        results = slots.releasing_results(iter([(1, 2), (False, 3), (0, 1), (False, 1)]))
+        self.assertEqual(list(results), [("two", 2), (False, 3), ("o\0ne", 1), (False, 1)])
+        slots.close()
+
+    def test_chunksize_controller(self):
+        controller = btcrecover.ChunksizeController(1000, 2, 0.01, 100000)
+        self.assertEqual(controller.next_chunksize(1000), 1000)
+        controller.observe(1000, 0.02, 0.0)      # twice as slow as targeted
+        self.assertEqual(controller.next_chunksize(2000), 500)
+        for i in xrange(50):
+            controller.observe(500, 0.0001, 0.0) # much faster than targeted
+        self.assertEqual(controller.next_chunksize(3000), 16000)  # and by MAX_GROWTH
+        self.assertEqual(controller.next_chunksize(96000), 1000)  # smaller near the end
+        self.assertEqual(controller.next_chunksize(99999), 1)
+        controller = btcrecover.ChunksizeController(1000, 2, 0.01)
+        controller.observe(1000, 0.01, 0.01)     # idle workers lengthen the target time
+        self.assertGreater(controller.next_chunksize(1000), 1000)
+
+    def test_worker(self):
+        self.do_generator_test(["one two three four five six seven eight"], ["one", "four", "seven"],
+            b"--worker 1/3")
+        self.do_generator_test(["one two three four five six seven eight"], ["two", "five", "eight"],
+            b"--worker 2/3")
+        self.do_generator_test(["one two three four five six seven eight"], ["three", "six"],
+            b"--worker 3/3")
+
+    # With --worker-bases, each worker gets every TOTAL#'th base password along with all of its typos
+    def test_worker_bases(self):
+        self.do_generator_test(["one two three four five"], ["one", "ONE", "four", "FOUR"],
+            b"--worker 1/3 --worker-bases --typos-capslock")
+        self.do_generator_test(["one two three four five"], ["three", "THREE"],
+            b"--worker 3/3 --worker-bases --typos-capslock")
+    #
+    # Every password is produced by one of the workers, which each count and skip only their own
+    def test_worker_bases_skip(self):
+        tokenlist = "one + %1,2[xy]\n two \n ^three"
+        btcrecover.parse_arguments(b"-d --typos 2 --typos-swap --typos-insert %[ab] --tokenlist __funccall --listpass".split(),
+            tokenlist = StringIO(tokenlist))
+        all_passwords = btcrecover.password_generator(sys.maxint).next()
+        workers_passwords = []
+        for worker in xrange(1, 4):
+            cmd_line = b"-d --typos 2 --typos-swap --typos-insert %[ab] --worker-bases --worker " + str(worker) + b"/3"
+            btcrecover.parse_arguments((b"--tokenlist __funccall --listpass " + cmd_line).split(),
+                tokenlist = StringIO(tokenlist))
+            worker_passwords = btcrecover.password_generator(sys.maxint).next()
+            self.assertEqual(btcrecover.count_passwords_analytically(), (len(worker_passwords), True))
+            for skip in 1, len(worker_passwords) // 2, len(worker_passwords) - 1:
+                self.do_generator_test(tokenlist.split("\n"), worker_passwords[skip:],
+                    cmd_line + b" --skip " + str(skip), False, sys.maxint, skip)
+            workers_passwords.extend(worker_passwords)
+        self.assertEqual(sorted(workers_passwords), sorted(all_passwords))
+    #
+    def test_worker_bases_invalid(self):
+        self.expect_syntax_failure(["one"], "--worker-bases requires --worker", b"--worker-bases")
+
+    def test_backend_invalid(self):
+        self.expect_syntax_failure(["one"], "--backend threads can't be used with --shard-generation",
+                                   b"--backend threads --shard-generation")
+
+    def test_bounded_chunks(self):
+        bounded_chunks = btcrecover.BoundedChunks(2)
+        chunks  = bounded_chunks.limiting(iter(xrange(10)))
+        results = bounded_chunks.releasing_results(iter(xrange(10)))
+        self.assertEqual([chunks.next(), chunks.next()], [0, 1])
+        self.assertFalse(bounded_chunks._available.acquire(False))  # a third chunk would block
+        results.next()
+        self.assertEqual(chunks.next(), 2)
+        bounded_chunks.close()
+        self.assertEqual(list(chunks), [])
+
+    def test_no_dupchecks_1(self):
+        self.do_generator_test(["one", "one"], ["one", "one", "oneone", "oneone"], b"-ddd")
+        self.do_generator_test(["one", "one"], ["one", "one", "oneone"], b"-dd")
+
+    def test_no_dupchecks_2(self):
+        self.do_generator_test(["one", "one"], ["one", "oneone"], b"-d")
+        # Duplicate code works differently the second time around; test it also
+        self.assertEqual(btcrecover.password_generator(3).next(), ["one", "oneone"])
+
+    def test_no_dupchecks_3(self):
+        self.do_generator_test(["%[ab] %[a-b]"], ["a", "b", "a", "b"], b"-d")
+        self.do_generator_test(["%[ab] %[a-b]"], ["a", "b"])
+        # Duplicate code works differently the second time around; test it also
+        self.assertEqual(btcrecover.password_generator(3).next(), ["a", "b"])
+
+    def test_compact_dupchecks(self):
+        self.do_generator_test(["one", "one"], ["one", "oneone"], b"-d --compact-dupchecks")
+        self.do_generator_test(["%[ab] %[a-b]"], ["a", "b"], b"--compact-dupchecks 32")
+        # Duplicate code works differently the second time around; test it also
+        self.assertEqual(btcrecover.password_generator(3).next(), ["a", "b"])
+        self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], b"--exclude-passwordlist __funccall --compact-dupchecks",
+                               exclude_passwordlist=StringIO("exc1\nexc2"))
+    def test_compact_dupchecks_collisions(self):
+        dups = btcrecover.CompactDuplicateChecker(1)  # every fingerprint is the same
+        self.assertEqual([dups.is_duplicate(x) for x in "abca"], [False, True, True, True])
+        dups.run_finished()
+        # Items mistaken for duplicates in the first run aren't in later runs
+        self.assertEqual([dups.is_duplicate(x) for x in "abca"], [False, False, False, True])
+    def test_compact_dupchecks_invalid(self):
+        self.expect_syntax_failure(["one"], "--compact-dupchecks BITS must be between 32 and", b"--compact-dupchecks 16")
+
+    def test_max_memory(self):
+        self.do_generator_test(["one", "one"], ["one", "oneone"], b"-d --max-memory 1")
+        self.do_generator_test(["^%[ab] %[a-b]$"], ["a", "b"], b"--max-memory 1")
+        self.assertEqual(btcrecover.password_generator(3).next(), ["a", "b"])
+    def test_max_memory_spilled(self):
+        dups = btcrecover.SpillingDuplicateChecker(1000)  # spills about every 9 items
+        dups.exclude("excluded")
+        items = [str(i) for i in xrange(500)] + [u"\u00e9", (u"a", "b")]
+        self.assertFalse(any(dups.is_duplicate(x) for x in items))
+        self.assertTrue(1 < len(dups._runs) <= dups.MAX_RUNS)  # runs were spilled and merged
+        self.assertTrue(all(dups.is_duplicate(x) for x in items[::7] + ["excluded"]))
+        self.assertFalse(dups.is_duplicate("new"))
+        dups.run_finished()
+        # Only items seen twice in the first run are tracked in later runs
+        self.assertEqual([dups.is_duplicate(x) for x in ["0", "0", "1", "1", "excluded", "new"]],
+                         [False, True, False, False, True, False])
+    def test_spilled_items(self):
+        keys = sorted(str(i) for i in xrange(1000))
+        run  = btcrecover.SpilledItems(iter(keys), len(keys))
+        self.assertEqual(list(run), keys)
+        self.assertTrue(all(key in run for key in keys))
+        self.assertFalse(any(key in run for key in (b"", b"-1", b"1000", b"999a", b"\xff")))
+        run.close()
+    def test_max_memory_invalid(self):
+        self.expect_syntax_failure(["one"], "--max-memory must be >= 1", b"--max-memory 0")
+
+    # Need to check four different code paths for --exclude-passwordlist
+    def test_exclude(self):
+        self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], b"--exclude-passwordlist __funccall",
+                               exclude_passwordlist=StringIO("exc1\nexc2"))
+    def test_exclude_nodupchecks(self):
+        self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], b"--exclude-passwordlist __funccall -dd",
+                               exclude_passwordlist=StringIO("exc1\nexc2"))
+    def test_exclude_noeta(self):
+        self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], b"--exclude-passwordlist __funccall --no-eta",
+                               exclude_passwordlist=StringIO("exc1\nexc2"))
+    def test_exclude_noeta_nodupchecks(self):
+        self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"], b"--exclude-passwordlist __funccall --no-eta -dd",
+                               exclude_passwordlist=StringIO("exc1\nexc2"))
+
+    def test_exclude_index(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        try:
+            index_filename = os.path.join(temp_dir, "exclude-index")
+            with self.assertRaises(SystemExit) as cm:
+                btcrecover.parse_arguments(
+                    b"--exclude-passwordlist __funccall --build-exclude-index".split() + [index_filename],
+                    exclude_passwordlist=StringIO("exc1\nexc2\nexc1"))
+            self.assertEqual(cm.exception.code, 0)
+            self.assertEqual(len(btcrecover.ExcludeIndex(open(index_filename, "rb"))), 2)
+            for extra_cmd_line in (b"", b" -dd", b" --no-eta", b" --no-eta -dd"):
+                self.do_generator_test(["exc1 exc2 inc exc1 exc2"], ["inc"],
+                                       b"--exclude-index " + index_filename + extra_cmd_line)
+            with self.assertRaises(SystemExit) as cm:
+                btcrecover.parse_arguments(
+                    b"--exclude-passwordlist __funccall --build-exclude-index".split() + [index_filename],
+                    exclude_passwordlist=StringIO("exc1"))
+            self.assertIn("already exists, won't overwrite", cm.exception.code)
+        finally:
+            shutil.rmtree(temp_dir)
+    def test_exclude_index_runs(self):
+        passwords = [tstr(i) for i in xrange(0, 1000, 2)]
+        index_file = tempfile.TemporaryFile()
+        keys_per_run = btcrecover.EXCLUDE_INDEX_KEYS_PER_RUN
+        btcrecover.EXCLUDE_INDEX_KEYS_PER_RUN = 64  # so that several runs are merged
+        try:
+            self.assertEqual(btcrecover.build_exclude_index(StringIO("\n".join(passwords * 2)), index_file), 500)
+        finally:
+            btcrecover.EXCLUDE_INDEX_KEYS_PER_RUN = keys_per_run
+        index = btcrecover.ExcludeIndex(index_file)
+        self.assertEqual([tstr(i) in index for i in xrange(1000)], [i % 2 == 0 for i in xrange(1000)])
+        index.close()
+    def test_exclude_index_invalid(self):
+        with tempfile.NamedTemporaryFile() as index_file:
+            index_file.write(b"not an index" * 10)
+            index_file.flush()
+            self.expect_syntax_failure(["one"], "not an exclude index file", b"--exclude-index " + index_file.name)
+
+
+SAVESLOT_SIZE = 4096
+AUTOSAVE_ARGS = b"--autosave __funccall --tokenlist __funccall --data-extract --no-progress --threads 1".split()
+AUTOSAVE_TOKENLIST    = "^one \n two \n three \n"
+AUTOSAVE_DATA_EXTRACT = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA=="
+class Test06AutosaveRestore(unittest.TestCase):
+
+    autosave_file = BytesIONonClosing()
+
+    def run_autosave_parse_arguments(self, autosave_file):
+        btcrecover.parse_arguments(AUTOSAVE_ARGS,
+            autosave     = autosave_file,
+            tokenlist    = StringIO(AUTOSAVE_TOKENLIST),
+            data_extract = AUTOSAVE_DATA_EXTRACT)
+
+    def run_restore_parse_arguments(self, restore_file):
+        btcrecover.parse_arguments(b"--restore __funccall".split(),
+            restore      = restore_file,
+            tokenlist    = StringIO(AUTOSAVE_TOKENLIST),
+            data_extract = AUTOSAVE_DATA_EXTRACT)
+
+    # These test_ functions are in alphabetical order (the same order they're executed in)
+
+    # Create the initial autosave data
+    def test_autosave(self):
+        autosave_file = self.__class__.autosave_file
+        self.run_autosave_parse_arguments(autosave_file)
+        self.assertIn("Password search exhausted", btcrecover.main()[1])
+        #
+        # Load slot 0, and verify it was created before any passwords were tested
+        autosave_file.seek(0)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 0)
+        self.assertLessEqual(autosave_file.tell(), SAVESLOT_SIZE)
+        #
+        # Load slot 1, and verify it was created after all passwords were tested
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 9)
+        self.assertLessEqual(autosave_file.tell(), 2*SAVESLOT_SIZE)
+
+    # Using --autosave, restore (a copy of) the autosave data created by test_autosave(),
+    # and make sure all of the passwords have already been tested
+    def test_autosave_restore(self):
+        self.run_autosave_parse_arguments(BytesIONonClosing(self.__class__.autosave_file.getvalue()))
+        self.assertIn("Skipped all 9 passwords, exiting", btcrecover.main()[1])
+
+    # Using --restore, restore (a copy of) the autosave data created by test_autosave(),
+    # and make sure all of the passwords have already been tested
+    def test_restore(self):
+        self.run_restore_parse_arguments(BytesIONonClosing(self.__class__.autosave_file.getvalue()))
+        self.assertIn("Skipped all 9 passwords, exiting", btcrecover.main()[1])
+
+    # Using --autosave, restore (a copy of) the autosave data created by test_autosave(),
+    # but change the arguments to generate an error
+    def test_restore_changed_args(self):
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.parse_arguments(AUTOSAVE_ARGS + [b"--typos-capslock"],
+                autosave     = BytesIO(self.__class__.autosave_file.getvalue()),
+                tokenlist    = StringIO(AUTOSAVE_TOKENLIST),
+                data_extract = AUTOSAVE_DATA_EXTRACT)
+        self.assertIn("can't restore previous session: the command line options have changed", cm.exception.code)
+
+    # Using --autosave, restore (a copy of) the autosave data created by test_autosave(),
+    # but change the tokenlist file to generate an error
+    def test_restore_changed_tokenlist(self):
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.parse_arguments(AUTOSAVE_ARGS,
+                autosave     = BytesIO(self.__class__.autosave_file.getvalue()),
+                tokenlist    = StringIO(AUTOSAVE_TOKENLIST + "four"),
+                data_extract = AUTOSAVE_DATA_EXTRACT)
+        self.assertIn("can't restore previous session: the tokenlist file has changed", cm.exception.code)
+
+    # Using --restore, restore (a copy of) the autosave data created by test_autosave(),
+    # but change the data_extract to generate an error
+    def test_restore_changed_data_extract(self):
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.parse_arguments(b"--restore __funccall".split(),
+                restore      = BytesIO(self.__class__.autosave_file.getvalue()),
+                tokenlist    = StringIO(AUTOSAVE_TOKENLIST),
+                data_extract = "bWI6ACkebfNQTLk75CfI5X3svX6AC7NFeGsgUxKNFg==")  # has a valid CRC
+        self.assertIn("can't restore previous session: the encrypted key entered is not the same", cm.exception.code)
+
+    # With --no-dupchecks, the password position is also saved and then used to seek during a restore
+    def test_restore_position(self):
+        autosave_file = BytesIONonClosing()
+        btcrecover.parse_arguments(AUTOSAVE_ARGS + [b"-d"],
+            autosave     = autosave_file,
+            tokenlist    = StringIO(AUTOSAVE_TOKENLIST),
+            data_extract = AUTOSAVE_DATA_EXTRACT)
+        self.assertIn("Password search exhausted", btcrecover.main()[1])
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 9)
+        self.assertEqual(savestate.get(b"position"), (8, 8, 0))  # the last of 9 base passwords
+        #
+        # Move the saved position back to the fifth base password, and restore from there
+        savestate[b"skip"]     = 6
+        savestate[b"position"] = (4, 4, 0)
+        autosave_file.seek(SAVESLOT_SIZE)
+        autosave_file.truncate()
+        cPickle.dump(savestate, autosave_file, cPickle.HIGHEST_PROTOCOL)
+        btcrecover.parse_arguments(b"--restore __funccall".split(),
+            restore      = autosave_file,
+            tokenlist    = StringIO(AUTOSAVE_TOKENLIST),
+            data_extract = AUTOSAVE_DATA_EXTRACT)
+        password_iterator, skipped_count = btcrecover.password_generator_factory(sys.maxint)
+        self.assertEqual(skipped_count, 6)
+        self.assertEqual(password_iterator.next(), ["twothree", "onethreetwo", "onetwothree"])
+
+    # The duplicate cache saved beside the autosave file lets a restore skip counting passwords
+    def test_restore_dups_cache(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        try:
+            autosave_filename = os.path.join(temp_dir, "autosave")
+            tokenlist = "^one \n two \n two \n three \n"  # the duplicate tokens need duplicate checking
+            btcrecover.parse_arguments(AUTOSAVE_ARGS[:1] + [autosave_filename] + AUTOSAVE_ARGS[2:],
+                tokenlist    = StringIO(tokenlist),
+                data_extract = AUTOSAVE_DATA_EXTRACT)
+            self.assertIn("Password search exhausted", btcrecover.main()[1])
+            btcrecover.autosave_file.close()
+            self.assertTrue(os.path.isfile(autosave_filename + btcrecover.DUPS_CACHE_SUFFIX))
+            #
+            btcrecover.parse_arguments(b"--restore".split() + [autosave_filename],
+                tokenlist    = StringIO(tokenlist),
+                data_extract = AUTOSAVE_DATA_EXTRACT)
+            btcrecover.args.skip = 0
+            self.assertTrue(btcrecover.load_dups_cache())
+            self.assertEqual(btcrecover.token_combination_dups._run_number, 1)
+            self.assertEqual(list(btcrecover.password_generator(sys.maxint).next()),
+                ["one", "two", "onetwo", "twotwo", "onetwotwo", "three", "onethree", "threetwo", "twothree",
+                 "onethreetwo", "onetwothree", "threetwotwo", "twothreetwo", "twotwothree", "onethreetwotwo",
+                 "onetwothreetwo", "onetwotwothree"])
+            btcrecover.autosave_file.close()
+            #
+            # A cache from a different search (e.g. a changed data_extract) is ignored
+            btcrecover.savestate[b"key_crc"] += 1
+            self.assertFalse(btcrecover.load_dups_cache())
+        finally:
+            shutil.rmtree(temp_dir)
+
+    # Using --restore, restore the autosave data created by test_autosave(),
+    # but remove the last byte from slot 1 to make it invalid
+    def test_restore_truncated(self):
+        autosave_file = self.__class__.autosave_file
+        autosave_file.seek(-1, os.SEEK_END)
+        autosave_file.truncate()
+        self.run_restore_parse_arguments(autosave_file)
+        #
+        # Slot 1 had the final save, but since it is invalid, the loader should fall
+        # back to slot 0 with the initial save, so the passwords should be tried again.
+        self.assertIn("Password search exhausted", btcrecover.main()[1])
+        #
+        # Because slot 1 was invalid, it is the first slot overwritten. Load it, and
+        # verify it was written to before any passwords were tested
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 0)
+        #
+        # Load slot 0 (the second slot overwritten), and verify it was written to
+        # after all passwords were tested
+        autosave_file.seek(0)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 9)
+
+
+is_armory_loadable = None
+def can_load_armory(permit_unicode = False):
+    if tstr == unicode and not permit_unicode:
+        return False
+    global is_armory_loadable
+    # Don't call the load function more than once
+    # (calling more than once on success is OK though)
+    if is_armory_loadable is None:
+        try:
+            btcrecover.load_armory_library(permit_unicode)
+            is_armory_loadable = True
+        except ImportError:
+            is_armory_loadable = False
+    return is_armory_loadable
+
+is_protobuf_loadable = None
+def can_load_protobuf():
+    global is_protobuf_loadable
+    if is_protobuf_loadable is None:
+        try:
+            import wallet_pb2
+            is_protobuf_loadable = True
+        except ImportError:
+            is_protobuf_loadable = False
+    return is_protobuf_loadable
+
+is_numpy_loadable = None
+def can_load_numpy():
+    global is_numpy_loadable
+    if is_numpy_loadable is None:
+        try:
+            import numpy
+            is_numpy_loadable = True
+        except ImportError:
+            is_numpy_loadable = False
+    return is_numpy_loadable
+
+pylibscrypt = None
+def can_load_scrypt():
+    global pylibscrypt
+    if pylibscrypt is None:
+        try:
+            import pylibscrypt
+        except ImportError:
+            pylibscrypt = False
+    if pylibscrypt and pylibscrypt._done:  # True iff a binary implementation was found
+        return True
+    return can_load_libcrypto() and hasattr(btcrecover.libcrypto, b"EVP_PBE_scrypt")
+
+def can_load_libcrypto():
+    return btcrecover.load_libcrypto() is not None
+
+
+class Test07WalletDecryption(unittest.TestCase):
+
+    # Checks a test wallet against the known password, and ensures
+    # that the library doesn't make any changes to the wallet file
+    def wallet_tester(self, wallet_basename, force_purepython = False, force_kdf_purepython = False,
+                      correct_pass = None, blockchain_mainpass = None, android_backuppass = None):
+        assert os.path.basename(wallet_basename) == wallet_basename
+        wallet_filename = os.path.join(wallet_dir, wallet_basename)
+
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        temp_wallet_filename = os.path.join(temp_dir, wallet_basename)
+        shutil.copyfile(wallet_filename, temp_wallet_filename)
+
+        if android_backuppass:
+            wallet = btcrecover.WalletAndroidSpendingPIN.load_from_filename(
+                temp_wallet_filename, android_backuppass, force_purepython)
+        elif blockchain_mainpass:
+            wallet = btcrecover.WalletBlockchainSecondpass.load_from_filename(
+                temp_wallet_filename, blockchain_mainpass, force_purepython)
+        else:
+            wallet = btcrecover.load_wallet(temp_wallet_filename)
+
+        if force_purepython:     btcrecover.load_aes256_library(force_purepython=True)
+        if force_kdf_purepython: btcrecover.load_pbkdf2_library(force_purepython=True)
+
+        if not correct_pass:
+            correct_pass = "btcr-test-password"
+        self.assertEqual(wallet.return_verified_password_or_false(
+            ["btcr-wrong-password-1", "btcr-wrong-password-2"]), (False, 2))
+        self.assertEqual(wallet.return_verified_password_or_false(
+            ["btcr-wrong-password-3", correct_pass, "btcr-wrong-password-4"]), (correct_pass, 2))
+        if isinstance(wallet, btcrecover.PackedPasswordsWallet):
+            self.assertEqual(wallet.return_verified_packed_index_or_none(*btcrecover.pack_passwords(
+                ["btcr-wrong-password-3", correct_pass, "btcr-wrong-password-4"], wallet.encode_password)), (1, 2))
+
+        del wallet
+        self.assertTrue(filecmp.cmp(wallet_filename, temp_wallet_filename, False))  # False == always compare file contents
+        shutil.rmtree(temp_dir)
+
+    @unittest.skipUnless(can_load_armory(), "requires Armory and ASCII version of btcrecover")
+    def test_armory(self):
+        self.wallet_tester("armory-wallet.wallet")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_bitcoincore(self):
+        self.wallet_tester("bitcoincore-wallet.dat")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_electrum(self):
+        self.wallet_tester("electrum-wallet")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_electrum2(self):
+        self.wallet_tester("electrum2-wallet")
+
+    def test_electrum2_upgradedfrom_electrum1(self):
+        self.wallet_tester("electrum1-upgradedto-electrum2-wallet")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_multibit(self):
+        self.wallet_tester("multibit-wallet.key")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_multibithd(self):
+        self.wallet_tester("mbhd.wallet.aes")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
+    def test_bitcoinj(self):
+        self.wallet_tester("bitcoinj-wallet.wallet")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
+    def test_androidpin(self):
+        self.wallet_tester("android-bitcoin-wallet-backup",
+                           android_backuppass="btcr-test-password", correct_pass="123456")
+
+    @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
+    def test_androidpin_unencrypted(self):
+        self.wallet_tester("bitcoinj-wallet.wallet", android_backuppass="IGNORED")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_bither(self):
+        self.wallet_tester("bither-wallet.db")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_msigna(self):
+        self.wallet_tester("msigna-wallet.vault")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
+                         hasattr(hashlib, b"pbkdf2_hmac"),
+                         "requires PyCrypto and Python 2.7.8+")
+    def test_blockchain_v0(self):
+        self.wallet_tester("blockchain-v0.0-wallet.aes.json")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
+                         hasattr(hashlib, b"pbkdf2_hmac"),
+                         "requires PyCrypto and Python 2.7.8+")
+    def test_blockchain_v2(self):
+        self.wallet_tester("blockchain-v2.0-wallet.aes.json")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
+                         hasattr(hashlib, b"pbkdf2_hmac"),
+                         "requires PyCrypto and Python 2.7.8+")
+    def test_blockchain_secondpass_v0(self):
+        self.wallet_tester("blockchain-v0.0-wallet.aes.json", blockchain_mainpass="btcr-test-password")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
+                         hasattr(hashlib, b"pbkdf2_hmac"),
+                         "requires PyCrypto and Python 2.7.8+")
+    def test_blockchain_secondpass_v2(self):
+        self.wallet_tester("blockchain-v2.0-wallet.aes.json", blockchain_mainpass="btcr-test-password")
+
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
+    def test_blockchain_secondpass_unencrypted(self):  # this wallet has no second-password iter_count, so this case is also tested here
+        self.wallet_tester("blockchain-unencrypted-wallet.aes.json", blockchain_mainpass="IGNORED")
+
+    def test_bitcoincore_pywallet(self):
+        self.wallet_tester("bitcoincore-pywallet-dumpwallet.txt")
+
+    # Make sure the Blockchain wallet loader can heuristically determine that files containing
+    # base64 data that doesn't look entirely encrypted (random) are not Blockchain wallets
+    def test_blockchain_invalid(self):
+        # A base64-containing file that's mostly but not entirely encrypted (random)
+        with self.assertRaises(ValueError) as cm:
+            btcrecover.WalletBlockchain.load_from_filename(os.path.join(wallet_dir, "multibit-wallet.key"))
+        self.assertIn("Doesn't look random enough to be an encrypted Blockchain wallet", cm.exception.args[0])
+
+    def test_bitcoincore_pp(self):
+        self.wallet_tester("bitcoincore-wallet.dat", force_purepython=True)
+
+    def test_electrum_pp(self):
+        self.wallet_tester("electrum-wallet", force_purepython=True)
+
+    def test_electrum2_pp(self):
+        self.wallet_tester("electrum2-wallet", force_purepython=True)
+
+    def test_multibit_pp(self):
+        self.wallet_tester("multibit-wallet.key", force_purepython=True)
+
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_multibithd_pp(self):
+        self.wallet_tester("mbhd.wallet.aes", force_purepython=True)
+
+    @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
+    def test_bitcoinj_pp(self):
+        self.wallet_tester("bitcoinj-wallet.wallet", force_purepython=True)
+
+    @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
+    def test_androidpin_pp(self):
+        self.wallet_tester("android-bitcoin-wallet-backup", force_purepython=True,
+                           android_backuppass="btcr-test-password", correct_pass="123456")
+
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_bither_pp(self):
+        self.wallet_tester("bither-wallet.db", force_purepython=True)
+
+    def test_msigna_pp(self):
+        self.wallet_tester("msigna-wallet.vault", force_purepython=True)
+
+    def test_blockchain_v0_pp(self):
+        self.wallet_tester("blockchain-v0.0-wallet.aes.json", force_purepython=True, force_kdf_purepython=True)
+
+    def test_blockchain_v2_pp(self):
+        self.wallet_tester("blockchain-v2.0-wallet.aes.json", force_purepython=True, force_kdf_purepython=True)
+
+    def test_blockchain_secondpass_v0_pp(self):
+        self.wallet_tester("blockchain-v0.0-wallet.aes.json", force_purepython=True, force_kdf_purepython=True,
+                           blockchain_mainpass="btcr-test-password")
+
+    def test_blockchain_secondpass_v2_pp(self):
+        self.wallet_tester("blockchain-v2.0-wallet.aes.json", force_purepython=True, force_kdf_purepython=True,
+                           blockchain_mainpass="btcr-test-password")
+
+    def test_blockchain_secondpass_unencrypted_pp(self):  # this wallet has no second-password iter_count, so this case is also tested here
+        self.wallet_tester("blockchain-unencrypted-wallet.aes.json", force_kdf_purepython=True, blockchain_mainpass="IGNORED")
+
+    def test_invalid_wallet(self):
+        with self.assertRaises(SystemExit) as cm:
+            btcrecover.load_wallet(__file__)
+        self.assertIn("unrecognized wallet format", cm.exception.code)
+
+
+class Test08BIP39Passwords(unittest.TestCase):
+
+    def bip39_tester(self, force_purepython = False, unicode_pw = False, *args, **kwargs):
+
+        btcrecover.loaded_wallet = btcrecover.WalletBIP39(*args, **kwargs)
+        if force_purepython: btcrecover.load_pbkdf2_library(force_purepython=True)
+
+        correct_pw = "btcr-test-password" if not unicode_pw else "btcr-тест-пароль"
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-1", "btcr-wrong-password-2"]), (False, 2))
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-3", correct_pw, "btcr-wrong-password-4"]), (correct_pw, 2))
+
+    @unittest.skipUnless(can_load_armory(permit_unicode=True), "requires Armory")
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"),
+                         "requires Python 2.7.8+")
+    def test_bip39_mpk(self):
+        self.bip39_tester(
+            mpk=      "xpub6D3uXJmdUg4xVnCUkNXJPCkk18gZAB8exGdQeb2rDwC5UJtraHHARSCc2Nz7rQ14godicjXiKxhUn39gbAw6Xb5eWb5srcbkhqPgAqoTMEY",
+            mnemonic= "certain come keen collect slab gauge photo inside mechanic deny leader drop"
+        )
+
+    @unittest.skipUnless(can_load_armory(permit_unicode=True), "requires Armory")
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_bip39_unicode_password(self):
+        self.bip39_tester(
+            mpk=        "xpub6CZe1G1A1CaaSepbekLMSk1sBRNA9kHZzEQCedudHAQHHB21FW9fYpQWXBevrLVQfL8JFQVFWEw3aACdr6szksaGsLiHDKyRd1rPJ6ev5ig",
+            mnemonic=   "certain come keen collect slab gauge photo inside mechanic deny leader drop",
+            unicode_pw= True
+        )
+
+    @unittest.skipUnless(can_load_armory(permit_unicode=True), "requires Armory")
+    def test_bip39_unicode_mnemonic(self):
+        self.bip39_tester(
+            mpk=       "xpub6C7cXo5w4HPs6X93zKdkRNDFyHedGHwQHvmMst7HYjeudySyF3eTsWktz6JVz4CkrzuLiEbieYP8dQaxsffJXjquD3FLmnqioHe8qZwcBF3",
+            mnemonic= u"あんまり　おんがく　いとこ　ひくい　こくはく　あらゆる　てあし　げどく　はしる　げどく　そぼろ　はみがき"
+        )
+
+    @unittest.skipUnless(can_load_armory(permit_unicode=True), "requires Armory")
+    def test_bip39_address(self):
+        self.bip39_tester(
+            address=       "1AmugMgC6pBbJGYuYmuRrEpQVB9BBMvCCn",
+            address_limit= 5,
+            mnemonic=      "certain come keen collect slab gauge photo inside mechanic deny leader drop"
+        )
+
+    @unittest.skipUnless(can_load_armory(permit_unicode=True), "requires Armory")
+    def test_bip39_pp(self):
+        self.bip39_tester(
+            mpk=              "xpub6D3uXJmdUg4xVnCUkNXJPCkk18gZAB8exGdQeb2rDwC5UJtraHHARSCc2Nz7rQ14godicjXiKxhUn39gbAw6Xb5eWb5srcbkhqPgAqoTMEY",
+            mnemonic=         "certain come keen collect slab gauge photo inside mechanic deny leader drop",
+            force_purepython= True
+        )
+
+
+def has_any_opencl_devices():
+    try:   devs = btcrecover.get_opencl_devices()
+    except ImportError: return False
+    return len(devs) > 0
+
+
+class Test08KeyDecryption(unittest.TestCase):
+
+    def key_tester(self, key_crc_base64, force_purepython = False, force_kdf_purepython = False, unicode_pw = False,
+                   force_sha512_lanes = False):
+        btcrecover.load_from_base64_key(key_crc_base64)
+        if force_purepython:     btcrecover.load_aes256_library(force_purepython=True)
+        if force_kdf_purepython: btcrecover.load_pbkdf2_library(force_purepython=True)
+        if force_sha512_lanes:   btcrecover.loaded_wallet._sha512_lanes_min = 1
+
+        correct_pw = "btcr-test-password" if not unicode_pw else "btcr-тест-пароль"
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-1", "btcr-wrong-password-2"]), (False, 2))
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-3", correct_pw, "btcr-wrong-password-4"]), (correct_pw, 2))
+
+    @unittest.skipUnless(can_load_armory(), "requires Armory and ASCII version of btcrecover")
+    def test_armory(self):
+        self.key_tester("YXI6r7mks1qvph4G+rRT7WlIptdr9qDqyFTfXNJ3ciuWJ12BgWX5Il+y28hLNr/u4Wl49hUi4JBeq6Jz9dVBX3vAJ6476FEAACAABAAAAGGwnwXRpPbBzC5lCOBVVWDu7mUJetBOBvzVAv0IbrboDXqA8A==")
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_bitcoincore(self):
+        self.key_tester("YmM65iRhIMReOQ2qaldHbn++T1fYP3nXX5tMHbaA/lqEbLhFk6/1Y5F5x0QJAQBI/maR")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_bitcoincore_unicode(self):
+        self.key_tester("YmM6XAL2X19VfzlKJfc+7LIeNrB2KC8E9DWe1YhhOchPoClvwftbuqjXKkfdAAARmggo", unicode_pw=True)
+    #
+    # The test key above uses too many iterations to verify with NumPy in a reasonable time when there
+    # are only a few passwords, so this encrypts a key (well, just its padding) with only a few iterations
+    @unittest.skipUnless(can_load_numpy(), "requires NumPy")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_bitcoincore_lanes(self):
+        import Crypto.Cipher.AES
+        salt, iter_count, iv = b"saltsalt", 5, b"\x42" * 16
+        derived_key = btcrecover.sha512_chain(b"btcr-test-password" + salt, iter_count)
+        self.assertEqual(btcrecover.sha512_chains_lanes([b"btcr-test-password" + salt, b""], iter_count),
+                         [derived_key, btcrecover.sha512_chain(b"", iter_count)])
+        padding  = Crypto.Cipher.AES.new(derived_key[:32], Crypto.Cipher.AES.MODE_CBC, iv).encrypt(b"\x10" * 16)
+        key_data = b"bc:" + struct.pack(b"< 32s 8s I", iv + padding, salt, iter_count)
+        self.key_tester(base64.b64encode(key_data + struct.pack(b"< I", zlib.crc32(key_data) & 0xffffffff)),
+                        force_sha512_lanes=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_multibit(self):
+        self.key_tester("bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_multibit_unicode(self):
+        self.key_tester("bWI6YK6OX8bVP2Ar/j2dZBBQ+F0pEn8kZK6rlXiAWA==", unicode_pw=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_multidoge(self):
+        self.key_tester("bWI6IdK25nMhHI9n4zlb1cUtWBl7mL7gh7ZtxkYaDw==")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_multidoge_unicode(self):
+        self.key_tester("bWI6ry78W+RkeTi2dVt2omZMfXRi46xDsIhr0jKN3g==", unicode_pw=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_androidwallet(self):
+        self.key_tester("bWI6Ii/ZEeDjUJKq704wzUxKudpvAralnrOQtXM4og==")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_androidwallet_unicode(self):
+        self.key_tester("bWI6f1QdX7xXtC0zG7XK9pTGTifie5FUeAGhJ05esw==", unicode_pw=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_androidknc(self):
+        self.key_tester("bWI6n6ccPSkbrmxQpdfKNAOBFppQLGloPDHE2sOucQ====")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_androidknc_unicode(self):
+        self.key_tester("bWI6TaEiZOBE+52jqe09jKcVa39KqvOpJxbpEtCVPQ==", unicode_pw=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_multibithd(self):
+        self.key_tester("bTI6LbH/+ROEa0cQ0inH7V3thbdFJV4=")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_multibithd_unicode(self):
+        self.key_tester("bTI6M7wXqwXQWo4o22eN50PNnlkc/Qs=", unicode_pw=True)
+
+    @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_bitcoinj(self):
+        self.key_tester("Ymo6MacXiCd1+6/qtPc5rCaj6qIGJbu5tX2PXQXqF4Df/kFrjNGMDMHqrwBAAAAIAAEAZwdBow==")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_bitcoinj_unicode(self):
+        self.key_tester("Ymo6hgWTejxVYfL/LLF4af8j2RfEsi5y16kTQhECWnn9iCt8AmGWPoPomQBAAAAIAAEAfNRA3A==", unicode_pw=True)
+
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_bither(self):
+        self.key_tester("YnQ6PocfHvWGVbCzlVb9cUtPDjosnuB7RoyspTEzZZAqURlCsLudQaQ4IkIW8YE=")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_bither_unicode(self):
+        self.key_tester("YnQ6ENNU1KSJlzC8FMfAq/MHgWgaZkxpiByt/vLQ/UdP2NlCsLudQaQ4IjTbPcw=", unicode_pw=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_msigna(self):
+        self.key_tester("bXM6SWd6U+qTKOzQDfz8auBL1/tzu0kap7NMOqctt7U0nA8XOI6j6BCjxCsc7mU=")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_msigna_unicode(self):
+        self.key_tester("bXM6i9OkMzrIJqWvpM+Dxq795jeFFxiB6DtBwuGmeEtfHLLOjMvoJRAWeSsf+Pg=", unicode_pw=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_electrum(self):
+        self.key_tester("ZWw6kLJxTDF7LxneT7c5DblJ9k9WYwV6YUIUQO+IDiIXzMUZvsCT")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_electrum_unicode(self):
+        self.key_tester("ZWw6rLwP/stP422FgteriIgvq4LD90adedrAqz61gKuYDRrx3+Q+", unicode_pw=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_electrum2(self):
+        self.key_tester("ZTI69B961mYKYFV7Bg1zRYZ8ZGw4cE+2D8NF3lp6d2XPe8qTdJUz")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto", "requires PyCrypto")
+    def test_electrum2_unicode(self):
+        self.key_tester("ZTI6k2tz83Lzs83hyQPRj2g90f7nVYHYM20qLv4NIVIzUNNqVWv8", unicode_pw=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
+                         hasattr(hashlib, b"pbkdf2_hmac"),
+                         "requires PyCrypto and Python 2.7.8+")
+    def test_blockchain_v0(self):
+        self.key_tester("Yms69Z9y1J66ceYKkrXy11mHR+YDD8WrPJeTNaAnO7LO7YgAAAAAbnp7YQ==")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
+                         hasattr(hashlib, b"pbkdf2_hmac"),
+                         "requires PyCrypto and Python 2.7.8+")
+    def test_blockchain_v0_unicode(self):
+        self.key_tester("Yms68OsennSoypcGGUvhrhEBFCiIkAK2Qphnfdc3Ungk/SoAAAAAcr6jYQ==", unicode_pw=True)
+
+    @unittest.skipUnless(btcrecover.load_aes256_library().__name__ == b"Crypto" and
+                         hasattr(hashlib, b"pbkdf2_hmac"),
+                         "requires PyCrypto and Python 2.7.8+")
+    def test_blockchain_v2(self):
+        self.key_tester("Yms6abF6aZYdu5sKpStKA4ihra6GEAeZTumFiIM0YQUkTjcQJwAAj8ekAQ==")
+
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
+    def test_blockchain_secondpass(self):                # extracted from blockchain-v0.0-wallet.aes.json which has a second password iter_count
+        self.key_tester("YnM6ujsYxz3SE7fEEekfMuIC1oII7KY//j5FMObBn7HydqVyjnaeTCZDAaC4LbJcVkxaCgAAACsWXkw=")
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
+    def test_blockchain_secondpass_unicode(self):
+        self.key_tester("YnM6/e8Inpbesj+CYE0YvdXLewgN5UH9KFvliZrI43OmYnyHbCa71RBD57XO0CbuADDTCgAAACCVL/w=", unicode_pw=True)
+
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
+    def test_blockchain_secondpass_no_iter_count(self):  # extracted from blockchain-unencrypted-wallet.aes.json which is missing a second password iter_count
+        self.key_tester("YnM6ujsYxz3SE7fEEekfMuIC1oII7KY//j5FMObBn7HydqVyjnaeTCZDAaC4LbJcVkxaAAAAAE/24yM=")
+
+    def test_bitcoincore_pp(self):
+        self.key_tester("YmM65iRhIMReOQ2qaldHbn++T1fYP3nXX5tMHbaA/lqEbLhFk6/1Y5F5x0QJAQBI/maR", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_bitcoincore_unicode_pp(self):
+        self.key_tester("YmM6XAL2X19VfzlKJfc+7LIeNrB2KC8E9DWe1YhhOchPoClvwftbuqjXKkfdAAARmggo", force_purepython=True, unicode_pw=True)
+
+    def test_multibit_pp(self):
+        self.key_tester("bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_multibit_unicode_pp(self):
+        self.key_tester("bWI6YK6OX8bVP2Ar/j2dZBBQ+F0pEn8kZK6rlXiAWA==", force_purepython=True, unicode_pw=True)
+    #
+    # With enough passwords in a chunk, the pure python AES uses NumPy to decrypt with all their keys at once
+    @unittest.skipUnless(can_load_numpy(), "requires NumPy")
+    def test_multibit_numpy_pp(self):
+        btcrecover.load_from_base64_key("bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")
+        btcrecover.load_aes256_library(force_purepython=True)
+        passwords = ["btcr-wrong-password-" + tstr(i) for i in xrange(btcrecover.AES_KEYS_NUMPY_MIN)]
+        self.assertEqual(btcrecover.return_verified_password_or_false(passwords), (False, len(passwords)))
+        passwords[-2] = "btcr-test-password"
+        self.assertEqual(btcrecover.return_verified_password_or_false(passwords), ("btcr-test-password", len(passwords) - 1))
+
+    @unittest.skipUnless(can_load_numpy(), "requires NumPy")
+    def test_aes256_cbc_decrypt_keys_numpy(self):
+        btcrecover.load_aes256_library(force_purepython=True)
+        keys       = [os.urandom(32) for i in xrange(btcrecover.AES_KEYS_NUMPY_MIN)]
+        ivs        = [os.urandom(16) for i in xrange(btcrecover.AES_KEYS_NUMPY_MIN)]
+        ciphertext = os.urandom(16)
+        self.assertEqual(btcrecover.aes256_cbc_decrypt_keys(keys, ivs[0], ciphertext),
+                         [btcrecover.aes256_cbc_decrypt(key, ivs[0], ciphertext) for key in keys])
+        self.assertEqual(btcrecover.aes256_cbc_decrypt_keys(keys, ivs, ciphertext),
+                         [btcrecover.aes256_cbc_decrypt(key, iv, ciphertext) for key, iv in zip(keys, ivs)])
+
+    def test_multidoge_pp(self):
+        self.key_tester("bWI6IdK25nMhHI9n4zlb1cUtWBl7mL7gh7ZtxkYaDw==", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_multidoge_unicode_pp(self):
+        self.key_tester("bWI6ry78W+RkeTi2dVt2omZMfXRi46xDsIhr0jKN3g==", force_purepython=True, unicode_pw=True)
+
+    def test_androidwallet_pp(self):
+        self.key_tester("bWI6Ii/ZEeDjUJKq704wzUxKudpvAralnrOQtXM4og==", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_androidwallet_unicode_pp(self):
+        self.key_tester("bWI6f1QdX7xXtC0zG7XK9pTGTifie5FUeAGhJ05esw==", force_purepython=True, unicode_pw=True)
+
+    def test_androidknc_pp(self):
+        self.key_tester("bWI6n6ccPSkbrmxQpdfKNAOBFppQLGloPDHE2sOucQ==", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_androidknc_unicode_pp(self):
+        self.key_tester("bWI6TaEiZOBE+52jqe09jKcVa39KqvOpJxbpEtCVPQ==", force_purepython=True, unicode_pw=True)
+
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_multibithd_pp(self):
+        self.key_tester("bTI6LbH/+ROEa0cQ0inH7V3thbdFJV4=", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode,   "Unicode builds only")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_multibithd_unicode_pp(self):
+        self.key_tester("bTI6M7wXqwXQWo4o22eN50PNnlkc/Qs=", force_purepython=True, unicode_pw=True)
+
+    @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
+    def test_bitcoinj_pp(self):
+        self.key_tester("Ymo6MacXiCd1+6/qtPc5rCaj6qIGJbu5tX2PXQXqF4Df/kFrjNGMDMHqrwBAAAAIAAEAZwdBow==", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(can_load_protobuf(), "requires protobuf")
+    @unittest.skipUnless(can_load_scrypt(),   "requires a binary scrypt library")
+    def test_bitcoinj_unicode_pp(self):
+        self.key_tester("Ymo6hgWTejxVYfL/LLF4af8j2RfEsi5y16kTQhECWnn9iCt8AmGWPoPomQBAAAAIAAEAfNRA3A==", force_purepython=True, unicode_pw=True)
+
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_bither_pp(self):
+        self.key_tester("YnQ6PocfHvWGVbCzlVb9cUtPDjosnuB7RoyspTEzZZAqURlCsLudQaQ4IkIW8YE=", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(can_load_scrypt(), "requires a binary scrypt library")
+    def test_bither_unicode_pp(self):
+        self.key_tester("YnQ6ENNU1KSJlzC8FMfAq/MHgWgaZkxpiByt/vLQ/UdP2NlCsLudQaQ4IjTbPcw=", force_purepython=True, unicode_pw=True)
+
+    def test_msigna_pp(self):
+        self.key_tester("bXM6SWd6U+qTKOzQDfz8auBL1/tzu0kap7NMOqctt7U0nA8XOI6j6BCjxCsc7mU=", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_msigna_unicode_pp(self):
+        self.key_tester("bXM6i9OkMzrIJqWvpM+Dxq795jeFFxiB6DtBwuGmeEtfHLLOjMvoJRAWeSsf+Pg=", force_purepython=True, unicode_pw=True)
+
+    def test_electrum_pp(self):
+        self.key_tester("ZWw6kLJxTDF7LxneT7c5DblJ9k9WYwV6YUIUQO+IDiIXzMUZvsCT", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_electrum_unicode_pp(self):
+        self.key_tester("ZWw6rLwP/stP422FgteriIgvq4LD90adedrAqz61gKuYDRrx3+Q+", force_purepython=True, unicode_pw=True)
+
+    def test_electrum2_pp(self):
+        self.key_tester("ZTI69B961mYKYFV7Bg1zRYZ8ZGw4cE+2D8NF3lp6d2XPe8qTdJUz", force_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_electrum2_unicode_pp(self):
+        self.key_tester("ZTI6k2tz83Lzs83hyQPRj2g90f7nVYHYM20qLv4NIVIzUNNqVWv8", force_purepython=True, unicode_pw=True)
+
+    def test_blockchain_v0_pp(self):
+        self.key_tester("Yms69Z9y1J66ceYKkrXy11mHR+YDD8WrPJeTNaAnO7LO7YgAAAAAbnp7YQ==", force_purepython=True, force_kdf_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_blockchain_v0_unicode_pp(self):
+        self.key_tester("Yms68OsennSoypcGGUvhrhEBFCiIkAK2Qphnfdc3Ungk/SoAAAAAcr6jYQ==", force_purepython=True, force_kdf_purepython=True, unicode_pw=True)
+
+    def test_blockchain_v2_pp(self):
+        self.key_tester("Yms6abF6aZYdu5sKpStKA4ihra6GEAeZTumFiIM0YQUkTjcQJwAAj8ekAQ==", force_purepython=True, force_kdf_purepython=True)
+
+    def test_pbkdf2_hmac_checkpoints(self):
+        btcrecover.load_pbkdf2_library(force_purepython=True)
+        for hash_name, key_len in (b"sha1", 32), (b"sha512", 64):
+            self.assertEqual(btcrecover.pbkdf2_hmac_checkpoints_purepython(hash_name, b"password", b"salt", (1, 2, 10), key_len),
+                             [btcrecover.pbkdf2_hmac(hash_name, b"password", b"salt", iter_count, key_len) for iter_count in (1, 2, 10)])
+
+    def test_pbkdf2_hmac_fixed_key(self):
+        btcrecover.load_pbkdf2_library(force_purepython=True)
+        salts = [b"salt", b"mnemonic", b""]
+        for hash_name, key_len in (b"sha1", 32), (b"sha512", 64), (b"sha512", 100):
+            self.assertEqual(btcrecover.pbkdf2_hmac_fixed_key_purepython(hash_name, b"password" * 20)(salts, 3, key_len),
+                             [btcrecover.pbkdf2_hmac(hash_name, b"password" * 20, salt, 3, key_len) for salt in salts])
+
+    @unittest.skipUnless(hasattr(hashlib, b"pbkdf2_hmac"), "requires Python 2.7.8+")
+    def test_pbkdf2_hmac_purepython(self):
+        for hash_name, key_len in (b"sha1", None), (b"sha1", 32), (b"sha512", 64), (b"sha512", 150):
+            self.assertEqual(btcrecover.pbkdf2_hmac_purepython(hash_name, b"password", b"salt", 10, key_len),
+                             hashlib.pbkdf2_hmac(hash_name, b"password", b"salt", 10, key_len))
+
+    def test_calibration_file(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        saved_rates = btcrecover.calibration_rates
+        try:
+            btcrecover.calibration_filename = os.path.join(temp_dir, "calibration.json")
+            btcrecover.calibration_rates    = None
+            rate = btcrecover.calibrated_rate(b"test", b"xrange", lambda count: sum(xrange(count)))
+            self.assertGreater(rate, 0)
+            # Once it's saved, the rate is reloaded instead of being remeasured
+            btcrecover.calibration_rates = None
+            self.assertEqual(btcrecover.calibrated_rate(b"test", b"xrange", None), rate)
+            # but not after a library is installed or upgraded
+            try:
+                import numpy
+                self.assertIn(b"numpy-" + numpy.__version__, btcrecover.calibration_host_id())
+            except ImportError:
+                self.assertNotIn(b"numpy-", btcrecover.calibration_host_id())
+        finally:
+            btcrecover.calibration_filename = None
+            btcrecover.calibration_rates    = saved_rates
+            shutil.rmtree(temp_dir)
+
+    def test_fastest_backend(self):
+        saved_rates = btcrecover.calibration_rates
+        try:
+            btcrecover.calibration_rates = {b"test/a": 100.0, b"test/b": 120.0, b"test/c": 200.0}
+            self.assertEqual(btcrecover.fastest_backend(b"test", None, (b"a", None), (b"b", None)), b"a")  # within the margin
+            self.assertEqual(btcrecover.fastest_backend(b"test", None, (b"a", None), (b"c", None)), b"c")
+            #
+            # A candidate which fails is skipped
+            def failed_loader():
+                raise ValueError("unsupported hash type")
+            self.assertEqual(btcrecover.fastest_backend(b"test", None, (b"failed", failed_loader), (b"b", None)), b"b")
+            self.assertIn(b"test/failed", btcrecover.failed_backends)
+        finally:
+            btcrecover.calibration_rates = saved_rates
+            btcrecover.failed_backends.discard(b"test/failed")
+
+    @unittest.skipUnless(can_load_libcrypto(), "requires OpenSSL's libcrypto")
+    def test_libcrypto_aes(self):
+        keys = [struct.pack(b"32B", *range(i, i + 32)) for i in xrange(20)]
+        ivs  = [struct.pack(b"16B", *range(i, i + 16)) for i in xrange(20)]
+        ciphertext = hashlib.sha512(b"ciphertext").digest()[:48]
+        plaintexts = []
+        for backend in b"libcrypto", b"aespython":
+            btcrecover.load_aes256_library(backend=backend)
+            plaintexts.append((btcrecover.aes256_cbc_decrypt(keys[0], ivs[0], ciphertext),
+                               btcrecover.aes256_ofb_decrypt(keys[0], ivs[0], ciphertext),
+                               btcrecover.aes256_cbc_decrypt_keys(keys, ivs,    ciphertext[:16]),
+                               btcrecover.aes256_cbc_decrypt_keys(keys, ivs[0], ciphertext[:16])))
+        self.assertEqual(plaintexts[0], plaintexts[1])
+
+    @unittest.skipUnless(can_load_libcrypto(), "requires OpenSSL's libcrypto")
+    def test_libcrypto_pbkdf2(self):
+        btcrecover.load_pbkdf2_library(backend=b"libcrypto")
+        for hash_name, key_len in (b"sha1", None), (b"sha1", 32), (b"sha512", 64), (b"sha512", 150):
+            self.assertEqual(btcrecover.pbkdf2_hmac(hash_name, b"password", b"salt", 10, key_len),
+                             btcrecover.pbkdf2_hmac_purepython(hash_name, b"password", b"salt", 10, key_len))
+
+    @unittest.skipUnless(can_load_libcrypto() and hasattr(btcrecover.libcrypto, b"EVP_PBE_scrypt"),
+                         "requires OpenSSL 1.1.0+'s libcrypto")
+    def test_libcrypto_scrypt(self):
+        btcrecover.load_scrypt_library(backend=b"libcrypto")
+        self.assertEqual(btcrecover.scrypt(b"password", b"NaCl", 1024, 8, 16, 64), base64.b16decode(   # from RFC 7914
+            b"FDBABE1C9D3472007856E7190D01E9FE7C6AD7CBC8237830E77376634B3731622EAF30D92E22A3886FF109279D9830DAC727AFB94A83EE6D8360CBDFA2CC0640"))
+
+    def test_blockchain_secondpass_pp(self):                # extracted from blockchain-v0.0-wallet.aes.json which has a second password iter_count
+        self.key_tester("YnM6ujsYxz3SE7fEEekfMuIC1oII7KY//j5FMObBn7HydqVyjnaeTCZDAaC4LbJcVkxaCgAAACsWXkw=", force_kdf_purepython=True)
+    #
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    def test_blockchain_secondpass_unicode_pp(self):
+        self.key_tester("YnM6/e8Inpbesj+CYE0YvdXLewgN5UH9KFvliZrI43OmYnyHbCa71RBD57XO0CbuADDTCgAAACCVL/w=", force_kdf_purepython=True, unicode_pw=True)
+
+    def test_blockchain_secondpass_no_iter_count_pp(self):  # extracted from blockchain-unencrypted-wallet.aes.json which is missing a second password iter_count
+        self.key_tester("YnM6ujsYxz3SE7fEEekfMuIC1oII7KY//j5FMObBn7HydqVyjnaeTCZDAaC4LbJcVkxaAAAAAE/24yM=", force_kdf_purepython=True)
+
+    @unittest.skipUnless(has_any_opencl_devices(), "requires OpenCL and a compatible device")
+    def test_bitcoincore_cl(self):
+        btcrecover.load_from_base64_key("YmM65iRhIMReOQ2qaldHbn++T1fYP3nXX5tMHbaA/lqEbLhFk6/1Y5F5x0QJAQBI/maR")
+
+        dev_names_tested = set()
+        for dev in btcrecover.get_opencl_devices():
+            if dev.name in dev_names_tested: continue
+            dev_names_tested.add(dev.name)
+            btcrecover.loaded_wallet.init_opencl_kernel([dev], [4], [4], 200)
+
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-1", "btcr-wrong-password-2"]), (False, 2),
+                dev.name.strip() + " found a false positive")
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-3", "btcr-test-password", "btcr-wrong-password-4"]), ("btcr-test-password", 2),
+                dev.name.strip() + " failed to find password")
+
+    @unittest.skipUnless(tstr == unicode, "Unicode builds only")
+    @unittest.skipUnless(has_any_opencl_devices(), "requires OpenCL and a compatible device")
+    def test_bitcoincore_cl_unicode(self):
+        btcrecover.load_from_base64_key("YmM6XAL2X19VfzlKJfc+7LIeNrB2KC8E9DWe1YhhOchPoClvwftbuqjXKkfdAAARmggo")
+
+        dev_names_tested = set()
+        for dev in btcrecover.get_opencl_devices():
+            if dev.name in dev_names_tested: continue
+            dev_names_tested.add(dev.name)
+            btcrecover.loaded_wallet.init_opencl_kernel([dev], [4], [4], 200)
+
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-3", "btcr-тест-пароль", "btcr-wrong-password-4"]), ("btcr-тест-пароль", 2),
+                dev.name.strip() + " failed to find password")
+
+    @unittest.skipUnless(has_any_opencl_devices(), "requires OpenCL and a compatible device")
+    @unittest.skipIf(sys.platform == "win32", "windows kills and restarts drivers which take too long")
+    def test_bitcoincore_cl_no_interrupts(self):
+        btcrecover.load_from_base64_key("YmM65iRhIMReOQ2qaldHbn++T1fYP3nXX5tMHbaA/lqEbLhFk6/1Y5F5x0QJAQBI/maR")
+
+        dev_names_tested = set()
+        for dev in btcrecover.get_opencl_devices():
+            if dev.name in dev_names_tested: continue
+            dev_names_tested.add(dev.name)
+            btcrecover.loaded_wallet.init_opencl_kernel([dev], [4], [4], 1)
+
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-1", "btcr-wrong-password-2"]), (False, 2))
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-3", "btcr-test-password", "btcr-wrong-password-4"]), ("btcr-test-password", 2))
+
+    @unittest.skipUnless(has_any_opencl_devices(), "requires OpenCL and a compatible device")
+    def test_bitcoincore_cl_sli(self):
+        devices_by_name = dict()
+        for dev in btcrecover.get_opencl_devices():
+            if dev.name in devices_by_name: break
+            else: devices_by_name[dev.name] = dev
+        else:
+            self.skipTest("requires two identical OpenCL devices")
+
+        btcrecover.load_from_base64_key("YmM65iRhIMReOQ2qaldHbn++T1fYP3nXX5tMHbaA/lqEbLhFk6/1Y5F5x0QJAQBI/maR")
+        btcrecover.loaded_wallet.init_opencl_kernel([devices_by_name[dev.name], dev], [2, 2], [2, 2], 200)
+
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-1", "btcr-wrong-password-2", "btcr-wrong-password-3", "btcr-wrong-password-4"]), (False, 4))
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-5", "btcr-test-password", "btcr-wrong-password-6"]), ("btcr-test-password", 2))
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-5", "btcr-wrong-password-6", "btcr-test-password"]), ("btcr-test-password", 3))
+
+    @unittest.skipUnless(can_load_armory(), "requires Armory and ASCII version of btcrecover")
+    @unittest.skipUnless(has_any_opencl_devices(), "requires OpenCL and a compatible device")
+    def test_armory_cl(self):
+        btcrecover.load_from_base64_key("YXI6r7mks1qvph4G+rRT7WlIptdr9qDqyFTfXNJ3ciuWJ12BgWX5Il+y28hLNr/u4Wl49hUi4JBeq6Jz9dVBX3vAJ6476FEAACAABAAAAGGwnwXRpPbBzC5lCOBVVWDu7mUJetBOBvzVAv0IbrboDXqA8A==")
+
+        dev_names_tested = set()
+        for dev in btcrecover.get_opencl_devices():
+            if dev.name in dev_names_tested: continue
+            dev_names_tested.add(dev.name)
+            btcrecover.loaded_wallet.init_opencl_kernel([dev], [4], [4], 200)
+
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-1", "btcr-wrong-password-2"]), (False, 2),
+                dev.name.strip() + " found a false positive")
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-3", "btcr-test-password", "btcr-wrong-password-4"]), ("btcr-test-password", 2),
+                dev.name.strip() + " failed to find password")
+
+    @unittest.skipUnless(can_load_armory(), "requires Armory and ASCII version of btcrecover")
+    @unittest.skipUnless(has_any_opencl_devices(), "requires OpenCL and a compatible device")
+    def test_armory_cl_mem_factor(self):
+        btcrecover.load_from_base64_key("YXI6r7mks1qvph4G+rRT7WlIptdr9qDqyFTfXNJ3ciuWJ12BgWX5Il+y28hLNr/u4Wl49hUi4JBeq6Jz9dVBX3vAJ6476FEAACAABAAAAGGwnwXRpPbBzC5lCOBVVWDu7mUJetBOBvzVAv0IbrboDXqA8A==")
+
+        dev_names_tested = set()
+        for dev in btcrecover.get_opencl_devices():
+            if dev.name in dev_names_tested: continue
+            dev_names_tested.add(dev.name)
+            btcrecover.loaded_wallet.init_opencl_kernel([dev], [8], [8], 200, save_every=3)
+
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-1", "btcr-wrong-password-2"]), (False, 2),
+                dev.name.strip() + " found a false positive")
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-3", "btcr-test-password", "btcr-wrong-password-4"]), ("btcr-test-password", 2),
+                dev.name.strip() + " failed to find password")
+
+    @unittest.skipUnless(can_load_armory(), "requires Armory and ASCII version of btcrecover")
+    @unittest.skipUnless(has_any_opencl_devices(), "requires OpenCL and a compatible device")
+    @unittest.skipIf(sys.platform == "win32", "windows kills and restarts drivers which take too long")
+    def test_armory_cl_no_interrupts(self):
+        btcrecover.load_from_base64_key("YXI6r7mks1qvph4G+rRT7WlIptdr9qDqyFTfXNJ3ciuWJ12BgWX5Il+y28hLNr/u4Wl49hUi4JBeq6Jz9dVBX3vAJ6476FEAACAABAAAAGGwnwXRpPbBzC5lCOBVVWDu7mUJetBOBvzVAv0IbrboDXqA8A==")
+
+        dev_names_tested = set()
+        for dev in btcrecover.get_opencl_devices():
+            if dev.name in dev_names_tested: continue
+            dev_names_tested.add(dev.name)
+            btcrecover.loaded_wallet.init_opencl_kernel([dev], [4], [4], 1)
+
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-1", "btcr-wrong-password-2"]), (False, 2))
+            self.assertEqual(btcrecover.return_verified_password_or_false(
+                ["btcr-wrong-password-3", "btcr-test-password", "btcr-wrong-password-4"]), ("btcr-test-password", 2))
+
+    @unittest.skipUnless(can_load_armory(), "requires Armory and ASCII version of btcrecover")
+    @unittest.skipUnless(has_any_opencl_devices(), "requires OpenCL and a compatible device")
+    def test_armory_cl_sli(self):
+        devices_by_name = dict()
+        for dev in btcrecover.get_opencl_devices():
+            if dev.name in devices_by_name: break
+            else: devices_by_name[dev.name] = dev
+        else:
+            self.skipTest("requires two identical OpenCL devices")
+
+        btcrecover.load_from_base64_key("YXI6r7mks1qvph4G+rRT7WlIptdr9qDqyFTfXNJ3ciuWJ12BgWX5Il+y28hLNr/u4Wl49hUi4JBeq6Jz9dVBX3vAJ6476FEAACAABAAAAGGwnwXRpPbBzC5lCOBVVWDu7mUJetBOBvzVAv0IbrboDXqA8A==")
+        btcrecover.loaded_wallet.init_opencl_kernel([devices_by_name[dev.name], dev], [4, 4], [4, 4], 200)
+
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-1", "btcr-wrong-password-2", "btcr-wrong-password-3", "btcr-wrong-password-4",
+             "btcr-wrong-password-5", "btcr-wrong-password-6", "btcr-wrong-password-7", "btcr-wrong-password-8"]), (False, 8))
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-1", "btcr-wrong-password-2", "btcr-test-password",    "btcr-wrong-password-4",
+             "btcr-wrong-password-5", "btcr-wrong-password-6", "btcr-wrong-password-7", "btcr-wrong-password-8"]), ("btcr-test-password", 3))
+        self.assertEqual(btcrecover.return_verified_password_or_false(
+            ["btcr-wrong-password-1", "btcr-wrong-password-2", "btcr-wrong-password-3", "btcr-wrong-password-4",
+             "btcr-wrong-password-5", "btcr-wrong-password-6", "btcr-wrong-password-7", "btcr-test-password"]), ("btcr-test-password", 8))
+
+    def test_invalid_crc(self):
+        with self.assertRaises(SystemExit) as cm:
+            self.key_tester("aWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA==")
+        self.assertIn("encrypted key data is corrupted (failed CRC check)", cm.exception.code)
+
+
+E2E_ARGS = b"--tokenlist __funccall --exclude-passwordlist __funccall --data-extract --autosave __funccall " \
+           b"--typos 3 --typos-case --typos-repeat --typos-swap --no-progress".split()
+E2E_TOKENLIST    = "+ ^%0,1[b-c]tcr-- \n"  "+ ^,$%0,1<Test- \n"  "^3$pas \n"  "+ wrod$"
+E2E_EXCLUDELIST  = "tCr--Test-wrod\n" "btcr-Tsett-paaswrod\n" "ctcr--Test-pAssrwod"  # passwords #4, #100004, & #120004
+E2E_DATA_EXTRACT = "bWI6oikebfNQTLk75CfI5X3svX6AC7NFeGsgTNXZfA=="
+E2E_COORDINATOR_SECRET = b"e2e-secret"
+# Target functions for the worker processes of Test09EndToEnd.test_coordinator()
+def e2e_coordinated_worker(address, threads):
+    while not os.path.exists(address):
+        time.sleep(0.05)
+    autosave_index = E2E_ARGS.index(b"--autosave")
+    btcrecover.parse_arguments(E2E_ARGS[:autosave_index] + E2E_ARGS[autosave_index+2:] +
+                               [b"--coordinated-by", address, b"--threads", threads,
+                                b"--coordinator-secret", E2E_COORDINATOR_SECRET],
+        tokenlist            = StringIO(E2E_TOKENLIST),
+        exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+        data_extract         = E2E_DATA_EXTRACT)
+    btcrecover.main()
+#
+# Connects to the coordinator, optionally authenticating with secret
+def e2e_connect(address, secret = None):
+    while not os.path.exists(address):
+        time.sleep(0.05)
+    worker = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    worker.connect(address)
+    if secret is not None:
+        worker.sendall(b'{"hello": true}\n')
+        challenge = base64.b16decode(json.loads(worker.recv(1024))["challenge"])
+        worker.sendall(json.dumps({"auth": hmac.new(secret, challenge, hashlib.sha256).hexdigest()}) + b"\n")
+        assert json.loads(worker.recv(1024)) == {"ok": True}
+    return worker
+#
+# Leases a range and then fails without finishing it
+def e2e_failed_worker(address):
+    worker = e2e_connect(address, E2E_COORDINATOR_SECRET)
+    worker.sendall(b'{"request": true}\n')
+    worker.recv(1024)
+    worker.close()
+#
+# Sends messages which should each cause the coordinator to disconnect it (without affecting the search)
+def e2e_invalid_worker(address):
+    for secret, message in (
+            (None,                   b'[not json'),
+            (None,                   b'{"found": "d3JvbmctcGFzc3dvcmQ="}'),  # not authenticated
+            (b"wrong-secret",        None),
+            (E2E_COORDINATOR_SECRET, b'{"completed": [0, 1000000], "bases": 1000000, "passwords": 0, "seconds": 1}'),
+            (E2E_COORDINATOR_SECRET, b'{"completed": "0-1"}'),
+            (E2E_COORDINATOR_SECRET, b'["request"]')):
+        try:
+            worker = e2e_connect(address, secret)
+        except (AssertionError, ValueError):
+            assert secret != E2E_COORDINATOR_SECRET
+            continue  # the wrong secret was rejected
+        assert message, "the wrong secret was accepted"
+        worker.sendall(message + b"\n")
+        assert worker.recv(1024) == b"", "the invalid message was accepted"
+        worker.close()
+
+#
+# Sends messages without ever reading the replies until the coordinator disconnects it
+def e2e_stalled_worker(address):
+    worker = e2e_connect(address, E2E_COORDINATOR_SECRET)
+    give_up_at = time.time() + 60.0
+    try:
+        while time.time() < give_up_at:
+            worker.sendall(b'{"heartbeat": true}\n' * 1000)
+    except socket.error:
+        return
+    assert False, "the stalled worker wasn't disconnected"
+
+class Test09EndToEnd(unittest.TestCase):
+
+    autosave_file = BytesIONonClosing()
+
+    # These test_ functions are in alphabetical order (the same order they're executed in)
+
+    # A test of multiple features at once
+    def test_end_to_end(self):
+        autosave_file = self.__class__.autosave_file
+        btcrecover.parse_arguments(E2E_ARGS,
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = autosave_file)
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+
+        # Verify the exact password number where it was found to ensure password ordering hasn't changed
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 103762)
+
+    # Repeat the test above using the same autosave file, starting off just before the password was found
+    def test_restore(self):
+        self.test_end_to_end()
+
+        # Verify the password number where the search started
+        autosave_file = self.__class__.autosave_file
+        autosave_file.seek(0)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 103762)
+
+    # Repeat the first test with a coordinator handing out parts of the search to local worker processes
+    # (one of which fails after being given its first part, one of which only sends invalid messages, and one
+    # of which stops reading the replies), while the coordinator autosaves the progress
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "Unix domain sockets are not supported")
+    def test_coordinator(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        try:
+            address = os.path.join(temp_dir, "coordinator")
+            workers = [multiprocessing.Process(target=e2e_failed_worker,  args=(address,)),
+                       multiprocessing.Process(target=e2e_invalid_worker, args=(address,)),
+                       multiprocessing.Process(target=e2e_stalled_worker, args=(address,))] + \
+                      [multiprocessing.Process(target=e2e_coordinated_worker, args=(address, threads)) for threads in (b"1", b"2")]
+            for worker in workers:
+                worker.start()
+            autosave_file = BytesIONonClosing()
+            btcrecover.parse_arguments(E2E_ARGS + [b"--coordinator", address, b"--coordinator-secret", E2E_COORDINATOR_SECRET],
+                tokenlist            = StringIO(E2E_TOKENLIST),
+                exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+                data_extract         = E2E_DATA_EXTRACT,
+                autosave             = autosave_file)
+            self.assertEqual("btcr-test-password", btcrecover.main()[0])
+            for worker in workers:
+                worker.join()
+                self.assertEqual(worker.exitcode, 0)
+        finally:
+            shutil.rmtree(temp_dir)
+        self.assertFalse(os.path.exists(address))
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertIn(b"coordinator", savestate)
+
+    # Repeat the first test with a new autosave file using worker processes: the passwords are counted in parallel,
+    # and the duplicates found by the counting processes finish this process's duplicate checkers' first run (so
+    # they can be cached) before searching
+    def test_threads_dupchecks(self):
+        temp_dir = tempfile.mkdtemp("-test-btcr")
+        try:
+            autosave_filename = os.path.join(temp_dir, "autosave")
+            args = E2E_ARGS[:]
+            args[args.index(b"--autosave") + 1] = autosave_filename
+            btcrecover.parse_arguments(args + [b"--threads", b"3"],
+                tokenlist            = StringIO(E2E_TOKENLIST),
+                exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+                data_extract         = E2E_DATA_EXTRACT)
+            self.assertTrue(btcrecover.can_count_in_parallel())
+            self.assertEqual("btcr-test-password", btcrecover.main()[0])
+            self.assertEqual(btcrecover.password_dups._run_number, 1)  # (the search didn't finish its run)
+            self.assertTrue(os.path.isfile(autosave_filename + btcrecover.DUPS_CACHE_SUFFIX))
+            btcrecover.autosave_file.close()
+        finally:
+            shutil.rmtree(temp_dir)
+
+    # Calling main() again with the same wallet after a search which finished normally
+    # reuses the worker processes and the measured verification speed
+    def test_reuse_worker_pool(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --data-extract --threads 3 --no-progress".split(),
+            tokenlist    = StringIO("one two three"),
+            data_extract = E2E_DATA_EXTRACT)
+        self.assertEqual(btcrecover.main(), (False, "Password search exhausted"))
+        idle_worker_pool     = btcrecover.idle_worker_pool
+        measured_performance = btcrecover.measured_performance
+        self.assertIsNotNone(idle_worker_pool)
+        #
+        wallet = btcrecover.loaded_wallet
+        btcrecover.parse_arguments(b"--tokenlist __funccall --threads 3 --no-progress".split(),
+            tokenlist = StringIO("four five"), wallet = wallet)
+        self.assertEqual(btcrecover.main(), (False, "Password search exhausted"))
+        self.assertIs(btcrecover.idle_worker_pool[0], idle_worker_pool[0])
+        self.assertIs(btcrecover.measured_performance, measured_performance)
+        #
+        # A pool with a different number of workers isn't reused
+        btcrecover.parse_arguments(b"--tokenlist __funccall --threads 2 --no-progress".split(),
+            tokenlist = StringIO("six seven"), wallet = wallet)
+        self.assertEqual(btcrecover.main(), (False, "Password search exhausted"))
+        self.assertIsNot(btcrecover.idle_worker_pool[0], idle_worker_pool[0])
+        self.assertLess(btcrecover.idle_worker_pool[2], idle_worker_pool[2])
+        #
+        btcrecover.parse_arguments(b"--tokenlist __funccall --threads 3 --no-progress".split(),
+            tokenlist = StringIO("btcr-test-password"), wallet = wallet)
+        self.assertEqual(btcrecover.main()[0], "btcr-test-password")
+        self.assertIsNone(btcrecover.idle_worker_pool)
+
+    # Repeat the first test without an autosave file, with each worker generating its own passwords
+    @unittest.skipIf(sys.platform == "win32", "--shard-generation is not supported on Windows")
+    def test_shard_generation(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --exclude-passwordlist __funccall --data-extract --typos 3"
+                                   b" --typos-case --typos-repeat --typos-swap --no-progress --shard-generation --threads 3".split(),
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT)
+        self.assertEqual(btcrecover.args.no_dupchecks, 1)
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+
+    # If a shard's process dies without sending its final result, the search ends instead of hanging
+    @unittest.skipIf(sys.platform == "win32", "--shard-generation is not supported on Windows")
+    def test_shard_died(self):
+        results_queue = multiprocessing.Queue()
+        shard_processes = [multiprocessing.Process(target=results_queue.put, args=(None,)),
+                           multiprocessing.Process(target=os._exit, args=(9,))]
+        for process in shard_processes:
+            process.start()
+        with self.assertRaises(SystemExit) as cm:
+            list(btcrecover.shard_results_iterator(results_queue, shard_processes))
+        self.assertIn("a worker process exited unexpectedly (exit code 9)", cm.exception.code)
+
+    # Repeat the first test with a new autosave file, using worker processes which receive passwords via
+    # shared memory in chunks whose size varies, and make sure the autosaved password number is still exact
+    @unittest.skipIf(sys.platform == "win32", "shared memory password slots are not supported on Windows")
+    def test_shared_memory(self):
+        autosave_file = BytesIONonClosing()
+        btcrecover.parse_arguments(E2E_ARGS + [b"--threads", b"3"],
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = autosave_file)
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 103762)
+
+    # Repeat the first test with a new autosave file, using worker threads which share the wallet
+    # instead of worker processes, and make sure the autosaved password number is still exact
+    def test_backend_threads(self):
+        autosave_file = BytesIONonClosing()
+        btcrecover.parse_arguments(E2E_ARGS + [b"--threads", b"3", b"--backend", b"threads"],
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = autosave_file)
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 103762)
+
+    # With --backend auto, the faster backend is chosen (and remembered for the same wallet)
+    def test_backend_auto(self):
+        btcrecover.parse_arguments(b"--tokenlist __funccall --data-extract --threads 2 --no-progress --backend auto".split(),
+            tokenlist    = StringIO("one two btcr-test-password"),
+            data_extract = E2E_DATA_EXTRACT)
+        packed_chunks = btcrecover.SharedPasswordSlots.packed_chunks
+        packed_chunks_calls = [0]
+        def counting_packed_chunks(self, password_iterator):
+            packed_chunks_calls[0] += 1
+            return packed_chunks(self, password_iterator)
+        btcrecover.SharedPasswordSlots.packed_chunks = counting_packed_chunks
+        try:
+            self.assertEqual(btcrecover.main()[0], "btcr-test-password")
+        finally:
+            btcrecover.SharedPasswordSlots.packed_chunks = packed_chunks
+        wallet, workers, backend = btcrecover.measured_backend
+        self.assertIs(wallet, btcrecover.loaded_wallet)
+        self.assertIn(workers, (1, 2))  # (one fewer is spawned if the main thread also counts as a worker)
+        self.assertIn(backend, ("processes", "threads"))
+        if sys.platform != "win32":
+            # The processes were benchmarked using shared memory (twice, after waiting for them to start)
+            self.assertGreaterEqual(packed_chunks_calls[0], 2)
+        #
+        # When threads were chosen earlier, no process pool is opened for the next search
+        btcrecover.measured_backend = wallet, workers, "threads"
+        btcrecover.parse_arguments(b"--tokenlist __funccall --threads 2 --no-progress --backend auto".split(),
+            tokenlist = StringIO("one two btcr-test-password"), wallet = wallet)
+        open_worker_pool = btcrecover.open_worker_pool
+        btcrecover.open_worker_pool = None  # (calling it would raise a TypeError)
+        try:
+            self.assertEqual(btcrecover.main()[0], "btcr-test-password")
+        finally:
+            btcrecover.open_worker_pool = open_worker_pool
+
+    @unittest.skipIf(sys.platform == "win32", "--background-count is not supported on Windows")
+    def test_background_count(self):
+        autosave_file = BytesIONonClosing()
+        btcrecover.parse_arguments(E2E_ARGS + [b"--background-count"],
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = autosave_file)
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 103762)
+
+    def test_eta_sample(self):
+        btcrecover.parse_arguments(E2E_ARGS + [b"--eta-sample"],
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = BytesIONonClosing())
+        self.assertEqual("btcr-test-password", btcrecover.main()[0])
+
+    # Repeat the first test with a new autosave file, using --skip to start just after the password is located
+    def test_skip(self):
+        autosave_file = BytesIONonClosing()
+        btcrecover.parse_arguments(E2E_ARGS + [b"--skip=103763"],
+            tokenlist            = StringIO(E2E_TOKENLIST),
+            exclude_passwordlist = StringIO(E2E_EXCLUDELIST),
+            data_extract         = E2E_DATA_EXTRACT,
+            autosave             = autosave_file)
+        self.assertIn("Password search exhausted", btcrecover.main()[1])
+
+        # Verify the password number where the search started
+        autosave_file.seek(0)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 103763)
+
+        # Verify the total count of passwords
+        autosave_file.seek(SAVESLOT_SIZE)
+        savestate = cPickle.load(autosave_file)
+        self.assertEqual(savestate.get(b"skip"), 139652)
+
+
+# QuickTests: all of Test01Basics, Test02Anchors, Test03WildCards, and Test04Typos,
+# all of Test05CommandLine except the "large" tests, and select quick tests from
+# Test08KeyDecryption
+class QuickTests(unittest.TestSuite) :
+    def __init__(self):
+        super(QuickTests, self).__init__()
+        tl = unittest.defaultTestLoader
+        self.addTests(tl.loadTestsFromTestCase(TestCase)
+            for TestCase in (Test01Basics, Test02Anchors, Test03WildCards, Test04Typos))
+        self.addTest(tl.loadTestsFromNames(("Test05CommandLine." + method_name
+            for method_name in tl.getTestCaseNames(Test05CommandLine) if "large" not in method_name),
+            module=sys.modules[__name__]))
+        self.addTest(tl.loadTestsFromNames(("Test08KeyDecryption." + method_name
+            for method_name in (
+                "test_bitcoincore_pp",
+                "test_bitcoincore_unicode_pp",
+                "test_multibit",
+                "test_multibit_unicode",
+                "test_multidoge",
+                "test_multidoge_unicode",
+                "test_androidwallet",
+                "test_androidwallet_unicode",
+                "test_androidknc",
+                "test_androidknc_unicode",
+                "test_multibithd",
+                "test_multibithd_unicode",
+                "test_bitcoinj",
+                "test_bitcoinj_unicode",
+                "test_bither",
+                "test_bither_unicode",
+                "test_msigna",
+                "test_msigna_unicode",
+                "test_electrum",
+                "test_electrum_unicode",
+                "test_electrum2",
+                "test_electrum2_unicode",
+                "test_blockchain_v0",
+                "test_blockchain_v0_unicode",
+                "test_blockchain_v2",
+                "test_blockchain_secondpass",
+                "test_blockchain_secondpass_unicode",
+                "test_blockchain_secondpass_no_iter_count",
+                "test_multibit_pp",
+                "test_multibit_unicode_pp",
+                "test_multidoge_pp",
+                "test_multidoge_unicode_pp",
+                "test_androidwallet_pp",
+                "test_androidwallet_unicode_pp",
+                "test_androidknc_pp",
+                "test_androidknc_unicode_pp",
+                "test_multibithd_pp",
+                "test_multibithd_unicode_pp",
+                "test_bitcoinj_pp",
+                "test_bitcoinj_unicode_pp",
+                "test_bither_pp",
+                "test_bither_unicode_pp",
+                "test_msigna_pp",
+                "test_msigna_unicode_pp",
+                "test_electrum_pp",
+                "test_electrum_unicode_pp",
+                "test_electrum2_pp",
+                "test_electrum2_unicode_pp",
+                "test_blockchain_v0_pp",
+                "test_blockchain_v0_unicode_pp",
+                "test_blockchain_secondpass_pp",
+                "test_blockchain_secondpass_unicode_pp",
+                "test_blockchain_secondpass_no_iter_count_pp",
+                "test_invalid_crc")),
+            module=sys.modules[__name__]
+        ))
+        self.addTests(tl.loadTestsFromTestCase(Test08BIP39Passwords))
+
+
+if __name__ == b'__main__':
+
+    import argparse, atexit
+
+    # Add two new arguments to those already provided by unittest.main()
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--no-buffer", action="store_true")
+    parser.add_argument("--no-pause",  action="store_true")
+    args, unittest_args = parser.parse_known_args()
+    sys.argv[1:] = unittest_args
+
+    # By default, pause before exiting
+    if not args.no_pause:
+        atexit.register(lambda: raw_input("\nPress Enter to exit ..."))
+
+    unittest.main(buffer = not args.no_buffer)
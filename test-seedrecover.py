@@ -36,6 +36,9 @@ warnings.simplefilter("error")
 
 import seedrecover, unittest, os, tempfile, shutil, filecmp
 
+# Measure crypto backends afresh instead of using (or overwriting) the user's calibration file
+seedrecover.btcr.calibration_filename = None
+
 wallet_dir = os.path.join(os.path.dirname(__file__), "test-wallets")
 
 